@@ -0,0 +1,40 @@
+"""add_hotel_analytics_rollup_table
+
+Revision ID: 3b7e91c4d2a6
+Revises: 22fd2f447aad
+Create Date: 2026-10-18 09:12:41.118203
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3b7e91c4d2a6"
+down_revision: Union[str, None] = "22fd2f447aad"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "hotel_analytics_rollup",
+        sa.Column("id", sa.Integer, primary_key=True, autoincrement=True),
+        sa.Column("dimension", sa.String(50), nullable=False, index=True),
+        sa.Column("bucket", sa.String(255), nullable=False),
+        sa.Column("hotel_count", sa.Integer, nullable=False, default=0),
+        sa.Column("value_sum", sa.Float, nullable=True),
+        sa.Column("refreshed_at", sa.DateTime, nullable=False),
+        sa.UniqueConstraint(
+            "dimension", "bucket", name="uq_hotel_rollup_dimension_bucket"
+        ),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("hotel_analytics_rollup")
@@ -0,0 +1,35 @@
+"""add_point_meter_batches_table
+
+Revision ID: 5e9a3c7d1f02
+Revises: d41f6a7b2c85
+Create Date: 2026-10-18 16:02:45.310872
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5e9a3c7d1f02"
+down_revision: Union[str, None] = "d41f6a7b2c85"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "point_meter_batches",
+        sa.Column("batch_id", sa.String(64), primary_key=True),
+        sa.Column("user_count", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("points", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("applied_at", sa.DateTime, nullable=False, index=True),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("point_meter_batches")
@@ -0,0 +1,98 @@
+"""add_user_activity_rollup_tables
+
+Revision ID: 8c2d5f1a9e34
+Revises: 3b7e91c4d2a6
+Create Date: 2026-10-18 11:04:27.530914
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8c2d5f1a9e34"
+down_revision: Union[str, None] = "3b7e91c4d2a6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _create_activity_rollup(table_name: str, key_name: str, index_name: str) -> None:
+    op.create_table(
+        table_name,
+        sa.Column("id", sa.Integer, primary_key=True, autoincrement=True),
+        sa.Column("bucket_start", sa.DateTime, nullable=False, index=True),
+        sa.Column("user_id", sa.String(10), nullable=False, server_default=""),
+        sa.Column("action", sa.String(50), nullable=False),
+        sa.Column("success", sa.Boolean, nullable=False, server_default=sa.true()),
+        sa.Column("count", sa.Integer, nullable=False, server_default="0"),
+        sa.UniqueConstraint(
+            "bucket_start", "user_id", "action", "success", name=key_name
+        ),
+    )
+    op.create_index(index_name, table_name, ["user_id", "bucket_start"])
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _create_activity_rollup(
+        "user_activity_rollup_hourly",
+        "uq_activity_rollup_hourly_key",
+        "ix_activity_rollup_hourly_user_bucket",
+    )
+    _create_activity_rollup(
+        "user_activity_rollup_daily",
+        "uq_activity_rollup_daily_key",
+        "ix_activity_rollup_daily_user_bucket",
+    )
+
+    op.create_table(
+        "user_endpoint_rollup_daily",
+        sa.Column("id", sa.Integer, primary_key=True, autoincrement=True),
+        sa.Column("bucket_start", sa.DateTime, nullable=False),
+        sa.Column("user_id", sa.String(10), nullable=False, server_default=""),
+        sa.Column("method", sa.String(10), nullable=False, server_default=""),
+        sa.Column("endpoint", sa.String(255), nullable=False, server_default=""),
+        sa.Column("status_code", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("count", sa.Integer, nullable=False, server_default="0"),
+        sa.UniqueConstraint(
+            "bucket_start",
+            "user_id",
+            "method",
+            "endpoint",
+            "status_code",
+            name="uq_endpoint_rollup_daily_key",
+        ),
+    )
+    op.create_index(
+        "ix_endpoint_rollup_daily_user_bucket",
+        "user_endpoint_rollup_daily",
+        ["user_id", "bucket_start"],
+    )
+
+    op.create_table(
+        "activity_rollup_state",
+        sa.Column("name", sa.String(50), primary_key=True),
+        sa.Column("last_log_id", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime, nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("activity_rollup_state")
+    op.drop_index(
+        "ix_endpoint_rollup_daily_user_bucket", table_name="user_endpoint_rollup_daily"
+    )
+    op.drop_table("user_endpoint_rollup_daily")
+    op.drop_index(
+        "ix_activity_rollup_daily_user_bucket", table_name="user_activity_rollup_daily"
+    )
+    op.drop_table("user_activity_rollup_daily")
+    op.drop_index(
+        "ix_activity_rollup_hourly_user_bucket",
+        table_name="user_activity_rollup_hourly",
+    )
+    op.drop_table("user_activity_rollup_hourly")
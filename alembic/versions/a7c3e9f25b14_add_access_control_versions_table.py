@@ -0,0 +1,38 @@
+"""add_access_control_versions_table
+
+Revision ID: a7c3e9f25b14
+Revises: 5e9a3c7d1f02
+Create Date: 2026-10-18 17:11:38.204517
+
+"""
+
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a7c3e9f25b14"
+down_revision: Union[str, None] = "5e9a3c7d1f02"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    table = op.create_table(
+        "access_control_versions",
+        sa.Column("name", sa.String(50), primary_key=True),
+        sa.Column("version", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime, nullable=False),
+    )
+    op.bulk_insert(
+        table, [{"name": "global", "version": 1, "updated_at": datetime.utcnow()}]
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("access_control_versions")
@@ -0,0 +1,41 @@
+"""add_data_versions_table
+
+Revision ID: b6d2e8a4c1f7
+Revises: f3a9c1e7b5d2
+Create Date: 2026-10-19 11:02:47.381905
+
+"""
+
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b6d2e8a4c1f7"
+down_revision: Union[str, None] = "f3a9c1e7b5d2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TRACKED_TABLES = ("hotels", "provider_mappings", "locations", "contacts", "supplier_summary")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    table = op.create_table(
+        "data_versions",
+        sa.Column("name", sa.String(50), primary_key=True),
+        sa.Column("version", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime, nullable=False),
+    )
+    now = datetime.utcnow()
+    op.bulk_insert(
+        table, [{"name": name, "version": 1, "updated_at": now} for name in TRACKED_TABLES]
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("data_versions")
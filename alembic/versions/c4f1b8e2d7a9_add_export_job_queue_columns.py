@@ -0,0 +1,41 @@
+"""add_export_job_queue_columns
+
+Revision ID: c4f1b8e2d7a9
+Revises: a7c3e9f25b14
+Create Date: 2026-10-18 22:48:12.530144
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c4f1b8e2d7a9"
+down_revision: Union[str, None] = "a7c3e9f25b14"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("export_jobs", sa.Column("priority", sa.Integer, nullable=False, server_default="0"))
+    op.add_column("export_jobs", sa.Column("payload", sa.JSON, nullable=True))
+    op.add_column("export_jobs", sa.Column("worker_id", sa.String(100), nullable=True))
+    op.add_column("export_jobs", sa.Column("heartbeat_at", sa.DateTime, nullable=True))
+    op.add_column("export_jobs", sa.Column("attempts", sa.Integer, nullable=False, server_default="0"))
+    op.add_column("export_jobs", sa.Column("checkpoint", sa.JSON, nullable=True))
+    op.create_index("ix_export_jobs_queue", "export_jobs", ["status", "priority", "created_at"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_export_jobs_queue", table_name="export_jobs")
+    op.drop_column("export_jobs", "checkpoint")
+    op.drop_column("export_jobs", "attempts")
+    op.drop_column("export_jobs", "heartbeat_at")
+    op.drop_column("export_jobs", "worker_id")
+    op.drop_column("export_jobs", "payload")
+    op.drop_column("export_jobs", "priority")
@@ -0,0 +1,52 @@
+"""add_user_points_reserved_points
+
+Revision ID: d1e7f3b9a5c2
+Revises: b6d2e8a4c1f7
+Create Date: 2026-10-20 09:41:12.530174
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d1e7f3b9a5c2"
+down_revision: Union[str, None] = "b6d2e8a4c1f7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "user_points",
+        sa.Column("reserved_points", sa.Integer, nullable=False, server_default="0"),
+    )
+    # Outstanding leases used to be taken out of current_points; keep them
+    # in the balance and mark them reserved instead
+    op.execute(
+        """
+        UPDATE user_points SET
+            current_points = current_points + (
+                SELECT COALESCE(SUM(points), 0) FROM point_meter_leases
+                WHERE point_meter_leases.user_id = user_points.user_id
+            ),
+            reserved_points = (
+                SELECT COALESCE(SUM(points), 0) FROM point_meter_leases
+                WHERE point_meter_leases.user_id = user_points.user_id
+            )
+        WHERE user_id IN (SELECT user_id FROM point_meter_leases)
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(
+        "UPDATE user_points SET current_points = current_points - reserved_points "
+        "WHERE reserved_points > 0"
+    )
+    op.drop_column("user_points", "reserved_points")
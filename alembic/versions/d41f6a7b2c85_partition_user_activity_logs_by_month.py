@@ -0,0 +1,84 @@
+"""partition_user_activity_logs_by_month
+
+Revision ID: d41f6a7b2c85
+Revises: 8c2d5f1a9e34
+Create Date: 2026-10-18 14:37:02.664190
+
+MySQL only: converts user_activity_logs to RANGE COLUMNS(created_at)
+partitioning with one partition per month (pYYYYMM) plus a catch-all pmax.
+MySQL requires the partitioning column in every unique key and does not
+allow foreign keys on partitioned tables, so the primary key becomes
+(id, created_at) and the users FK is dropped (the ORM relationship is
+unaffected). Other dialects keep the plain table; the retention service
+prunes it by created_at range instead.
+
+"""
+
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d41f6a7b2c85"
+down_revision: Union[str, None] = "8c2d5f1a9e34"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLE = "user_activity_logs"
+MONTHS_AHEAD = 3
+
+
+def _add_months(month: datetime, count: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name != "mysql":
+        return
+
+    for fk in sa.inspect(bind).get_foreign_keys(TABLE):
+        if fk.get("name"):
+            op.execute(f"ALTER TABLE {TABLE} DROP FOREIGN KEY `{fk['name']}`")
+
+    op.execute(f"ALTER TABLE {TABLE} DROP PRIMARY KEY, ADD PRIMARY KEY (id, created_at)")
+
+    oldest = bind.execute(sa.text(f"SELECT MIN(created_at) FROM {TABLE}")).scalar()
+    now = datetime.utcnow()
+    month = datetime((oldest or now).year, (oldest or now).month, 1)
+    last = _add_months(datetime(now.year, now.month, 1), MONTHS_AHEAD)
+
+    partitions = []
+    while month <= last:
+        upper = _add_months(month, 1)
+        partitions.append(
+            f"PARTITION p{month:%Y%m} VALUES LESS THAN ('{upper:%Y-%m-%d}')"
+        )
+        month = upper
+    partitions.append("PARTITION pmax VALUES LESS THAN (MAXVALUE)")
+
+    op.execute(
+        f"ALTER TABLE {TABLE} PARTITION BY RANGE COLUMNS(created_at) "
+        f"({', '.join(partitions)})"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name != "mysql":
+        return
+
+    op.execute(f"ALTER TABLE {TABLE} REMOVE PARTITIONING")
+    op.execute(f"ALTER TABLE {TABLE} DROP PRIMARY KEY, ADD PRIMARY KEY (id)")
+    # Rows of users deleted while the FK was absent would block the constraint
+    op.execute(
+        f"UPDATE {TABLE} SET user_id = NULL "
+        f"WHERE user_id IS NOT NULL AND user_id NOT IN (SELECT id FROM users)"
+    )
+    op.create_foreign_key(None, TABLE, "users", ["user_id"], ["id"])
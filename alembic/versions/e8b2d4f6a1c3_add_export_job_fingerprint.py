@@ -0,0 +1,31 @@
+"""add_export_job_fingerprint
+
+Revision ID: e8b2d4f6a1c3
+Revises: c4f1b8e2d7a9
+Create Date: 2026-10-18 23:41:05.218734
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e8b2d4f6a1c3"
+down_revision: Union[str, None] = "c4f1b8e2d7a9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("export_jobs", sa.Column("fingerprint", sa.String(64), nullable=True))
+    op.create_index("ix_export_jobs_fingerprint", "export_jobs", ["fingerprint"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_export_jobs_fingerprint", table_name="export_jobs")
+    op.drop_column("export_jobs", "fingerprint")
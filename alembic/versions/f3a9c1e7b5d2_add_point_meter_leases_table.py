@@ -0,0 +1,35 @@
+"""add_point_meter_leases_table
+
+Revision ID: f3a9c1e7b5d2
+Revises: e8b2d4f6a1c3
+Create Date: 2026-10-19 09:12:31.604218
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f3a9c1e7b5d2"
+down_revision: Union[str, None] = "e8b2d4f6a1c3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "point_meter_leases",
+        sa.Column("owner", sa.String(100), primary_key=True),
+        sa.Column("user_id", sa.String(10), primary_key=True),
+        sa.Column("points", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime, nullable=False, index=True),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("point_meter_leases")
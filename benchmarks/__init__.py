@@ -0,0 +1,6 @@
+"""
+Performance benchmarks
+
+Reproducible, offline benchmarks of the hot endpoints and services on a
+synthetic data set. See ``benchmarks.run`` for usage.
+"""
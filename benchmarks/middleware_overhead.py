@@ -0,0 +1,256 @@
+"""
+Middleware overhead microbenchmark
+
+Times sequential GETs (httpx ``ASGITransport``, no network) through the
+app's real middleware stack and through the same app with every middleware
+removed; the difference is what the stack costs per request. Two trivial
+routes are added for the measurement:
+
+- ``/health/bench``: excluded from access logging ("uncounted")
+- ``/bench/ping``: logged like any other API call ("counted")
+
+Each tree is measured in its own interpreter against an empty SQLite
+database created from that tree's models. ``--ref`` additionally measures
+another commit, exported with ``git archive`` (untracked local settings
+such as ``routes/path.py`` and ``.env`` are copied over), so the numbers in
+a change description can be reproduced, e.g. the BaseHTTPMiddleware stack
+that the request pipeline replaced.
+
+Usage:
+    python -m benchmarks.middleware_overhead                       # current tree
+    python -m benchmarks.middleware_overhead --ref 47414ec~1       # old stack vs current
+    python -m benchmarks.middleware_overhead --requests 5000 --output overhead.json
+"""
+
+from typing import Any, Dict, List, Optional
+import argparse
+import asyncio
+import contextlib
+import gc
+import json
+import logging
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARK_DIR)
+
+ENDPOINTS = {
+    "uncounted": "/health/bench",
+    "counted": "/bench/ping",
+}
+
+# Local, untracked files a checkout needs to import main
+LOCAL_FILES = ["routes/path.py", ".env"]
+
+
+def export_tree(ref: str, destination: str) -> str:
+    """Extract ``ref`` of this repository into ``destination``"""
+    archive = os.path.join(destination, "tree.tar")
+    with open(archive, "wb") as f:
+        subprocess.run(["git", "archive", "--format=tar", ref], cwd=REPO_ROOT, stdout=f, check=True)
+    tree = os.path.join(destination, "tree")
+    with tarfile.open(archive) as tar:
+        tar.extractall(tree)
+    os.remove(archive)
+
+    for relative in LOCAL_FILES:
+        source = os.path.join(REPO_ROOT, relative)
+        if os.path.exists(source) and not os.path.exists(os.path.join(tree, relative)):
+            shutil.copy2(source, os.path.join(tree, relative))
+    os.makedirs(os.path.join(tree, "static"), exist_ok=True)
+    return tree
+
+
+def _asgi(app, stack):
+    """ASGI callable running ``stack`` (a built middleware stack) as ``app``"""
+
+    async def call(scope, receive, send):
+        scope["app"] = app
+        await stack(scope, receive, send)
+
+    return call
+
+
+async def _time_requests(client, path: str, count: int) -> List[float]:
+    durations = []
+    for _ in range(count):
+        started = time.perf_counter()
+        response = await client.get(path)
+        durations.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {path} returned {response.status_code}")
+    return durations
+
+
+async def _measure(variants: Dict[str, Any], count: int, warmup: int, rounds: int) -> Dict[str, Dict[str, List[float]]]:
+    """
+    Time every endpoint under every variant. Variants alternate in
+    ``rounds`` short runs so machine drift hits them equally.
+    """
+    import httpx
+
+    clients = {
+        name: httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=asgi, client=("127.0.0.1", 5000)),
+            base_url="http://localhost",
+        )
+        for name, asgi in variants.items()
+    }
+    durations = {name: {endpoint: [] for endpoint in ENDPOINTS} for name in variants}
+    try:
+        for client in clients.values():
+            for path in ENDPOINTS.values():
+                await _time_requests(client, path, warmup)
+
+        per_round = max(1, count // rounds)
+        order = list(variants)
+        for _ in range(rounds):
+            gc.collect()
+            for name in order:
+                for endpoint, path in ENDPOINTS.items():
+                    durations[name][endpoint] += await _time_requests(clients[name], path, per_round)
+            order.reverse()
+    finally:
+        for client in clients.values():
+            await client.aclose()
+    return durations
+
+
+def _summary_us(durations: List[float]) -> Dict[str, float]:
+    return {
+        "mean_us": round(statistics.fmean(durations) * 1e6, 1),
+        "p50_us": round(statistics.median(durations) * 1e6, 1),
+    }
+
+
+def measure_tree(tree: str, workdir: str, count: int, warmup: int, rounds: int) -> Dict[str, Any]:
+    """Import ``tree``'s app in this interpreter and time it with and without middleware"""
+    os.environ["DB_CONNECTION"] = f"sqlite:///{os.path.join(workdir, 'overhead.db')}"
+    os.environ.setdefault("METRICS_DIR", os.path.join(workdir, "metrics"))
+    os.environ.setdefault("PROFILER_DIR", os.path.join(workdir, "profiles"))
+    sys.path[:] = [tree] + [p for p in sys.path if os.path.abspath(p or ".") != BENCHMARK_DIR]
+    os.chdir(tree)
+    # Startup and Redis-down warnings would bury the results
+    logging.disable(logging.WARNING)
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        import models
+        from database import engine
+        import main as app_main
+
+        models.Base.metadata.create_all(bind=engine)
+
+    app = app_main.app
+    app.add_api_route("/health/bench", lambda: {"status": "ok"}, methods=["GET"])
+    app.add_api_route("/bench/ping", lambda: {"status": "ok"}, methods=["GET"])
+
+    # The same app and routes with and without the user middleware
+    middleware = [m.cls.__name__ for m in app.user_middleware]
+    stack = _asgi(app, app.build_middleware_stack())
+    app.user_middleware = []
+    bare = _asgi(app, app.build_middleware_stack())
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        durations = asyncio.run(_measure({"bare": bare, "stack": stack}, count, warmup, rounds))
+
+    results: Dict[str, Any] = {"middleware": middleware}
+    for endpoint in ENDPOINTS:
+        bare_stats = _summary_us(durations["bare"][endpoint])
+        stack_stats = _summary_us(durations["stack"][endpoint])
+        results[endpoint] = {
+            "bare": bare_stats,
+            "stack": stack_stats,
+            "overhead_us": round(stack_stats["p50_us"] - bare_stats["p50_us"], 1),
+        }
+    return results
+
+
+def _run_worker(tree: str, count: int, warmup: int, rounds: int) -> Dict[str, Any]:
+    """Measure ``tree`` in a fresh interpreter (main can only be imported once)"""
+    with tempfile.TemporaryDirectory(prefix="hita_overhead_") as workdir:
+        output = os.path.join(workdir, "result.json")
+        subprocess.run(
+            [
+                sys.executable,
+                os.path.abspath(__file__),
+                "--worker",
+                tree,
+                "--workdir",
+                workdir,
+                "--requests",
+                str(count),
+                "--warmup",
+                str(warmup),
+                "--rounds",
+                str(rounds),
+                "--output",
+                output,
+            ],
+            check=True,
+        )
+        with open(output, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+
+def _print_result(label: str, result: Dict[str, Any]) -> None:
+    print(f"{label}: {len(result['middleware'])} middleware ({', '.join(result['middleware'])})")
+    for name in ENDPOINTS:
+        row = result[name]
+        print(
+            f"  {name:<10} p50 bare {row['bare']['p50_us']:>8.1f} us  stack {row['stack']['p50_us']:>8.1f} us  "
+            f"overhead {row['overhead_us']:>8.1f} us  (mean {row['bare']['mean_us']:.1f} / {row['stack']['mean_us']:.1f})"
+        )
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Measure the per-request cost of the middleware stack")
+    parser.add_argument("--ref", help="Also measure this git commit (e.g. 47414ec~1)")
+    parser.add_argument("--requests", type=int, default=1000, help="Timed requests per endpoint (default: 1000)")
+    parser.add_argument("--warmup", type=int, default=200, help="Untimed requests per endpoint (default: 200)")
+    parser.add_argument("--rounds", type=int, default=10, help="Alternating runs the requests are split into (default: 10)")
+    parser.add_argument("--output", help="Write the results JSON to this file")
+    parser.add_argument("--worker", metavar="TREE", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        result = measure_tree(os.path.abspath(args.worker), args.workdir, args.requests, args.warmup, args.rounds)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        return
+
+    output_path = os.path.abspath(args.output) if args.output else None
+    results: Dict[str, Any] = {"requests": args.requests}
+    if args.ref:
+        with tempfile.TemporaryDirectory(prefix="hita_ref_") as destination:
+            tree = export_tree(args.ref, destination)
+            results[args.ref] = _run_worker(tree, args.requests, args.warmup, args.rounds)
+        _print_result(args.ref, results[args.ref])
+    results["current"] = _run_worker(REPO_ROOT, args.requests, args.warmup, args.rounds)
+    _print_result("current", results["current"])
+
+    if args.ref:
+        before = [results[args.ref][name]["overhead_us"] for name in ENDPOINTS]
+        after = [results["current"][name]["overhead_us"] for name in ENDPOINTS]
+        print(
+            "Overhead vs " + args.ref + ": "
+            + ", ".join(
+                f"{name} {a / b:.0%}" if b > 0 else f"{name} n/a"
+                for name, a, b in zip(ENDPOINTS, after, before)
+            )
+        )
+
+    if output_path:
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
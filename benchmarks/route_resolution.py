@@ -0,0 +1,195 @@
+"""
+Route resolution microbenchmark
+
+Measures what the size of the route table costs:
+
+- ``routes``: entries in ``app.router.routes``
+- ``late_route``: time to resolve the last registered route, the worst case
+  of Starlette's linear scan (``route.matches`` on every entry until one
+  matches fully)
+- ``miss``: time to scan the whole table for a path no route matches
+- ``openapi``: time to generate the OpenAPI schema and its number of paths
+
+Each tree is measured in its own interpreter. ``--ref`` additionally
+measures another commit (see ``benchmarks.middleware_overhead.export_tree``),
+e.g. the tree that still registered every router under both ``/api`` and
+the bare path.
+
+Usage:
+    python -m benchmarks.route_resolution
+    python -m benchmarks.route_resolution --ref 9f10630~1
+"""
+
+from typing import Any, Dict, List, Optional
+import argparse
+import contextlib
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARK_DIR)
+
+MISS_PATH = "/v1.0/benchmark/no-such-route"
+
+
+def _scope(path: str, method: str = "GET") -> Dict[str, Any]:
+    return {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "root_path": "",
+        "headers": [],
+        "query_string": b"",
+    }
+
+
+def _resolve(routes, scope) -> Optional[Any]:
+    """The route Starlette's router would pick for ``scope`` (same scan order)"""
+    from starlette.routing import Match
+
+    partial = None
+    for route in routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route
+        if match == Match.PARTIAL and partial is None:
+            partial = route
+    return partial
+
+
+def _concrete_path(route) -> str:
+    """Path of ``route`` with every parameter filled in"""
+    path = route.path
+    for name in route.param_convertors:
+        path = path.replace("{" + name + ":path}", "1").replace("{" + name + "}", "1")
+    return path
+
+
+def _time_us(fn, repeat: int) -> float:
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - started)
+    return round(statistics.median(durations) * 1e6, 1)
+
+
+def measure_tree(tree: str, workdir: str, repeat: int) -> Dict[str, Any]:
+    """Import ``tree``'s app in this interpreter and time route resolution"""
+    os.environ["DB_CONNECTION"] = f"sqlite:///{os.path.join(workdir, 'routes.db')}"
+    os.environ.setdefault("METRICS_DIR", os.path.join(workdir, "metrics"))
+    os.environ.setdefault("PROFILER_DIR", os.path.join(workdir, "profiles"))
+    sys.path[:] = [tree] + [p for p in sys.path if os.path.abspath(p or ".") != BENCHMARK_DIR]
+    os.chdir(tree)
+    logging.disable(logging.WARNING)
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        import main as app_main
+        from fastapi.openapi.utils import get_openapi
+
+    app = app_main.app
+    routes = app.router.routes
+    # Last GET route that its own path resolves to (earlier parameterized
+    # routes can shadow a filled-in path)
+    late = next(
+        route
+        for route in reversed(routes)
+        if "GET" in (getattr(route, "methods", None) or ())
+        and _resolve(routes, _scope(_concrete_path(route))) is route
+    )
+    late_scope = _scope(_concrete_path(late))
+    miss_scope = _scope(MISS_PATH)
+    if _resolve(routes, miss_scope) is not None:
+        raise RuntimeError(f"{MISS_PATH} unexpectedly matches a route")
+
+    def openapi():
+        return get_openapi(title=app.title, version=app.version, routes=routes)
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        started = time.perf_counter()
+        schema = openapi()
+        openapi_ms = (time.perf_counter() - started) * 1000
+
+    return {
+        "routes": len(routes),
+        "late_route": {
+            "path": late.path,
+            "position": routes.index(late) + 1,
+            "us": _time_us(lambda: _resolve(routes, late_scope), repeat),
+        },
+        "miss_us": _time_us(lambda: _resolve(routes, miss_scope), repeat),
+        "openapi": {"paths": len(schema.get("paths", {})), "ms": round(openapi_ms, 1)},
+    }
+
+
+def _run_worker(tree: str, repeat: int) -> Dict[str, Any]:
+    """Measure ``tree`` in a fresh interpreter (main can only be imported once)"""
+    with tempfile.TemporaryDirectory(prefix="hita_routes_") as workdir:
+        output = os.path.join(workdir, "result.json")
+        subprocess.run(
+            [
+                sys.executable,
+                os.path.abspath(__file__),
+                "--worker",
+                tree,
+                "--workdir",
+                workdir,
+                "--repeat",
+                str(repeat),
+                "--output",
+                output,
+            ],
+            check=True,
+        )
+        with open(output, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+
+def _print_result(label: str, result: Dict[str, Any]) -> None:
+    print(
+        f"{label}: {result['routes']} routes  late route (#{result['late_route']['position']}) "
+        f"{result['late_route']['us']:.1f} us  "
+        f"miss {result['miss_us']:.1f} us  openapi {result['openapi']['paths']} paths "
+        f"in {result['openapi']['ms']:.0f} ms"
+    )
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Measure route table size and resolution cost")
+    parser.add_argument("--ref", help="Also measure this git commit (e.g. 9f10630~1)")
+    parser.add_argument("--repeat", type=int, default=2000, help="Timed resolutions per path (default: 2000)")
+    parser.add_argument("--output", help="Write the results JSON to this file")
+    parser.add_argument("--worker", metavar="TREE", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        result = measure_tree(os.path.abspath(args.worker), args.workdir, args.repeat)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        return
+
+    output_path = os.path.abspath(args.output) if args.output else None
+    results: Dict[str, Any] = {}
+    if args.ref:
+        from benchmarks.middleware_overhead import export_tree
+
+        with tempfile.TemporaryDirectory(prefix="hita_ref_") as destination:
+            results[args.ref] = _run_worker(export_tree(args.ref, destination), args.repeat)
+        _print_result(args.ref, results[args.ref])
+    results["current"] = _run_worker(REPO_ROOT, args.repeat)
+    _print_result("current", results["current"])
+
+    if output_path:
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
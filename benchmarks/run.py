@@ -0,0 +1,275 @@
+"""
+Performance benchmark runner
+
+Generates (or reuses) the synthetic data set, runs the scenarios in
+``benchmarks.scenarios`` in-process and reports throughput and latency
+percentiles per scenario. Nothing leaves the machine: the database is a
+SQLite file in the working directory, raw content and static files are
+generated next to it, and Redis is optional (the app degrades as it does
+in production when Redis is down).
+
+Results can be recorded as a baseline and later runs compared against it;
+a scenario regresses when its p50 or p95 grows, or its throughput drops, by
+more than ``--threshold``. Baselines are only comparable on the same
+machine with the same ``--hotels`` and ``--seed``.
+
+Usage:
+    python -m benchmarks.run                                  # run everything, print a table
+    python -m benchmarks.run --save-baseline                  # record benchmarks/baseline.json
+    python -m benchmarks.run --compare                        # exit 1 on regressions
+    python -m benchmarks.run --scenarios autocomplete,radius_search --hotels 5000
+    python -m benchmarks.run --output results.json --iterations 50
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime, timezone
+import argparse
+import contextlib
+import gc
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic_data import BENCH_USER_ID, BENCH_USERNAME, SyntheticDataset, generate
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARK_DIR)
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, "baseline.json")
+DEFAULT_WORKDIR = os.path.join(tempfile.gettempdir(), "hita_bench")
+DEFAULT_THRESHOLD = 0.25
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Linear-interpolated percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarize(durations: List[float], wall_seconds: float) -> Dict[str, Any]:
+    values = sorted(durations)
+    return {
+        "ops": len(values),
+        "ops_per_sec": round(len(values) / wall_seconds, 2) if wall_seconds else 0.0,
+        "mean_ms": round(statistics.fmean(values) * 1000, 3),
+        "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def prepare_environment(workdir: str) -> None:
+    """
+    Point the app at the benchmark data set.
+
+    Must run before anything imports ``database`` (the engine is created at
+    import time from ``DB_CONNECTION``).
+    """
+    os.environ["DB_CONNECTION"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.setdefault("METRICS_DIR", os.path.join(workdir, "metrics"))
+    os.environ.setdefault("PROFILER_DIR", os.path.join(workdir, "profiles"))
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+
+
+def _measure(ctx, scenario, count: int) -> Tuple[List[float], float]:
+    """Set up, warm up and time ``count`` operations of ``scenario``"""
+    if scenario.setup:
+        scenario.setup(ctx)
+    try:
+        for _ in range(scenario.warmup):
+            scenario.run(ctx)
+
+        durations = []
+        gc.collect()
+        started = time.perf_counter()
+        for _ in range(count):
+            op_started = time.perf_counter()
+            scenario.run(ctx)
+            durations.append(time.perf_counter() - op_started)
+        return durations, time.perf_counter() - started
+    finally:
+        if scenario.teardown:
+            scenario.teardown(ctx)
+
+
+def run_scenarios(ctx, names: List[str], iterations: Optional[int]) -> Dict[str, Any]:
+    from benchmarks.scenarios import SCENARIOS, ScenarioSkipped
+
+    results: Dict[str, Any] = {}
+    for name in names:
+        scenario = SCENARIOS[name]
+        # Handlers print progress; keep it out of the table (and off the terminal)
+        skipped = None
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            try:
+                durations, wall = _measure(ctx, scenario, iterations or scenario.iterations)
+            except ScenarioSkipped as e:
+                skipped = str(e)
+
+        if skipped is not None:
+            print(f"  {name:<20} skipped: {skipped}")
+            results[name] = {"skipped": skipped}
+            continue
+        results[name] = {"description": scenario.description, **summarize(durations, wall)}
+        stats = results[name]
+        print(
+            f"  {name:<20} {stats['ops']:>6} ops {stats['ops_per_sec']:>10.1f}/s "
+            f"p50 {stats['p50_ms']:>9.2f} ms  p95 {stats['p95_ms']:>9.2f} ms  p99 {stats['p99_ms']:>9.2f} ms"
+        )
+    return results
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Regression messages for scenarios slower than ``baseline`` by more than ``threshold``"""
+    regressions = []
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous or "skipped" in current or "skipped" in previous:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            if previous[metric] and current[metric] > previous[metric] * (1 + threshold):
+                regressions.append(
+                    f"{name}: {metric} {current[metric]:.2f} vs baseline {previous[metric]:.2f} "
+                    f"(+{(current[metric] / previous[metric] - 1) * 100:.0f}%)"
+                )
+        if previous["ops_per_sec"] and current["ops_per_sec"] < previous["ops_per_sec"] * (1 - threshold):
+            regressions.append(
+                f"{name}: ops_per_sec {current['ops_per_sec']:.1f} vs baseline {previous['ops_per_sec']:.1f} "
+                f"({(current['ops_per_sec'] / previous['ops_per_sec'] - 1) * 100:.0f}%)"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the HITA performance benchmarks")
+    parser.add_argument("--workdir", default=DEFAULT_WORKDIR, help=f"Data set directory (default: {DEFAULT_WORKDIR})")
+    parser.add_argument("--hotels", type=int, default=2000, help="Number of synthetic hotels (default: 2000)")
+    parser.add_argument("--seed", type=int, default=42, help="Data set seed (default: 42)")
+    parser.add_argument("--scenarios", help="Comma separated scenario names (default: all)")
+    parser.add_argument("--iterations", type=int, help="Timed operations per scenario (default: per scenario)")
+    parser.add_argument("--regenerate", action="store_true", help="Rebuild the data set even if it exists")
+    parser.add_argument("--output", help="Write the results JSON to this file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline file (default: benchmarks/baseline.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--compare", action="store_true", help="Compare against the baseline, exit 1 on regressions")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help=f"Allowed slowdown before a scenario counts as regressed (default: {DEFAULT_THRESHOLD})",
+    )
+    parser.add_argument("--list", action="store_true", help="List the scenarios and exit")
+    args = parser.parse_args()
+
+    workdir = os.path.abspath(args.workdir)
+    baseline_path = os.path.abspath(args.baseline)
+    output_path = os.path.abspath(args.output) if args.output else None
+    os.makedirs(workdir, exist_ok=True)
+    prepare_environment(workdir)
+
+    from benchmarks.scenarios import SCENARIOS, BenchmarkContext
+
+    if args.list:
+        for scenario in SCENARIOS.values():
+            print(f"{scenario.name:<20} {scenario.description}")
+        return
+
+    names = [name.strip() for name in args.scenarios.split(",")] if args.scenarios else list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    baseline = None
+    if args.compare:
+        if not os.path.exists(baseline_path):
+            parser.error(f"no baseline at {baseline_path}; record one with --save-baseline")
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if (baseline["meta"]["hotels"], baseline["meta"]["seed"]) != (args.hotels, args.seed):
+            parser.error(
+                f"baseline was recorded with --hotels {baseline['meta']['hotels']} --seed {baseline['meta']['seed']}"
+            )
+
+    print(f"Preparing {args.hotels} hotels (seed {args.seed}) in {workdir}")
+    manifest = generate(workdir, args.hotels, args.seed, force=args.regenerate)
+    dataset = SyntheticDataset(args.hotels, args.seed)
+
+    # The app reads static/ relative to the working directory
+    os.chdir(workdir)
+    # Startup and Redis-down warnings would bury the results table
+    logging.disable(logging.WARNING)
+
+    from datetime import timedelta
+    from fastapi.testclient import TestClient
+    from routes.auth import create_access_token
+    import routes.contents
+    import main as app_main
+
+    routes.contents.RAW_BASE_DIR = os.path.join(workdir, "raw")
+    token = create_access_token({"sub": BENCH_USERNAME, "user_id": BENCH_USER_ID}, timedelta(hours=12))
+
+    with TestClient(app_main.app) as client:
+        ctx = BenchmarkContext(
+            workdir=workdir,
+            hotels=dataset.hotels,
+            seed=args.seed,
+            client=client,
+            headers={"Authorization": f"Bearer {token}", "X-Forwarded-For": "127.0.0.1"},
+        )
+        print(f"Running {len(names)} scenario(s)")
+        scenario_results = run_scenarios(ctx, names, args.iterations)
+
+    results = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "hotels": args.hotels,
+            "seed": args.seed,
+            "rows": manifest["rows"],
+        },
+        "scenarios": scenario_results,
+    }
+
+    if output_path:
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {baseline_path}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for message in regressions:
+                print(f"  {message}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.threshold:.0%} against {baseline_path}")
+
+
+if __name__ == "__main__":
+    main()
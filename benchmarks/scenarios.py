@@ -0,0 +1,275 @@
+"""
+Benchmark scenarios
+
+Each scenario drives one hot path in-process against the synthetic data set
+(see ``synthetic_data``). ``setup`` runs once, outside the timed section;
+``run`` is one timed operation and must raise on a wrong answer, so a
+scenario never reports a fast error path as a speed-up.
+
+HTTP scenarios go through the full ASGI stack (request pipeline, auth, IP
+whitelist, handler) with ``fastapi.testclient.TestClient``; service
+scenarios call the function behind the endpoint directly.
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+from dataclasses import dataclass, field
+import json
+import os
+import random
+import shutil
+
+from benchmarks.synthetic_data import BENCH_USER_ID, RAW_SUPPLIERS
+
+
+class ScenarioSkipped(Exception):
+    """Scenario cannot run in this environment (e.g. optional dependency missing)"""
+
+
+@dataclass
+class BenchmarkContext:
+    """State shared by the scenarios of one run"""
+
+    workdir: str
+    hotels: List[Dict[str, Any]]
+    seed: int
+    client: Any = None
+    headers: Dict[str, str] = field(default_factory=dict)
+    state: Dict[str, Any] = field(default_factory=dict)
+
+    def rng(self, name: str) -> random.Random:
+        """Per-scenario random source, independent of scenario order"""
+        return random.Random(f"{self.seed}:{name}")
+
+
+@dataclass
+class Scenario:
+    name: str
+    description: str
+    run: Callable[[BenchmarkContext], None]
+    setup: Optional[Callable[[BenchmarkContext], None]] = None
+    teardown: Optional[Callable[[BenchmarkContext], None]] = None
+    iterations: int = 200
+    warmup: int = 10
+
+
+def _expect(response, status_code: int = 200) -> Any:
+    if response.status_code != status_code:
+        raise AssertionError(
+            f"{response.request.method} {response.request.url.path} returned "
+            f"{response.status_code}: {response.text[:300]}"
+        )
+    return response.json()
+
+
+# ——————— Content fan-out ———————
+
+
+def _content_fanout_setup(ctx: BenchmarkContext) -> None:
+    rng = ctx.rng("content_fanout")
+    ittids = [hotel["ittid"] for hotel in ctx.hotels]
+    ctx.state["content_batches"] = [rng.sample(ittids, min(10, len(ittids))) for _ in range(64)]
+    ctx.state["content_cursor"] = 0
+
+
+def _content_fanout(ctx: BenchmarkContext) -> None:
+    batches = ctx.state["content_batches"]
+    batch = batches[ctx.state["content_cursor"] % len(batches)]
+    ctx.state["content_cursor"] += 1
+    _expect(ctx.client.post("/v1.0/content/get-hotel-with-ittid", json={"ittid": batch}, headers=ctx.headers))
+
+
+# ——————— Supplier formatting ———————
+
+
+def _formatting_setup(ctx: BenchmarkContext) -> None:
+    payloads = []
+    for supplier in RAW_SUPPLIERS:
+        supplier_dir = os.path.join(ctx.workdir, "raw", supplier)
+        for file_name in sorted(os.listdir(supplier_dir))[:50]:
+            with open(os.path.join(supplier_dir, file_name), "r", encoding="utf-8") as f:
+                payloads.append((supplier, json.load(f)))
+    ctx.state["formatting_payloads"] = payloads
+    ctx.state["formatting_cursor"] = 0
+
+
+def _formatting(ctx: BenchmarkContext) -> None:
+    from routes.hotelFormattingData import map_to_our_format
+
+    payloads = ctx.state["formatting_payloads"]
+    supplier, payload = payloads[ctx.state["formatting_cursor"] % len(payloads)]
+    ctx.state["formatting_cursor"] += 1
+    if not map_to_our_format(supplier, payload).get("name"):
+        raise AssertionError(f"{supplier} payload formatted without a name")
+
+
+# ——————— Autocomplete ———————
+
+
+def _autocomplete_setup(ctx: BenchmarkContext) -> None:
+    rng = ctx.rng("autocomplete")
+    terms = set()
+    for hotel in rng.sample(ctx.hotels, min(50, len(ctx.hotels))):
+        words = hotel["name"].split()
+        terms.update((words[0][:4], hotel["city"][:5], f"{words[0]} {words[1][:3]}"))
+    ctx.state["autocomplete_terms"] = sorted(terms)
+    ctx.state["autocomplete_cursor"] = 0
+
+
+def _autocomplete(ctx: BenchmarkContext, fuzzy: bool) -> None:
+    terms = ctx.state["autocomplete_terms"]
+    term = terms[ctx.state["autocomplete_cursor"] % len(terms)]
+    ctx.state["autocomplete_cursor"] += 1
+    _expect(ctx.client.get("/v1.0/content/autocomplete-all", params={"query": term, "fuzzy": fuzzy}))
+
+
+# ——————— Radius search ———————
+
+
+def _radius_search_setup(ctx: BenchmarkContext) -> None:
+    rng = ctx.rng("radius_search")
+    requests = []
+    for hotel in rng.sample(ctx.hotels, min(32, len(ctx.hotels))):
+        requests.append(
+            {
+                "lat": str(hotel["latitude"]),
+                "lon": str(hotel["longitude"]),
+                "radius": "10",
+                "supplier": sorted(hotel["providers"]),
+                "country_code": hotel["country_code"],
+            }
+        )
+    ctx.state["radius_requests"] = requests
+    ctx.state["radius_cursor"] = 0
+
+
+def _radius_search(ctx: BenchmarkContext) -> None:
+    requests = ctx.state["radius_requests"]
+    body = requests[ctx.state["radius_cursor"] % len(requests)]
+    ctx.state["radius_cursor"] += 1
+    result = _expect(ctx.client.post("/v1.0/locations/search-hotel-with-location", json=body, headers=ctx.headers))
+    if not result.get("total_hotels"):
+        raise AssertionError(f"radius search around {body['lat']},{body['lon']} found nothing")
+
+
+# ——————— Exports ———————
+
+
+def _export_setup(ctx: BenchmarkContext) -> None:
+    ctx.state["export_dir"] = os.path.join(ctx.workdir, "exports")
+    os.makedirs(ctx.state["export_dir"], exist_ok=True)
+
+
+def _export_teardown(ctx: BenchmarkContext) -> None:
+    shutil.rmtree(ctx.state.pop("export_dir"), ignore_errors=True)
+
+
+def _export_csv(ctx: BenchmarkContext) -> None:
+    from database import SessionLocal
+    from export_schemas import ExportFormat, HotelExportFilters
+    from services.export_engine import ExportEngine
+    from services.export_filter_service import ExportFilterService
+    import models
+
+    db = SessionLocal()
+    try:
+        user = db.query(models.User).filter(models.User.id == BENCH_USER_ID).one()
+        query = ExportFilterService(db).build_hotel_query(
+            filters=HotelExportFilters(suppliers="All", country_codes=["US", "GB", "AE"]),
+            allowed_suppliers=list(RAW_SUPPLIERS),
+        )
+        response = ExportEngine(db, ctx.state["export_dir"]).export_hotels_sync(query, ExportFormat.CSV, user)
+        if not os.path.getsize(response.path):
+            raise AssertionError("export produced an empty file")
+        os.remove(response.path)
+    finally:
+        db.close()
+
+
+# ——————— ML matching ———————
+
+
+def _ml_matching_setup(ctx: BenchmarkContext) -> None:
+    try:
+        from ml.mapping_3 import find_best_match
+    except ImportError as e:
+        raise ScenarioSkipped(f"ml.mapping_3 unavailable: {e}")
+    import logging
+
+    # find_best_match logs every candidate step at INFO
+    logging.getLogger("ml.mapping_3").setLevel(logging.WARNING)
+    rng = ctx.rng("ml_matching")
+    ctx.state["ml_find_best_match"] = find_best_match
+    ctx.state["ml_queries"] = [
+        (hotel["name"], hotel["city"], hotel["country_name"])
+        for hotel in rng.sample(ctx.hotels, min(16, len(ctx.hotels)))
+    ]
+    ctx.state["ml_cursor"] = 0
+
+
+def _ml_matching(ctx: BenchmarkContext) -> None:
+    queries = ctx.state["ml_queries"]
+    name, city, country = queries[ctx.state["ml_cursor"] % len(queries)]
+    ctx.state["ml_cursor"] += 1
+    csv_path = os.path.join(ctx.workdir, "static", "hotelcontent", "itt_hotel_basic_info.csv")
+    if ctx.state["ml_find_best_match"](name, city, country, csv_path) is None:
+        raise AssertionError(f"no match for {name!r}")
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    scenario.name: scenario
+    for scenario in (
+        Scenario(
+            "content_fanout",
+            "POST /v1.0/content/get-hotel-with-ittid, 10 hotels per call, raw files + formatting",
+            _content_fanout,
+            setup=_content_fanout_setup,
+            iterations=100,
+        ),
+        Scenario(
+            "formatting",
+            "map_to_our_format over hotelbeds, agoda and ratehawkhotel raw content",
+            _formatting,
+            setup=_formatting_setup,
+            iterations=1000,
+            warmup=50,
+        ),
+        Scenario(
+            "autocomplete",
+            "GET /v1.0/content/autocomplete-all (exact)",
+            lambda ctx: _autocomplete(ctx, fuzzy=False),
+            setup=_autocomplete_setup,
+            iterations=300,
+        ),
+        Scenario(
+            "autocomplete_fuzzy",
+            "GET /v1.0/content/autocomplete-all?fuzzy=true",
+            lambda ctx: _autocomplete(ctx, fuzzy=True),
+            setup=_autocomplete_setup,
+            iterations=100,
+        ),
+        Scenario(
+            "radius_search",
+            "POST /v1.0/locations/search-hotel-with-location, 10 km",
+            _radius_search,
+            setup=_radius_search_setup,
+            iterations=200,
+        ),
+        Scenario(
+            "export_csv",
+            "ExportEngine.export_hotels_sync, CSV, three countries with locations/contacts/mappings",
+            _export_csv,
+            setup=_export_setup,
+            teardown=_export_teardown,
+            iterations=10,
+            warmup=1,
+        ),
+        Scenario(
+            "ml_matching",
+            "ml.mapping_3.find_best_match against the basic-info CSV",
+            _ml_matching,
+            setup=_ml_matching_setup,
+            iterations=10,
+            warmup=1,
+        ),
+    )
+}
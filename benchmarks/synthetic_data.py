@@ -0,0 +1,542 @@
+"""
+Synthetic benchmark data
+
+Builds a self-contained, deterministic data set for the benchmark suite in
+one working directory:
+
+    <workdir>/
+        bench.db                                    SQLite database (hotels, locations,
+                                                    contacts, chains, provider mappings,
+                                                    supplier summary, benchmark users)
+        raw/<supplier>/<provider_id>.json           raw supplier content (RAW_BASE_DIR)
+        static/hotelcontent/itt_hotel_basic_info.csv
+        static/countryJson/<supplier>/<CC>.json     radius search input
+        manifest.json                               parameters and counts
+
+The same ``hotels`` and ``seed`` always produce byte-identical files and the
+same rows, so results are comparable across machines and branches. Raw
+content is written in the shapes ``map_to_our_format`` reads for
+``hotelbeds``, ``agoda`` and ``ratehawkhotel``.
+
+Usage:
+    python -m benchmarks.synthetic_data --workdir .bench --hotels 2000 [--seed 42]
+"""
+
+from typing import Any, Dict, List
+from datetime import datetime
+import argparse
+import csv
+import json
+import os
+import random
+
+GENERATOR_VERSION = 1
+
+RAW_SUPPLIERS = ("hotelbeds", "agoda", "ratehawkhotel")
+
+BENCH_USER_ID = "bench00001"
+BENCH_USERNAME = "bench_super"
+BENCH_EMAIL = "bench_super@example.com"
+BENCH_GENERAL_USER_ID = "bench00002"
+
+FIXED_TIME = datetime(2024, 1, 1, 0, 0, 0)
+
+# (country code, country name, [(city, latitude, longitude), ...])
+COUNTRIES = (
+    ("US", "United States", [("New York", 40.7128, -74.006), ("Miami", 25.7617, -80.1918)]),
+    ("GB", "United Kingdom", [("London", 51.5074, -0.1278), ("Manchester", 53.4808, -2.2426)]),
+    ("AE", "United Arab Emirates", [("Dubai", 25.2048, 55.2708), ("Abu Dhabi", 24.4539, 54.3773)]),
+    ("TH", "Thailand", [("Bangkok", 13.7563, 100.5018), ("Phuket", 7.8804, 98.3923)]),
+    ("FR", "France", [("Paris", 48.8566, 2.3522), ("Nice", 43.7102, 7.262)]),
+    ("JP", "Japan", [("Tokyo", 35.6762, 139.6503), ("Osaka", 34.6937, 135.5023)]),
+    ("BD", "Bangladesh", [("Dhaka", 23.8103, 90.4125), ("Cox's Bazar", 21.4272, 92.0058)]),
+    ("ES", "Spain", [("Barcelona", 41.3874, 2.1686), ("Madrid", 40.4168, -3.7038)]),
+)
+
+NAME_PREFIXES = (
+    "Grand", "Royal", "Park", "Sea View", "City", "Golden", "Palm", "Blue Lagoon",
+    "Harbor", "Central", "Imperial", "Garden", "Riverside", "Sunset", "Crown", "Summit",
+)
+PROPERTY_TYPES = ("Hotel", "Resort", "Inn", "Suites", "Residences", "Lodge", "Apartments")
+CHAINS = (
+    ("Hilton", "HH", "Hilton Garden"),
+    ("Marriott", "MC", "Courtyard"),
+    ("Accor", "AC", "Novotel"),
+    ("IHG", "IH", "Holiday Inn"),
+    ("Hyatt", "HY", "Hyatt Place"),
+)
+STREETS = ("Main St", "Beach Rd", "King Ave", "Market St", "Station Rd", "Harbour Blvd", "Park Lane")
+FACILITIES = (
+    "Free WiFi", "Swimming pool", "Fitness centre", "Spa", "Restaurant", "Bar", "Parking",
+    "Airport shuttle", "Room service", "Business centre", "Laundry", "Kids club",
+)
+ROOM_TYPES = (
+    ("DBL.ST", "Double Standard", 2),
+    ("TWN.SU", "Twin Superior", 2),
+    ("SGL.EC", "Single Economy", 1),
+    ("FAM.DX", "Family Deluxe", 4),
+    ("STE.EX", "Executive Suite", 3),
+)
+
+
+class SyntheticDataset:
+    """
+    Deterministic hotel catalogue (built in memory, then written out).
+    """
+
+    def __init__(self, hotels: int, seed: int = 42):
+        self.hotel_count = hotels
+        self.seed = seed
+        self.hotels: List[Dict[str, Any]] = []
+        self._build()
+
+    def _build(self) -> None:
+        rng = random.Random(self.seed)
+        for index in range(self.hotel_count):
+            country_code, country_name, cities = COUNTRIES[index % len(COUNTRIES)]
+            city, city_lat, city_lon = cities[rng.randrange(len(cities))]
+            property_type = rng.choice(PROPERTY_TYPES)
+            name = f"{rng.choice(NAME_PREFIXES)} {property_type} {city} {index % 97}"
+            chain = CHAINS[rng.randrange(len(CHAINS))] if rng.random() < 0.6 else None
+            suppliers = sorted(rng.sample(RAW_SUPPLIERS, rng.randint(1, len(RAW_SUPPLIERS))))
+            self.hotels.append(
+                {
+                    "ittid": str(10000000 + index),
+                    "name": name,
+                    "property_type": property_type,
+                    "rating": str(rng.randint(2, 5)),
+                    "latitude": round(city_lat + rng.uniform(-0.15, 0.15), 6),
+                    "longitude": round(city_lon + rng.uniform(-0.15, 0.15), 6),
+                    "address": f"{rng.randint(1, 400)} {rng.choice(STREETS)}",
+                    "postal_code": f"{rng.randint(10000, 99999)}",
+                    "city": city,
+                    "country_code": country_code,
+                    "country_name": country_name,
+                    "chain": chain,
+                    "phone": f"+{rng.randint(1, 99)} {rng.randint(100000000, 999999999)}",
+                    "email": f"reservations{index}@example.com",
+                    "website": f"https://hotel{index}.example.com",
+                    "facilities": rng.sample(FACILITIES, rng.randint(3, 8)),
+                    "rooms": rng.sample(ROOM_TYPES, rng.randint(1, 4)),
+                    "images": rng.randint(3, 12),
+                    "description": " ".join(
+                        f"{name} offers {rng.choice(FACILITIES).lower()} near {city}."
+                        for _ in range(rng.randint(2, 6))
+                    ),
+                    "providers": {
+                        supplier: f"{supplier[:2].upper()}{200000 + index}" for supplier in suppliers
+                    },
+                }
+            )
+
+    # ------------------------------------------------------------------ files
+
+    def write(self, workdir: str, database_url: str) -> Dict[str, Any]:
+        os.makedirs(workdir, exist_ok=True)
+        raw_files = self.write_raw_content(os.path.join(workdir, "raw"))
+        self.write_basic_info_csv(os.path.join(workdir, "static", "hotelcontent", "itt_hotel_basic_info.csv"))
+        country_files = self.write_country_json(os.path.join(workdir, "static", "countryJson"))
+        rows = self.write_database(database_url)
+        manifest = {
+            "generator_version": GENERATOR_VERSION,
+            "hotels": self.hotel_count,
+            "seed": self.seed,
+            "raw_files": raw_files,
+            "country_files": country_files,
+            "rows": rows,
+        }
+        with open(os.path.join(workdir, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
+
+    def write_raw_content(self, raw_dir: str) -> int:
+        writers = {
+            "hotelbeds": self._hotelbeds_payload,
+            "agoda": self._agoda_payload,
+            "ratehawkhotel": self._ratehawk_payload,
+        }
+        count = 0
+        for hotel in self.hotels:
+            for supplier, provider_id in hotel["providers"].items():
+                supplier_dir = os.path.join(raw_dir, supplier)
+                os.makedirs(supplier_dir, exist_ok=True)
+                with open(os.path.join(supplier_dir, f"{provider_id}.json"), "w", encoding="utf-8") as f:
+                    json.dump(writers[supplier](hotel, provider_id), f, sort_keys=True)
+                count += 1
+        return count
+
+    def write_basic_info_csv(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(
+                ["Id", "ittid", "Name", "AddressLine1", "CityName", "CountryName", "CountryCode", "Latitude", "Longitude"]
+            )
+            for index, hotel in enumerate(self.hotels, start=1):
+                writer.writerow(
+                    [
+                        index,
+                        hotel["ittid"],
+                        hotel["name"],
+                        hotel["address"],
+                        hotel["city"],
+                        hotel["country_name"],
+                        hotel["country_code"],
+                        hotel["latitude"],
+                        hotel["longitude"],
+                    ]
+                )
+
+    def write_country_json(self, country_dir: str) -> int:
+        by_file: Dict[tuple, list] = {}
+        for hotel in self.hotels:
+            for supplier, provider_id in hotel["providers"].items():
+                by_file.setdefault((supplier, hotel["country_code"]), []).append(
+                    {
+                        "lat": hotel["latitude"],
+                        "lon": hotel["longitude"],
+                        "name": hotel["name"],
+                        "addr": hotel["address"],
+                        "ptype": hotel["property_type"],
+                        "photo": f"https://img.example.com/{hotel['ittid']}/0.jpg",
+                        "star": float(hotel["rating"]),
+                        "ittid": hotel["ittid"],
+                        supplier: [provider_id],
+                    }
+                )
+        for (supplier, country_code), items in by_file.items():
+            os.makedirs(os.path.join(country_dir, supplier), exist_ok=True)
+            with open(os.path.join(country_dir, supplier, f"{country_code}.json"), "w", encoding="utf-8") as f:
+                json.dump(items, f)
+        return len(by_file)
+
+    # --------------------------------------------------------------- database
+
+    def write_database(self, database_url: str) -> Dict[str, int]:
+        from sqlalchemy import create_engine, insert
+        import models
+
+        engine = create_engine(database_url)
+        models.Base.metadata.drop_all(engine)
+        models.Base.metadata.create_all(engine)
+
+        hotels, locations, contacts, chains, mappings = [], [], [], [], []
+        supplier_totals: Dict[str, int] = {}
+        for hotel in self.hotels:
+            ittid = hotel["ittid"]
+            hotels.append(
+                {
+                    "ittid": ittid,
+                    "name": hotel["name"],
+                    "latitude": str(hotel["latitude"]),
+                    "longitude": str(hotel["longitude"]),
+                    "address_line1": hotel["address"],
+                    "postal_code": hotel["postal_code"],
+                    "rating": hotel["rating"],
+                    "property_type": hotel["property_type"],
+                    "primary_photo": f"https://img.example.com/{ittid}/0.jpg",
+                    "map_status": "updated",
+                    "created_at": FIXED_TIME,
+                    "updated_at": FIXED_TIME,
+                }
+            )
+            locations.append(
+                {
+                    "ittid": ittid,
+                    "city_name": hotel["city"],
+                    "country_name": hotel["country_name"],
+                    "country_code": hotel["country_code"],
+                    "master_city_name": hotel["city"],
+                    "created_at": FIXED_TIME,
+                    "updated_at": FIXED_TIME,
+                }
+            )
+            for contact_type, key in (("phone", "phone"), ("email", "email"), ("website", "website")):
+                contacts.append({"ittid": ittid, "contact_type": contact_type, "value": hotel[key]})
+            if hotel["chain"]:
+                chain_name, chain_code, brand_name = hotel["chain"]
+                chains.append(
+                    {"ittid": ittid, "chain_name": chain_name, "chain_code": chain_code, "brand_name": brand_name}
+                )
+            for supplier, provider_id in hotel["providers"].items():
+                supplier_totals[supplier] = supplier_totals.get(supplier, 0) + 1
+                mappings.append(
+                    {
+                        "ittid": ittid,
+                        "provider_name": supplier,
+                        "provider_id": provider_id,
+                        "system_type": "a",
+                        "created_at": FIXED_TIME,
+                        "updated_at": FIXED_TIME,
+                    }
+                )
+
+        users = [
+            {
+                "id": BENCH_USER_ID,
+                "username": BENCH_USERNAME,
+                "email": BENCH_EMAIL,
+                "hashed_password": "!",
+                "role": models.UserRole.SUPER_USER.value,
+                "is_active": True,
+                "created_at": FIXED_TIME,
+                "updated_at": FIXED_TIME,
+            },
+            {
+                "id": BENCH_GENERAL_USER_ID,
+                "username": "bench_general",
+                "email": "bench_general@example.com",
+                "hashed_password": "!",
+                "role": models.UserRole.GENERAL_USER.value,
+                "is_active": True,
+                "created_at": FIXED_TIME,
+                "updated_at": FIXED_TIME,
+            },
+        ]
+
+        with engine.begin() as conn:
+            conn.execute(insert(models.User), users)
+            conn.execute(
+                insert(models.UserPoint),
+                [
+                    {
+                        "user_id": user["id"],
+                        "user_email": user["email"],
+                        "total_points": 10_000_000,
+                        "current_points": 10_000_000,
+                        "total_used_points": 0,
+                    }
+                    for user in users
+                ],
+            )
+            conn.execute(
+                insert(models.UserIPWhitelist),
+                [
+                    {"user_id": user["id"], "ip_address": "127.0.0.0/8", "created_by": BENCH_USER_ID, "is_active": True}
+                    for user in users
+                ],
+            )
+            conn.execute(
+                insert(models.UserProviderPermission),
+                [{"user_id": BENCH_GENERAL_USER_ID, "provider_name": supplier} for supplier in RAW_SUPPLIERS],
+            )
+            for table, rows in (
+                (models.Hotel, hotels),
+                (models.Location, locations),
+                (models.Contact, contacts),
+                (models.Chain, chains),
+                (models.ProviderMapping, mappings),
+            ):
+                for start in range(0, len(rows), 5000):
+                    conn.execute(insert(table), rows[start : start + 5000])
+            conn.execute(
+                insert(models.SupplierSummary),
+                [
+                    {
+                        "provider_name": supplier,
+                        "total_hotels": total,
+                        "total_mappings": total,
+                        "last_updated": FIXED_TIME,
+                        "summary_generated_at": FIXED_TIME,
+                    }
+                    for supplier, total in sorted(supplier_totals.items())
+                ],
+            )
+        engine.dispose()
+        return {
+            "hotels": len(hotels),
+            "locations": len(locations),
+            "contacts": len(contacts),
+            "chains": len(chains),
+            "provider_mappings": len(mappings),
+        }
+
+    # ---------------------------------------------------------- raw payloads
+
+    @staticmethod
+    def _images(hotel: Dict[str, Any]) -> List[str]:
+        return [f"https://img.example.com/{hotel['ittid']}/{n}.jpg" for n in range(hotel["images"])]
+
+    def _hotelbeds_payload(self, hotel: Dict[str, Any], provider_id: str) -> Dict[str, Any]:
+        return {
+            "hotel": {
+                "code": provider_id,
+                "name": {"content": hotel["name"]},
+                "description": {"content": hotel["description"]},
+                "country": {"isoCode": hotel["country_code"], "description": {"content": hotel["country_name"]}},
+                "destination": {"code": hotel["city"][:3].upper()},
+                "state": {"name": hotel["city"]},
+                "city": {"content": hotel["city"]},
+                "coordinates": {"latitude": hotel["latitude"], "longitude": hotel["longitude"]},
+                "category": {"description": {"content": f"{hotel['rating']} STARS"}},
+                "chain": {"description": {"content": hotel["chain"][0] if hotel["chain"] else None}},
+                "address": {"content": hotel["address"]},
+                "postalCode": hotel["postal_code"],
+                "email": hotel["email"],
+                "web": hotel["website"],
+                "phones": [{"phoneNumber": hotel["phone"], "phoneType": "PHONEHOTEL"}],
+                "rooms": [
+                    {
+                        "roomCode": code,
+                        "description": title,
+                        "maxPax": pax + 1,
+                        "maxAdults": pax,
+                        "maxChildren": 1,
+                        "roomFacilities": [
+                            {"description": {"content": facility}} for facility in hotel["facilities"][:3]
+                        ],
+                        "roomStays": [
+                            {"roomStayFacilities": [{"description": {"content": "Double bed"}, "number": 1}]}
+                        ],
+                    }
+                    for code, title, pax in hotel["rooms"]
+                ],
+                "facilities": [
+                    {"description": {"content": facility}, "facilityGroupCode": 70, "order": order}
+                    for order, facility in enumerate(hotel["facilities"])
+                ],
+                "images": [
+                    {"path": f"{hotel['ittid']}/{order}.jpg", "order": order, "type": {"description": {"content": "General view"}}}
+                    for order in range(hotel["images"])
+                ],
+                "interestPoints": [{"facilityCode": 10, "poiName": f"{hotel['city']} Old Town"}],
+                "terminals": [{"terminalCode": hotel["city"][:3].upper(), "name": {"content": f"{hotel['city']} Airport"}}],
+            }
+        }
+
+    def _agoda_payload(self, hotel: Dict[str, Any], provider_id: str) -> Dict[str, Any]:
+        return {
+            "Hotel_feed_full": {
+                "hotels": {
+                    "hotel": {
+                        "hotel_id": provider_id,
+                        "hotel_name": hotel["name"],
+                        "hotel_formerly_name": hotel["name"],
+                        "translated_name": hotel["name"],
+                        "star_rating": hotel["rating"],
+                        "latitude": hotel["latitude"],
+                        "longitude": hotel["longitude"],
+                        "accommodation_type": hotel["property_type"],
+                        "number_of_reviews": 120,
+                        "rating_average": 8.4,
+                        "popularity_score": 55,
+                        "company_traceability_info": {
+                            "email": hotel["email"],
+                            "phone_no": hotel["phone"],
+                            "website": hotel["website"],
+                        },
+                    }
+                },
+                "addresses": {
+                    "address": [
+                        {
+                            "address_line_1": hotel["address"],
+                            "address_line_2": None,
+                            "city": hotel["city"],
+                            "state": hotel["city"],
+                            "country": hotel["country_name"],
+                            "postal_code": hotel["postal_code"],
+                        }
+                    ]
+                },
+                "hotel_descriptions": {"hotel_description": {"overview": hotel["description"]}},
+                "facilities": {
+                    "facility": [
+                        {"property_group_description": "General", "property_name": facility}
+                        for facility in hotel["facilities"]
+                    ]
+                },
+                "pictures": {
+                    "picture": [
+                        {"picture_id": str(order), "caption": "General view", "URL": url}
+                        for order, url in enumerate(self._images(hotel))
+                    ]
+                },
+                "roomtypes": {
+                    "roomtype": [
+                        {
+                            "hotel_room_type_id": code,
+                            "standard_caption": title,
+                            "standard_caption_translated": title,
+                            "max_occupancy_per_room": pax,
+                            "max_infant_in_room": 1,
+                            "no_of_room": 10,
+                            "size_of_room": 28,
+                            "bed_type": "Double",
+                            "max_extrabeds": 1,
+                            "shared_bathroom": "No",
+                        }
+                        for code, title, pax in hotel["rooms"]
+                    ]
+                },
+            }
+        }
+
+    def _ratehawk_payload(self, hotel: Dict[str, Any], provider_id: str) -> Dict[str, Any]:
+        # ratehawk stores nested structures as Python literals inside strings
+        return {
+            "hotel_info": {
+                "hotel_code": provider_id,
+                "name": hotel["name"],
+                "address": f"{hotel['address']}, {hotel['city']}",
+                "kind": hotel["property_type"],
+                "star_rating": int(hotel["rating"]),
+                "hotel_chain": hotel["chain"][0] if hotel["chain"] else None,
+                "latitude": hotel["latitude"],
+                "longitude": hotel["longitude"],
+                "email": hotel["email"],
+                "phone": hotel["phone"],
+                "postal_code": hotel["postal_code"],
+                "check_in_time": "14:00:00",
+                "check_out_time": "12:00:00",
+                "region": repr({"country_code": hotel["country_code"], "name": hotel["city"]}),
+                "images_ext": repr(
+                    [
+                        {"url": url.replace(".jpg", "_{size}.jpg"), "category_slug": "hotel_front" if order == 0 else "room"}
+                        for order, url in enumerate(self._images(hotel))
+                    ]
+                ),
+                "amenity_groups": repr([{"group_name": "General", "amenities": list(hotel["facilities"])}]),
+                "description_struct": repr([{"title": "About", "paragraphs": [hotel["description"]]}]),
+                "serp_filters": repr(["has_internet", "has_parking"]),
+            }
+        }
+
+
+def generate(workdir: str, hotels: int, seed: int = 42, force: bool = False) -> Dict[str, Any]:
+    """
+    Create (or reuse) the data set in ``workdir``.
+
+    An existing data set is reused when its manifest matches ``hotels``,
+    ``seed`` and the generator version, unless ``force`` is set.
+    """
+    workdir = os.path.abspath(workdir)
+    manifest_path = os.path.join(workdir, "manifest.json")
+    if not force and os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if (
+            manifest.get("generator_version") == GENERATOR_VERSION
+            and manifest.get("hotels") == hotels
+            and manifest.get("seed") == seed
+        ):
+            return manifest
+
+    database_url = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    return SyntheticDataset(hotels, seed).write(workdir, database_url)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the synthetic benchmark data set")
+    parser.add_argument("--workdir", default=".bench", help="Output directory (default: .bench)")
+    parser.add_argument("--hotels", type=int, default=2000, help="Number of hotels (default: 2000)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed (default: 42)")
+    parser.add_argument("--force", action="store_true", help="Regenerate even if the data set exists")
+    args = parser.parse_args()
+
+    manifest = generate(args.workdir, args.hotels, args.seed, force=args.force)
+    print(json.dumps(manifest, indent=2))
+
+
+if __name__ == "__main__":
+    main()
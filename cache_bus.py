@@ -0,0 +1,235 @@
+"""
+Cache invalidation bus
+
+In-process caches (access control entries, the cities-by-country map, the
+hotel CSV indexes, two-tier L1 entries) live in each uvicorn worker. A
+change made in one worker must reach all of them, so invalidations are
+broadcast over Redis pub/sub:
+
+    from cache_bus import register_local_cache, publish_invalidation
+
+    register_local_cache("cities_by_country", lambda key: _reset())
+    ...
+    publish_invalidation("cities_by_country")
+
+``publish_invalidation`` runs the local handler immediately, then publishes
+``{"name", "key", "origin"}`` on ``CACHE_INVALIDATION_CHANNEL``. Every worker
+runs a listener thread (started with the app) that dispatches messages from
+other workers to their registered handlers. Pub/sub is fire-and-forget, so
+when the listener reconnects after losing Redis it clears every registered
+cache once, covering messages it may have missed. ``key=None`` means
+"everything in this cache".
+"""
+
+from typing import Callable, Dict, List, Optional, Set
+import asyncio
+import json
+import logging
+import os
+import socket
+import threading
+import uuid
+
+import redis
+from redis.exceptions import RedisError
+
+from redis_pool import (
+    REDIS_HOST,
+    REDIS_PORT,
+    REDIS_DB,
+    REDIS_PASSWORD,
+    CONNECT_TIMEOUT,
+    get_async_redis,
+)
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+CHANNEL = os.getenv("CACHE_INVALIDATION_CHANNEL", "cache:invalidate")
+RECONNECT_MAX_SECONDS = float(os.getenv("CACHE_INVALIDATION_RECONNECT_MAX_SECONDS", "30"))
+
+LocalCacheHandler = Callable[[Optional[str]], None]
+
+
+class InvalidationBus:
+    """
+    Registry of local cache handlers plus the Redis pub/sub listener.
+    """
+
+    def __init__(self, channel: str = CHANNEL):
+        self.channel = channel
+        self.origin = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._handlers: Dict[str, List[LocalCacheHandler]] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pending: Set[asyncio.Task] = set()
+        self._stats = {"published": 0, "received": 0, "reconnects": 0}
+
+    def register(self, name: str, handler: LocalCacheHandler) -> None:
+        """Call ``handler(key)`` whenever ``name`` is invalidated in any worker"""
+        with self._lock:
+            self._handlers.setdefault(name, []).append(handler)
+
+    def publish(self, name: str, key: Optional[str] = None) -> None:
+        """Invalidate ``name`` here and broadcast it to the other workers"""
+        self._dispatch(name, key)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not None:
+            # Called from the event loop thread: don't block it on Redis
+            task = loop.create_task(self._apublish_remote(name, key))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+            return
+
+        from cache_config import cache
+
+        if not cache.is_available:
+            return
+        try:
+            cache.redis_client.publish(self.channel, self._message(name, key))
+            self._stats["published"] += 1
+        except Exception as e:
+            logger.warning(f"Could not publish invalidation for {name}: {e}")
+
+    async def apublish(self, name: str, key: Optional[str] = None) -> None:
+        """``publish`` for code running on the event loop"""
+        self._dispatch(name, key)
+        await self._apublish_remote(name, key)
+
+    async def _apublish_remote(self, name: str, key: Optional[str]) -> None:
+        result = await get_async_redis().execute("publish", self.channel, self._message(name, key))
+        if result is not None:
+            self._stats["published"] += 1
+
+    def registered_names(self) -> List[str]:
+        with self._lock:
+            return sorted(self._handlers)
+
+    def invalidate_all_local(self) -> None:
+        """Clear every registered cache in this worker only"""
+        with self._lock:
+            names = list(self._handlers)
+        for name in names:
+            self._dispatch(name, None)
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="cache_invalidation_listener", daemon=True
+        )
+        self._thread.start()
+        logger.info(f"Cache invalidation listener started on channel {self.channel}")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        logger.info("Cache invalidation listener stopped")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            registered = sum(len(handlers) for handlers in self._handlers.values())
+        return {**self._stats, "handlers": registered}
+
+    def _message(self, name: str, key: Optional[str]) -> str:
+        return json.dumps({"name": name, "key": key, "origin": self.origin})
+
+    def _dispatch(self, name: str, key: Optional[str]) -> None:
+        with self._lock:
+            handlers = list(self._handlers.get(name, ()))
+        for handler in handlers:
+            try:
+                handler(key)
+            except Exception as e:
+                logger.error(f"Local cache invalidation handler for {name} failed: {e}")
+
+    def _handle_message(self, data) -> None:
+        try:
+            message = json.loads(data)
+        except (TypeError, ValueError):
+            return
+        if message.get("origin") == self.origin:
+            return  # already applied when published
+        self._stats["received"] += 1
+        self._dispatch(message.get("name"), message.get("key"))
+
+    def _run(self) -> None:
+        backoff = 1.0
+        connected_before = False
+        while not self._stop_event.is_set():
+            client = None
+            pubsub = None
+            try:
+                client = redis.Redis(
+                    host=REDIS_HOST,
+                    port=REDIS_PORT,
+                    db=REDIS_DB,
+                    password=REDIS_PASSWORD,
+                    decode_responses=True,
+                    socket_connect_timeout=CONNECT_TIMEOUT,
+                    health_check_interval=30,
+                )
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                if connected_before:
+                    # Messages sent while we were disconnected are lost
+                    self._stats["reconnects"] += 1
+                    self.invalidate_all_local()
+                connected_before = True
+                backoff = 1.0
+
+                while not self._stop_event.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message.get("type") == "message":
+                        self._handle_message(message.get("data"))
+            except (RedisError, OSError) as e:
+                logger.debug(f"Cache invalidation listener disconnected: {e}")
+                self._stop_event.wait(backoff)
+                backoff = min(backoff * 2, RECONNECT_MAX_SECONDS)
+            finally:
+                for resource in (pubsub, client):
+                    if resource is not None:
+                        try:
+                            resource.close()
+                        except Exception:
+                            pass
+
+
+# Global bus instance
+invalidation_bus = InvalidationBus()
+
+
+def register_local_cache(name: str, handler: LocalCacheHandler) -> None:
+    """Register an in-process cache for cross-worker invalidation"""
+    invalidation_bus.register(name, handler)
+
+
+def publish_invalidation(name: str, key: Optional[str] = None) -> None:
+    """Invalidate a local cache in every worker (sync code)"""
+    invalidation_bus.publish(name, key)
+
+
+async def apublish_invalidation(name: str, key: Optional[str] = None) -> None:
+    """Invalidate a local cache in every worker (async code)"""
+    await invalidation_bus.apublish(name, key)
+
+
+def start_invalidation_listener() -> Optional[InvalidationBus]:
+    """Start the pub/sub listener unless CACHE_INVALIDATION_BUS_ENABLED=false"""
+    if os.getenv("CACHE_INVALIDATION_BUS_ENABLED", "true").lower() in ("0", "false", "no"):
+        logger.info("Cache invalidation listener disabled")
+        return None
+    invalidation_bus.start()
+    return invalidation_bus
+
+
+def stop_invalidation_listener() -> None:
+    """Stop the pub/sub listener"""
+    invalidation_bus.stop()
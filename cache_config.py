@@ -1,15 +1,39 @@
 """
 Redis cache configuration and utilities for user management system
+
+Invalidation uses generation-counter namespaces instead of pattern deletes.
+Each cache tag (``user_list``, ``user_details:<id>`` ...) has a counter at
+``cache_gen:<tag>``; keys embed the current generations of their tags
+(``user_list:v3:page_1:...``). Invalidating a tag is a single ``INCR``, after
+which old keys are simply never read again. They expire through their TTL,
+and ``CacheSweeper`` removes them earlier with an incremental ``SCAN`` so
+Redis never runs a blocking ``KEYS`` over the whole keyspace. A worker
+reuses generations it has read for ``CACHE_GENERATION_LOCAL_SECONDS``, so
+other workers' invalidations become visible within that interval.
+
+``cached`` stores values in the two-tier cache (``tiered_cache``).
 """
 
 import redis
 import json
 import os
-from typing import Any, Optional, Union
-from datetime import datetime, timedelta
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+from datetime import date, datetime, time as time_of_day, timedelta
+from decimal import Decimal
+from enum import Enum
 from functools import wraps
+from uuid import UUID
+import asyncio
+import hashlib
 import logging
 
+from sqlalchemy.orm import Session
+
+from redis_pool import get_async_redis
+from tiered_cache import tiered_cache
+
 logger = logging.getLogger(__name__)
 
 class CacheConfig:
@@ -29,13 +53,29 @@ class CacheConfig:
     
     # Enhanced TTL for superadmin operations
     SUPERADMIN_USER_LIST_TTL = 900  # 15 minutes - longer cache for superadmin
+    
+    # Generation counters and orphaned-key sweeping
+    GENERATION_PREFIX = "cache_gen:"
+    SWEEP_INTERVAL_SECONDS = int(os.getenv("CACHE_SWEEP_INTERVAL_SECONDS", "300"))
+    SWEEP_BATCH_SIZE = int(os.getenv("CACHE_SWEEP_BATCH_SIZE", "500"))
+    # How long a worker reuses generations it has read (bounds cross-worker staleness)
+    GENERATION_LOCAL_SECONDS = float(os.getenv("CACHE_GENERATION_LOCAL_SECONDS", "1"))
 
 class RedisCache:
-    """Redis cache manager for user management system"""
+    """
+    Redis cache manager for user management system.
+
+    The plain methods use a synchronous client and are meant for sync code
+    (threadpool endpoints, services, scripts). Code running on the event loop
+    should use the ``a``-prefixed coroutines, which go through the shared
+    async pool in ``redis_pool`` and never block the loop.
+    """
     
     def __init__(self):
         self.redis_client = None
         self.is_available = False
+        self.async_client = get_async_redis()
+        self._generations: Dict[str, tuple] = {}
         self._connect()
     
     def _connect(self):
@@ -102,19 +142,137 @@ class RedisCache:
             return False
     
     def delete_pattern(self, pattern: str) -> bool:
-        """Delete all keys matching pattern"""
+        """
+        Delete all keys matching pattern (incremental SCAN + UNLINK).
+        
+        Prefer ``invalidate_tags`` for cache namespaces; this walks the keyspace.
+        """
         if not self.is_available:
             return False
             
         try:
-            keys = self.redis_client.keys(pattern)
-            if keys:
-                self.redis_client.delete(*keys)
+            batch = []
+            for key in self.redis_client.scan_iter(match=pattern, count=CacheConfig.SWEEP_BATCH_SIZE):
+                batch.append(key)
+                if len(batch) >= CacheConfig.SWEEP_BATCH_SIZE:
+                    self.redis_client.unlink(*batch)
+                    batch = []
+            if batch:
+                self.redis_client.unlink(*batch)
             return True
         except Exception as e:
             logger.error(f"Cache delete pattern error for pattern {pattern}: {e}")
             return False
     
+    def count_keys(self, pattern: str = "*") -> int:
+        """Count keys matching pattern with SCAN (monitoring only)"""
+        if not self.is_available:
+            return 0
+        
+        try:
+            if pattern == "*":
+                return self.redis_client.dbsize()
+            return sum(1 for _ in self.redis_client.scan_iter(match=pattern, count=CacheConfig.SWEEP_BATCH_SIZE))
+        except Exception as e:
+            logger.error(f"Cache count error for pattern {pattern}: {e}")
+            return 0
+    
+    def generations(self, tags: Sequence[str]) -> List[int]:
+        """Current generation of each tag (0 if never invalidated)"""
+        if not self.is_available or not tags:
+            return [0] * len(tags)
+        
+        known = self._known_generations(tags)
+        if known is not None:
+            return known
+        try:
+            values = self.redis_client.mget([CacheConfig.GENERATION_PREFIX + tag for tag in tags])
+            return self._remember_generations(tags, [int(v) if v else 0 for v in values])
+        except Exception as e:
+            logger.error(f"Cache generation read error for tags {tags}: {e}")
+            return [0] * len(tags)
+    
+    def _known_generations(self, tags: Sequence[str]) -> Optional[List[int]]:
+        """Recently read generations, or None if any tag needs a fresh read"""
+        now = time.monotonic()
+        known = []
+        for tag in tags:
+            cached_generation = self._generations.get(tag)
+            if cached_generation is None or now - cached_generation[1] >= CacheConfig.GENERATION_LOCAL_SECONDS:
+                return None
+            known.append(cached_generation[0])
+        return known
+    
+    def _remember_generations(self, tags: Sequence[str], values: List[int]) -> List[int]:
+        now = time.monotonic()
+        for tag, value in zip(tags, values):
+            self._generations[tag] = (value, now)
+        return values
+    
+    def tagged_key(self, namespace: str, suffix: str, tags: Optional[Sequence[str]] = None) -> str:
+        """
+        Build a key that is invalidated together with its tags.
+        
+        Args:
+            namespace: Leading key segment; also the first tag unless ``tags`` is given
+            suffix: Rest of the key
+            tags: Tags whose invalidation should orphan this key (first one is
+                the namespace-wide tag checked by the sweeper)
+        """
+        tags = list(tags) if tags else [namespace]
+        return _format_tagged_key(namespace, self.generations(tags), suffix)
+    
+    def invalidate_tags(self, *tags: str) -> bool:
+        """Orphan every key built with any of ``tags`` (one INCR per tag, one round trip)"""
+        if not self.is_available or not tags:
+            return False
+        
+        try:
+            pipeline = self.redis_client.pipeline(transaction=False)
+            for tag in tags:
+                pipeline.incr(CacheConfig.GENERATION_PREFIX + tag)
+            # This worker sees its own invalidation immediately
+            self._remember_generations(tags, pipeline.execute())
+            return True
+        except Exception as e:
+            logger.error(f"Cache invalidate error for tags {tags}: {e}")
+            return False
+    
+    def sweep(self, namespaces: Iterable[str], batch_size: int = None) -> int:
+        """
+        Delete keys from superseded generations of each namespace.
+        
+        Keys are visited with SCAN in ``batch_size`` steps, so Redis stays
+        responsive however large the keyspace is. Only the namespace-wide
+        (first) generation is compared; keys orphaned by narrower tags are
+        left to their TTL.
+        
+        Returns:
+            Number of keys deleted
+        """
+        if not self.is_available:
+            return 0
+        
+        batch_size = batch_size or CacheConfig.SWEEP_BATCH_SIZE
+        deleted = 0
+        for namespace in namespaces:
+            current = str(self.generations([namespace])[0])
+            prefix_length = len(namespace) + 2  # "<namespace>:v"
+            batch = []
+            try:
+                for key in self.redis_client.scan_iter(match=f"{namespace}:v*", count=batch_size):
+                    generation = key[prefix_length:].split(":", 1)[0].split(".", 1)[0]
+                    if generation.isdigit() and generation != current:
+                        batch.append(key)
+                    if len(batch) >= batch_size:
+                        deleted += self.redis_client.unlink(*batch)
+                        batch = []
+                if batch:
+                    deleted += self.redis_client.unlink(*batch)
+            except Exception as e:
+                logger.error(f"Cache sweep error for namespace {namespace}: {e}")
+        return deleted
+    
     def exists(self, key: str) -> bool:
         """Check if key exists in cache"""
         if not self.is_available:
@@ -126,11 +284,128 @@ class RedisCache:
             logger.error(f"Cache exists error for key {key}: {e}")
             return False
 
+    async def aget(self, key: str) -> Optional[Any]:
+        """Get value from cache without blocking the event loop"""
+        value = await self.async_client.get(key)
+        if not value:
+            return None
+        try:
+            return json.loads(value)
+        except ValueError as e:
+            logger.error(f"Cache decode error for key {key}: {e}")
+            return None
+
+    async def aset(self, key: str, value: Any, ttl: int = 300) -> bool:
+        """Set value in cache with TTL without blocking the event loop"""
+        try:
+            serialized_value = json.dumps(value, default=str)
+        except (TypeError, ValueError) as e:
+            logger.error(f"Cache encode error for key {key}: {e}")
+            return False
+        return await self.async_client.setex(key, ttl, serialized_value)
+
+    async def adelete(self, key: str) -> bool:
+        """Delete key from cache without blocking the event loop"""
+        return bool(await self.async_client.delete(key))
+
+    async def aexists(self, key: str) -> bool:
+        """Check if key exists in cache without blocking the event loop"""
+        return bool(await self.async_client.exists(key))
+
+    async def agenerations(self, tags: Sequence[str]) -> List[int]:
+        """Current generation of each tag without blocking the event loop"""
+        if not tags:
+            return []
+        known = self._known_generations(tags)
+        if known is not None:
+            return known
+        values = await self.async_client.execute(
+            "mget", [CacheConfig.GENERATION_PREFIX + tag for tag in tags]
+        )
+        if values is None:
+            return [0] * len(tags)
+        return self._remember_generations(tags, [int(v) if v else 0 for v in values])
+
+    async def atagged_key(self, namespace: str, suffix: str, tags: Optional[Sequence[str]] = None) -> str:
+        """Async ``tagged_key``"""
+        tags = list(tags) if tags else [namespace]
+        return _format_tagged_key(namespace, await self.agenerations(tags), suffix)
+
+    async def ainvalidate_tags(self, *tags: str) -> bool:
+        """Async ``invalidate_tags``"""
+        if not tags:
+            return False
+        results = await self.async_client.pipeline(
+            [("incr", (CacheConfig.GENERATION_PREFIX + tag,)) for tag in tags]
+        )
+        if results is None:
+            return False
+        self._remember_generations(tags, results)
+        return True
+
+
+def _format_tagged_key(namespace: str, generations: Sequence[int], suffix: str) -> str:
+    return f"{namespace}:v{'.'.join(str(g) for g in generations)}:{suffix}"
+
 # Global cache instance
 cache = RedisCache()
 
+def stable_hash(value: Any, digest_size: int = 16) -> str:
+    """
+    Process-independent hash of a value for cache keys.
+    
+    Unlike ``hash()`` (salted per process) this gives the same key in every
+    worker: the value is serialized canonically (type-tagged, dicts and
+    sets sorted) and hashed with BLAKE2b.
+    """
+    return hashlib.blake2b(_canonical(value).encode("utf-8"), digest_size=digest_size).hexdigest()
+
+def _canonical(value: Any, depth: int = 0) -> str:
+    """Type-tagged canonical text of a value (equal values -> equal text)"""
+    if value is None:
+        return "N"
+    if isinstance(value, bool):
+        return "T" if value else "F"
+    if isinstance(value, Enum):
+        return f"e{type(value).__qualname__}.{value.name}"
+    if isinstance(value, int):
+        return f"i{value}"
+    if isinstance(value, float):
+        return f"f{value!r}"
+    if isinstance(value, str):
+        return f"s{len(value)}:{value}"
+    if isinstance(value, (bytes, bytearray)):
+        return f"y{bytes(value).hex()}"
+    if isinstance(value, (datetime, date, time_of_day)):
+        return f"d{value.isoformat()}"
+    if isinstance(value, (Decimal, UUID)):
+        return f"{type(value).__name__}:{value}"
+    if depth > 6:
+        return f"c{type(value).__qualname__}"
+    if isinstance(value, dict):
+        items = sorted(f"{_canonical(k, depth + 1)}={_canonical(v, depth + 1)}" for k, v in value.items())
+        return "m{" + ",".join(items) + "}"
+    if isinstance(value, tuple):
+        return "t(" + ",".join(_canonical(v, depth + 1) for v in value) + ")"
+    if isinstance(value, list):
+        return "l[" + ",".join(_canonical(v, depth + 1) for v in value) + "]"
+    if isinstance(value, (set, frozenset)):
+        return "S{" + ",".join(sorted(_canonical(v, depth + 1) for v in value)) + "}"
+    if isinstance(value, Session):
+        # Connections are not part of what a call computes
+        return "xSession"
+    if hasattr(value, "__table__") and hasattr(value, "id"):
+        # ORM rows are identified by primary key
+        return f"o{type(value).__name__}:{_canonical(value.id, depth + 1)}"
+    if hasattr(value, "model_dump"):
+        return f"p{type(value).__qualname__}:{_canonical(value.model_dump(), depth + 1)}"
+    if hasattr(value, "__dict__"):
+        state = {k: v for k, v in vars(value).items() if not k.startswith("_")}
+        return f"c{type(value).__module__}.{type(value).__qualname__}:{_canonical(state, depth + 1)}"
+    return f"r{type(value).__qualname__}:{value!r}"
+
 def cache_key_builder(*args, **kwargs) -> str:
-    """Build cache key from arguments"""
+    """Build cache key from arguments (identical in every worker process)"""
     key_parts = []
     
     # Add positional arguments
@@ -138,44 +413,56 @@ def cache_key_builder(*args, **kwargs) -> str:
         if isinstance(arg, (str, int, float, bool)):
             key_parts.append(str(arg))
         else:
-            key_parts.append(str(hash(str(arg))))
+            key_parts.append(stable_hash(arg))
     
     # Add keyword arguments
     for k, v in sorted(kwargs.items()):
         if isinstance(v, (str, int, float, bool)):
             key_parts.append(f"{k}:{v}")
         else:
-            key_parts.append(f"{k}:{hash(str(v))}")
+            key_parts.append(f"{k}:{stable_hash(v)}")
     
     return ":".join(key_parts)
 
 def cached(ttl: int = 300, key_prefix: str = ""):
-    """Decorator for caching function results"""
+    """
+    Decorator for caching function results (sync or async functions).
+    
+    Values go through the two-tier cache (per-process LRU in front of
+    Redis) with single-flight computation, early refresh and serve-stale;
+    see ``tiered_cache``.
+    """
     def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                suffix = f"{func.__name__}:{cache_key_builder(*args, **kwargs)}"
+                cache_key = await cache.atagged_key(key_prefix, suffix) if key_prefix else f":{suffix}"
+                return await tiered_cache.aget_or_compute(
+                    cache_key, lambda: func(*args, **kwargs), ttl
+                )
+            return async_wrapper
+
         @wraps(func)
         def wrapper(*args, **kwargs):
-            # Build cache key
-            cache_key = f"{key_prefix}:{func.__name__}:{cache_key_builder(*args, **kwargs)}"
-            
-            # Try to get from cache
-            cached_result = cache.get(cache_key)
-            if cached_result is not None:
-                logger.debug(f"Cache hit for key: {cache_key}")
-                return cached_result
-            
-            # Execute function and cache result
-            result = func(*args, **kwargs)
-            if result is not None:
-                cache.set(cache_key, result, ttl)
-                logger.debug(f"Cache set for key: {cache_key}")
-            
-            return result
+            # Build cache key (versioned by the key_prefix tag)
+            suffix = f"{func.__name__}:{cache_key_builder(*args, **kwargs)}"
+            cache_key = cache.tagged_key(key_prefix, suffix) if key_prefix else f":{suffix}"
+            return tiered_cache.get_or_compute(cache_key, lambda: func(*args, **kwargs), ttl)
         return wrapper
     return decorator
 
 def invalidate_cache_pattern(pattern: str):
-    """Invalidate all cache keys matching pattern"""
-    cache.delete_pattern(pattern)
+    """
+    Invalidate all cache keys matching pattern.
+    
+    ``"<namespace>*"`` for a tagged namespace is a generation bump; any other
+    pattern falls back to an incremental SCAN delete.
+    """
+    if pattern.endswith("*") and pattern[:-1] in CacheKeys.NAMESPACES:
+        cache.invalidate_tags(pattern[:-1])
+    else:
+        cache.delete_pattern(pattern)
     logger.info(f"Invalidated cache pattern: {pattern}")
 
 # Cache key patterns for user management
@@ -188,37 +475,111 @@ class CacheKeys:
     DASHBOARD_STATS = "dashboard_stats"
     SUPERADMIN_USER_LIST = "superadmin_user_list"
     
+    # Generation-tagged namespaces (swept by CacheSweeper)
+    NAMESPACES = (USER_STATS, USER_LIST, USER_DETAILS, DASHBOARD_STATS, SUPERADMIN_USER_LIST)
+    
     @staticmethod
     def user_list_key(page: int, limit: int, filters: dict) -> str:
         """Generate cache key for user list"""
-        filter_hash = hash(str(sorted(filters.items())))
-        return f"{CacheKeys.USER_LIST}:page_{page}:limit_{limit}:filters_{filter_hash}"
+        filter_hash = stable_hash(filters)
+        return cache.tagged_key(CacheKeys.USER_LIST, f"page_{page}:limit_{limit}:filters_{filter_hash}")
     
     @staticmethod
     def superadmin_user_list_key(page: int, limit: int, filters: dict) -> str:
         """Generate cache key for superadmin user list with enhanced caching"""
-        filter_hash = hash(str(sorted(filters.items())))
-        return f"{CacheKeys.SUPERADMIN_USER_LIST}:page_{page}:limit_{limit}:filters_{filter_hash}"
+        filter_hash = stable_hash(filters)
+        return cache.tagged_key(CacheKeys.SUPERADMIN_USER_LIST, f"page_{page}:limit_{limit}:filters_{filter_hash}")
     
     @staticmethod
     def user_details_key(user_id: str) -> str:
         """Generate cache key for user details"""
-        return f"{CacheKeys.USER_DETAILS}:{user_id}"
+        return cache.tagged_key(CacheKeys.USER_DETAILS, str(user_id), CacheKeys.user_details_tags(user_id))
+    
+    @staticmethod
+    def user_details_tags(user_id: str) -> List[str]:
+        """All user details, then this user's details"""
+        return [CacheKeys.USER_DETAILS, f"{CacheKeys.USER_DETAILS}:{user_id}"]
+    
+    @staticmethod
+    def user_cache_tags(user_id: str = None) -> List[str]:
+        """Tags to bump when a user (or users in general) change"""
+        tags = [
+            CacheKeys.USER_STATS,
+            CacheKeys.USER_LIST,
+            CacheKeys.SUPERADMIN_USER_LIST,
+            CacheKeys.DASHBOARD_STATS,
+        ]
+        tags.append(f"{CacheKeys.USER_DETAILS}:{user_id}" if user_id else CacheKeys.USER_DETAILS)
+        return tags
     
     @staticmethod
     def invalidate_user_caches(user_id: str = None):
         """Invalidate user-related caches"""
-        patterns = [
-            f"{CacheKeys.USER_STATS}*",
-            f"{CacheKeys.USER_LIST}*",
-            f"{CacheKeys.SUPERADMIN_USER_LIST}*",
-            f"{CacheKeys.DASHBOARD_STATS}*"
-        ]
-        
-        if user_id:
-            patterns.append(f"{CacheKeys.USER_DETAILS}:{user_id}")
-        else:
-            patterns.append(f"{CacheKeys.USER_DETAILS}*")
-        
-        for pattern in patterns:
-            invalidate_cache_pattern(pattern)
\ No newline at end of file
+        cache.invalidate_tags(*CacheKeys.user_cache_tags(user_id))
+
+
+class CacheSweeper:
+    """
+    Background thread that deletes superseded-generation keys every
+    ``CacheConfig.SWEEP_INTERVAL_SECONDS`` (they would otherwise linger
+    until their TTL).
+    """
+    
+    def __init__(self, interval_seconds: int = CacheConfig.SWEEP_INTERVAL_SECONDS):
+        self.interval_seconds = interval_seconds
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="cache_sweeper", daemon=True)
+        self._thread.start()
+        logger.info(f"Cache sweeper started (interval={self.interval_seconds}s)")
+    
+    def stop(self, timeout: float = 10.0):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        logger.info("Cache sweeper stopped")
+    
+    def run_once(self) -> int:
+        deleted = cache.sweep(CacheKeys.NAMESPACES)
+        if deleted:
+            logger.info(f"Cache sweeper removed {deleted} orphaned keys")
+        return deleted
+    
+    def _run(self):
+        while not self._stop_event.wait(self.interval_seconds):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Cache sweep failed: {e}")
+
+
+# Global sweeper instance
+_cache_sweeper: Optional[CacheSweeper] = None
+
+
+def start_cache_sweeper() -> Optional[CacheSweeper]:
+    """Start the orphaned-key sweeper unless CACHE_SWEEP_ENABLED=false"""
+    global _cache_sweeper
+    
+    if os.getenv("CACHE_SWEEP_ENABLED", "true").lower() in ("0", "false", "no"):
+        logger.info("Cache sweeper disabled")
+        return None
+    if _cache_sweeper is None:
+        _cache_sweeper = CacheSweeper()
+    _cache_sweeper.start()
+    return _cache_sweeper
+
+
+def stop_cache_sweeper():
+    """Stop the orphaned-key sweeper"""
+    global _cache_sweeper
+    
+    if _cache_sweeper is not None:
+        _cache_sweeper.stop()
+        _cache_sweeper = None
\ No newline at end of file
@@ -1,13 +1,31 @@
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.openapi.utils import get_openapi
+from fastapi.routing import APIRoute
+import hashlib
+import inspect
+import json
+import logging
+import os
+import sys
 
+# Configure logging
+logger = logging.getLogger(__name__)
 
-def custom_openapi(app: FastAPI):
-    # Force regeneration of schema for development (comment out for production)
-    # if app.openapi_schema:
-    #     return app.openapi_schema
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# precomputed: serve the schema built by `python custom_openapi.py build`
+#   (generated once per worker if the file is missing or stale)
+# dynamic: regenerate on every request (development)
+OPENAPI_SCHEMA_MODE = os.getenv("OPENAPI_SCHEMA_MODE", "precomputed").lower()
+OPENAPI_SCHEMA_DIR = os.getenv("OPENAPI_SCHEMA_DIR", os.path.join(BASE_DIR, "static", "openapi"))
+
+# Files besides the route modules that shape the generated schema
+_SCHEMA_SOURCE_FILES = ("custom_openapi.py", "schemas.py", "user_schemas.py", "export_schemas.py")
 
+
+def custom_openapi(app: FastAPI):
+    """Generate the full schema (always regenerates; see load_openapi_schema)"""
     # Generate base schema
     openapi_schema = get_openapi(
         title=app.title,
@@ -2231,3 +2249,114 @@ def create_custom_swagger_ui_response(app):
             init_oauth=getattr(app, "swagger_ui_init_oauth", {}),
         )
     )
+
+
+# ——————— Precomputed schema ———————
+
+
+def schema_fingerprint(app: FastAPI) -> str:
+    """
+    Hash of everything the generated schema depends on: app metadata, the
+    route table and the source of the route and schema modules.
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{app.title}|{app.version}|{app.openapi_version}".encode())
+    source_files = {os.path.join(BASE_DIR, name) for name in _SCHEMA_SOURCE_FILES}
+    for route in app.routes:
+        if isinstance(route, APIRoute):
+            endpoint = inspect.unwrap(route.endpoint)
+            digest.update(
+                f"{route.path}|{','.join(sorted(route.methods))}|"
+                f"{endpoint.__module__}.{endpoint.__qualname__}|{route.include_in_schema}\n".encode()
+            )
+            try:
+                source_files.add(inspect.getsourcefile(endpoint))
+            except TypeError:
+                pass
+        else:
+            digest.update(f"{type(route).__name__}|{getattr(route, 'path', '')}\n".encode())
+    for path in sorted(filter(None, source_files)):
+        try:
+            with open(path, "rb") as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+        except OSError:
+            continue
+    return digest.hexdigest()
+
+
+def schema_file_path(app: FastAPI, schema_dir: str = OPENAPI_SCHEMA_DIR) -> str:
+    """Versioned file name of the precomputed schema for this build of ``app``"""
+    return os.path.join(
+        schema_dir, f"openapi-{app.version}-{schema_fingerprint(app)[:16]}.json"
+    )
+
+
+def load_openapi_schema(app: FastAPI):
+    """
+    ``app.openapi`` replacement: the precomputed schema file when it matches
+    the running code, otherwise a schema generated once and kept in memory.
+    """
+    if OPENAPI_SCHEMA_MODE == "dynamic":
+        return custom_openapi(app)
+    if app.openapi_schema:
+        return app.openapi_schema
+
+    path = schema_file_path(app)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            app.openapi_schema = json.load(f)
+        logger.info(f"Loaded precomputed OpenAPI schema {os.path.basename(path)}")
+        return app.openapi_schema
+    except FileNotFoundError:
+        logger.info(
+            f"No precomputed OpenAPI schema at {path}; generating it "
+            f"(run `python custom_openapi.py build` at build time)"
+        )
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read precomputed OpenAPI schema {path}: {e}")
+    return custom_openapi(app)
+
+
+def build_openapi_schema(app: FastAPI, schema_dir: str = OPENAPI_SCHEMA_DIR) -> str:
+    """
+    Generate the schema and write it to its versioned file (build step).
+
+    Older schema files in ``schema_dir`` are removed.
+
+    Returns:
+        Path of the written file
+    """
+    os.makedirs(schema_dir, exist_ok=True)
+    path = schema_file_path(app, schema_dir)
+    schema = custom_openapi(app)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(schema, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+    for name in os.listdir(schema_dir):
+        stale = os.path.join(schema_dir, name)
+        if name.startswith("openapi-") and name.endswith(".json") and stale != path:
+            os.remove(stale)
+    return path
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build or check the precomputed OpenAPI schema")
+    parser.add_argument("command", choices=["build", "check"])
+    parser.add_argument("--out", default=OPENAPI_SCHEMA_DIR, help="Schema directory")
+    args = parser.parse_args()
+
+    sys.path.insert(0, BASE_DIR)
+    from main import app as application
+
+    if args.command == "build":
+        print(build_openapi_schema(application, args.out))
+    else:
+        path = schema_file_path(application, args.out)
+        if not os.path.exists(path):
+            print(f"Precomputed OpenAPI schema is missing or stale: {path}")
+            sys.exit(1)
+        print(f"Precomputed OpenAPI schema is up to date: {path}")
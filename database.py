@@ -1,9 +1,16 @@
-from sqlalchemy import create_engine, event
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
-from typing import Generator
+from typing import Dict, Generator, Optional
 from dotenv import load_dotenv
+from fastapi import Request
+import hashlib
+import itertools
+import logging
 import os
+import threading
+import time
 from sqlalchemy.engine import Engine
 import sqlalchemy.dialects.sqlite  # Import the SQLite dialect directly
 
@@ -14,52 +21,319 @@ load_dotenv()
 DATABASE_URL = os.getenv("DB_CONNECTION")
 # DATABASE_URL = "sqlite:///./hita.db"
 
-engine = create_engine(
-    DATABASE_URL,
-    pool_size=10,  # Increased pool size for better concurrency
-    max_overflow=20,  # Increased overflow for burst traffic
-    pool_timeout=15,  # Reduced timeout for faster failover
-    pool_recycle=1800,  # Recycle connections more frequently (30 min)
-    pool_pre_ping=True,  # Validate connections before use
-    pool_use_lifo=True,  # Use LIFO for better connection reuse
-    echo=False,  # Set to True for SQL debugging
-)
+DB_POOL_SIZE = 10  # Increased pool size for better concurrency
+DB_MAX_OVERFLOW = 20  # Increased overflow for burst traffic
+
+DB_REPLICA_URLS = [
+    url.strip() for url in os.getenv("DB_REPLICA_URLS", "").split(",") if url.strip()
+]
+DB_REPLICA_MAX_LAG_SECONDS = float(os.getenv("DB_REPLICA_MAX_LAG_SECONDS", "5"))
+DB_REPLICA_CHECK_SECONDS = float(os.getenv("DB_REPLICA_CHECK_SECONDS", "5"))
+# How long a client reads from the primary after one of its own writes
+DB_READ_YOUR_WRITES_SECONDS = float(os.getenv("DB_READ_YOUR_WRITES_SECONDS", "10"))
+
+logger = logging.getLogger(__name__)
+
+
+def _create_engine(url: str) -> Engine:
+    db_engine = create_engine(
+        url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=15,  # Reduced timeout for faster failover
+        pool_recycle=1800,  # Recycle connections more frequently (30 min)
+        pool_pre_ping=True,  # Validate connections before use
+        pool_use_lifo=True,  # Use LIFO for better connection reuse
+        echo=False,  # Set to True for SQL debugging
+    )
 
+    @event.listens_for(db_engine, "connect")
+    def enable_sqlite_fk_constraints(dbapi_connection, connection_record):
+        # Check if the database dialect is SQLite
+        if isinstance(db_engine.dialect, sqlalchemy.dialects.sqlite.dialect):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA foreign_keys=ON")
+            # Enable WAL mode for better concurrency (allows reads during writes)
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")  # Faster writes, still safe
+            cursor.execute("PRAGMA busy_timeout=30000")  # 30 second timeout for locks
+            cursor.close()
 
-@event.listens_for(engine, "connect")
-def enable_sqlite_fk_constraints(dbapi_connection, connection_record):
-    # Check if the database dialect is SQLite
-    if isinstance(engine.dialect, sqlalchemy.dialects.sqlite.dialect):
-        cursor = dbapi_connection.cursor()
-        cursor.execute("PRAGMA foreign_keys=ON")
-        # Enable WAL mode for better concurrency (allows reads during writes)
-        cursor.execute("PRAGMA journal_mode=WAL")
-        cursor.execute("PRAGMA synchronous=NORMAL")  # Faster writes, still safe
-        cursor.execute("PRAGMA busy_timeout=30000")  # 30 second timeout for locks
-        cursor.close()
+    return db_engine
 
 
+engine = _create_engine(DATABASE_URL)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
+def _replica_lag_seconds(connection) -> Optional[float]:
+    """
+    Replication delay reported by the replica itself.
+
+    Returns:
+        Seconds behind the primary (0 for dialects without replication,
+        e.g. SQLite files used locally), or None if replication is stopped
+    """
+    dialect = connection.dialect.name
+    if dialect in ("mysql", "mariadb"):
+        try:
+            row = connection.execute(text("SHOW REPLICA STATUS")).mappings().first()
+        except DBAPIError:
+            row = connection.execute(text("SHOW SLAVE STATUS")).mappings().first()
+        if row is None:
+            return 0.0  # not a replica (e.g. a second primary in a cluster)
+        lag = row.get("Seconds_Behind_Source", row.get("Seconds_Behind_Master"))
+        return float(lag) if lag is not None else None
+    if dialect == "postgresql":
+        return float(
+            connection.execute(
+                text(
+                    "SELECT CASE WHEN pg_is_in_recovery() THEN COALESCE("
+                    "EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) "
+                    "ELSE 0 END"
+                )
+            ).scalar()
+            or 0
+        )
+    return 0.0
+
+
+class ReadReplica:
+    """One replica engine plus its last known health"""
+
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.engine = _create_engine(url)
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.lag: Optional[float] = None
+        self.healthy = False
+        self.checked_at = 0.0
+        self.error: Optional[str] = None
+
+    def refresh(self, max_lag: float) -> None:
+        try:
+            with self.engine.connect() as connection:
+                self.lag = _replica_lag_seconds(connection)
+            self.error = None
+            self.healthy = self.lag is not None and self.lag <= max_lag
+        except Exception as e:
+            self.lag = None
+            self.healthy = False
+            self.error = str(e)
+            logger.warning(f"Read replica {self.name} unavailable: {e}")
+        self.checked_at = time.monotonic()
+
+
+class ReplicaRouter:
+    """
+    Picks a healthy, sufficiently fresh replica for read-only sessions.
+
+    Replica lag is probed at most every ``check_seconds`` per replica (by
+    whichever request thread notices it is due); replicas that are down or
+    more than ``max_lag`` seconds behind are skipped until the next probe.
+    When no replica qualifies, reads go to the primary.
+    """
+
+    def __init__(self, urls, max_lag: float, check_seconds: float):
+        self.replicas = [ReadReplica(f"replica{i + 1}", url) for i, url in enumerate(urls)]
+        self.max_lag = max_lag
+        self.check_seconds = check_seconds
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+        self._refreshing = set()
+
+    def pick(self) -> Optional[ReadReplica]:
+        """Next usable replica in round-robin order, or None for the primary"""
+        if not self.replicas:
+            return None
+        start = next(self._next)
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(start + offset) % len(self.replicas)]
+            self._refresh_if_due(replica)
+            if replica.healthy:
+                return replica
+        return None
+
+    def _refresh_if_due(self, replica: ReadReplica) -> None:
+        if time.monotonic() - replica.checked_at < self.check_seconds:
+            return
+        with self._lock:
+            if replica.name in self._refreshing:
+                return  # another thread is probing; use the last known state
+            self._refreshing.add(replica.name)
+        try:
+            replica.refresh(self.max_lag)
+        finally:
+            with self._lock:
+                self._refreshing.discard(replica.name)
+
+    def status(self):
+        return [
+            {
+                "name": replica.name,
+                "healthy": replica.healthy,
+                "lag_seconds": replica.lag,
+                "error": replica.error,
+                "pool": _engine_pool_status(replica.engine),
+            }
+            for replica in self.replicas
+        ]
+
+
+replica_router = ReplicaRouter(
+    DB_REPLICA_URLS, DB_REPLICA_MAX_LAG_SECONDS, DB_REPLICA_CHECK_SECONDS
+)
+
+
+# ——————— Read-your-writes stickiness ———————
+
+_CLIENT_KEY = "client_key"
+_WROTE_KEY = "wrote"
+_READ_ONLY_KEY = "read_only"
+_STICKY_PREFIX = "db_primary_until:"
+
+_sticky_until: Dict[str, float] = {}
+_sticky_lock = threading.Lock()
+
+
+def _client_key(request: Optional[Request]) -> Optional[str]:
+    """Stable per-client identity: API key or bearer token, else client IP"""
+    if request is None:
+        return None
+    credential = request.headers.get("X-API-Key") or request.headers.get("Authorization")
+    if not credential:
+        credential = request.client.host if request.client else None
+    if not credential:
+        return None
+    return hashlib.blake2b(credential.encode("utf-8"), digest_size=12).hexdigest()
+
+
+def _shared_redis_call(operation):
+    """Run a sync Redis call behind the shared breaker; None if Redis is unavailable"""
+    from cache_config import cache
+    from redis_pool import get_async_redis
+
+    breaker = get_async_redis().breaker
+    if not cache.is_available or not breaker.allow():
+        return None
+    try:
+        result = operation(cache.redis_client)
+    except Exception as e:
+        breaker.record_failure()
+        logger.debug(f"Read-your-writes marker unavailable: {e}")
+        return None
+    else:
+        breaker.record_success()
+        return result
+    finally:
+        breaker.release_trial()
+
+
+def mark_primary_sticky(client_key: str, seconds: float = DB_READ_YOUR_WRITES_SECONDS) -> None:
+    """Route this client's reads to the primary for ``seconds`` (all workers)"""
+    if seconds <= 0 or not replica_router.replicas:
+        return
+    with _sticky_lock:
+        _sticky_until[client_key] = time.time() + seconds
+        if len(_sticky_until) > 10000:
+            now = time.time()
+            for key in [key for key, until in _sticky_until.items() if until <= now]:
+                del _sticky_until[key]
+    _shared_redis_call(
+        lambda client: client.set(f"{_STICKY_PREFIX}{client_key}", 1, px=int(seconds * 1000))
+    )
+
+
+def is_primary_sticky(client_key: str) -> bool:
+    until = _sticky_until.get(client_key)
+    if until is not None and until > time.time():
+        return True
+    return bool(_shared_redis_call(lambda client: client.exists(f"{_STICKY_PREFIX}{client_key}")))
+
+
+@event.listens_for(Session, "after_flush")
+def _record_flush_write(session, flush_context):
+    session.info[_WROTE_KEY] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _record_statement_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        if orm_execute_state.session.info.get(_READ_ONLY_KEY):
+            raise RuntimeError("Write attempted on a read-only (replica) session")
+        orm_execute_state.session.info[_WROTE_KEY] = True
+
+
+@event.listens_for(Session, "before_flush")
+def _reject_read_only_flush(session, flush_context, instances):
+    if session.info.get(_READ_ONLY_KEY) and (session.new or session.dirty or session.deleted):
+        raise RuntimeError("Write attempted on a read-only (replica) session")
+
+
+@event.listens_for(Session, "after_commit")
+def _stick_client_to_primary(session):
+    if session.info.pop(_WROTE_KEY, False) and session.info.get(_CLIENT_KEY):
+        mark_primary_sticky(session.info[_CLIENT_KEY])
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_write(session):
+    session.info.pop(_WROTE_KEY, None)
+
+
 # Dependency to get DB session
-def get_db() -> Generator[Session, None, None]:
+def get_db(request: Request = None) -> Generator[Session, None, None]:
     db = SessionLocal()
+    # Lets a commit route this client's next reads to the primary
+    db.info[_CLIENT_KEY] = _client_key(request)
     try:
         yield db
     finally:
         db.close()
 
 
-# Connection pool health check
-def get_pool_status():
-    """Get current connection pool status"""
-    pool = engine.pool
+def get_read_session(client_key: Optional[str] = None) -> Session:
+    """
+    Session for read-only work: a healthy replica, or the primary when
+    there is none, when replicas lag, or when ``client_key`` wrote recently.
+    Flushes and INSERT/UPDATE/DELETE statements raise on it.
+    """
+    replica = None
+    if replica_router.replicas and (client_key is None or not is_primary_sticky(client_key)):
+        replica = replica_router.pick()
+    db = replica.SessionLocal() if replica is not None else SessionLocal()
+    db.info[_READ_ONLY_KEY] = True
+    db.info["replica"] = replica.name if replica is not None else "primary"
+    return db
+
+
+# Dependency for read-only endpoints (lists, searches, dashboards)
+def get_read_db(request: Request = None) -> Generator[Session, None, None]:
+    db = get_read_session(_client_key(request))
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def _engine_pool_status(db_engine: Engine):
+    pool = db_engine.pool
     return {
         "pool_size": pool.size(),
         "checked_in": pool.checkedin(),
         "checked_out": pool.checkedout(),
         "overflow": pool.overflow(),
-        "invalid": pool.invalid(),
     }
+
+
+# Connection pool health check
+def get_pool_status():
+    """Get current connection pool status"""
+    return _engine_pool_status(engine)
+
+
+def get_replica_status():
+    """Health, lag and pool usage of each configured read replica"""
+    return replica_router.status()
@@ -0,0 +1,243 @@
+"""
+Database access from async route handlers
+
+The ORM layer is synchronous (``database.get_db`` yields a blocking
+SQLAlchemy ``Session``). An ``async def`` handler that queries it directly
+runs the query on the event loop, so one slow query stalls every in-flight
+request on the worker. Async code must hand DB work to a thread instead:
+
+    from db_async import run_db, db_offload
+
+    # One call
+    user = await run_db(get_user_by_id, db, user_id)
+
+    # A whole handler (the function body stays synchronous)
+    @router.get("/stats")
+    @db_offload
+    def get_stats(db: Session = Depends(get_db)): ...
+
+Offloaded work runs on AnyIO worker threads gated by a dedicated capacity
+limiter of ``DB_THREADPOOL_SIZE`` tokens (default: the engine's pool size
+plus overflow). It never queues behind, or starves, the threadpool FastAPI
+uses for ``def`` handlers and sync dependencies, and it never starts more
+concurrent DB calls than there are connections to serve them. A request's
+session is only ever used by one thread at a time.
+
+``check_blocking_db_handlers(app)`` runs at startup and logs every coroutine
+handler or dependency that still touches a ``get_db``/``get_read_db``
+session outside ``run_db`` (``DB_BLOCKING_CHECK=off|warn|error``).
+"""
+
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+from functools import partial, wraps
+import ast
+import asyncio
+import inspect
+import logging
+import textwrap
+import os
+
+import anyio
+import anyio.to_thread
+from fastapi.routing import APIRoute
+
+from database import DB_POOL_SIZE, DB_MAX_OVERFLOW, get_db, get_read_db
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+THREADPOOL_SIZE = int(os.getenv("DB_THREADPOOL_SIZE", str(DB_POOL_SIZE + DB_MAX_OVERFLOW)))
+BLOCKING_CHECK = os.getenv("DB_BLOCKING_CHECK", "warn").lower()
+
+T = TypeVar("T")
+
+_limiter: Optional[anyio.CapacityLimiter] = None
+_limiter_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _get_limiter() -> anyio.CapacityLimiter:
+    global _limiter, _limiter_loop
+    loop = asyncio.get_running_loop()
+    if _limiter is None or _limiter_loop is not loop:
+        # Limiters belong to the loop that created them
+        _limiter = anyio.CapacityLimiter(THREADPOOL_SIZE)
+        _limiter_loop = loop
+    return _limiter
+
+
+async def run_db(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run blocking DB work on the DB threadpool and await its result.
+
+    Args:
+        func: Synchronous callable (query helper, service function, lambda)
+        *args, **kwargs: Passed to ``func``
+
+    Returns:
+        Whatever ``func`` returns; exceptions propagate unchanged
+    """
+    return await anyio.to_thread.run_sync(partial(func, *args, **kwargs), limiter=_get_limiter())
+
+
+def db_offload(func: Callable[..., T]) -> Callable[..., Any]:
+    """
+    Turn a synchronous handler into a coroutine that runs it via ``run_db``.
+
+    The signature is preserved, so FastAPI resolves parameters and
+    dependencies exactly as for the original function.
+    """
+    if asyncio.iscoroutinefunction(func):
+        raise TypeError(f"db_offload expects a sync function, got coroutine {func.__qualname__}")
+
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run_db(func, *args, **kwargs)
+
+    return wrapper
+
+
+def offload_stats() -> Dict[str, Any]:
+    """Current DB threadpool usage (for health endpoints)"""
+    stats = {"size": THREADPOOL_SIZE, "in_use": 0, "waiting": 0}
+    if _limiter is not None:
+        stats["in_use"] = int(_limiter.borrowed_tokens)
+        stats["waiting"] = _limiter.statistics().tasks_waiting
+    return stats
+
+
+# ——————— Startup check for blocking DB use in coroutines ———————
+
+
+def _call_name(node: ast.Call) -> Optional[str]:
+    target = node.func
+    return target.attr if isinstance(target, ast.Attribute) else getattr(target, "id", None)
+
+
+class _SessionUseFinder(ast.NodeVisitor):
+    """Collect line numbers where session names are used outside ``run_db(...)``"""
+
+    def __init__(self, names):
+        self.names = set(names)
+        self.lines: List[int] = []
+        self._offloaded = 0
+
+    def visit_Call(self, node: ast.Call) -> None:
+        if _call_name(node) == "run_db":
+            self._offloaded += 1
+            self.generic_visit(node)
+            self._offloaded -= 1
+        else:
+            self.generic_visit(node)
+
+    def visit_Await(self, node: ast.Await) -> None:
+        call = node.value
+        if not isinstance(call, ast.Call) or _call_name(call) == "run_db":
+            self.generic_visit(node)
+            return
+        # ``await helper(db)`` hands the session to another coroutine
+        # (e.g. a two_tier_cache helper that offloads); judge the helper, not the caller
+        self.visit(call.func)
+        for value in list(call.args) + [keyword.value for keyword in call.keywords]:
+            if not (isinstance(value, ast.Name) and value.id in self.names):
+                self.visit(value)
+
+    def visit_Name(self, node: ast.Name) -> None:
+        if node.id in self.names and not self._offloaded:
+            self.lines.append(node.lineno)
+
+    def visit_FunctionDef(self, node: ast.FunctionDef) -> None:
+        # Nested sync helpers are fine as long as they are called via run_db
+        pass
+
+    def visit_AsyncFunctionDef(self, node: ast.AsyncFunctionDef) -> None:
+        pass
+
+
+def _session_params(dependant) -> List[str]:
+    return [
+        sub.name
+        for sub in dependant.dependencies
+        if sub.name and getattr(sub, "call", None) in (get_db, get_read_db)
+    ]
+
+
+def _blocking_lines(call: Callable, names: List[str]) -> List[int]:
+    try:
+        source, first_line = inspect.getsourcelines(call)
+        tree = ast.parse(textwrap.dedent("".join(source)))
+    except (OSError, TypeError, SyntaxError):
+        return []
+    function = tree.body[0]
+    if not isinstance(function, ast.AsyncFunctionDef):
+        return []
+    finder = _SessionUseFinder(names)
+    for statement in function.body:
+        finder.visit(statement)
+    return sorted({first_line + line - 1 for line in finder.lines})
+
+
+def find_blocking_db_handlers(app) -> List[Dict[str, Any]]:
+    """
+    List coroutine handlers/dependencies that use a DB session on the loop.
+
+    Returns:
+        One dict per offending function: ``function``, ``file``, ``lines``, ``routes``
+    """
+    findings: Dict[Any, Dict[str, Any]] = {}
+    seen = set()
+
+    def visit(dependant, route_label: str) -> None:
+        for sub in dependant.dependencies:
+            visit(sub, route_label)
+        call = dependant.call
+        if call is None:
+            return
+        names = _session_params(dependant)
+        if not names:
+            return
+        original = inspect.unwrap(call)
+        if not asyncio.iscoroutinefunction(original):
+            return  # sync handlers run in a threadpool; db_offload wrappers unwrap to sync
+        key = (original.__module__, original.__qualname__)
+        if key not in seen:
+            seen.add(key)
+            lines = _blocking_lines(original, names)
+            if lines:
+                findings[key] = {
+                    "function": f"{original.__module__}.{original.__qualname__}",
+                    "file": inspect.getsourcefile(original),
+                    "lines": lines,
+                    "routes": [],
+                }
+        if key in findings and route_label not in findings[key]["routes"]:
+            findings[key]["routes"].append(route_label)
+
+    for route in app.routes:
+        if isinstance(route, APIRoute):
+            label = f"{','.join(sorted(route.methods or []))} {route.path}"
+            visit(route.dependant, label)
+
+    return sorted(findings.values(), key=lambda item: item["function"])
+
+
+def check_blocking_db_handlers(app) -> List[Dict[str, Any]]:
+    """
+    Log (or, with ``DB_BLOCKING_CHECK=error``, refuse to start on) blocking DB use.
+    """
+    if BLOCKING_CHECK in ("off", "0", "false", "no"):
+        return []
+    findings = find_blocking_db_handlers(app)
+    for item in findings:
+        logger.warning(
+            f"Blocking DB call in coroutine {item['function']} "
+            f"(lines {', '.join(map(str, item['lines']))}; "
+            f"{len(item['routes'])} route(s), e.g. {item['routes'][0]}). "
+            f"Use run_db() or a sync handler."
+        )
+    if findings:
+        logger.warning(f"{len(findings)} coroutine(s) block the event loop on the database")
+        if BLOCKING_CHECK == "error":
+            raise RuntimeError(
+                f"{len(findings)} coroutine handler(s) use the sync DB session on the event loop"
+            )
+    return findings
@@ -0,0 +1,318 @@
+"""
+Per-request SQL instrumentation
+
+SQLAlchemy ``before/after_cursor_execute`` hooks on every engine (primary
+and read replicas) that attribute each statement to the request running it.
+The request pipeline opens a ``QueryStats`` for every HTTP request and binds
+it to a context variable, which AnyIO copies into the threads that run sync
+handlers, dependencies and ``run_db`` calls, so queries are counted wherever
+the request executes them.
+
+For every request it records the query count, total DB time, time per
+statement shape and the slowest statements. A shape is the statement text
+with literals and expanded ``IN (...)`` lists collapsed, so the same query
+issued in a loop (N+1) always has one shape. Shapes repeated at least
+``SQL_N_PLUS_ONE_THRESHOLD`` times in one request are flagged.
+
+Results go to:
+
+- ``Server-Timing`` response header (``app`` and ``db`` durations, query count)
+- the metrics exporter (queries and DB time per request, N+1 detections per route)
+- ``sql_offenders()``: this worker's top repeated shapes and slowest statements
+  per route (``GET /v1.0/database/sql-offenders``)
+
+Outside HTTP requests (scripts, workers) wrap the code under test:
+
+    from db_instrumentation import track_queries
+
+    with track_queries() as stats:
+        get_hotels_using_ittid_list(...)
+    print(stats.count, stats.repeated())
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from datetime import datetime
+from functools import lru_cache
+import heapq
+import logging
+import os
+import re
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from metrics import LATENCY_BUCKETS, registry
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+SQL_INSTRUMENTATION = os.getenv("SQL_INSTRUMENTATION", "true").lower() not in ("0", "false", "no")
+SQL_SERVER_TIMING = os.getenv("SQL_SERVER_TIMING", "true").lower() not in ("0", "false", "no")
+N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "10"))
+SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", "500"))
+OFFENDERS_MAX = int(os.getenv("SQL_OFFENDERS_MAX", "500"))
+
+SLOWEST_PER_REQUEST = 3
+SLOWEST_OVERALL = 50
+SHAPE_MAX_LENGTH = 500
+
+_current: ContextVar[Optional["QueryStats"]] = ContextVar("sql_query_stats", default=None)
+
+_WHITESPACE = re.compile(r"\s+")
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = r"(?:\?|%s|%\(\w+\)s|:\w+)"
+_PLACEHOLDER_LIST = re.compile(rf"\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})*\s*\)")
+
+
+@lru_cache(maxsize=4096)
+def statement_shape(statement: str) -> str:
+    """Statement text with literals and placeholder lists collapsed"""
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    shape = _LITERALS.sub("?", shape)
+    shape = _PLACEHOLDER_LIST.sub("(?)", shape)
+    return shape[:SHAPE_MAX_LENGTH]
+
+
+class QueryStats:
+    """
+    SQL statements executed on behalf of one request (or ``track_queries`` block).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.started = time.perf_counter()
+        self.shapes: Dict[str, List[float]] = {}  # shape -> [count, seconds]
+        self.slowest: List[Tuple[float, str]] = []  # min-heap of (seconds, shape)
+        self._lock = threading.Lock()
+        self._token: Optional[Token] = None
+
+    def record(self, statement: str, seconds: float) -> None:
+        shape = statement_shape(statement)
+        with self._lock:
+            self.count += 1
+            self.total_seconds += seconds
+            entry = self.shapes.get(shape)
+            if entry is None:
+                self.shapes[shape] = [1, seconds]
+            else:
+                entry[0] += 1
+                entry[1] += seconds
+            if len(self.slowest) < SLOWEST_PER_REQUEST:
+                heapq.heappush(self.slowest, (seconds, shape))
+            elif seconds > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, (seconds, shape))
+
+    def repeated(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> List[Dict[str, Any]]:
+        """Shapes executed at least ``threshold`` times (likely N+1 loops)"""
+        with self._lock:
+            items = [(shape, entry[0], entry[1]) for shape, entry in self.shapes.items() if entry[0] >= threshold]
+        items.sort(key=lambda item: item[1], reverse=True)
+        return [
+            {"shape": shape, "count": int(count), "total_ms": round(seconds * 1000, 2)}
+            for shape, count, seconds in items
+        ]
+
+    def server_timing(self) -> str:
+        """``Server-Timing`` header value (durations so far)"""
+        app_ms = (time.perf_counter() - self.started) * 1000
+        return (
+            f'app;dur={app_ms:.1f}, '
+            f'db;dur={self.total_seconds * 1000:.1f};desc="{self.count} queries"'
+        )
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "queries": self.count,
+            "db_ms": round(self.total_seconds * 1000, 2),
+            "slowest": [
+                {"shape": shape, "ms": round(seconds * 1000, 2)}
+                for seconds, shape in sorted(self.slowest, reverse=True)
+            ],
+            "repeated": self.repeated(),
+        }
+
+
+# ——————— Engine hooks ———————
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and _current.get() is not None:
+        context._query_started = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_query_started", None)
+    if started is None:
+        return
+    stats = _current.get()
+    if stats is not None:
+        stats.record(statement, time.perf_counter() - started)
+
+
+# ——————— Request binding ———————
+
+
+def start_query_stats() -> Optional[QueryStats]:
+    """Start counting queries for the current request (None when disabled)"""
+    if not SQL_INSTRUMENTATION:
+        return None
+    stats = QueryStats()
+    stats._token = _current.set(stats)
+    return stats
+
+
+def finish_query_stats(stats: QueryStats, route: str) -> None:
+    """Unbind ``stats`` and record it in the metrics and the offender log"""
+    if stats._token is not None:
+        _current.reset(stats._token)
+        stats._token = None
+    db_queries_per_request.observe(stats.count, route)
+    db_time_per_request.observe(stats.total_seconds, route)
+    repeated = stats.repeated()
+    if repeated:
+        n_plus_one_requests.inc(route)
+    offenders.record(route, stats, repeated)
+
+
+@contextmanager
+def track_queries():
+    """Count the queries of a code block (scripts, tests, background jobs)"""
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    return _current.get()
+
+
+# ——————— Offender log ———————
+
+
+class OffenderLog:
+    """
+    Per-process record of repeated statement shapes and slow statements by route.
+    """
+
+    def __init__(self, max_entries: int = OFFENDERS_MAX):
+        self.max_entries = max_entries
+        self._repeated: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self._slowest: List[Tuple[float, str, str, str]] = []  # min-heap of (seconds, shape, route, at)
+        self._routes: Dict[str, List[float]] = {}  # route -> [requests, queries, seconds, max queries]
+        self._lock = threading.Lock()
+
+    def record(self, route: str, stats: QueryStats, repeated: List[Dict[str, Any]]) -> None:
+        now = datetime.utcnow().isoformat()
+        with self._lock:
+            totals = self._routes.setdefault(route, [0, 0, 0.0, 0])
+            totals[0] += 1
+            totals[1] += stats.count
+            totals[2] += stats.total_seconds
+            totals[3] = max(totals[3], stats.count)
+
+            for item in repeated:
+                key = (route, item["shape"])
+                entry = self._repeated.get(key)
+                if entry is None:
+                    logger.warning(
+                        f"Possible N+1 on {route}: {item['count']}x {item['shape'][:200]}"
+                    )
+                    entry = self._repeated[key] = {
+                        "route": route,
+                        "shape": item["shape"],
+                        "requests": 0,
+                        "executions": 0,
+                        "max_per_request": 0,
+                        "total_ms": 0.0,
+                    }
+                    while len(self._repeated) > self.max_entries:
+                        self._repeated.popitem(last=False)
+                else:
+                    self._repeated.move_to_end(key)
+                entry["requests"] += 1
+                entry["executions"] += item["count"]
+                entry["max_per_request"] = max(entry["max_per_request"], item["count"])
+                entry["total_ms"] += item["total_ms"]
+                entry["last_seen"] = now
+
+            for seconds, shape in stats.slowest:
+                if seconds * 1000 >= SLOW_QUERY_MS:
+                    logger.warning(f"Slow query on {route} ({seconds * 1000:.0f} ms): {shape[:200]}")
+                row = (seconds, shape, route, now)
+                if len(self._slowest) < SLOWEST_OVERALL:
+                    heapq.heappush(self._slowest, row)
+                elif seconds > self._slowest[0][0]:
+                    heapq.heapreplace(self._slowest, row)
+
+    def top(self, limit: int = 20) -> Dict[str, Any]:
+        with self._lock:
+            repeated = sorted(
+                (dict(entry, total_ms=round(entry["total_ms"], 2)) for entry in self._repeated.values()),
+                key=lambda entry: entry["executions"],
+                reverse=True,
+            )[:limit]
+            slowest = [
+                {"route": route, "shape": shape, "ms": round(seconds * 1000, 2), "at": at}
+                for seconds, shape, route, at in sorted(self._slowest, reverse=True)[:limit]
+            ]
+            routes = sorted(
+                (
+                    {
+                        "route": route,
+                        "requests": int(requests),
+                        "avg_queries": round(queries / requests, 1),
+                        "max_queries": int(max_queries),
+                        "avg_db_ms": round(seconds / requests * 1000, 2),
+                    }
+                    for route, (requests, queries, seconds, max_queries) in self._routes.items()
+                ),
+                key=lambda entry: entry["avg_queries"],
+                reverse=True,
+            )[:limit]
+        return {"n_plus_one": repeated, "slowest_statements": slowest, "routes_by_queries": routes}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._repeated.clear()
+            self._slowest.clear()
+            self._routes.clear()
+
+
+offenders = OffenderLog()
+
+
+def sql_offenders(limit: int = 20) -> Dict[str, Any]:
+    """Top N+1 shapes, slowest statements and query-heavy routes of this worker"""
+    return {
+        "pid": os.getpid(),
+        "n_plus_one_threshold": N_PLUS_ONE_THRESHOLD,
+        "slow_query_ms": SLOW_QUERY_MS,
+        **offenders.top(limit),
+    }
+
+
+# ——————— Metrics ———————
+
+db_queries_per_request = registry.histogram(
+    "hita_db_queries_per_request",
+    "SQL statements executed per HTTP request",
+    ["route"],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 250, 500, 1000),
+)
+db_time_per_request = registry.histogram(
+    "hita_db_time_per_request_seconds", "Total SQL time per HTTP request", ["route"], buckets=LATENCY_BUCKETS
+)
+n_plus_one_requests = registry.counter(
+    "hita_db_n_plus_one_requests_total", "Requests repeating one statement shape past the N+1 threshold", ["route"]
+)
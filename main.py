@@ -2,7 +2,7 @@ from database import engine
 import os
 import models
 import logging
-from custom_openapi import custom_openapi
+from custom_openapi import load_openapi_schema
 
 # Fastapi Base
 from fastapi import FastAPI, Request
@@ -13,7 +13,7 @@ from fastapi.exception_handlers import RequestValidationError
 # New imports for caching
 from fastapi_cache import FastAPICache
 from fastapi_cache.backends.redis import RedisBackend
-import redis.asyncio as aioredis
+from redis_pool import get_async_redis, close_async_redis
 
 # Import error handlers
 from error_handlers import register_error_handlers
@@ -27,7 +27,7 @@ from routes.contents import router as contents_router
 from routes.permissions import router as permissions_router
 from routes.delete import router as delete_router
 from routes.mapping import router as mapping_router
-from routes.health import router as health_router
+from routes.health import router as health_router, prometheus_router
 from routes.cache_management import router as cache_router
 from routes.cached_user_routes import router as cache_users_router
 from routes.audit_dashboard import router as audit_router
@@ -45,6 +45,7 @@ from routes.hotelRawDataCollectionFromSupplier import (
 )
 from routes.locations import router as locations_router
 from routes.database_health import router as db_health_router
+from routes.profiler import router as profiler_router
 from routes.analytics import (
     router as analytics_router,
     dashboard_router as analytics_dashboard_router,
@@ -55,29 +56,16 @@ from routes.setting import router as setting_router
 
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from security.middleware import create_security_middleware_stack
-from middleware.ip_middleware import IPAddressMiddleware
-from middleware.api_logging import create_api_logging_middleware
-from middleware.auth_middleware import AuthenticationMiddleware
+from middleware.pipeline import install_request_pipeline
+from middleware.path_alias import PathAliasMiddleware
 
 app = FastAPI()
 
-create_security_middleware_stack(app)
+# Restrict Host headers when ALLOWED_HOSTS is set (comma separated)
+allowed_hosts = [h.strip() for h in os.getenv("ALLOWED_HOSTS", "*").split(",") if h.strip()]
+if allowed_hosts and "*" not in allowed_hosts:
+    app.add_middleware(TrustedHostMiddleware, allowed_hosts=allowed_hosts)
 
-# Add IP address middleware to properly extract client IPs
-app.add_middleware(
-    IPAddressMiddleware,
-    trusted_proxies=["127.0.0.1", "::1", "192.168.0.0/16", "10.0.0.0/8"],
-)
-
-# Add trusted host middleware to handle proxy headers
-app.add_middleware(
-    TrustedHostMiddleware,
-    allowed_hosts=["*"],  # Configure this based on your deployment
-)
-
-
-# Add CORS middleware first (runs last)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -91,64 +79,74 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Add trusted host middleware
-app.add_middleware(
-    TrustedHostMiddleware,
-    allowed_hosts=["*"],  # Configure this based on your deployment
-)
-
-# Add IP address middleware to properly extract client IPs
-app.add_middleware(
-    IPAddressMiddleware,
-    trusted_proxies=["127.0.0.1", "::1", "192.168.0.0/16", "10.0.0.0/8"],
-)
-
-# Add API logging middleware BEFORE security middleware
-# This ensures security middleware runs first, then logging can access request.state.user
-app.add_middleware(
-    create_api_logging_middleware(
-        enhanced=True,  # Use enhanced logging with detailed metrics
-        exclude_paths=[
-            "/docs",
-            "/redoc",
-            "/openapi.json",
-            "/favicon.ico",
-            "/health",
-            "/metrics",
-            "/static",
-        ],
-        log_request_body=False,  # Set to True if you want to log request bodies
-        log_response_body=False,  # Set to True if you want to log response bodies
-        max_body_size=1024,  # Maximum body size to log in bytes
-    )
+# Request pipeline added LAST (so it runs FIRST): client IP, security checks,
+# rate limiting, body validation, security headers and API access logging
+install_request_pipeline(
+    app,
+    exclude_paths=[
+        "/docs",
+        "/redoc",
+        "/openapi.json",
+        "/favicon.ico",
+        "/health",
+        "/metrics",
+        "/static",
+    ],
+    log_request_body=False,  # Set to True if you want to log request bodies
+    log_response_body=False,  # Set to True if you want to log response bodies
+    max_body_size=1024,  # Maximum body size to log in bytes
 )
 
-# Add authentication middleware BEFORE API logging
-# This extracts user from JWT token and sets request.state.user
-app.add_middleware(AuthenticationMiddleware)
-
-# Add security middleware LAST (so it runs FIRST)
-# This ensures authentication happens before logging tries to read request.state.user
-create_security_middleware_stack(app)
+# Outermost: serve /api/... from the same routes as the bare paths
+app.add_middleware(PathAliasMiddleware, prefixes=["/api"])
 
 
 # ——————— Initialize Redis cache and Export Worker on startup ———————
 @app.on_event("startup")
 async def startup():
-    # Create Redis connection (adjust URL if needed)
+    # Reuse the shared async Redis pool (short timeouts, same host settings)
     # Note: decode_responses should be False for fastapi-cache2 to work properly
-    redis = aioredis.from_url(
-        "redis://localhost", encoding="utf8", decode_responses=False
-    )
+    redis = get_async_redis(decode_responses=False).client
     # Initialize FastAPI-Cache with a prefix
     FastAPICache.init(RedisBackend(redis), prefix="fastapi-cache")
 
-    # Initialize dedicated export worker
-    from services.export_worker import get_export_worker
+    # Initialize dedicated export worker (consumes the durable export queue
+    # in-process unless EXPORT_WORKER_MODE=external)
+    from services.export_worker import start_export_worker
 
-    worker = get_export_worker()
+    start_export_worker()
     logger.info("Export worker initialized")
 
+    # Keep the audit/activity rollups current
+    from services.activity_rollup_service import start_activity_rollup_worker
+
+    start_activity_rollup_worker()
+
+    # Write-behind point metering for per-request deductions
+    from services.point_meter_service import start_point_meter
+
+    start_point_meter()
+
+    # Remove cache keys orphaned by generation bumps
+    from cache_config import start_cache_sweeper
+
+    start_cache_sweeper()
+
+    # Cross-worker invalidation of in-process caches
+    from cache_bus import start_invalidation_listener
+
+    start_invalidation_listener()
+
+    # Flag coroutine handlers that still run sync DB queries on the event loop
+    from db_async import check_blocking_db_handlers
+
+    check_blocking_db_handlers(app)
+
+    # Per-worker metrics snapshots for the /metrics scrape endpoint
+    from metrics import start_metrics
+
+    start_metrics()
+
 
 @app.on_event("shutdown")
 async def shutdown():
@@ -158,6 +156,32 @@ async def shutdown():
     shutdown_export_worker()
     logger.info("Export worker shutdown complete")
 
+    from services.activity_rollup_service import stop_activity_rollup_worker
+
+    stop_activity_rollup_worker()
+
+    from services.point_meter_service import stop_point_meter
+
+    stop_point_meter()
+
+    from cache_config import stop_cache_sweeper
+
+    stop_cache_sweeper()
+
+    from cache_bus import stop_invalidation_listener
+
+    stop_invalidation_listener()
+
+    from middleware.pipeline import flush_access_logs
+
+    await flush_access_logs()
+
+    from metrics import stop_metrics
+
+    stop_metrics()
+
+    await close_async_redis()
+
 
 # ————————————————————————————————————————————————
 
@@ -207,26 +231,7 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     return JSONResponse(status_code=422, content={"detail": serializable_errors})
 
 
-app.include_router(auth_router, prefix="/api")
-app.include_router(users_router, prefix="/api")
-app.include_router(hotels_demo_router, prefix="/api")
-app.include_router(hotels_router, prefix="/api")
-app.include_router(contents_router, prefix="/api")
-app.include_router(permissions_router, prefix="/api")
-app.include_router(delete_router, prefix="/api")
-app.include_router(mapping_router, prefix="/api")
-app.include_router(health_router, prefix="/api")
-app.include_router(cache_router, prefix="/api")
-app.include_router(cache_users_router, prefix="/api")
-app.include_router(audit_router, prefix="/api")
-app.include_router(dashboard_router, prefix="/api")
-app.include_router(export_router, prefix="/api")
-app.include_router(export_jobs_router, prefix="/api")
-app.include_router(notifications_router, prefix="/api")
-app.include_router(blog_router, prefix="/api")
-app.include_router(free_trial_router, prefix="/api")
-
-# Also include without /api prefix for backward compatibility
+# Each router is registered once; /api/... is served via PathAliasMiddleware
 app.include_router(auth_router)
 app.include_router(users_router)
 app.include_router(hotels_demo_router)
@@ -236,6 +241,7 @@ app.include_router(permissions_router)
 app.include_router(delete_router)
 app.include_router(mapping_router)
 app.include_router(health_router)
+app.include_router(prometheus_router)
 app.include_router(cache_router)
 app.include_router(cache_users_router)
 app.include_router(audit_router)
@@ -245,25 +251,12 @@ app.include_router(export_jobs_router)
 app.include_router(notifications_router)
 app.include_router(blog_router)
 app.include_router(free_trial_router)
-
-
-app.include_router(raw_content_data, prefix="/api")
-app.include_router(hotel_formatting_data, prefix="/api")
-app.include_router(hotel_row_data_collection, prefix="/api")
-app.include_router(locations_router, prefix="/api")
-app.include_router(db_health_router, prefix="/api")
-app.include_router(analytics_router, prefix="/api")
-app.include_router(analytics_dashboard_router, prefix="/api")
-app.include_router(ml_mapping_router, prefix="/api")
-app.include_router(api_logging_management_router, prefix="/api")
-app.include_router(setting_router, prefix="/api")
-
-# Also include without /api prefix for backward compatibility
 app.include_router(raw_content_data)
 app.include_router(hotel_formatting_data)
 app.include_router(hotel_row_data_collection)
 app.include_router(locations_router)
 app.include_router(db_health_router)
+app.include_router(profiler_router)
 app.include_router(analytics_router)
 app.include_router(analytics_dashboard_router)
 app.include_router(ml_mapping_router)
@@ -287,5 +280,5 @@ async def custom_swagger_ui_html():
     return create_custom_swagger_ui_response(app)
 
 
-# Apply the custom OpenAPI schema
-app.openapi = lambda: custom_openapi(app)
+# Apply the custom OpenAPI schema (precomputed file when available, see custom_openapi.py)
+app.openapi = lambda: load_openapi_schema(app)
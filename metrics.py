@@ -0,0 +1,564 @@
+"""
+Prometheus metrics
+
+Counters, gauges and fixed-bucket histograms for every uvicorn worker,
+aggregated across workers and exposed in the Prometheus text format
+(``GET /metrics``):
+
+    from metrics import registry
+
+    jobs = registry.counter("hita_jobs_total", "Jobs processed", ["kind"])
+    jobs.inc("export")
+
+Recording is in-process and cheap: each metric has its own small lock, and a
+histogram observation is one bisect plus two additions. A background thread
+writes a snapshot of the worker's metrics to ``METRICS_DIR/worker-<pid>.json``
+every ``METRICS_FLUSH_SECONDS``; a scrape (in any worker) merges the live
+state of its own process with the other workers' files:
+
+- counters and histograms are summed over all workers, including ones that
+  have exited, so totals only drop when a dead worker's file expires after
+  ``METRICS_DEAD_WORKER_SECONDS`` (Prometheus treats that as a counter reset)
+- gauges are summed (or max'ed) over live workers only
+
+Gauges that describe shared state (DB pool, export workers, caches, Redis
+breaker) are filled in by collector callbacks right before each snapshot.
+Request latency is recorded by the request pipeline per route template, so
+``route_latency_summary()`` can report real p50/p95/p99 per route.
+"""
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from bisect import bisect_left
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() not in ("0", "false", "no")
+METRICS_DIR = os.getenv("METRICS_DIR", os.path.join(tempfile.gettempdir(), "hita_metrics"))
+FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "1"))
+DEAD_WORKER_SECONDS = float(os.getenv("METRICS_DEAD_WORKER_SECONDS", "3600"))
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+# Scrapers allowed without the token (comma-separated addresses or CIDR ranges)
+METRICS_ALLOWED_IPS = os.getenv("METRICS_ALLOWED_IPS", "")
+
+# Request latency buckets in seconds (upper bounds; +Inf is implicit)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+LabelValues = Tuple[str, ...]
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series: Dict[LabelValues, Any] = {}
+
+    def _key(self, labelvalues: Iterable[Any]) -> LabelValues:
+        key = tuple(str(value) for value in labelvalues)
+        if len(key) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+        return key
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            series = [[list(key), self._copy(value)] for key, value in self._series.items()]
+        return {
+            "type": self.kind,
+            "help": self.documentation,
+            "labels": list(self.labelnames),
+            "series": series,
+            **self._meta(),
+        }
+
+    def _copy(self, value: Any) -> Any:
+        return value
+
+    def _meta(self) -> Dict[str, Any]:
+        return {}
+
+
+class Counter(_Metric):
+    """Monotonic counter"""
+
+    kind = "counter"
+
+    def inc(self, *labelvalues: Any, amount: float = 1.0) -> None:
+        key = self._key(labelvalues)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    """
+    Point-in-time value.
+
+    ``mode`` decides how workers are combined: ``sum`` or ``max`` over live
+    workers.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), mode: str = "sum"):
+        super().__init__(name, documentation, labelnames)
+        self.mode = mode
+
+    def set(self, value: float, *labelvalues: Any) -> None:
+        key = self._key(labelvalues)
+        with self._lock:
+            self._series[key] = float(value)
+
+    def _meta(self) -> Dict[str, Any]:
+        return {"mode": self.mode}
+
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram (per series: bucket counts, sum, count)"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labelvalues: Any) -> None:
+        key = self._key(labelvalues)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._series.get(key)
+            if state is None:
+                # [counts per bucket incl. +Inf, sum]
+                state = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def _copy(self, value: Any) -> Any:
+        return [list(value[0]), value[1]]
+
+    def _meta(self) -> Dict[str, Any]:
+        return {"buckets": list(self.buckets)}
+
+
+class MetricsRegistry:
+    """
+    Metrics of one worker plus the file-based aggregation across workers.
+    """
+
+    def __init__(self, directory: str = METRICS_DIR, flush_seconds: float = FLUSH_SECONDS):
+        self.directory = directory
+        self.flush_seconds = flush_seconds
+        self.pid = os.getpid()
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------ definition
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (), mode: str = "sum") -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames, mode=mode))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets=buckets))
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """Call ``collector()`` (which sets gauges) before every snapshot"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def _register(self, metric: _Metric) -> Any:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"Metric {metric.name} already registered differently")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    # ------------------------------------------------------------- snapshots
+
+    def snapshot(self) -> Dict[str, Any]:
+        """This worker's metrics (collectors run first)"""
+        with self._lock:
+            collectors = list(self._collectors)
+            metrics = list(self._metrics.values())
+        for collector in collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.debug(f"Metrics collector {getattr(collector, '__name__', collector)} failed: {e}")
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def flush(self) -> None:
+        """Write this worker's snapshot file (atomic rename)"""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._worker_file(self.pid)
+            tmp_path = f"{path}.tmp"
+            payload = {"pid": self.pid, "updated_at": time.time(), "metrics": self.snapshot()}
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(payload, f, separators=(",", ":"))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write metrics snapshot: {e}")
+
+    def aggregate(self) -> Dict[str, Any]:
+        """Metrics merged over all workers (live state for this process)"""
+        merged: Dict[str, Any] = {}
+        self._merge(merged, self.snapshot(), live=True)
+        for pid, payload in self._other_workers():
+            self._merge(merged, payload["metrics"], live=payload["live"])
+        return merged
+
+    def _other_workers(self) -> List[Tuple[int, Dict[str, Any]]]:
+        workers = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return workers
+        now = time.time()
+        for name in names:
+            if not (name.startswith("worker-") and name.endswith(".json")):
+                continue
+            try:
+                pid = int(name[len("worker-"):-len(".json")])
+            except ValueError:
+                continue
+            if pid == self.pid:
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    payload = json.load(f)
+            except (OSError, ValueError):
+                continue
+            age = now - float(payload.get("updated_at", 0))
+            live = _pid_alive(pid) and age < max(10 * self.flush_seconds, 30)
+            if not live and age > DEAD_WORKER_SECONDS:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            payload["live"] = live
+            workers.append((pid, payload))
+        return workers
+
+    @staticmethod
+    def _merge(merged: Dict[str, Any], metrics: Dict[str, Any], live: bool) -> None:
+        for name, metric in metrics.items():
+            kind = metric["type"]
+            if kind == "gauge" and not live:
+                continue
+            target = merged.get(name)
+            if target is None:
+                target = merged[name] = {**metric, "series": {}}
+            series = target["series"]
+            for labelvalues, value in metric["series"]:
+                key = tuple(labelvalues)
+                current = series.get(key)
+                if kind == "histogram":
+                    if current is None:
+                        series[key] = [list(value[0]), value[1]]
+                    elif len(current[0]) == len(value[0]):
+                        current[0] = [a + b for a, b in zip(current[0], value[0])]
+                        current[1] += value[1]
+                elif current is None:
+                    series[key] = value
+                elif kind == "gauge" and metric.get("mode") == "max":
+                    series[key] = max(current, value)
+                else:
+                    series[key] = current + value
+
+    def _worker_file(self, pid: int) -> str:
+        return os.path.join(self.directory, f"worker-{pid}.json")
+
+    # ------------------------------------------------------------- lifecycle
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        # Workers are forked after import; identify by the running process
+        self.pid = os.getpid()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="metrics_flusher", daemon=True)
+        self._thread.start()
+        logger.info(f"Metrics flusher started ({self.directory}, every {self.flush_seconds:g}s)")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.flush_seconds):
+            self.flush()
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# ——————— Exposition ———————
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def render_prometheus(merged: Optional[Dict[str, Any]] = None) -> str:
+    """Prometheus text exposition format (version 0.0.4)"""
+    merged = collect_metrics() if merged is None else merged
+    lines: List[str] = []
+    for name in sorted(merged):
+        metric = merged[name]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        labelnames = metric["labels"]
+        for labelvalues in sorted(metric["series"]):
+            value = metric["series"][labelvalues]
+            if metric["type"] != "histogram":
+                lines.append(f"{name}{_labels(labelnames, labelvalues)} {_format_value(value)}")
+                continue
+            counts, total = value
+            cumulative = 0
+            for bound, count in zip(list(metric["buckets"]) + [math.inf], counts):
+                cumulative += count
+                le = ("le", _format_value(bound))
+                lines.append(f"{name}_bucket{_labels(labelnames, labelvalues, le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labelnames, labelvalues)} {_format_value(total)}")
+            lines.append(f"{name}_count{_labels(labelnames, labelvalues)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def histogram_quantile(q: float, buckets: Sequence[float], counts: Sequence[int]) -> Optional[float]:
+    """
+    Estimate a quantile from bucket counts (linear within the bucket, as
+    PromQL's ``histogram_quantile``). Returns None without observations.
+    """
+    total = sum(counts)
+    if total == 0:
+        return None
+    rank = q * total
+    cumulative = 0
+    for index, count in enumerate(counts):
+        previous = cumulative
+        cumulative += count
+        if cumulative >= rank and count:
+            if index >= len(buckets):
+                return buckets[-1]  # +Inf bucket: highest finite bound
+            lower = buckets[index - 1] if index > 0 else 0.0
+            return lower + (buckets[index] - lower) * (rank - previous) / count
+    return buckets[-1]
+
+
+# ——————— Application metrics ———————
+
+registry = MetricsRegistry()
+
+http_requests = registry.counter(
+    "hita_http_requests_total", "HTTP requests by route template and status", ["method", "route", "status"]
+)
+http_request_duration = registry.histogram(
+    "hita_http_request_duration_seconds", "HTTP request latency by route template", ["method", "route"]
+)
+
+
+def observe_request(method: str, route: Optional[str], status_code: int, seconds: float) -> None:
+    """Record one finished HTTP request"""
+    if not METRICS_ENABLED:
+        return
+    route = route or UNMATCHED_ROUTE
+    http_requests.inc(method, route, status_code)
+    http_request_duration.observe(seconds, method, route)
+
+
+def route_latency_summary(merged: Optional[Dict[str, Any]] = None, limit: int = 50) -> Dict[str, Any]:
+    """
+    Request counts, error rates (5xx) and p50/p95/p99 latency (ms) per
+    route, merged over all workers.
+    """
+    merged = registry.aggregate() if merged is None else merged
+    duration = merged.get(http_request_duration.name)
+    requests = merged.get(http_requests.name)
+    if not duration:
+        return {"total_requests": 0, "error_rate_percent": 0.0, "latency_ms": {}, "routes": []}
+
+    buckets = duration["buckets"]
+    errors: Dict[Tuple[str, str], float] = {}
+    for (method, route, status_code), count in (requests or {}).get("series", {}).items():
+        if str(status_code).startswith("5"):
+            errors[(method, route)] = errors.get((method, route), 0) + count
+
+    def quantiles(counts: Sequence[int]) -> Dict[str, Optional[float]]:
+        result = {}
+        for label, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+            value = histogram_quantile(q, buckets, counts)
+            result[label] = round(value * 1000, 2) if value is not None else None
+        return result
+
+    overall = [0] * (len(buckets) + 1)
+    routes = []
+    for (method, route), (counts, total_seconds) in duration["series"].items():
+        count = sum(counts)
+        overall = [a + b for a, b in zip(overall, counts)]
+        routes.append(
+            {
+                "method": method,
+                "route": route,
+                "requests": count,
+                "error_rate_percent": round(errors.get((method, route), 0) / count * 100, 2) if count else 0.0,
+                "avg_ms": round(total_seconds / count * 1000, 2) if count else None,
+                **quantiles(counts),
+            }
+        )
+    routes.sort(key=lambda item: item["requests"], reverse=True)
+    total_requests = sum(overall)
+    return {
+        "total_requests": total_requests,
+        "error_rate_percent": round(sum(errors.values()) / total_requests * 100, 2) if total_requests else 0.0,
+        "latency_ms": quantiles(overall),
+        "routes": routes[:limit],
+    }
+
+
+db_pool = registry.gauge("hita_db_pool_connections", "DB connection pool usage", ["engine", "state"])
+db_threadpool = registry.gauge("hita_db_threadpool_tasks", "DB threadpool tasks", ["state"])
+export_slots = registry.gauge("hita_export_worker_slots", "Export worker slots", ["state"])
+export_queue = registry.gauge("hita_export_queue_jobs", "Jobs in the durable export queue", ["state"], mode="max")
+cache_lookups = registry.gauge(
+    "hita_cache_lookups", "Two-tier cache lookups since worker start (live workers)", ["result"]
+)
+cache_hit_ratio = registry.gauge("hita_cache_hit_ratio", "Two-tier cache hit ratio (live workers)")
+redis_breaker_open = registry.gauge(
+    "hita_redis_breaker_open", "1 while the Redis circuit breaker is open", mode="max"
+)
+
+
+def _collect_db_pool() -> None:
+    from database import engine, replica_router
+    from db_async import offload_stats
+
+    pool = engine.pool
+    db_pool.set(pool.checkedout(), "primary", "checked_out")
+    db_pool.set(pool.checkedin(), "primary", "checked_in")
+    # QueuePool reports overflow as negative until pool_size is exhausted
+    db_pool.set(max(pool.overflow(), 0), "primary", "overflow")
+    for replica in replica_router.replicas:
+        db_pool.set(replica.engine.pool.checkedout(), replica.name, "checked_out")
+        db_pool.set(replica.engine.pool.checkedin(), replica.name, "checked_in")
+
+    threadpool = offload_stats()
+    db_threadpool.set(threadpool["in_use"], "in_use")
+    db_threadpool.set(threadpool["waiting"], "waiting")
+
+
+def _collect_export_worker() -> None:
+    from services import export_worker
+
+    # Only report a worker this process already started
+    worker = export_worker._export_worker
+    if worker is not None and worker.consuming:
+        status = worker.get_worker_status()
+        export_slots.set(status["active_jobs"], "active")
+        export_slots.set(status["available_slots"], "available")
+        export_queue.set(status["queue"]["pending"], "pending")
+        export_queue.set(status["queue"]["processing"], "processing")
+
+
+def _collect_cache() -> None:
+    from tiered_cache import tiered_cache
+    from redis_pool import _shared_breaker
+
+    stats = tiered_cache.stats()
+    cache_lookups.set(stats["l1_hits"], "l1_hit")
+    cache_lookups.set(stats["l2_hits"], "l2_hit")
+    cache_lookups.set(stats["misses"], "miss")
+    redis_breaker_open.set(1 if _shared_breaker.state == "open" else 0)
+
+
+for _collector in (_collect_db_pool, _collect_export_worker, _collect_cache):
+    registry.add_collector(_collector)
+
+
+def _with_cache_hit_ratio(merged: Dict[str, Any]) -> Dict[str, Any]:
+    # The ratio of summed lookups, not a sum (or mean) of per-worker ratios
+    lookups = merged.get(cache_lookups.name, {}).get("series", {})
+    hits = lookups.get(("l1_hit",), 0) + lookups.get(("l2_hit",), 0)
+    total = hits + lookups.get(("miss",), 0)
+    if total:
+        ratio = merged.setdefault(cache_hit_ratio.name, {**cache_hit_ratio.snapshot(), "series": {}})
+        ratio["series"] = {(): hits / total}
+    return merged
+
+
+def collect_metrics() -> Dict[str, Any]:
+    """All metrics merged over workers, including derived gauges"""
+    return _with_cache_hit_ratio(registry.aggregate())
+
+
+def start_metrics() -> Optional[MetricsRegistry]:
+    """Start the snapshot flusher unless METRICS_ENABLED=false"""
+    if not METRICS_ENABLED:
+        logger.info("Metrics disabled")
+        return None
+    registry.start()
+    return registry
+
+
+def stop_metrics() -> None:
+    """Stop the flusher and write a final snapshot"""
+    if METRICS_ENABLED:
+        registry.stop()
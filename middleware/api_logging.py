@@ -1,419 +1,175 @@
 """
-API Logging Middleware for comprehensive user activity tracking
+API access logging for comprehensive user activity tracking
 
-This middleware automatically logs all API requests to track user activity,
-endpoint usage, and system interactions for the user activity dashboard.
+The request pipeline (``middleware/pipeline.py``) hands every finished
+request to ``APIAccessLogger``, which writes one audit entry per request to
+track user activity, endpoint usage and system interactions for the user
+activity dashboard. The write happens after the response has been sent, on
+the DB threadpool, with its own short-lived session.
 
-Uses APILoggingConfig to determine which endpoints should be counted in usage logs.
+AuditLogger applies APILoggingConfig to decide which endpoints are counted in
+usage logs.
 """
 
-import time
-import json
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response as StarletteResponse
-from sqlalchemy.orm import Session
-from database import get_db
+from fastapi import Request
+import json
+import logging
+
+from database import SessionLocal
 from security.audit_logging import AuditLogger, ActivityType, SecurityLevel
+from middleware.auth_middleware import load_active_user, token_user_id
 from utils.api_logging_config import api_logging_config
-import models
-
-
-class APILoggingMiddleware(BaseHTTPMiddleware):
-    """Middleware to log all API requests for user activity tracking"""
-
-    def __init__(self, app, exclude_paths: Optional[list] = None):
-        super().__init__(app)
-        # Keep basic exclude paths for system endpoints
-        self.exclude_paths = exclude_paths or [
-            "/docs",
-            "/redoc",
-            "/openapi.json",
-            "/favicon.ico",
-            "/static",
-        ]
-
-    async def dispatch(self, request: Request, call_next):
-        # Skip logging for basic system paths
-        if any(request.url.path.startswith(path) for path in self.exclude_paths):
-            return await call_next(request)
-
-        # Check if this endpoint should be counted using our configuration
-        endpoint_path = request.url.path
-        should_count = api_logging_config.should_count_endpoint(endpoint_path)
-        should_exclude = api_logging_config.should_exclude_endpoint(endpoint_path)
-
-        # DEBUG: Print middleware execution with config info
-        print(
-            f"🔍 API LOGGING: {request.method} {endpoint_path} | Count: {should_count} | Exclude: {should_exclude}"
-        )
-
-        # If endpoint is explicitly excluded, skip detailed logging
-        if should_exclude:
-            print(f"⏭️ SKIPPING LOG: {endpoint_path} is in exclude list")
-            return await call_next(request)
-
-        # Record start time
-        start_time = time.time()
-
-        # Extract user information if available
-        user_id = None
-        user_email = None
-
-        # Try to get user from request state (set by auth middleware)
-        if hasattr(request.state, "user") and request.state.user:
-            user_id = request.state.user.id
-            user_email = request.state.user.email
-            print(f"👤 API LOGGING: Found user {user_id} ({user_email})")
-        else:
-            print(
-                f"❌ API LOGGING: No user found in request.state for {request.url.path}"
-            )
-
-        # Process the request
-        response = await call_next(request)
-
-        # Calculate processing time
-        process_time = time.time() - start_time
-
-        print(f"📝 API LOGGING: Logging request for user {user_id}")
-
-        # Log the API access
-        await self._log_api_access(
-            request=request,
-            response=response,
-            user_id=user_id,
-            user_email=user_email,
-            process_time=process_time,
-        )
-
-        print(f"✅ API LOGGING: Completed logging for {request.url.path}")
-        return response
-
-    async def _log_api_access(
-        self,
-        request: Request,
-        response: StarletteResponse,
-        user_id: Optional[str],
-        user_email: Optional[str],
-        process_time: float,
-    ):
-        """Log API access to the database"""
-
-        try:
-            # Check if this endpoint should be counted
-            endpoint_path = request.url.path
-            should_count = api_logging_config.should_count_endpoint(endpoint_path)
-
-            # If endpoint should not be counted, skip logging
-            if not should_count:
-                print(f"⏭️ SKIP LOGGING: {endpoint_path} not in count list")
-                return
-
-            # Get database session
-            db_gen = get_db()
-            db: Session = next(db_gen)
-
-            try:
-                audit_logger = AuditLogger(db)
-
-                # Extract request details
-                method = request.method
-                endpoint = request.url.path
-                query_params = (
-                    dict(request.query_params) if request.query_params else {}
-                )
-                status_code = response.status_code
-
-                # Determine if this was a successful request
-                is_success = 200 <= status_code < 400
-
-                # Prepare activity details
-                details = {
-                    "endpoint": endpoint,
-                    "method": method,
-                    "status_code": status_code,
-                    "process_time_ms": round(process_time * 1000, 2),
-                    "query_params": query_params,
-                    "user_email": user_email,
-                    "timestamp": datetime.utcnow().isoformat(),
-                    "counted_in_usage": True,  # Mark that this was counted
-                }
-
-                # Add request body size if available
-                if hasattr(request, "content_length") and request.content_length:
-                    details["request_size_bytes"] = request.content_length
-
-                # Add response size if available
-                if hasattr(response, "content_length") and response.content_length:
-                    details["response_size_bytes"] = response.content_length
-
-                # Determine security level based on endpoint and status
-                security_level = SecurityLevel.LOW
-                if status_code >= 400:
-                    security_level = SecurityLevel.MEDIUM
-                if status_code >= 500:
-                    security_level = SecurityLevel.HIGH
-
-                # Special handling for sensitive endpoints
-                sensitive_endpoints = [
-                    "/v1.0/auth/login",
-                    "/v1.0/auth/register",
-                    "/v1.0/user/create",
-                    "/v1.0/user/points/give",
-                ]
-
-                if any(endpoint.startswith(path) for path in sensitive_endpoints):
-                    security_level = SecurityLevel.MEDIUM
-
-                # Log the activity
-                audit_logger.log_activity(
-                    activity_type=ActivityType.API_ACCESS,
-                    user_id=user_id,
-                    details=details,
-                    request=request,
-                    security_level=security_level,
-                    success=is_success,
-                )
 
-                # Log errors separately for better tracking
-                if not is_success:
-                    audit_logger.log_activity(
-                        activity_type=ActivityType.API_ERROR,
-                        user_id=user_id,
-                        details={
-                            **details,
-                            "error_category": self._categorize_error(status_code),
-                            "requires_attention": status_code >= 500,
-                        },
-                        request=request,
-                        security_level=security_level,
-                        success=False,
-                    )
+# Configure logging
+logger = logging.getLogger(__name__)
 
-            finally:
-                db.close()
+SENSITIVE_HEADERS = frozenset(["authorization", "cookie", "x-api-key"])
 
-        except Exception as e:
-            # Don't let logging failures break the API
-            print(f"Failed to log API access: {e}")
-
-    def _categorize_error(self, status_code: int) -> str:
-        """Categorize errors based on status code"""
-        if status_code == 400:
-            return "Bad Request"
-        elif status_code == 401:
-            return "Unauthorized"
-        elif status_code == 403:
-            return "Forbidden"
-        elif status_code == 404:
-            return "Not Found"
-        elif status_code == 422:
-            return "Validation Error"
-        elif status_code == 429:
-            return "Rate Limited"
-        elif 400 <= status_code < 500:
-            return "Client Error"
-        elif 500 <= status_code < 600:
-            return "Server Error"
-        else:
-            return "Unknown Error"
+DEFAULT_EXCLUDE_PATHS = [
+    "/docs",
+    "/redoc",
+    "/openapi.json",
+    "/favicon.ico",
+    "/health",
+    "/metrics",
+    "/static",
+]
 
 
-class EnhancedAPILoggingMiddleware(BaseHTTPMiddleware):
-    """Enhanced version with more detailed logging and performance metrics"""
+class APIAccessLogger:
+    """Detailed API access logging with performance metrics"""
 
     def __init__(
         self,
-        app,
-        exclude_paths: Optional[list] = None,
+        exclude_paths: Optional[List[str]] = None,
         log_request_body: bool = False,
         log_response_body: bool = False,
         max_body_size: int = 1024,  # Max body size to log in bytes
     ):
-        super().__init__(app)
-        self.exclude_paths = exclude_paths or [
-            "/docs",
-            "/redoc",
-            "/openapi.json",
-            "/favicon.ico",
-            "/health",
-            "/metrics",
-        ]
+        self.exclude_paths = tuple(exclude_paths or DEFAULT_EXCLUDE_PATHS)
         self.log_request_body = log_request_body
         self.log_response_body = log_response_body
         self.max_body_size = max_body_size
 
-    async def dispatch(self, request: Request, call_next):
-        # Skip logging for excluded paths
-        if any(request.url.path.startswith(path) for path in self.exclude_paths):
-            return await call_next(request)
-
-        # Record detailed timing
-        start_time = time.time()
-
-        # Extract comprehensive request information
-        request_info = await self._extract_request_info(request)
-
-        # Process the request
-        response = await call_next(request)
-
-        # Calculate timing
-        end_time = time.time()
-        process_time = end_time - start_time
-
-        # Extract response information
-        response_info = self._extract_response_info(response)
-
-        # Log comprehensive API access
-        await self._log_comprehensive_access(
-            request=request,
-            response=response,
-            request_info=request_info,
-            response_info=response_info,
-            process_time=process_time,
-        )
-
-        return response
+    def should_log(self, path: str) -> bool:
+        return not path.startswith(self.exclude_paths)
+
+    def should_record(self, path: str, status_code: int) -> bool:
+        """
+        False when AuditLogger would drop the entry anyway, so no session is
+        opened for it (excluded endpoints; successful, uncounted endpoints).
+        """
+        if api_logging_config.should_exclude_endpoint(path):
+            return False
+        if 200 <= status_code < 400:
+            return api_logging_config.should_count_endpoint(path)
+        return True
+
+    def wants_request_body(self, request: Request) -> bool:
+        """Only bodies with a declared, small enough length are logged"""
+        if not self.log_request_body:
+            return False
+        try:
+            return 0 < int(request.headers.get("content-length", "0")) <= self.max_body_size
+        except ValueError:
+            return False
 
-    async def _extract_request_info(self, request: Request) -> Dict[str, Any]:
+    def request_info(self, request: Request, body: Optional[bytes] = None) -> Dict[str, Any]:
         """Extract comprehensive request information"""
         info = {
             "method": request.method,
             "endpoint": request.url.path,
             "query_params": dict(request.query_params),
-            "headers": dict(request.headers),
+            "headers": {
+                k: "[REDACTED]" if k in SENSITIVE_HEADERS else v
+                for k, v in request.headers.items()
+            },
             "client_ip": request.client.host if request.client else None,
             "user_agent": request.headers.get("user-agent"),
             "content_type": request.headers.get("content-type"),
             "content_length": request.headers.get("content-length"),
         }
-
-        # Extract user information if available
-        if hasattr(request.state, "user") and request.state.user:
-            # Handle role - it might be an enum or already a string
-            user_role = request.state.user.role
-            if hasattr(user_role, "value"):
-                user_role_str = user_role.value
-            else:
-                user_role_str = str(user_role)
-
-            info.update(
-                {
-                    "user_id": request.state.user.id,
-                    "user_email": request.state.user.email,
-                    "user_role": user_role_str,
-                }
-            )
-
-        # Log request body if enabled and size is reasonable
-        if self.log_request_body and info.get("content_length"):
-            try:
-                content_length = int(info["content_length"])
-                if content_length <= self.max_body_size:
-                    body = await request.body()
-                    if body:
-                        # Try to parse as JSON, fallback to string
-                        try:
-                            info["request_body"] = json.loads(body.decode())
-                        except:
-                            info["request_body"] = body.decode()[: self.max_body_size]
-            except:
-                pass
-
+        if body:
+            info["request_body"] = self._decode_body(body)
         return info
 
-    def _extract_response_info(self, response: StarletteResponse) -> Dict[str, Any]:
-        """Extract response information"""
-        info = {
-            "status_code": response.status_code,
-            "headers": dict(response.headers) if hasattr(response, "headers") else {},
-        }
-
-        # Add response body if enabled (be careful with large responses)
-        if self.log_response_body and hasattr(response, "body"):
-            try:
-                if len(response.body) <= self.max_body_size:
-                    try:
-                        info["response_body"] = json.loads(response.body.decode())
-                    except:
-                        info["response_body"] = response.body.decode()[
-                            : self.max_body_size
-                        ]
-            except:
-                pass
-
-        return info
-
-    async def _log_comprehensive_access(
+    def write(
         self,
         request: Request,
-        response: StarletteResponse,
         request_info: Dict[str, Any],
-        response_info: Dict[str, Any],
+        status_code: int,
+        response_headers: Dict[str, str],
         process_time: float,
-    ):
-        """Log comprehensive API access information"""
-
+        response_body: Optional[bytes] = None,
+    ) -> None:
+        """
+        Write the audit entry for one finished request (sync; DB threadpool).
+
+        The user comes from ``request.state.user`` when the route
+        authenticated; otherwise the bearer token's ``user_id`` claim is
+        looked up here, in the same session as the write.
+        """
+        db = SessionLocal()
         try:
-            # Get database session
-            db_gen = get_db()
-            db: Session = next(db_gen)
-
-            try:
-                audit_logger = AuditLogger(db)
-
-                # Combine all information
-                details = {
-                    **request_info,
-                    **response_info,
-                    "process_time_ms": round(process_time * 1000, 2),
-                    "timestamp": datetime.utcnow().isoformat(),
-                    "performance_category": self._categorize_performance(process_time),
-                    "endpoint_category": self._categorize_endpoint(
-                        request_info["endpoint"]
-                    ),
-                }
-
-                # Remove sensitive information from headers
-                if "headers" in details:
-                    sensitive_headers = ["authorization", "cookie", "x-api-key"]
-                    details["headers"] = {
-                        k: "[REDACTED]" if k.lower() in sensitive_headers else v
-                        for k, v in details["headers"].items()
+            user = getattr(request.state, "user", None)
+            if user is None:
+                user_id = token_user_id(request.headers.get("authorization"), request.url.path)
+                if user_id:
+                    user = load_active_user(db, user_id)
+
+            details = {
+                **request_info,
+                "status_code": status_code,
+                "response_headers": response_headers,
+                "process_time_ms": round(process_time * 1000, 2),
+                "timestamp": datetime.utcnow().isoformat(),
+                "performance_category": self._categorize_performance(process_time),
+                "endpoint_category": self._categorize_endpoint(request_info["endpoint"]),
+            }
+            if response_body is not None:
+                details["response_body"] = self._decode_body(response_body)
+            if user is not None:
+                # Handle role - it might be an enum or already a string
+                user_role = user.role
+                details.update(
+                    {
+                        "user_id": user.id,
+                        "user_email": user.email,
+                        "user_role": user_role.value if hasattr(user_role, "value") else str(user_role),
                     }
-
-                # Determine activity type and security level
-                activity_type = ActivityType.API_ACCESS
-                security_level = SecurityLevel.LOW
-                is_success = 200 <= response_info["status_code"] < 400
-
-                if not is_success:
-                    activity_type = ActivityType.API_ERROR
-                    security_level = (
-                        SecurityLevel.MEDIUM
-                        if response_info["status_code"] < 500
-                        else SecurityLevel.HIGH
-                    )
-
-                # Log the activity
-                audit_logger.log_activity(
-                    activity_type=activity_type,
-                    user_id=request_info.get("user_id"),
-                    details=details,
-                    request=request,
-                    security_level=security_level,
-                    success=is_success,
                 )
 
-            finally:
-                db.close()
-
+            # Determine activity type and security level
+            activity_type = ActivityType.API_ACCESS
+            security_level = SecurityLevel.LOW
+            is_success = 200 <= status_code < 400
+
+            if not is_success:
+                activity_type = ActivityType.API_ERROR
+                security_level = SecurityLevel.MEDIUM if status_code < 500 else SecurityLevel.HIGH
+
+            AuditLogger(db).log_activity(
+                activity_type=activity_type,
+                user_id=user.id if user is not None else None,
+                details=details,
+                request=request,
+                security_level=security_level,
+                success=is_success,
+            )
         except Exception as e:
             # Don't let logging failures break the API
-            print(f"Failed to log comprehensive API access: {e}")
+            logger.error(f"Failed to log API access: {e}")
+        finally:
+            db.close()
+
+    def _decode_body(self, body: bytes) -> Any:
+        # Try to parse as JSON, fallback to string
+        try:
+            return json.loads(body)
+        except (ValueError, UnicodeDecodeError):
+            return body[: self.max_body_size].decode(errors="replace")
 
     def _categorize_performance(self, process_time: float) -> str:
         """Categorize request performance"""
@@ -442,21 +198,3 @@ class EnhancedAPILoggingMiddleware(BaseHTTPMiddleware):
             return "dashboard"
         else:
             return "other"
-
-
-def create_api_logging_middleware(enhanced: bool = False, **kwargs):
-    """Factory function to create API logging middleware"""
-    if enhanced:
-
-        class ConfiguredEnhancedAPILoggingMiddleware(EnhancedAPILoggingMiddleware):
-            def __init__(self, app):
-                super().__init__(app, **kwargs)
-
-        return ConfiguredEnhancedAPILoggingMiddleware
-    else:
-
-        class ConfiguredAPILoggingMiddleware(APILoggingMiddleware):
-            def __init__(self, app):
-                super().__init__(app, **kwargs)
-
-        return ConfiguredAPILoggingMiddleware
@@ -1,89 +1,64 @@
-
 """
-Authentication Middleware - Add this to middleware/auth_middleware.py
+Request user resolution for the request pipeline
+
+The pipeline never opens a DB session just to find out who is calling.
+Routes that authenticate put the user on ``request.state.user`` themselves
+(``routes.auth.get_current_user``); for everything else the access logger
+reads the ``user_id`` claim from the bearer token and loads the user only
+when it writes the log entry, on the DB threadpool.
 """
 
-import time
 from typing import Optional
-from fastapi import Request, HTTPException
-from starlette.middleware.base import BaseHTTPMiddleware
 from jose import jwt, JWTError
 from sqlalchemy.orm import Session
-from database import get_db
 import models
 import os
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
+ALGORITHM = "HS256"
+
+# Paths that don't require authentication
+PUBLIC_PATHS = (
+    "/docs",
+    "/redoc",
+    "/openapi.json",
+    "/favicon.ico",
+    "/health",
+    "/metrics",
+    "/static",
+    "/v1.0/auth/login",
+    "/v1.0/auth/register",
+)
+
+
+def token_user_id(authorization: Optional[str], path: str = "") -> Optional[str]:
+    """
+    Read the ``user_id`` claim from a ``Bearer`` Authorization header.
+
+    Returns:
+        The user id, or None for public paths, missing or invalid tokens
+    """
+    if not authorization or not authorization.startswith("Bearer "):
+        return None
+    if path.startswith(PUBLIC_PATHS):
+        return None
+    token = authorization.split(" ")[1]
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError as e:
+        logger.debug(f"Ignoring invalid bearer token: {e}")
+        return None
+    return payload.get("user_id")
+
 
-class AuthenticationMiddleware(BaseHTTPMiddleware):
-    """Middleware to extract user from JWT token and set request.state.user"""
-    
-    def __init__(self, app):
-        super().__init__(app)
-        self.SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
-        self.ALGORITHM = "HS256"
-        
-        # Paths that don't require authentication
-        self.public_paths = [
-            "/docs",
-            "/redoc", 
-            "/openapi.json",
-            "/favicon.ico",
-            "/health",
-            "/metrics",
-            "/static",
-            "/v1.0/auth/login",
-            "/v1.0/auth/register"
-        ]
-    
-    async def dispatch(self, request: Request, call_next):
-        # Initialize user as None
-        request.state.user = None
-        request.state.user_id = None
-        
-        # Skip authentication for public paths
-        if any(request.url.path.startswith(path) for path in self.public_paths):
-            return await call_next(request)
-        
-        # Extract JWT token from Authorization header
-        authorization = request.headers.get("Authorization")
-        if not authorization or not authorization.startswith("Bearer "):
-            # No token provided - continue without user (some endpoints may be optional auth)
-            return await call_next(request)
-        
-        token = authorization.split(" ")[1]
-        
-        try:
-            # Decode JWT token
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
-            user_id = payload.get("user_id")
-            
-            if user_id:
-                # Get database session
-                db_gen = get_db()
-                db: Session = next(db_gen)
-                
-                try:
-                    # Get user from database
-                    user = db.query(models.User).filter(
-                        models.User.id == user_id,
-                        models.User.is_active == True
-                    ).first()
-                    
-                    if user:
-                        # Set user in request state
-                        request.state.user = user
-                        request.state.user_id = user.id
-                        print(f"🔐 AUTH MIDDLEWARE: Set user {user.id} ({user.email})")
-                    else:
-                        print(f"❌ AUTH MIDDLEWARE: User {user_id} not found or inactive")
-                        
-                finally:
-                    db.close()
-                    
-        except JWTError as e:
-            print(f"❌ AUTH MIDDLEWARE: JWT error: {e}")
-        except Exception as e:
-            print(f"❌ AUTH MIDDLEWARE: Error: {e}")
-        
-        # Continue with request
-        response = await call_next(request)
-        return response
+def load_active_user(db: Session, user_id: str) -> Optional[models.User]:
+    """Active user by id (sync; call from the DB threadpool)"""
+    return (
+        db.query(models.User)
+        .filter(models.User.id == user_id, models.User.is_active == True)
+        .first()
+    )
@@ -77,27 +77,25 @@ class CacheInvalidationMiddleware(BaseHTTPMiddleware):
         return match.group(1) if match else None
     
     async def _invalidate_cache_type(self, cache_type: str, user_id: str = None):
-        """Invalidate specific cache type"""
+        """Invalidate specific cache type (generation bump, no keyspace scan)"""
         
         try:
+            from cache_config import cache
+            
             if cache_type == 'user_stats':
-                from cache_config import invalidate_cache_pattern
-                invalidate_cache_pattern(f"{CacheKeys.USER_STATS}*")
+                await cache.ainvalidate_tags(CacheKeys.USER_STATS)
                 
             elif cache_type == 'user_list':
-                from cache_config import invalidate_cache_pattern
-                invalidate_cache_pattern(f"{CacheKeys.USER_LIST}*")
+                await cache.ainvalidate_tags(CacheKeys.USER_LIST)
                 
             elif cache_type == 'dashboard_stats':
-                from cache_config import invalidate_cache_pattern
-                invalidate_cache_pattern(f"{CacheKeys.DASHBOARD_STATS}*")
+                await cache.ainvalidate_tags(CacheKeys.DASHBOARD_STATS)
                 
             elif cache_type == 'user_details':
-                from cache_config import invalidate_cache_pattern
                 if user_id:
-                    invalidate_cache_pattern(f"{CacheKeys.USER_DETAILS}:{user_id}")
+                    await cache.ainvalidate_tags(f"{CacheKeys.USER_DETAILS}:{user_id}")
                 else:
-                    invalidate_cache_pattern(f"{CacheKeys.USER_DETAILS}*")
+                    await cache.ainvalidate_tags(CacheKeys.USER_DETAILS)
                     
         except Exception as e:
             logger.error(f"Error invalidating cache type {cache_type}: {e}")
@@ -167,17 +165,9 @@ class CacheManager:
     @staticmethod
     def clear_all_user_caches():
         """Clear all user-related caches"""
-        from cache_config import invalidate_cache_pattern
-        
-        patterns = [
-            f"{CacheKeys.USER_STATS}*",
-            f"{CacheKeys.USER_LIST}*",
-            f"{CacheKeys.USER_DETAILS}*",
-            f"{CacheKeys.DASHBOARD_STATS}*"
-        ]
+        from cache_config import cache
         
-        for pattern in patterns:
-            invalidate_cache_pattern(pattern)
+        cache.invalidate_tags(*CacheKeys.NAMESPACES)
         
         logger.info("All user caches cleared")
     
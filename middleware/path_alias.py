@@ -0,0 +1,42 @@
+"""
+URL prefix aliasing
+
+Every route is served both bare (``/v1.0/...``) and under ``/api``
+(``/api/v1.0/...``). Instead of registering each router twice, which doubles
+the route table Starlette scans linearly on every request and the operations
+the OpenAPI generator processes, routers are included once and this
+middleware strips the alias prefix before routing:
+
+    /api/v1.0/auth/token  ->  /v1.0/auth/token
+
+Everything downstream (request pipeline, rate limits, access logging,
+handlers) sees the canonical path, so both URL forms share one rate limit
+bucket and one usage count.
+"""
+
+from typing import Iterable
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+class PathAliasMiddleware:
+    """
+    Pure-ASGI middleware mapping aliased URL prefixes onto the canonical routes.
+    """
+
+    def __init__(self, app: ASGIApp, prefixes: Iterable[str] = ("/api",)):
+        self.app = app
+        self.prefixes = tuple(prefix.rstrip("/") for prefix in prefixes)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] in ("http", "websocket"):
+            path = scope["path"]
+            for prefix in self.prefixes:
+                if path.startswith(prefix) and path[len(prefix) : len(prefix) + 1] in ("", "/"):
+                    scope = dict(scope)
+                    scope["path"] = path[len(prefix) :] or "/"
+                    raw_path = scope.get("raw_path")
+                    if raw_path is not None:
+                        scope["raw_path"] = raw_path[len(prefix) :] or b"/"
+                    break
+        await self.app(scope, receive, send)
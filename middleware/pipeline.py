@@ -0,0 +1,266 @@
+"""
+Request pipeline
+
+One pure-ASGI middleware that runs every cross-cutting request step once, in
+a fixed order:
+
+    1. Client IP extraction        -> request.state.real_ip
+    2. Security checks             (suspicious user agents, malicious URLs)
+    3. Rate limiting               (sensitive endpoints, GCRA in Redis)
+    4. Request body validation     (user create/update JSON only)
+    5. The application             (CORS and routing run inside)
+    6. Response headers            (security headers, X-RateLimit-*, Server-Timing)
+    7. Metrics and access logging  (after the response is sent)
+
+It replaces the stack of ``BaseHTTPMiddleware`` classes (IP, two
+authentication middlewares, security, API logging), each of which spawned a
+task and re-wrapped the response per request. Nothing here opens a DB
+session on the request path: security events and access log entries are
+written by background tasks on the DB threadpool (``db_async.run_db``), and
+the calling user is resolved there from ``request.state.user`` (set by the
+auth dependencies) or the bearer token's ``user_id`` claim.
+
+Usage:
+    from middleware.pipeline import install_request_pipeline
+
+    install_request_pipeline(app, exclude_paths=[...])
+"""
+
+from typing import Any, Dict, Optional, Set
+import asyncio
+import logging
+import time
+
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from db_async import run_db
+from db_instrumentation import SQL_SERVER_TIMING, QueryStats, finish_query_stats, start_query_stats
+from metrics import UNMATCHED_ROUTE, observe_request
+from sampling_profiler import profiler
+from middleware.api_logging import APIAccessLogger
+from middleware.ip_middleware import extract_client_ip
+from security.middleware import DOCS_PATHS, SECURITY_HEADERS, SecurityPolicy
+from security.rate_limiting import rate_limit_headers
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+_BLOCKED_CONTENT = {
+    "error": True,
+    "message": "Access denied due to security policy",
+    "error_code": "ACCESS_DENIED",
+}
+
+# Background audit writes still running (awaited on shutdown)
+_pending: Set[asyncio.Task] = set()
+
+
+class RequestPipelineMiddleware:
+    """
+    Pure-ASGI middleware running the whole request pipeline.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        policy: Optional[SecurityPolicy] = None,
+        access_logger: Optional[APIAccessLogger] = None,
+    ):
+        self.app = app
+        self.policy = policy or SecurityPolicy()
+        self.access_logger = access_logger or APIAccessLogger()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope, receive)
+        request.state.real_ip = extract_client_ip(request)
+
+        # Documentation endpoints only get a minimal header
+        if scope["path"] in DOCS_PATHS:
+            await self.app(scope, receive, _with_headers(send, {"X-Content-Type-Options": "nosniff"}))
+            return
+
+        start_time = time.perf_counter()
+        sql_stats = start_query_stats()
+        profiled = profiler.enter_request(scope["path"], request.headers.get("authorization"))
+        response_state: Dict[str, Any] = {"status": None, "headers": None, "body": None}
+        send = self._wrap_send(request, send, response_state, sql_stats)
+        request_body: Optional[bytes] = None
+
+        try:
+            if await self.policy.check_security_blocks(request):
+                await JSONResponse(status_code=403, content=_BLOCKED_CONTENT)(scope, receive, send)
+                return
+
+            rate_limit_response = await self.policy.apply_rate_limiting(request)
+            if rate_limit_response is not None:
+                await rate_limit_response(scope, receive, send)
+                return
+
+            validate = self.policy.needs_body_validation(request)
+            if validate or self.access_logger.wants_request_body(request):
+                request_body = await request.body()
+                receive = _replay(request_body, receive)
+                if validate:
+                    self.policy.validate_request_data(request_body)
+
+            await self.app(scope, receive, send)
+
+        except HTTPException as e:
+            await self.policy.log_http_exception(request, e)
+            response = JSONResponse(
+                status_code=e.status_code,
+                content=(
+                    e.detail
+                    if isinstance(e.detail, dict)
+                    else {"error": True, "message": str(e.detail)}
+                ),
+                headers=e.headers,
+            )
+            await response(scope, receive, send)
+
+        except Exception as e:
+            logger.error(f"Request pipeline error: {e}")
+            await self.policy.log_api_error(request, e)
+            raise
+
+        finally:
+            process_time = time.perf_counter() - start_time
+            route = getattr(scope.get("route"), "path", None) or UNMATCHED_ROUTE
+            observe_request(scope["method"], route, response_state["status"] or 500, process_time)
+            if sql_stats is not None:
+                finish_query_stats(sql_stats, route)
+            if profiled is not None:
+                profiler.exit_request(profiled)
+            if response_state["status"] is not None:
+                self._log_access(request, request_body, response_state, process_time)
+
+    def _wrap_send(
+        self,
+        request: Request,
+        send: Send,
+        response_state: Dict[str, Any],
+        sql_stats: Optional[QueryStats] = None,
+    ) -> Send:
+        capture_body = self.access_logger.log_response_body
+        max_body_size = self.access_logger.max_body_size
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                for header, value in SECURITY_HEADERS.items():
+                    headers[header] = value
+                # Rate limit headers from the check that admitted this request
+                rate_info = getattr(request.state, "rate_limit_info", None)
+                if rate_info:
+                    for header, value in rate_limit_headers(rate_info).items():
+                        headers.setdefault(header, value)
+                if sql_stats is not None and SQL_SERVER_TIMING:
+                    headers.append("Server-Timing", sql_stats.server_timing())
+                response_state["status"] = message["status"]
+                response_state["headers"] = headers
+            elif capture_body and message["type"] == "http.response.body":
+                body = (response_state["body"] or b"") + message.get("body", b"")
+                response_state["body"] = body[: max_body_size + 1]
+            await send(message)
+
+        return send_wrapper
+
+    def _log_access(
+        self,
+        request: Request,
+        request_body: Optional[bytes],
+        response_state: Dict[str, Any],
+        process_time: float,
+    ) -> None:
+        path = request.url.path
+        status_code = response_state["status"]
+        if not self.access_logger.should_log(path):
+            return
+        if not self.access_logger.should_record(path, status_code):
+            return
+
+        response_body = response_state["body"]
+        if response_body is not None and len(response_body) > self.access_logger.max_body_size:
+            response_body = None
+        task = asyncio.ensure_future(
+            run_db(
+                self.access_logger.write,
+                request,
+                self.access_logger.request_info(request, request_body),
+                status_code,
+                dict(response_state["headers"]),
+                process_time,
+                response_body=response_body,
+            )
+        )
+        _pending.add(task)
+        task.add_done_callback(_pending.discard)
+
+
+def _with_headers(send: Send, extra_headers: Dict[str, str]) -> Send:
+    async def send_wrapper(message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = MutableHeaders(scope=message)
+            for header, value in extra_headers.items():
+                headers[header] = value
+        await send(message)
+
+    return send_wrapper
+
+
+def _replay(body: bytes, receive: Receive) -> Receive:
+    """Hand an already consumed request body to the application again"""
+    sent = False
+
+    async def replay_receive() -> Message:
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    return replay_receive
+
+
+def install_request_pipeline(
+    app,
+    enable_rate_limiting: bool = True,
+    enable_audit_logging: bool = True,
+    **access_log_options: Any,
+):
+    """
+    Add the request pipeline to ``app`` (call after all other ``add_middleware``
+    calls so it runs outermost).
+
+    Args:
+        app: FastAPI application
+        enable_rate_limiting: Rate limit the sensitive endpoints
+        enable_audit_logging: Write security events to the audit log
+        **access_log_options: ``APIAccessLogger`` options (``exclude_paths``,
+            ``log_request_body``, ``log_response_body``, ``max_body_size``)
+    """
+    app.add_middleware(
+        RequestPipelineMiddleware,
+        policy=SecurityPolicy(
+            enable_rate_limiting=enable_rate_limiting,
+            enable_audit_logging=enable_audit_logging,
+        ),
+        access_logger=APIAccessLogger(**access_log_options),
+    )
+    return app
+
+
+async def flush_access_logs(timeout: float = 5.0) -> None:
+    """Wait for pending access log writes (application shutdown)"""
+    if not _pending:
+        return
+    done, not_done = await asyncio.wait(list(_pending), timeout=timeout)
+    if not_done:
+        logger.warning(f"{len(not_done)} access log write(s) still pending at shutdown")
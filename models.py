@@ -13,6 +13,8 @@ from sqlalchemy import (
     func,
     case,
     or_,
+    UniqueConstraint,
+    Index,
 )
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship, Mapped
@@ -266,6 +268,8 @@ class UserPoint(Base):
     total_points = Column(Integer, default=0)
     current_points = Column(Integer, default=0)
     total_used_points = Column(Integer, default=0)
+    # Part of current_points reserved by point-meter leases (point_meter_leases)
+    reserved_points = Column(Integer, nullable=False, default=0, server_default="0")
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
@@ -452,7 +456,8 @@ class UserIPWhitelist(Base):
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(String(50), ForeignKey("users.id"), nullable=False)
-    ip_address = Column(String(45), nullable=False)  # Support both IPv4 and IPv6
+    # IPv4/IPv6 address or CIDR range ("203.0.113.0/24", "2001:db8::/32")
+    ip_address = Column(String(45), nullable=False)
     created_by = Column(String(50), nullable=False)  # Admin/Super user who added this
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -461,6 +466,11 @@ class UserIPWhitelist(Base):
     # Relationships
     user = relationship("User", backref="ip_whitelist")
 
+    @property
+    def is_range(self) -> bool:
+        """True if the entry is a CIDR range rather than a single address"""
+        return "/" in (self.ip_address or "")
+
 
 class SupplierSummary(Base):
     __tablename__ = "supplier_summary"
@@ -473,6 +483,138 @@ class SupplierSummary(Base):
     summary_generated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
 
 
+# Hotel Analytics Rollup Model
+class HotelAnalyticsRollup(Base):
+    """Pre-aggregated hotel counts per (dimension, bucket) for dashboards"""
+
+    __tablename__ = "hotel_analytics_rollup"
+    __table_args__ = (
+        UniqueConstraint("dimension", "bucket", name="uq_hotel_rollup_dimension_bucket"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    dimension = Column(
+        String(50), nullable=False, index=True
+    )  # "totals", "rating", "property_type", "country", "map_status", ...
+    bucket = Column(String(255), nullable=False)
+    hotel_count = Column(Integer, nullable=False, default=0)
+    value_sum = Column(Float, nullable=True)  # e.g. sum of ratings in the bucket
+    refreshed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class UserActivityRollupHourly(Base):
+    """Activity log counts per hour, user, action and outcome"""
+
+    __tablename__ = "user_activity_rollup_hourly"
+    __table_args__ = (
+        UniqueConstraint(
+            "bucket_start", "user_id", "action", "success",
+            name="uq_activity_rollup_hourly_key",
+        ),
+        Index("ix_activity_rollup_hourly_user_bucket", "user_id", "bucket_start"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    bucket_start = Column(DateTime, nullable=False, index=True)  # hour-aligned
+    user_id = Column(String(10), nullable=False, default="")  # "" = anonymous
+    action = Column(String(50), nullable=False)
+    success = Column(Boolean, nullable=False, default=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class UserActivityRollupDaily(Base):
+    """Activity log counts per day, user, action and outcome"""
+
+    __tablename__ = "user_activity_rollup_daily"
+    __table_args__ = (
+        UniqueConstraint(
+            "bucket_start", "user_id", "action", "success",
+            name="uq_activity_rollup_daily_key",
+        ),
+        Index("ix_activity_rollup_daily_user_bucket", "user_id", "bucket_start"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    bucket_start = Column(DateTime, nullable=False, index=True)  # midnight UTC
+    user_id = Column(String(10), nullable=False, default="")  # "" = anonymous
+    action = Column(String(50), nullable=False)
+    success = Column(Boolean, nullable=False, default=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class UserEndpointRollupDaily(Base):
+    """Per-day request counts by user, method, endpoint and status code"""
+
+    __tablename__ = "user_endpoint_rollup_daily"
+    __table_args__ = (
+        UniqueConstraint(
+            "bucket_start", "user_id", "method", "endpoint", "status_code",
+            name="uq_endpoint_rollup_daily_key",
+        ),
+        Index("ix_endpoint_rollup_daily_user_bucket", "user_id", "bucket_start"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    bucket_start = Column(DateTime, nullable=False)  # midnight UTC
+    user_id = Column(String(10), nullable=False, default="")
+    method = Column(String(10), nullable=False, default="")
+    endpoint = Column(String(255), nullable=False, default="")
+    status_code = Column(Integer, nullable=False, default=0)  # 0 = not recorded
+    count = Column(Integer, nullable=False, default=0)
+
+
+class ActivityRollupState(Base):
+    """Watermark of the last user_activity_logs id folded into the rollups"""
+
+    __tablename__ = "activity_rollup_state"
+
+    name = Column(String(50), primary_key=True)
+    last_log_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class PointMeterBatch(Base):
+    """Point meter flush batches already applied to user_points (replay guard)"""
+
+    __tablename__ = "point_meter_batches"
+
+    batch_id = Column(String(64), primary_key=True)
+    user_count = Column(Integer, nullable=False, default=0)
+    points = Column(Integer, nullable=False, default=0)
+    applied_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+class PointMeterLease(Base):
+    """Points a point-meter worker has reserved in user_points but not yet settled"""
+
+    __tablename__ = "point_meter_leases"
+
+    owner = Column(String(100), primary_key=True)
+    user_id = Column(String(10), primary_key=True)
+    points = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+class AccessControlVersion(Base):
+    """Version counter bumped by every provider-permission / IP-whitelist change"""
+
+    __tablename__ = "access_control_versions"
+
+    name = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class DataVersion(Base):
+    """Per-table change counter for export sources (services/data_version_service.py)"""
+
+    __tablename__ = "data_versions"
+
+    name = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
 # Notification Model
 class Notification(Base):
     __tablename__ = "notifications"
@@ -542,6 +684,23 @@ class ExportJob(Base):
     completed_at = Column(DateTime, nullable=True)
     expires_at = Column(DateTime, nullable=True, index=True)
 
+    # Durable queue (services/export_queue.py): any worker process can rebuild
+    # the job from payload; checkpoint lets a re-claimed job resume
+    priority = Column(Integer, nullable=False, default=0)
+    payload = Column(JSON, nullable=True)
+    worker_id = Column(String(100), nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    checkpoint = Column(JSON, nullable=True)
+
+    # Result reuse (services/export_result_cache.py): identical requests share
+    # a recent completed file
+    fingerprint = Column(String(64), nullable=True, index=True)
+
+    __table_args__ = (
+        Index("ix_export_jobs_queue", "status", "priority", "created_at"),
+    )
+
     # Relationships
     user = relationship("User", backref="export_jobs")
 
@@ -0,0 +1,335 @@
+"""
+Shared asyncio Redis client
+
+One ``redis.asyncio`` connection pool per worker for everything that talks to
+Redis from the event loop (auth token blacklist, cache, rate limiting,
+fastapi-cache). Calls never block the loop, time out quickly, and go through
+a circuit breaker: after ``REDIS_BREAKER_FAILURES`` consecutive errors Redis
+is skipped entirely for ``REDIS_BREAKER_RESET_SECONDS`` (callers get their
+default value immediately), then a single trial call decides whether to
+close the breaker again. A slow or dead Redis therefore costs at most one
+short timeout per reset period instead of stalling every request.
+
+Only connectivity errors count against the breaker. Command errors that
+Redis itself answers with (``ResponseError``: WRONGTYPE, a failing script)
+prove the server is reachable and are returned as ``default`` without
+opening it.
+
+Usage:
+    from redis_pool import get_async_redis
+
+    redis = get_async_redis()
+    value = await redis.get("key")
+    count, _ = await redis.pipeline([("incr", ("hits",)), ("expire", ("hits", 60))])
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from functools import lru_cache
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+import os
+
+import redis.asyncio as aioredis
+from redis.exceptions import NoScriptError, RedisError, ResponseError
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+REDIS_DB = int(os.getenv("REDIS_DB", 0))
+REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", None)
+
+SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "0.5"))
+CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", "0.5"))
+MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "64"))
+BREAKER_FAILURES = int(os.getenv("REDIS_BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("REDIS_BREAKER_RESET_SECONDS", "10"))
+
+REDIS_ERRORS = (RedisError, OSError, asyncio.TimeoutError)
+
+
+@lru_cache(maxsize=32)
+def _script_sha(script: str) -> str:
+    return hashlib.sha1(script.encode("utf-8")).hexdigest()
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker (closed -> open -> half-open).
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = BREAKER_FAILURES,
+        reset_seconds: float = BREAKER_RESET_SECONDS,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        """True if a call may go to Redis now"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_seconds:
+                return False
+            # Half-open: let exactly one trial call through
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info("Redis circuit breaker closed")
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warning(
+                        f"Redis circuit breaker opened after {self._failures} failures; "
+                        f"skipping Redis for {self.reset_seconds:.0f}s"
+                    )
+                self._opened_at = time.monotonic()
+
+    def release_trial(self) -> None:
+        """Free the half-open trial slot however the trial call ended"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {"state": self.state, "consecutive_failures": self._failures}
+
+
+class AsyncRedis:
+    """
+    Breaker-guarded facade over a pooled ``redis.asyncio.Redis`` client.
+
+    Every helper returns ``default`` instead of raising when Redis is
+    unavailable, so callers keep their existing "Redis is optional" behaviour.
+    """
+
+    def __init__(self, decode_responses: bool = True, breaker: Optional[CircuitBreaker] = None):
+        self.decode_responses = decode_responses
+        self.breaker = breaker or CircuitBreaker()
+        self._client: Optional[aioredis.Redis] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def client(self) -> aioredis.Redis:
+        """Underlying client, bound to the running event loop"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if self._client is None or (loop is not None and loop is not self._loop):
+            # Pools are tied to the loop that opened their connections
+            pool = aioredis.ConnectionPool(
+                host=REDIS_HOST,
+                port=REDIS_PORT,
+                db=REDIS_DB,
+                password=REDIS_PASSWORD,
+                decode_responses=self.decode_responses,
+                socket_timeout=SOCKET_TIMEOUT,
+                socket_connect_timeout=CONNECT_TIMEOUT,
+                socket_keepalive=True,
+                health_check_interval=30,
+                max_connections=MAX_CONNECTIONS,
+            )
+            self._client = aioredis.Redis(connection_pool=pool)
+            self._loop = loop
+        return self._client
+
+    @property
+    def available(self) -> bool:
+        """False while the breaker is open"""
+        return self.breaker.state != "open"
+
+    async def execute(self, command: str, *args, default: Any = None, **kwargs) -> Any:
+        """Run one command through the breaker"""
+        if not self.breaker.allow():
+            return default
+        try:
+            result = await getattr(self.client, command)(*args, **kwargs)
+        except ResponseError as e:
+            self.breaker.record_success()
+            logger.warning(f"Redis {command} rejected: {e}")
+            return default
+        except REDIS_ERRORS as e:
+            self.breaker.record_failure()
+            logger.warning(f"Redis {command} failed: {e}")
+            return default
+        else:
+            self.breaker.record_success()
+            return result
+        finally:
+            # Cancellation or an unexpected error must not hold the trial slot
+            self.breaker.release_trial()
+
+    async def pipeline(
+        self,
+        commands: Iterable[Tuple[str, Sequence[Any]]],
+        transaction: bool = False,
+        default: Any = None,
+    ) -> Optional[List[Any]]:
+        """
+        Send several commands in one round trip.
+
+        Args:
+            commands: ``(command_name, args)`` pairs
+            transaction: Wrap the batch in MULTI/EXEC
+            default: Returned when Redis is unavailable
+
+        Returns:
+            List of results in command order, or ``default``
+        """
+        if not self.breaker.allow():
+            return default
+        try:
+            async with self.client.pipeline(transaction=transaction) as pipe:
+                for command, args in commands:
+                    getattr(pipe, command)(*args)
+                results = await pipe.execute()
+        except ResponseError as e:
+            self.breaker.record_success()
+            logger.warning(f"Redis pipeline rejected: {e}")
+            return default
+        except REDIS_ERRORS as e:
+            self.breaker.record_failure()
+            logger.warning(f"Redis pipeline failed: {e}")
+            return default
+        else:
+            self.breaker.record_success()
+            return results
+        finally:
+            self.breaker.release_trial()
+
+    async def eval_script(
+        self,
+        script: str,
+        keys: Sequence[str],
+        args: Sequence[Any],
+        default: Any = None,
+    ) -> Any:
+        """
+        Run a Lua script by SHA, loading it on first use (EVALSHA, then EVAL).
+
+        Returns:
+            The script result, or ``default`` when Redis is unavailable
+        """
+        if not self.breaker.allow():
+            return default
+        sha = _script_sha(script)
+        try:
+            try:
+                result = await self.client.evalsha(sha, len(keys), *keys, *args)
+            except NoScriptError:
+                result = await self.client.eval(script, len(keys), *keys, *args)
+        except ResponseError as e:
+            self.breaker.record_success()
+            logger.warning(f"Redis script {sha[:8]} rejected: {e}")
+            return default
+        except REDIS_ERRORS as e:
+            self.breaker.record_failure()
+            logger.warning(f"Redis script {sha[:8]} failed: {e}")
+            return default
+        else:
+            self.breaker.record_success()
+            return result
+        finally:
+            self.breaker.release_trial()
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        return await self.execute("get", key, default=default)
+
+    async def mget(self, keys: Sequence[str]) -> List[Any]:
+        return await self.execute("mget", list(keys), default=[None] * len(keys))
+
+    async def set(self, key: str, value: Any, ex: Optional[int] = None, nx: bool = False) -> bool:
+        return bool(await self.execute("set", key, value, ex=ex, nx=nx, default=False))
+
+    async def setex(self, key: str, seconds: int, value: Any) -> bool:
+        return bool(await self.execute("setex", key, seconds, value, default=False))
+
+    async def delete(self, *keys: str) -> int:
+        if not keys:
+            return 0
+        return await self.execute("delete", *keys, default=0)
+
+    async def exists(self, *keys: str) -> int:
+        return await self.execute("exists", *keys, default=0)
+
+    async def incr(self, key: str, amount: int = 1) -> Optional[int]:
+        return await self.execute("incr", key, amount)
+
+    async def expire(self, key: str, seconds: int) -> bool:
+        return bool(await self.execute("expire", key, seconds, default=False))
+
+    async def getset(self, key: str, value: Any) -> Any:
+        return await self.execute("getset", key, value)
+
+    async def ping(self) -> bool:
+        return bool(await self.execute("ping", default=False))
+
+    async def close(self) -> None:
+        if self._client is not None:
+            try:
+                await self._client.aclose()
+            except REDIS_ERRORS + (RuntimeError,):
+                pass
+            self._client = None
+            self._loop = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "breaker": self.breaker.stats(),
+            "connected": self._client is not None,
+            "max_connections": MAX_CONNECTIONS,
+        }
+
+
+# One facade per response mode; both share the breaker so an outage is detected once
+_shared_breaker = CircuitBreaker()
+_clients: Dict[bool, AsyncRedis] = {}
+
+
+def get_async_redis(decode_responses: bool = True) -> AsyncRedis:
+    """Shared async Redis facade (``decode_responses=False`` for binary payloads)"""
+    client = _clients.get(decode_responses)
+    if client is None:
+        client = _clients.setdefault(
+            decode_responses, AsyncRedis(decode_responses, breaker=_shared_breaker)
+        )
+    return client
+
+
+async def close_async_redis() -> None:
+    """Close all pooled connections (application shutdown)"""
+    for client in list(_clients.values()):
+        await client.close()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Refresh Hotel Analytics Rollup
+
+Recomputes the hotel_analytics_rollup table used by
+/v1.0/dashboard/hotel-analytics. Run this periodically (e.g. every 10 minutes)
+via cron job or scheduler, or after bulk data imports. The dashboard also
+refreshes the rollup lazily when it is older than
+HOTEL_ANALYTICS_MAX_AGE_SECONDS (default 900).
+"""
+
+from database import SessionLocal
+from services.hotel_analytics_service import HotelAnalyticsService
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def refresh_rollup():
+    """Refresh the hotel analytics rollup table"""
+    
+    db = SessionLocal()
+    
+    try:
+        logger.info("🔄 Refreshing hotel_analytics_rollup table...")
+        
+        result = HotelAnalyticsService(db).refresh_rollup()
+        
+        logger.info(
+            f"✅ Wrote {result['rows_written']} rollup rows in {result['duration_seconds']:.2f}s"
+        )
+        return True
+        
+    except Exception as e:
+        logger.error(f"❌ Error refreshing hotel analytics rollup: {e}")
+        db.rollback()
+        return False
+    finally:
+        db.close()
+
+def main():
+    print("🔄 Hotel Analytics Rollup Refresh")
+    print("="*60)
+    
+    success = refresh_rollup()
+    
+    if success:
+        print("\n✅ Refresh completed successfully!")
+    else:
+        print("\n❌ Refresh failed. Check logs for details.")
+    
+    return success
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(0 if main() else 1)
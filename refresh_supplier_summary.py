@@ -2,39 +2,49 @@
 """
 Refresh Supplier Summary Table
 
-This script refreshes the supplier_summary table with the latest data.
-Run this periodically (e.g., hourly or daily) via cron job or scheduler.
+The supplier_summary counters are maintained incrementally by the API and
+bulk ingest paths (see services/supplier_summary_service.py). This script is
+the periodic reconciliation job: it recounts provider_mappings, reports any
+drift and corrects it.
+
+Usage:
+    python refresh_supplier_summary.py            # verify and fix
+    python refresh_supplier_summary.py --check    # verify only
 """
 
 from sqlalchemy import text
 from database import SessionLocal
+from services.supplier_summary_service import SupplierSummaryService
 import logging
 import time
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def refresh_summary():
-    """Refresh the supplier summary table"""
+def refresh_summary(fix: bool = True):
+    """Reconcile the supplier summary table against a full recount"""
     
     db = SessionLocal()
     
     try:
-        logger.info("🔄 Refreshing supplier_summary table...")
+        logger.info("🔄 Reconciling supplier_summary table...")
         
         start_time = time.time()
         
-        # Call the stored procedure
-        db.execute(text("CALL refresh_supplier_summary()"))
-        db.commit()
+        report = SupplierSummaryService(db).reconcile(fix=fix)
         
         end_time = time.time()
         
-        # Get count
-        result = db.execute(text("SELECT COUNT(*) FROM supplier_summary"))
-        count = result.fetchone()[0]
+        logger.info(
+            f"✅ Verified {report['providers_checked']} suppliers in {(end_time - start_time):.2f}s, "
+            f"{report['drifted_providers']} drifted"
+        )
         
-        logger.info(f"✅ Refreshed {count} suppliers in {(end_time - start_time):.2f}s")
+        for entry in report["drift"]:
+            print(
+                f"   ⚠️  {entry['provider_name']}: hotels {entry['stored_hotels']} -> {entry['actual_hotels']}, "
+                f"mappings {entry['stored_mappings']} -> {entry['actual_mappings']}"
+            )
         
         # Show top suppliers
         result = db.execute(text("""
@@ -59,17 +69,19 @@ def refresh_summary():
         db.close()
 
 def main():
+    import sys
+
     print("🔄 Supplier Summary Refresh")
     print("="*60)
     
-    success = refresh_summary()
+    success = refresh_summary(fix="--check" not in sys.argv)
     
     if success:
         print("\n✅ Refresh completed successfully!")
         print("\n💡 Schedule this script to run periodically:")
-        print("   • Cron job: 0 * * * * (every hour)")
-        print("   • Windows Task Scheduler: hourly")
-        print("   • Or trigger after bulk data imports")
+        print("   • Cron job: 0 3 * * * (daily, counters are kept live by the API)")
+        print("   • Windows Task Scheduler: daily")
+        print("   • Or trigger after loads that bypass the API (raw SQL imports)")
     else:
         print("\n❌ Refresh failed. Check logs for details.")
     
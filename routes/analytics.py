@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
 from sqlalchemy.orm import Session
 from sqlalchemy import func, or_
-from database import get_db
+from database import get_read_db
+from db_async import db_offload
 from schemas import (
     UserResponse,
     UserCreate,
@@ -24,6 +25,7 @@ from user_schemas import (
     ValidationError
 )
 from services.user_service import UserService
+from services.activity_rollup_service import ActivityRollupService
 from typing import Annotated, Optional
 import models
 from passlib.context import CryptContext
@@ -89,9 +91,10 @@ async def test_analytics_router(request: Request):
     }
 
 @router.get("/dashboard")
-async def get_dashboard_analytics(
+@db_offload
+def get_dashboard_analytics(
     current_user: Annotated[models.User, Depends(get_current_user)] = None,
-    db: Annotated[Session, Depends(get_db)] = None,
+    db: Annotated[Session, Depends(get_read_db)] = None,
 ):
     """
     Get dashboard analytics and statistics.
@@ -212,9 +215,10 @@ async def get_dashboard_analytics(
 
 
 @router.get("/user_points")
-async def get_point_analytics(
+@db_offload
+def get_point_analytics(
     current_user: Annotated[models.User, Depends(get_current_user)] = None,
-    db: Annotated[Session, Depends(get_db)] = None,
+    db: Annotated[Session, Depends(get_read_db)] = None,
 ):
     """
     Get point usage analytics and statistics.
@@ -346,12 +350,13 @@ async def get_point_analytics(
 
 
 @router.get("/user_activity")
-async def get_user_activity(
+@db_offload
+def get_user_activity(
     start_date: str = Query(..., description="Start date in YYYY-MM-DD format"),
     end_date: str = Query(..., description="End date in YYYY-MM-DD format"),
     user_role: Optional[str] = Query(None, description="Filter by user role (GENERAL_USER, ADMIN_USER, SUPER_USER)"),
     current_user: Annotated[models.User, Depends(get_current_user)] = None,
-    db: Annotated[Session, Depends(get_db)] = None,
+    db: Annotated[Session, Depends(get_read_db)] = None,
 ):
     """
     Get user activity analytics for a date range.
@@ -499,27 +504,10 @@ async def get_user_activity(
             # Get user's favorite endpoints from activity logs
             favorite_endpoints = []
             try:
-                # Query activity logs to find most accessed endpoints
-                endpoint_activities = db.query(
-                    models.UserActivityLog.details,
-                    func.count(models.UserActivityLog.id).label('access_count')
-                ).filter(
-                    models.UserActivityLog.user_id == user.id,
-                    models.UserActivityLog.created_at >= start_datetime,
-                    models.UserActivityLog.created_at < end_datetime,
-                    models.UserActivityLog.details.isnot(None)
-                ).group_by(
-                    models.UserActivityLog.details
-                ).order_by(
-                    func.count(models.UserActivityLog.id).desc()
-                ).limit(3).all()
-                
-                # Extract endpoint paths from activity details
-                for details, count in endpoint_activities:
-                    if isinstance(details, dict) and 'endpoint' in details:
-                        favorite_endpoints.append(details['endpoint'])
-                    elif isinstance(details, dict) and 'path' in details:
-                        favorite_endpoints.append(details['path'])
+                # Most accessed endpoints from the daily endpoint rollup
+                favorite_endpoints = ActivityRollupService(db).top_endpoints(
+                    start_datetime, user.id, until=end_datetime, limit=3
+                )
                 
                 # If no activity logs found, use transaction-based inference
                 if not favorite_endpoints:
@@ -618,9 +606,10 @@ async def get_user_activity(
 
 
 @router.get("/user_engagement")
-async def get_user_engagement(
+@db_offload
+def get_user_engagement(
     current_user: Annotated[models.User, Depends(get_current_user)] = None,
-    db: Annotated[Session, Depends(get_db)] = None,
+    db: Annotated[Session, Depends(get_read_db)] = None,
 ):
     """
     Get user engagement metrics and feature adoption.
@@ -865,9 +854,10 @@ async def get_user_engagement(
 
 
 @router.get("/system_health")
-async def get_system_health(
+@db_offload
+def get_system_health(
     current_user: Annotated[models.User, Depends(get_current_user)] = None,
-    db: Annotated[Session, Depends(get_db)] = None,
+    db: Annotated[Session, Depends(get_read_db)] = None,
 ):
     """
     Get system health and performance metrics.
@@ -1068,10 +1058,11 @@ dashboard_router = APIRouter(
 )
 
 @dashboard_router.get("/user_activity")
-async def get_dashboard_user_activity(
+@db_offload
+def get_dashboard_user_activity(
     days: int = Query(30, description="Number of days to analyze (default: 30)"),
     current_user: Annotated[models.User, Depends(get_current_user)] = None,
-    db: Annotated[Session, Depends(get_db)] = None,
+    db: Annotated[Session, Depends(get_read_db)] = None,
 ):
     """
     Get user activity analytics for dashboard display.
@@ -1151,6 +1142,16 @@ async def get_dashboard_user_activity(
         # Base query for users in current user's scope
         base_query = db.query(models.User).filter(models.User.created_by == created_by_str)
         
+        # Activity log counts for users in scope come from the activity rollups
+        rollups = ActivityRollupService(db)
+        scope_user_ids = [user_id for (user_id,) in base_query.with_entities(models.User.id)]
+        earliest_day = (now - timedelta(days=days - 1)).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        activity_log_counts = dict(
+            rollups.counts_by_day(earliest_day, user_ids=scope_user_ids)
+        )
+
         # === DAILY ACTIVITY ===
         daily_activity = []
         for i in range(days):
@@ -1171,13 +1172,7 @@ async def get_dashboard_user_activity(
                 models.PointTransaction.created_at < day_end
             ).count()
             
-            activity_log_count = db.query(models.UserActivityLog).join(
-                models.User, models.UserActivityLog.user_id == models.User.id
-            ).filter(
-                models.User.created_by == created_by_str,
-                models.UserActivityLog.created_at >= day_start,
-                models.UserActivityLog.created_at < day_end
-            ).count()
+            activity_log_count = activity_log_counts.get(day_start.date(), 0)
             
             total_activity = transaction_count + activity_log_count
             
@@ -1260,13 +1255,9 @@ async def get_dashboard_user_activity(
         hotel_deleted = max(0, hotel_created // 20)  # Assume ~5% deletion rate
         
         # User login activities
-        user_login = db.query(models.UserActivityLog).join(
-            models.User, models.UserActivityLog.user_id == models.User.id
-        ).filter(
-            models.User.created_by == created_by_str,
-            models.UserActivityLog.action == "login",
-            models.UserActivityLog.created_at >= start_date
-        ).count()
+        user_login = rollups.total(
+            start_date, actions=["login"], user_ids=scope_user_ids
+        )
         
         # If no specific login logs, estimate from sessions
         if user_login == 0:
@@ -6,20 +6,25 @@ Provides analytics and visualization-ready data for audit logs
 
 from fastapi import APIRouter, Depends, Query, Request, HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_, desc, case
+from sqlalchemy import desc
 from typing import Annotated, Optional, List
 from datetime import datetime, timedelta
+import heapq
 import models
 from database import get_db
+from db_async import db_offload
 from security.audit_logging import AuditLogger, ActivityType, SecurityLevel
 from routes.auth import get_current_user
 from security.middleware import validate_user_permissions
+from services.activity_rollup_service import ActivityRollupService
+from services.activity_log_retention_service import ActivityLogRetentionService
 
 router = APIRouter(prefix="/v1.0", tags=["Audit Analytics"])
 
 
 @router.get("/audit/analytics")
-async def get_audit_analytics(
+@db_offload
+def get_audit_analytics(
     request: Request,
     current_user: Annotated[models.User, Depends(get_current_user)],
     db: Annotated[Session, Depends(get_db)],
@@ -48,46 +53,17 @@ async def get_audit_analytics(
     # Calculate date range
     start_date = datetime.utcnow() - timedelta(days=days)
 
-    # Base query
-    base_query = db.query(models.UserActivityLog).filter(
-        models.UserActivityLog.created_at >= start_date
-    )
-
-    # Apply user filter if specified
-    if user_id:
-        base_query = base_query.filter(models.UserActivityLog.user_id == user_id)
+    # Aggregates come from the activity rollups (plus the not yet aggregated
+    # tail of the log), not from GROUP BY over the raw log table
+    rollups = ActivityRollupService(db)
 
     # 1. Daily Activity Timeline (for line/area chart)
-    date_expr = func.date(models.UserActivityLog.created_at)
-
-    daily_activity = db.query(
-        date_expr.label("date"),
-        func.count(models.UserActivityLog.id).label("count"),
-    ).filter(models.UserActivityLog.created_at >= start_date)
-
-    if user_id:
-        daily_activity = daily_activity.filter(
-            models.UserActivityLog.user_id == user_id
-        )
-
-    daily_activity = daily_activity.group_by(date_expr).order_by(date_expr).all()
+    daily_activity = rollups.counts_by_day(start_date, user_id=user_id)
 
     # 2. Activity Breakdown by Type (for pie/donut chart)
-    activity_by_type = db.query(
-        models.UserActivityLog.action,
-        func.count(models.UserActivityLog.id).label("count"),
-    ).filter(models.UserActivityLog.created_at >= start_date)
-
-    if user_id:
-        activity_by_type = activity_by_type.filter(
-            models.UserActivityLog.user_id == user_id
-        )
-
-    activity_by_type = (
-        activity_by_type.group_by(models.UserActivityLog.action)
-        .order_by(desc("count"))
-        .all()
-    )
+    action_counts = rollups.counts_by_action(start_date, user_id=user_id)
+    activity_by_type = sorted(action_counts.items(), key=lambda x: x[1], reverse=True)
+    total_activities = sum(action_counts.values())
 
     # 3. Security Events (for alert dashboard)
     security_activity_types = [
@@ -98,143 +74,60 @@ async def get_audit_analytics(
         ActivityType.LOGIN_FAILED.value,
     ]
 
-    security_events = db.query(
-        models.UserActivityLog.action,
-        func.count(models.UserActivityLog.id).label("count"),
-    ).filter(
-        models.UserActivityLog.created_at >= start_date,
-        models.UserActivityLog.action.in_(security_activity_types),
-    )
-
-    if user_id:
-        security_events = security_events.filter(
-            models.UserActivityLog.user_id == user_id
-        )
-
-    security_events = security_events.group_by(models.UserActivityLog.action).all()
+    security_events = [
+        (action, count)
+        for action, count in action_counts.items()
+        if action in security_activity_types
+    ]
 
     # 4. Top Active Users (for leaderboard/bar chart)
     top_users = []
     if not user_id:  # Only show if not filtering by specific user
-        top_users_query = (
-            db.query(
-                models.UserActivityLog.user_id,
-                models.User.username,
-                models.User.email,
-                func.count(models.UserActivityLog.id).label("activity_count"),
-            )
-            .join(models.User, models.UserActivityLog.user_id == models.User.id)
-            .filter(
-                models.UserActivityLog.created_at >= start_date,
-                models.UserActivityLog.user_id.isnot(None),
-            )
-            .group_by(
-                models.UserActivityLog.user_id, models.User.username, models.User.email
-            )
-            .order_by(desc("activity_count"))
-            .limit(10)
-            .all()
-        )
+        user_counts = rollups.counts_by_user(start_date)
+        known_users = {}
+        if user_counts:
+            known_users = {
+                user.id: user
+                for user in db.query(models.User)
+                .filter(models.User.id.in_(list(user_counts)))
+                .all()
+            }
 
         top_users = [
             {
-                "user_id": row.user_id,
-                "username": row.username,
-                "email": row.email,
-                "activity_count": row.activity_count,
+                "user_id": uid,
+                "username": known_users[uid].username,
+                "email": known_users[uid].email,
+                "activity_count": count,
             }
-            for row in top_users_query
-        ]
-
-    # 5. Authentication Statistics (for stats cards)
-    auth_stats = db.query(
-        func.sum(
-            case(
-                (models.UserActivityLog.action == ActivityType.LOGIN_SUCCESS.value, 1),
-                else_=0,
-            )
-        ).label("successful_logins"),
-        func.sum(
-            case(
-                (models.UserActivityLog.action == ActivityType.LOGIN_FAILED.value, 1),
-                else_=0,
-            )
-        ).label("failed_logins"),
-        func.sum(
-            case(
-                (models.UserActivityLog.action == ActivityType.LOGOUT.value, 1), else_=0
+            for uid, count in sorted(
+                user_counts.items(), key=lambda x: x[1], reverse=True
             )
-        ).label("logouts"),
-        func.sum(
-            case(
-                (
-                    models.UserActivityLog.action
-                    == ActivityType.PASSWORD_RESET_REQUEST.value,
-                    1,
-                ),
-                else_=0,
-            )
-        ).label("password_resets"),
-    ).filter(models.UserActivityLog.created_at >= start_date)
+            if uid in known_users
+        ][:10]
 
-    if user_id:
-        auth_stats = auth_stats.filter(models.UserActivityLog.user_id == user_id)
-
-    auth_stats = auth_stats.first()
+    # 5. Authentication Statistics (for stats cards)
+    auth_stats = {
+        "successful_logins": action_counts.get(ActivityType.LOGIN_SUCCESS.value, 0),
+        "failed_logins": action_counts.get(ActivityType.LOGIN_FAILED.value, 0),
+        "logouts": action_counts.get(ActivityType.LOGOUT.value, 0),
+        "password_resets": action_counts.get(
+            ActivityType.PASSWORD_RESET_REQUEST.value, 0
+        ),
+    }
 
     # 6. User Management Statistics (for stats cards)
-    user_mgmt_stats = db.query(
-        func.sum(
-            case(
-                (models.UserActivityLog.action == ActivityType.USER_CREATED.value, 1),
-                else_=0,
-            )
-        ).label("users_created"),
-        func.sum(
-            case(
-                (models.UserActivityLog.action == ActivityType.USER_UPDATED.value, 1),
-                else_=0,
-            )
-        ).label("users_updated"),
-        func.sum(
-            case(
-                (models.UserActivityLog.action == ActivityType.USER_DELETED.value, 1),
-                else_=0,
-            )
-        ).label("users_deleted"),
-        func.sum(
-            case(
-                (
-                    models.UserActivityLog.action
-                    == ActivityType.USER_ROLE_CHANGED.value,
-                    1,
-                ),
-                else_=0,
-            )
-        ).label("role_changes"),
-    ).filter(models.UserActivityLog.created_at >= start_date)
-
-    if user_id:
-        user_mgmt_stats = user_mgmt_stats.filter(
-            models.UserActivityLog.user_id == user_id
-        )
-
-    user_mgmt_stats = user_mgmt_stats.first()
+    user_mgmt_stats = {
+        "users_created": action_counts.get(ActivityType.USER_CREATED.value, 0),
+        "users_updated": action_counts.get(ActivityType.USER_UPDATED.value, 0),
+        "users_deleted": action_counts.get(ActivityType.USER_DELETED.value, 0),
+        "role_changes": action_counts.get(ActivityType.USER_ROLE_CHANGED.value, 0),
+    }
 
     # 7. Hourly Activity Pattern (for heatmap)
-    hour_expr = func.extract("hour", models.UserActivityLog.created_at)
-
-    hourly_pattern = db.query(
-        hour_expr.label("hour"),
-        func.count(models.UserActivityLog.id).label("count"),
-    ).filter(models.UserActivityLog.created_at >= start_date)
-
-    if user_id:
-        hourly_pattern = hourly_pattern.filter(
-            models.UserActivityLog.user_id == user_id
-        )
-
-    hourly_pattern = hourly_pattern.group_by(hour_expr).order_by("hour").all()
+    hourly_pattern = sorted(
+        rollups.counts_by_hour_of_day(start_date, user_id=user_id).items()
+    )
 
     # 8. Recent Critical Events (for alerts)
     recent_critical = db.query(models.UserActivityLog).filter(
@@ -275,42 +168,36 @@ async def get_audit_analytics(
         },
         "filter": {"user_id": user_id},
         "summary": {
-            "total_activities": base_query.count(),
-            "total_security_events": sum(row.count for row in security_events),
+            "total_activities": total_activities,
+            "total_security_events": sum(count for _, count in security_events),
             "unique_users": (
-                db.query(func.count(func.distinct(models.UserActivityLog.user_id)))
-                .filter(
-                    models.UserActivityLog.created_at >= start_date,
-                    models.UserActivityLog.user_id.isnot(None),
-                )
-                .scalar()
-                if not user_id
-                else 1
+                rollups.unique_users(start_date) if not user_id else 1
             ),
         },
         "timeline": {
             "daily_activity": [
-                {"date": row.date.isoformat(), "count": row.count}
-                for row in daily_activity
+                {"date": day.isoformat(), "count": count}
+                for day, count in daily_activity
             ]
         },
         "activity_breakdown": {
             "by_type": [
                 {
-                    "action": row.action,
-                    "count": row.count,
+                    "action": action,
+                    "count": count,
                     "percentage": (
-                        round((row.count / base_query.count() * 100), 2)
-                        if base_query.count() > 0
+                        round((count / total_activities * 100), 2)
+                        if total_activities > 0
                         else 0
                     ),
                 }
-                for row in activity_by_type
+                for action, count in activity_by_type
             ]
         },
         "security": {
             "events_by_type": [
-                {"action": row.action, "count": row.count} for row in security_events
+                {"action": action, "count": count}
+                for action, count in security_events
             ],
             "recent_critical_events": [
                 {
@@ -325,34 +212,25 @@ async def get_audit_analytics(
             ],
         },
         "authentication": {
-            "successful_logins": auth_stats.successful_logins or 0,
-            "failed_logins": auth_stats.failed_logins or 0,
-            "logouts": auth_stats.logouts or 0,
-            "password_resets": auth_stats.password_resets or 0,
+            **auth_stats,
             "success_rate": round(
                 (
                     (
-                        auth_stats.successful_logins
-                        / (auth_stats.successful_logins + auth_stats.failed_logins)
+                        auth_stats["successful_logins"]
+                        / (auth_stats["successful_logins"] + auth_stats["failed_logins"])
                         * 100
                     )
-                    if (auth_stats.successful_logins or 0)
-                    + (auth_stats.failed_logins or 0)
+                    if auth_stats["successful_logins"] + auth_stats["failed_logins"]
                     > 0
                     else 0
                 ),
                 2,
             ),
         },
-        "user_management": {
-            "users_created": user_mgmt_stats.users_created or 0,
-            "users_updated": user_mgmt_stats.users_updated or 0,
-            "users_deleted": user_mgmt_stats.users_deleted or 0,
-            "role_changes": user_mgmt_stats.role_changes or 0,
-        },
+        "user_management": user_mgmt_stats,
         "patterns": {
             "hourly_distribution": [
-                {"hour": int(row.hour), "count": row.count} for row in hourly_pattern
+                {"hour": hour, "count": count} for hour, count in hourly_pattern
             ]
         },
         "top_users": top_users,
@@ -360,7 +238,8 @@ async def get_audit_analytics(
 
 
 @router.get("/audit/user-activity/{user_id}")
-async def get_user_activity_graph(
+@db_offload
+def get_user_activity_graph(
     request: Request,
     user_id: str,
     current_user: Annotated[models.User, Depends(get_current_user)],
@@ -386,36 +265,13 @@ async def get_user_activity_graph(
     audit_logger = AuditLogger(db)
     start_date = datetime.utcnow() - timedelta(days=days)
 
-    # Get daily activity
-    date_expr_activity = func.date(models.UserActivityLog.created_at)
-
-    daily_activity = (
-        db.query(
-            date_expr_activity.label("date"),
-            func.count(models.UserActivityLog.id).label("count"),
-        )
-        .filter(
-            models.UserActivityLog.user_id == user_id,
-            models.UserActivityLog.created_at >= start_date,
-        )
-        .group_by(date_expr_activity)
-        .order_by(date_expr_activity)
-        .all()
-    )
-
-    # Get activity by type
-    activity_by_type = (
-        db.query(
-            models.UserActivityLog.action,
-            func.count(models.UserActivityLog.id).label("count"),
-        )
-        .filter(
-            models.UserActivityLog.user_id == user_id,
-            models.UserActivityLog.created_at >= start_date,
-        )
-        .group_by(models.UserActivityLog.action)
-        .order_by(desc("count"))
-        .all()
+    # Get daily activity and activity by type from the rollups
+    rollups = ActivityRollupService(db)
+    daily_activity = rollups.counts_by_day(start_date, user_id=user_id)
+    activity_by_type = sorted(
+        rollups.counts_by_action(start_date, user_id=user_id).items(),
+        key=lambda x: x[1],
+        reverse=True,
     )
 
     # Get recent activities
@@ -456,10 +312,10 @@ async def get_user_activity_graph(
             "end_date": datetime.utcnow().isoformat(),
         },
         "timeline": [
-            {"date": row.date.isoformat(), "count": row.count} for row in daily_activity
+            {"date": day.isoformat(), "count": count} for day, count in daily_activity
         ],
         "activity_breakdown": [
-            {"action": row.action, "count": row.count} for row in activity_by_type
+            {"action": action, "count": count} for action, count in activity_by_type
         ],
         "recent_activities": [
             {
@@ -471,12 +327,13 @@ async def get_user_activity_graph(
             }
             for log in recent_activities
         ],
-        "total_activities": sum(row.count for row in activity_by_type),
+        "total_activities": sum(count for _, count in activity_by_type),
     }
 
 
 @router.get("/audit/my-activity")
-async def get_my_activity(
+@db_offload
+def get_my_activity(
     request: Request,
     current_user: Annotated[models.User, Depends(get_current_user)],
     db: Annotated[Session, Depends(get_db)],
@@ -498,72 +355,20 @@ async def get_my_activity(
     start_date = datetime.utcnow() - timedelta(days=days)
     user_id = current_user.id
 
-    # Get daily activity
-    date_expr_my_activity = func.date(models.UserActivityLog.created_at)
+    rollups = ActivityRollupService(db)
 
-    daily_activity = (
-        db.query(
-            date_expr_my_activity.label("date"),
-            func.count(models.UserActivityLog.id).label("count"),
-        )
-        .filter(
-            models.UserActivityLog.user_id == user_id,
-            models.UserActivityLog.created_at >= start_date,
-        )
-        .group_by(date_expr_my_activity)
-        .order_by(date_expr_my_activity)
-        .all()
-    )
+    # Get daily activity
+    daily_activity = rollups.counts_by_day(start_date, user_id=user_id)
 
     # Get activity by type
-    activity_by_type = (
-        db.query(
-            models.UserActivityLog.action,
-            func.count(models.UserActivityLog.id).label("count"),
-        )
-        .filter(
-            models.UserActivityLog.user_id == user_id,
-            models.UserActivityLog.created_at >= start_date,
-        )
-        .group_by(models.UserActivityLog.action)
-        .order_by(desc("count"))
-        .all()
-    )
+    action_counts = rollups.counts_by_action(start_date, user_id=user_id)
+    activity_by_type = sorted(action_counts.items(), key=lambda x: x[1], reverse=True)
 
-    # Get endpoint usage statistics from details JSON
-    all_activities = (
-        db.query(models.UserActivityLog)
-        .filter(
-            models.UserActivityLog.user_id == user_id,
-            models.UserActivityLog.created_at >= start_date,
-        )
-        .all()
+    # Endpoint, method and status code usage from the daily endpoint rollup
+    endpoint_usage, method_usage, status_code_stats = rollups.endpoint_usage(
+        start_date, user_id=user_id
     )
 
-    # Parse endpoint usage from details
-    endpoint_usage = {}
-    method_usage = {}
-    status_code_stats = {}
-
-    for activity in all_activities:
-        if activity.details and isinstance(activity.details, dict):
-            # Extract endpoint information
-            endpoint = activity.details.get("endpoint") or activity.details.get("path")
-            method = activity.details.get("method")
-            status_code = activity.details.get("status_code")
-
-            if endpoint:
-                endpoint_key = f"{method} {endpoint}" if method else endpoint
-                endpoint_usage[endpoint_key] = endpoint_usage.get(endpoint_key, 0) + 1
-
-            if method:
-                method_usage[method] = method_usage.get(method, 0) + 1
-
-            if status_code:
-                status_code_stats[str(status_code)] = (
-                    status_code_stats.get(str(status_code), 0) + 1
-                )
-
     # Sort endpoints by usage count
     sorted_endpoints = sorted(endpoint_usage.items(), key=lambda x: x[1], reverse=True)
 
@@ -580,93 +385,23 @@ async def get_my_activity(
     )
 
     # Authentication stats for this user
-    auth_stats = (
-        db.query(
-            func.sum(
-                case(
-                    (
-                        models.UserActivityLog.action
-                        == ActivityType.LOGIN_SUCCESS.value,
-                        1,
-                    ),
-                    else_=0,
-                )
-            ).label("successful_logins"),
-            func.sum(
-                case(
-                    (
-                        models.UserActivityLog.action
-                        == ActivityType.LOGIN_FAILED.value,
-                        1,
-                    ),
-                    else_=0,
-                )
-            ).label("failed_logins"),
-            func.sum(
-                case(
-                    (models.UserActivityLog.action == ActivityType.LOGOUT.value, 1),
-                    else_=0,
-                )
-            ).label("logouts"),
-        )
-        .filter(
-            models.UserActivityLog.user_id == user_id,
-            models.UserActivityLog.created_at >= start_date,
-        )
-        .first()
-    )
-
-    # Hourly pattern (using HOUR function for MySQL compatibility)
-    hour_expr_my = func.hour(models.UserActivityLog.created_at)
+    auth_stats = {
+        "successful_logins": action_counts.get(ActivityType.LOGIN_SUCCESS.value, 0),
+        "failed_logins": action_counts.get(ActivityType.LOGIN_FAILED.value, 0),
+        "logouts": action_counts.get(ActivityType.LOGOUT.value, 0),
+    }
 
-    hourly_pattern = (
-        db.query(
-            hour_expr_my.label("hour"),
-            func.count(models.UserActivityLog.id).label("count"),
-        )
-        .filter(
-            models.UserActivityLog.user_id == user_id,
-            models.UserActivityLog.created_at >= start_date,
-        )
-        .group_by(hour_expr_my)
-        .order_by("hour")
-        .all()
+    # Hourly pattern
+    hourly_pattern = sorted(
+        rollups.counts_by_hour_of_day(start_date, user_id=user_id).items()
     )
 
     # Most active day
-    date_expr_most_active = func.date(models.UserActivityLog.created_at)
+    most_active_day = max(daily_activity, key=lambda x: x[1], default=None)
 
-    most_active_day = (
-        db.query(
-            date_expr_most_active.label("date"),
-            func.count(models.UserActivityLog.id).label("count"),
-        )
-        .filter(
-            models.UserActivityLog.user_id == user_id,
-            models.UserActivityLog.created_at >= start_date,
-        )
-        .group_by(date_expr_most_active)
-        .order_by(desc("count"))
-        .first()
-    )
-
-    # Day of week pattern (using DAYOFWEEK function for MySQL compatibility)
-    # MySQL DAYOFWEEK returns 1=Sunday, 2=Monday, ..., 7=Saturday
-    # Use the same expression in SELECT and GROUP BY to satisfy ONLY_FULL_GROUP_BY
-    day_of_week_expr = func.dayofweek(models.UserActivityLog.created_at) - 1
-
-    day_of_week_pattern = (
-        db.query(
-            day_of_week_expr.label("day_of_week"),
-            func.count(models.UserActivityLog.id).label("count"),
-        )
-        .filter(
-            models.UserActivityLog.user_id == user_id,
-            models.UserActivityLog.created_at >= start_date,
-        )
-        .group_by(day_of_week_expr)
-        .order_by("day_of_week")
-        .all()
+    # Day of week pattern (0=Sunday, ..., 6=Saturday)
+    day_of_week_pattern = sorted(
+        rollups.counts_by_day_of_week(start_date, user_id=user_id).items()
     )
 
     # Map day of week numbers to names
@@ -694,7 +429,7 @@ async def get_my_activity(
         security_level=SecurityLevel.LOW,
     )
 
-    total_activities = sum(row.count for row in activity_by_type)
+    total_activities = sum(action_counts.values())
     total_endpoint_calls = sum(endpoint_usage.values())
 
     return {
@@ -723,8 +458,8 @@ async def get_my_activity(
                 round(total_endpoint_calls / days, 2) if days > 0 else 0
             ),
             "most_active_day": {
-                "date": most_active_day.date.isoformat() if most_active_day else None,
-                "count": most_active_day.count if most_active_day else 0,
+                "date": most_active_day[0].isoformat() if most_active_day else None,
+                "count": most_active_day[1] if most_active_day else 0,
             },
         },
         "endpoint_usage": {
@@ -782,34 +517,31 @@ async def get_my_activity(
             ],
         },
         "timeline": [
-            {"date": row.date.isoformat(), "count": row.count} for row in daily_activity
+            {"date": day.isoformat(), "count": count} for day, count in daily_activity
         ],
         "activity_breakdown": [
             {
-                "action": row.action,
-                "action_label": row.action.replace("_", " ").title(),
-                "count": row.count,
+                "action": action,
+                "action_label": action.replace("_", " ").title(),
+                "count": count,
                 "percentage": (
-                    round((row.count / total_activities * 100), 2)
+                    round((count / total_activities * 100), 2)
                     if total_activities > 0
                     else 0
                 ),
             }
-            for row in activity_by_type
+            for action, count in activity_by_type
         ],
         "authentication": {
-            "successful_logins": auth_stats.successful_logins or 0,
-            "failed_logins": auth_stats.failed_logins or 0,
-            "logouts": auth_stats.logouts or 0,
+            **auth_stats,
             "success_rate": round(
                 (
                     (
-                        auth_stats.successful_logins
-                        / (auth_stats.successful_logins + auth_stats.failed_logins)
+                        auth_stats["successful_logins"]
+                        / (auth_stats["successful_logins"] + auth_stats["failed_logins"])
                         * 100
                     )
-                    if (auth_stats.successful_logins or 0)
-                    + (auth_stats.failed_logins or 0)
+                    if auth_stats["successful_logins"] + auth_stats["failed_logins"]
                     > 0
                     else 100
                 ),
@@ -819,34 +551,30 @@ async def get_my_activity(
         "patterns": {
             "hourly_distribution": [
                 {
-                    "hour": int(row.hour),
-                    "hour_label": f"{int(row.hour):02d}:00",
-                    "count": row.count,
+                    "hour": hour,
+                    "hour_label": f"{hour:02d}:00",
+                    "count": count,
                 }
-                for row in hourly_pattern
+                for hour, count in hourly_pattern
             ],
             "most_active_hour": (
-                max(hourly_pattern, key=lambda x: x.count).hour
-                if hourly_pattern
-                else None
+                max(hourly_pattern, key=lambda x: x[1])[0] if hourly_pattern else None
             ),
             "day_of_week_distribution": [
                 {
-                    "day_of_week": int(row.day_of_week),
-                    "day_name": day_names[int(row.day_of_week)],
-                    "count": row.count,
+                    "day_of_week": day_of_week,
+                    "day_name": day_names[day_of_week],
+                    "count": count,
                     "percentage": (
-                        round((row.count / total_activities * 100), 2)
+                        round((count / total_activities * 100), 2)
                         if total_activities > 0
                         else 0
                     ),
                 }
-                for row in day_of_week_pattern
+                for day_of_week, count in day_of_week_pattern
             ],
             "most_active_day_of_week": (
-                day_names[
-                    int(max(day_of_week_pattern, key=lambda x: x.count).day_of_week)
-                ]
+                day_names[max(day_of_week_pattern, key=lambda x: x[1])[0]]
                 if day_of_week_pattern
                 else None
             ),
@@ -881,7 +609,8 @@ async def get_my_activity(
 
 
 @router.get("/audit/my-stats")
-async def get_my_stats(
+@db_offload
+def get_my_stats(
     request: Request,
     current_user: Annotated[models.User, Depends(get_current_user)],
     db: Annotated[Session, Depends(get_db)],
@@ -901,33 +630,15 @@ async def get_my_stats(
     last_30_days = datetime.utcnow() - timedelta(days=30)
     # All time
 
-    # Activity counts
-    activities_7_days = (
-        db.query(func.count(models.UserActivityLog.id))
-        .filter(
-            models.UserActivityLog.user_id == user_id,
-            models.UserActivityLog.created_at >= last_7_days,
-        )
-        .scalar()
-        or 0
-    )
-
-    activities_30_days = (
-        db.query(func.count(models.UserActivityLog.id))
-        .filter(
-            models.UserActivityLog.user_id == user_id,
-            models.UserActivityLog.created_at >= last_30_days,
-        )
-        .scalar()
-        or 0
-    )
+    rollups = ActivityRollupService(db)
 
-    activities_all_time = (
-        db.query(func.count(models.UserActivityLog.id))
-        .filter(models.UserActivityLog.user_id == user_id)
-        .scalar()
-        or 0
+    # Activity counts
+    activities_7_days = rollups.total(last_7_days, user_id=user_id)
+    activities_30_days_by_action = rollups.counts_by_action(
+        last_30_days, user_id=user_id
     )
+    activities_30_days = sum(activities_30_days_by_action.values())
+    activities_all_time = rollups.total(user_id=user_id)
 
     # Last login
     last_login = (
@@ -941,30 +652,13 @@ async def get_my_stats(
     )
 
     # Most common action
-    most_common_action = (
-        db.query(
-            models.UserActivityLog.action,
-            func.count(models.UserActivityLog.id).label("count"),
-        )
-        .filter(
-            models.UserActivityLog.user_id == user_id,
-            models.UserActivityLog.created_at >= last_30_days,
-        )
-        .group_by(models.UserActivityLog.action)
-        .order_by(desc("count"))
-        .first()
+    most_common_action = max(
+        activities_30_days_by_action.items(), key=lambda x: x[1], default=None
     )
 
     # Failed login attempts (security indicator)
-    failed_logins_7_days = (
-        db.query(func.count(models.UserActivityLog.id))
-        .filter(
-            models.UserActivityLog.user_id == user_id,
-            models.UserActivityLog.action == ActivityType.LOGIN_FAILED.value,
-            models.UserActivityLog.created_at >= last_7_days,
-        )
-        .scalar()
-        or 0
+    failed_logins_7_days = rollups.total(
+        last_7_days, user_id=user_id, actions=[ActivityType.LOGIN_FAILED.value]
     )
 
     # Account age
@@ -995,13 +689,13 @@ async def get_my_stats(
             ),
         },
         "most_common_action": {
-            "action": most_common_action.action if most_common_action else None,
+            "action": most_common_action[0] if most_common_action else None,
             "action_label": (
-                most_common_action.action.replace("_", " ").title()
+                most_common_action[0].replace("_", " ").title()
                 if most_common_action
                 else None
             ),
-            "count": most_common_action.count if most_common_action else 0,
+            "count": most_common_action[1] if most_common_action else 0,
         },
         "security": {
             "failed_login_attempts_7_days": failed_logins_7_days,
@@ -1011,7 +705,8 @@ async def get_my_stats(
 
 
 @router.get("/audit/my-timeline")
-async def get_my_timeline(
+@db_offload
+def get_my_timeline(
     request: Request,
     current_user: Annotated[models.User, Depends(get_current_user)],
     db: Annotated[Session, Depends(get_db)],
@@ -1044,15 +739,7 @@ async def get_my_timeline(
     )
 
     # Get available action types for this user
-    available_actions = (
-        db.query(
-            models.UserActivityLog.action,
-            func.count(models.UserActivityLog.id).label("count"),
-        )
-        .filter(models.UserActivityLog.user_id == user_id)
-        .group_by(models.UserActivityLog.action)
-        .all()
-    )
+    available_actions = ActivityRollupService(db).counts_by_action(user_id=user_id)
 
     return {
         "user_id": user_id,
@@ -1060,11 +747,11 @@ async def get_my_timeline(
         "filter_applied": action_filter,
         "available_actions": [
             {
-                "action": row.action,
-                "action_label": row.action.replace("_", " ").title(),
-                "count": row.count,
+                "action": action,
+                "action_label": action.replace("_", " ").title(),
+                "count": count,
             }
-            for row in available_actions
+            for action, count in available_actions.items()
         ],
         "timeline": [
             {
@@ -1081,6 +768,97 @@ async def get_my_timeline(
     }
 
 
+@router.get("/audit/history")
+@db_offload
+def get_activity_history(
+    request: Request,
+    current_user: Annotated[models.User, Depends(get_current_user)],
+    db: Annotated[Session, Depends(get_db)],
+    start_date: datetime = Query(..., description="Range start (inclusive)"),
+    end_date: Optional[datetime] = Query(None, description="Range end (exclusive)"),
+    user_id: Optional[str] = Query(None, description="Filter by specific user ID"),
+    action: Optional[str] = Query(None, description="Filter by action type"),
+    limit: int = Query(100, ge=1, le=1000, description="Maximum rows to return"),
+):
+    """
+    Get raw activity log rows for any period, including archived history
+
+    Months older than the live retention window are read from the activity
+    log archive; newer rows come from the live table. Newest rows first.
+    """
+
+    validate_user_permissions(
+        current_user, [models.UserRole.SUPER_USER, models.UserRole.ADMIN_USER]
+    )
+
+    end_date = end_date or datetime.utcnow()
+    if end_date <= start_date:
+        raise HTTPException(
+            status_code=400, detail="end_date must be after start_date"
+        )
+
+    query = db.query(models.UserActivityLog).filter(
+        models.UserActivityLog.created_at >= start_date,
+        models.UserActivityLog.created_at < end_date,
+    )
+    if user_id:
+        query = query.filter(models.UserActivityLog.user_id == user_id)
+    if action:
+        query = query.filter(models.UserActivityLog.action == action)
+
+    live_rows = [
+        {
+            "id": log.id,
+            "user_id": log.user_id,
+            "action": log.action,
+            "ip_address": log.ip_address,
+            "created_at": log.created_at,
+            "details": log.details,
+            "source": "live",
+        }
+        for log in query.order_by(desc(models.UserActivityLog.created_at))
+        .limit(limit)
+        .all()
+    ]
+
+    # Archived months are removed from the live table, so both sources are
+    # disjoint; only archive files whose month overlaps the range are read.
+    archived_rows = heapq.nlargest(
+        limit,
+        (
+            {
+                "id": row["id"],
+                "user_id": row["user_id"],
+                "action": row["action"],
+                "ip_address": row["ip_address"],
+                "created_at": row["created_at"],
+                "details": row["details"],
+                "source": "archive",
+            }
+            for row in ActivityLogRetentionService(db).read_archive(
+                start_date, end_date, user_id=user_id, action=action
+            )
+        ),
+        key=lambda row: row["created_at"],
+    )
+
+    rows = heapq.nlargest(
+        limit, live_rows + archived_rows, key=lambda row: row["created_at"]
+    )
+
+    return {
+        "period": {
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+        },
+        "filter": {"user_id": user_id, "action": action},
+        "total_returned": len(rows),
+        "activities": [
+            {**row, "created_at": row["created_at"].isoformat()} for row in rows
+        ],
+    }
+
+
 def _format_time_ago(timestamp: datetime) -> str:
     """Helper function to format timestamp as 'time ago' string"""
     now = datetime.utcnow()
@@ -11,10 +11,11 @@ from sqlalchemy.orm import Session
 from sqlalchemy import text
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-import redis
 from pydantic import BaseModel, EmailStr
 
 from database import get_db
+from db_async import run_db
+from redis_pool import get_async_redis
 import models
 from models import UserRole
 import json
@@ -46,101 +47,32 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/v1.0/auth/token")
 
-# Redis for token blacklist and caching - lazy connection with error handling
-_redis_client = None
-_redis_available = False
-
-
-def get_redis_client():
-    """Get Redis client with lazy initialization and error handling"""
-    global _redis_client, _redis_available
-
-    if _redis_client is None:
-        try:
-            _redis_client = redis.Redis(
-                host=os.getenv("REDIS_HOST", "localhost"),
-                port=int(os.getenv("REDIS_PORT", 6379)),
-                db=int(os.getenv("REDIS_DB", 0)),
-                password=os.getenv("REDIS_PASSWORD", None),
-                decode_responses=True,
-                socket_timeout=1,  # Reduced timeout for faster response
-                socket_connect_timeout=1,
-                socket_keepalive=True,  # Keep connections alive
-                retry_on_timeout=True,  # Automatic retry on timeout
-                health_check_interval=30,  # Regular health checks
-            )
-            # Test connection
-            _redis_client.ping()
-            _redis_available = True
-            logger.info("Redis connection established successfully for auth")
-        except Exception as e:
-            logger.warning(
-                f"Redis not available for auth: {e}. Application will continue without Redis token caching."
-            )
-            _redis_available = False
-            _redis_client = None
-
-    return _redis_client if _redis_available else None
-
-
-# Wrapper for backward compatibility
+# Redis for token blacklist and caching - shared async pool with circuit breaking
 class RedisClientWrapper:
-    """Wrapper for Redis operations that handles connection errors gracefully"""
+    """Async Redis operations that degrade gracefully when Redis is unavailable"""
+
+    def __init__(self):
+        self._redis = get_async_redis()
 
-    def get(self, key: str):
+    async def get(self, key: str):
         """Get value from Redis (returns None if Redis unavailable)"""
-        client = get_redis_client()
-        if client:
-            try:
-                return client.get(key)
-            except Exception as e:
-                logger.warning(f"Redis get failed: {e}")
-                return None
-        return None
+        return await self._redis.get(key)
 
-    def setex(self, key: str, time: int, value: str):
+    async def setex(self, key: str, time: int, value: str):
         """Set value in Redis with expiration (silently fails if Redis unavailable)"""
-        client = get_redis_client()
-        if client:
-            try:
-                return client.setex(key, time, value)
-            except Exception as e:
-                logger.warning(f"Redis setex failed: {e}")
-                return False
-        return False
-
-    def delete(self, key: str):
+        return await self._redis.setex(key, time, value)
+
+    async def delete(self, key: str):
         """Delete key from Redis (silently fails if Redis unavailable)"""
-        client = get_redis_client()
-        if client:
-            try:
-                return client.delete(key)
-            except Exception as e:
-                logger.warning(f"Redis delete failed: {e}")
-                return False
-        return False
-
-    def getset(self, key: str, value: str):
+        return await self._redis.delete(key)
+
+    async def getset(self, key: str, value: str):
         """Get value and set new value atomically (returns None if Redis unavailable)"""
-        client = get_redis_client()
-        if client:
-            try:
-                return client.getset(key, value)
-            except Exception as e:
-                logger.warning(f"Redis getset failed: {e}")
-                return None
-        return None
+        return await self._redis.getset(key, value)
 
-    def exists(self, key: str):
-        """Check if key exists in Redis (returns False if Redis unavailable)"""
-        client = get_redis_client()
-        if client:
-            try:
-                return client.exists(key)
-            except Exception as e:
-                logger.warning(f"Redis exists failed: {e}")
-                return False
-        return False
+    async def exists(self, key: str):
+        """Check if key exists in Redis (returns 0 if Redis unavailable)"""
+        return await self._redis.exists(key)
 
 
 redis_client = RedisClientWrapper()
@@ -237,6 +169,14 @@ def get_user_by_id(db: Session, user_id: str) -> Optional[models.User]:
     return db.query(models.User).filter(models.User.id == user_id).first()
 
 
+def get_active_user_by_api_key(db: Session, api_key: str) -> Optional[models.User]:
+    return (
+        db.query(models.User)
+        .filter(models.User.api_key == api_key, models.User.is_active == True)
+        .first()
+    )
+
+
 def authenticate_user(
     db: Session, username: str, password: str
 ) -> Optional[models.User]:
@@ -344,7 +284,7 @@ async def get_current_user(
     )
 
     # Check if token is blacklisted
-    if redis_client.get(f"blacklist:{token}"):
+    if await redis_client.get(f"blacklist:{token}"):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has been revoked"
         )
@@ -371,7 +311,7 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
 
-    user = get_user_by_id(db, user_id=token_data.user_id)
+    user = await run_db(get_user_by_id, db, user_id=token_data.user_id)
     if user is None or not user.is_active:
         raise credentials_exception
 
@@ -456,7 +396,7 @@ async def ultra_fast_token(
 
     # ⚡ EXTREME PERFORMANCE: Check token cache first (fastest path)
     cache_key = f"auth_cache:{form_data.username}"
-    cached_token = redis_client.get(cache_key)
+    cached_token = await redis_client.get(cache_key)
 
     if cached_token:
         # Ultra-fast cache validation - minimal JWT decoding
@@ -522,7 +462,7 @@ async def ultra_fast_token(
 
     async def cache_token():
         try:
-            redis_client.setex(cache_key, cache_ttl, access_token)
+            await redis_client.setex(cache_key, cache_ttl, access_token)
         except:
             pass  # Cache failure doesn't affect response
 
@@ -798,7 +738,7 @@ async def reset_password(
 
         # 🚀 PERFORMANCE OPTIMIZATION: Invalidate auth cache on password change
         cache_key = f"auth_cache:{current_user.username}"
-        redis_client.delete(cache_key)
+        await redis_client.delete(cache_key)
 
         # Log successful password reset
         audit_logger = AuditLogger(db)
@@ -881,16 +821,16 @@ async def logout(
             current_timestamp = datetime.utcnow().timestamp()
             ttl = int(exp_timestamp - current_timestamp)
             if ttl > 0:
-                redis_client.setex(f"blacklist:{token}", ttl, "true")
+                await redis_client.setex(f"blacklist:{token}", ttl, "true")
     except JWTError:
         pass
 
     # Remove refresh token
-    redis_client.delete(f"refresh_token:{current_user.id}")
+    await redis_client.delete(f"refresh_token:{current_user.id}")
 
     # 🚀 PERFORMANCE OPTIMIZATION: Invalidate auth cache on logout
     cache_key = f"auth_cache:{current_user.username}"
-    redis_client.delete(cache_key)
+    await redis_client.delete(cache_key)
 
     # 📝 AUDIT LOG: Record successful logout
     audit_logger = AuditLogger(db)
@@ -939,7 +879,7 @@ async def logout_all_devices(
     - Immediate effect on token refresh attempts
     - Useful for security incidents
     """
-    redis_client.delete(f"refresh_token:{current_user.id}")
+    await redis_client.delete(f"refresh_token:{current_user.id}")
     return {"message": "Successfully logged out from all devices"}
 
 
@@ -1443,11 +1383,7 @@ async def authenticate_api_key(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="API Key required"
         )
 
-    user = (
-        db.query(models.User)
-        .filter(models.User.api_key == api_key, models.User.is_active == True)
-        .first()
-    )
+    user = await run_db(get_active_user_by_api_key, db, api_key)
 
     if not user:
         raise HTTPException(
@@ -1483,11 +1419,7 @@ async def authenticate_for_export(
 
     # Try API key authentication first (for General Users)
     if api_key:
-        user = (
-            db.query(models.User)
-            .filter(models.User.api_key == api_key, models.User.is_active == True)
-            .first()
-        )
+        user = await run_db(get_active_user_by_api_key, db, api_key)
 
         if user:
             # Check if API key has expired
@@ -1513,7 +1445,7 @@ async def authenticate_for_export(
         token = auth_header.split(" ")[1]
         try:
             # Check if token is blacklisted
-            if not redis_client.get(f"blacklist:{token}"):
+            if not await redis_client.get(f"blacklist:{token}"):
                 payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
 
                 # Support both standard and shortened key formats
@@ -1522,7 +1454,7 @@ async def authenticate_for_export(
                 token_type: str = payload.get("type") or payload.get("t")
 
                 if username and user_id and token_type in ["access", "a"]:
-                    user = get_user_by_id(db, user_id)
+                    user = await run_db(get_user_by_id, db, user_id)
                     if user and user.is_active:
                         # Only allow Super Users and Admin Users to use JWT tokens
                         if user.role in [
@@ -1557,11 +1489,7 @@ async def get_user_by_api_key_or_token(
     # Try API key authentication first
     api_key = request.headers.get("X-API-Key")
     if api_key:
-        user = (
-            db.query(models.User)
-            .filter(models.User.api_key == api_key, models.User.is_active == True)
-            .first()
-        )
+        user = await run_db(get_active_user_by_api_key, db, api_key)
 
         # Check if API key has expired
         if user and user.api_key_expires_at is not None:
@@ -1580,7 +1508,7 @@ async def get_user_by_api_key_or_token(
         token = auth_header.split(" ")[1]
         try:
             # Check if token is blacklisted
-            if not redis_client.get(f"blacklist:{token}"):
+            if not await redis_client.get(f"blacklist:{token}"):
                 payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
 
                 # Support both standard and shortened key formats
@@ -1589,7 +1517,7 @@ async def get_user_by_api_key_or_token(
                 token_type: str = payload.get("type") or payload.get("t")
 
                 if username and user_id and token_type in ["access", "a"]:
-                    user = get_user_by_id(db, user_id)
+                    user = await run_db(get_user_by_id, db, user_id)
                     if user and user.is_active:
                         return user
         except JWTError:
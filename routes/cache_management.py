@@ -10,6 +10,7 @@ from datetime import datetime
 
 from middleware.cache_invalidation import CacheManager, CacheWarmupService
 from cache_config import cache, CacheKeys
+from cache_bus import invalidation_bus, apublish_invalidation
 from routes.auth import get_current_user
 from models import User, UserRole
 
@@ -184,19 +185,11 @@ async def detailed_cache_health_check() -> Dict[str, Any]:
                 key_counts = {}
                 try:
                     key_counts = {
-                        "user_stats_keys": len(
-                            cache.redis_client.keys(f"{CacheKeys.USER_STATS}*")
-                        ),
-                        "user_list_keys": len(
-                            cache.redis_client.keys(f"{CacheKeys.USER_LIST}*")
-                        ),
-                        "user_details_keys": len(
-                            cache.redis_client.keys(f"{CacheKeys.USER_DETAILS}*")
-                        ),
-                        "dashboard_stats_keys": len(
-                            cache.redis_client.keys(f"{CacheKeys.DASHBOARD_STATS}*")
-                        ),
-                        "total_keys": len(cache.redis_client.keys("*")),
+                        "user_stats_keys": cache.count_keys(f"{CacheKeys.USER_STATS}*"),
+                        "user_list_keys": cache.count_keys(f"{CacheKeys.USER_LIST}*"),
+                        "user_details_keys": cache.count_keys(f"{CacheKeys.USER_DETAILS}*"),
+                        "dashboard_stats_keys": cache.count_keys(f"{CacheKeys.DASHBOARD_STATS}*"),
+                        "total_keys": cache.count_keys("*"),
                     }
                 except Exception as key_error:
                     logger.warning(f"Could not get key counts: {key_error}")
@@ -594,6 +587,66 @@ async def clear_user_cache(
         )
 
 
+@router.post("/clear/local/{cache_name}")
+async def clear_local_cache(
+    cache_name: str, current_user: Annotated[User, Depends(get_current_user)]
+) -> Dict[str, Any]:
+    """
+    Clear an In-Process Cache in Every Worker (Admin Only)
+
+    Broadcasts an invalidation on the cache invalidation bus so every API worker
+    drops its in-memory copy of the named cache. Use after data behind such a
+    cache changed outside the API, e.g. when the hotel CSV export is regenerated.
+
+    Known Caches:
+        - hotel_csv: Hotel name lookup and autocomplete indexes
+        - cities_by_country: Cities grouped by country
+        - access_control: Supplier permissions and IP whitelists
+        - tiered_l1: Per-process layer of the two-tier cache
+
+    Args:
+        cache_name (str): Name of the registered local cache
+        current_user: Currently authenticated admin user (injected by dependency)
+
+    Returns:
+        dict: Operation result with the cache name and who cleared it
+
+    Error Handling:
+        - 403: User lacks admin privileges
+        - 404: No local cache registered under that name
+    """
+    user_role = (
+        current_user.role.value
+        if hasattr(current_user.role, "value")
+        else str(current_user.role)
+    )
+    if user_role not in ["super_user", "admin_user"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admin users can clear caches",
+        )
+
+    if cache_name not in invalidation_bus.registered_names():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown local cache: {cache_name}",
+        )
+
+    await apublish_invalidation(cache_name)
+    logger.info(f"Local cache {cache_name} cleared in all workers by user: {current_user.id}")
+
+    return {
+        "success": True,
+        "message": f"Local cache '{cache_name}' cleared in all workers",
+        "timestamp": datetime.utcnow().isoformat(),
+        "cleared_by": {
+            "user_id": current_user.id,
+            "username": getattr(current_user, "username", "unknown"),
+            "role": user_role,
+        },
+    }
+
+
 @router.post("/warm")
 async def warm_caches(
     current_user: Annotated[User, Depends(get_current_user)],
@@ -871,19 +924,11 @@ async def cache_statistics(
 
                 # Get cache key counts by type
                 key_counts = {
-                    "user_stats_keys": len(
-                        cache.redis_client.keys(f"{CacheKeys.USER_STATS}*")
-                    ),
-                    "user_list_keys": len(
-                        cache.redis_client.keys(f"{CacheKeys.USER_LIST}*")
-                    ),
-                    "user_details_keys": len(
-                        cache.redis_client.keys(f"{CacheKeys.USER_DETAILS}*")
-                    ),
-                    "dashboard_stats_keys": len(
-                        cache.redis_client.keys(f"{CacheKeys.DASHBOARD_STATS}*")
-                    ),
-                    "total_keys": len(cache.redis_client.keys("*")),
+                    "user_stats_keys": cache.count_keys(f"{CacheKeys.USER_STATS}*"),
+                    "user_list_keys": cache.count_keys(f"{CacheKeys.USER_LIST}*"),
+                    "user_details_keys": cache.count_keys(f"{CacheKeys.USER_DETAILS}*"),
+                    "dashboard_stats_keys": cache.count_keys(f"{CacheKeys.DASHBOARD_STATS}*"),
+                    "total_keys": cache.count_keys("*"),
                 }
 
                 # Get performance metrics if available
@@ -1104,7 +1149,7 @@ async def test_cache_operations() -> Dict[str, Any]:
 
         # Test 2: Set operation with timing
         set_start = datetime.utcnow()
-        set_result = cache.set(test_key, test_value, 60)  # 60 second TTL
+        set_result = await cache.aset(test_key, test_value, 60)  # 60 second TTL
         set_end = datetime.utcnow()
         performance_metrics["set_duration_ms"] = (
             set_end - set_start
@@ -1113,7 +1158,7 @@ async def test_cache_operations() -> Dict[str, Any]:
 
         # Test 3: Get operation with timing and data integrity check
         get_start = datetime.utcnow()
-        get_result = cache.get(test_key)
+        get_result = await cache.aget(test_key)
         get_end = datetime.utcnow()
         performance_metrics["get_duration_ms"] = (
             get_end - get_start
@@ -1124,7 +1169,7 @@ async def test_cache_operations() -> Dict[str, Any]:
 
         # Test 4: Exists operation with timing
         exists_start = datetime.utcnow()
-        exists_result = cache.exists(test_key)
+        exists_result = await cache.aexists(test_key)
         exists_end = datetime.utcnow()
         performance_metrics["exists_duration_ms"] = (
             exists_end - exists_start
@@ -1133,7 +1178,7 @@ async def test_cache_operations() -> Dict[str, Any]:
 
         # Test 5: Delete operation with timing
         delete_start = datetime.utcnow()
-        delete_result = cache.delete(test_key)
+        delete_result = await cache.adelete(test_key)
         delete_end = datetime.utcnow()
         performance_metrics["delete_duration_ms"] = (
             delete_end - delete_start
@@ -1141,7 +1186,7 @@ async def test_cache_operations() -> Dict[str, Any]:
         test_results["delete_operation"] = bool(delete_result)
 
         # Test 6: Verify cleanup (get after delete)
-        get_after_delete = cache.get(test_key)
+        get_after_delete = await cache.aget(test_key)
         test_results["get_after_delete"] = get_after_delete is None
         test_results["cleanup_successful"] = get_after_delete is None
 
@@ -1217,7 +1262,7 @@ async def test_cache_operations() -> Dict[str, Any]:
     except Exception as e:
         # Ensure cleanup even on error
         try:
-            cache.delete(test_key)
+            await cache.adelete(test_key)
         except:
             pass  # Ignore cleanup errors
 
@@ -1354,14 +1354,14 @@ async def cache_health_check() -> Dict[str, Any]:
         
         # Test 2: Set operation with timing
         set_start = datetime.utcnow()
-        set_success = cache.set(test_key, test_value, 30)  # 30 second TTL
+        set_success = await cache.aset(test_key, test_value, 30)  # 30 second TTL
         set_end = datetime.utcnow()
         performance_metrics["set_operation_ms"] = (set_end - set_start).total_seconds() * 1000
         cache_status["operations"]["set"] = bool(set_success)
         
         # Test 3: Get operation with timing and data integrity check
         get_start = datetime.utcnow()
-        get_result = cache.get(test_key)
+        get_result = await cache.aget(test_key)
         get_end = datetime.utcnow()
         performance_metrics["get_operation_ms"] = (get_end - get_start).total_seconds() * 1000
         
@@ -1370,13 +1370,13 @@ async def cache_health_check() -> Dict[str, Any]:
         
         # Test 4: Delete operation with timing
         delete_start = datetime.utcnow()
-        delete_success = cache.delete(test_key)
+        delete_success = await cache.adelete(test_key)
         delete_end = datetime.utcnow()
         performance_metrics["delete_operation_ms"] = (delete_end - delete_start).total_seconds() * 1000
         cache_status["operations"]["delete"] = bool(delete_success)
         
         # Test 5: Verify cleanup
-        cleanup_check = cache.get(test_key)
+        cleanup_check = await cache.aget(test_key)
         cache_status["cleanup_successful"] = cleanup_check is None
         
         # Calculate total duration
@@ -1437,7 +1437,7 @@ async def cache_health_check() -> Dict[str, Any]:
         # Ensure cleanup even on error
         try:
             from cache_config import cache
-            cache.delete(test_key)
+            await cache.adelete(test_key)
         except:
             pass  # Ignore cleanup errors
         
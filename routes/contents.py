@@ -2,14 +2,13 @@ from fastapi import APIRouter, Depends, HTTPException, status, Query, Body, Requ
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import func
 from database import get_db
+from db_async import run_db
 from models import (
     Hotel,
     ProviderMapping,
     Location,
     Contact,
-    UserProviderPermission,
     UserRole,
-    UserIPWhitelist,
 )
 from pydantic import BaseModel
 from typing import List, Optional, Annotated, Dict, Any
@@ -29,55 +28,9 @@ from routes.path import RAW_BASE_DIR
 import os
 from routes.auth import get_current_user
 
-# Simple in-memory cache for user permissions (cleared periodically)
-_user_permissions_cache = {}
-_cache_ttl = 300  # 5 minutes cache TTL in seconds
-import time
-
-
-def _get_cached_user_permissions(user_id: int, db: Session):
-    """
-    Get user permissions from cache or database with TTL-based invalidation
-    """
-    current_time = time.time()
-
-    # Check cache
-    cached_data = _user_permissions_cache.get(user_id)
-    if cached_data and current_time - cached_data["timestamp"] < _cache_ttl:
-        return cached_data["permissions"]
-
-    # Cache miss or expired - fetch from database
-    permissions = [
-        perm.provider_name
-        for perm in db.query(UserProviderPermission)
-        .filter(UserProviderPermission.user_id == user_id)
-        .all()
-    ]
-
-    # Update cache
-    _user_permissions_cache[user_id] = {
-        "permissions": permissions,
-        "timestamp": current_time,
-    }
-
-    return permissions
-
-
-def _clear_permissions_cache():
-    """Clear expired cache entries"""
-    current_time = time.time()
-    expired_users = [
-        user_id
-        for user_id, data in _user_permissions_cache.items()
-        if current_time - data["timestamp"] > _cache_ttl
-    ]
-
-    for user_id in expired_users:
-        del _user_permissions_cache[user_id]
-
-
 from middleware.ip_middleware import get_client_ip
-from rapidfuzz import fuzz, process
+from services.access_control_service import check_ip_whitelist, get_user_access
+from cache_bus import register_local_cache
 
 from schemas import ProviderProperty, GetAllHotelResponse
 
@@ -93,43 +46,6 @@ router = APIRouter(
 )
 
 
-def check_ip_whitelist(user_id: str, request: Request, db: Session) -> bool:
-    """
-    Check if the user's IP address is in the whitelist.
-
-    Args:
-        user_id (str): The user ID to check
-        request (Request): The FastAPI request object
-        db (Session): Database session
-
-    Returns:
-        bool: True if IP is whitelisted, False otherwise
-    """
-    try:
-        # Get client IP using the middleware function
-        client_ip = get_client_ip(request)
-
-        if not client_ip:
-            return False
-
-        # Check if the user has any active IP whitelist entries for this IP
-        whitelist_entry = (
-            db.query(UserIPWhitelist)
-            .filter(
-                UserIPWhitelist.user_id == user_id,
-                UserIPWhitelist.ip_address == client_ip,
-                UserIPWhitelist.is_active == True,
-            )
-            .first()
-        )
-
-        return whitelist_entry is not None
-
-    except Exception as e:
-        print(f"Error checking IP whitelist: {str(e)}")
-        return False
-
-
 # def check_ip_whitelist(user_id: str, request: Request, db: Session) -> bool:
 #     """
 #     Check if the user's IP is whitelisted
@@ -277,16 +193,7 @@ async def get_hotel_details_internal(
             models.UserRole.ADMIN_USER,
         ]:
             # Check if general user has permission for this supplier
-            user_supplier_permission = (
-                db.query(models.UserProviderPermission)
-                .filter(
-                    models.UserProviderPermission.user_id == current_user.id,
-                    models.UserProviderPermission.provider_name == supplier_code,
-                )
-                .first()
-            )
-
-            if not user_supplier_permission:
+            if supplier_code not in get_user_access(current_user.id, db).granted:
                 # User doesn't have permission for this supplier
                 return None
 
@@ -439,37 +346,18 @@ def get_basic_country_info(
     try:
         # FAST PERMISSION CHECK - Check user permissions for the requested supplier
         if current_user.role not in [UserRole.SUPER_USER, UserRole.ADMIN_USER]:
-            # Get user permissions efficiently (single query)
-            user_permissions = (
-                db.query(UserProviderPermission.provider_name)
-                .filter(UserProviderPermission.user_id == current_user.id)
-                .all()
-            )
+            # Get user permissions from the access-control cache
+            access = get_user_access(current_user.id, db)
 
-            if not user_permissions:
+            if not access.permissions:
                 raise HTTPException(
                     status_code=status.HTTP_403_FORBIDDEN,
                     detail="You do not have permission to access any suppliers. Please contact your administrator.",
                 )
 
-            # Extract permission names and check for temporary deactivations
-            permission_names = [perm.provider_name for perm in user_permissions]
-            temp_deactivated_suppliers = []
-            active_suppliers = []
-
-            for perm_name in permission_names:
-                if perm_name.startswith("TEMP_DEACTIVATED_"):
-                    original_name = perm_name.replace("TEMP_DEACTIVATED_", "")
-                    temp_deactivated_suppliers.append(original_name)
-                else:
-                    active_suppliers.append(perm_name)
-
-            # Remove temporarily deactivated suppliers from active list
-            final_active_suppliers = [
-                supplier
-                for supplier in active_suppliers
-                if supplier not in temp_deactivated_suppliers
-            ]
+            # Temporarily deactivated suppliers are already removed
+            temp_deactivated_suppliers = access.deactivated_set
+            final_active_suppliers = access.active_suppliers
 
             # Check if user has permission for the requested supplier
             if request.supplier not in final_active_suppliers:
@@ -485,19 +373,9 @@ def get_basic_country_info(
                     )
         else:
             # For super/admin users, check for temporary deactivations
-            user_permissions = (
-                db.query(UserProviderPermission.provider_name)
-                .filter(
-                    UserProviderPermission.user_id == current_user.id,
-                    UserProviderPermission.provider_name.like("TEMP_DEACTIVATED_%"),
-                )
-                .all()
-            )
-
-            temp_deactivated_suppliers = [
-                perm.provider_name.replace("TEMP_DEACTIVATED_", "")
-                for perm in user_permissions
-            ]
+            temp_deactivated_suppliers = get_user_access(
+                current_user.id, db
+            ).deactivated_set
 
             if request.supplier in temp_deactivated_suppliers:
                 raise HTTPException(
@@ -621,12 +499,7 @@ async def get_hotel_data_provider_name_and_id(
             deduct_points_for_general_user(current_user, db)
 
             # load permissions
-            allowed_providers = [
-                p.provider_name
-                for p in db.query(UserProviderPermission)
-                .filter(UserProviderPermission.user_id == current_user.id)
-                .all()
-            ]
+            allowed_providers = list(get_user_access(current_user.id, db).permissions)
             # **early error if truly no permissions**
             if not allowed_providers:
                 raise HTTPException(
@@ -668,12 +541,7 @@ async def get_hotel_data_provider_name_and_id(
             # For general users, check if they have active permission for this specific supplier
             if current_user.role == models.UserRole.GENERAL_USER:
                 # Get all user permissions
-                all_permissions = [
-                    perm.provider_name
-                    for perm in db.query(models.UserProviderPermission)
-                    .filter(models.UserProviderPermission.user_id == current_user.id)
-                    .all()
-                ]
+                all_permissions = list(get_user_access(current_user.id, db).permissions)
 
                 # Check for temporary deactivation
                 temp_deactivated_name = f"TEMP_DEACTIVATED_{name}"
@@ -692,18 +560,7 @@ async def get_hotel_data_provider_name_and_id(
                     continue
             else:
                 # For super/admin users, check for temporary deactivation only
-                temp_deactivated_permissions = [
-                    perm.provider_name
-                    for perm in db.query(models.UserProviderPermission)
-                    .filter(
-                        models.UserProviderPermission.user_id == current_user.id,
-                        models.UserProviderPermission.provider_name
-                        == f"TEMP_DEACTIVATED_{name}",
-                    )
-                    .all()
-                ]
-
-                if temp_deactivated_permissions:
+                if get_user_access(current_user.id, db).is_deactivated(name):
                     print(
                         f"Supplier is temporarily deactivated for admin/super user: {name}"
                     )
@@ -980,12 +837,7 @@ def get_hotel_mapping_data_using_provider_name_and_id(
             deduct_points_for_general_user(current_user, db)
 
             # load permissions
-            allowed_providers = [
-                p.provider_name
-                for p in db.query(UserProviderPermission)
-                .filter(UserProviderPermission.user_id == current_user.id)
-                .all()
-            ]
+            allowed_providers = list(get_user_access(current_user.id, db).permissions)
             # **early error if truly no permissions**
             if not allowed_providers:
                 raise HTTPException(
@@ -1131,7 +983,7 @@ async def get_hotels_using_ittid_list(
     print(
         f"🚀 About to call IP whitelist check for user: {current_user.id} in get-basic-info-follow-countryCode"
     )
-    if not check_ip_whitelist(current_user.id, http_request, db):
+    if not await run_db(check_ip_whitelist, current_user.id, http_request, db):
         # Extract client IP for error message using middleware
         client_ip = get_client_ip(http_request) or "unknown"
 
@@ -1151,166 +1003,45 @@ async def get_hotels_using_ittid_list(
             },
         )
     try:
-        # 🚫 NO POINT DEDUCTION for super_user and admin_user
-        if current_user.role == models.UserRole.GENERAL_USER:
-            deduct_points_for_general_user(current_user, db)
-        elif current_user.role in [
-            models.UserRole.SUPER_USER,
-            models.UserRole.ADMIN_USER,
-        ]:
-            print(
-                f"🔓 Point deduction skipped for {current_user.role}: {current_user.email}"
-            )
-
-        # Fetch hotels
-        hotels = (
-            db.query(models.Hotel).filter(models.Hotel.ittid.in_(request.ittid)).all()
+        # All DB work in one threadpool hop; details are then fetched concurrently
+        hotel_mappings = await run_db(
+            _load_ittid_provider_mappings, current_user, request.ittid, db
         )
-        if not hotels:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="No hotels found for the provided ittid values.",
-            )
 
         result = []
-
-        # For General Users: only allowed providers (excluding temp deactivated)
-        if current_user.role == models.UserRole.GENERAL_USER:
-            # Get all user permissions (including temp deactivated ones)
-            all_permissions = [
-                permission.provider_name
-                for permission in db.query(UserProviderPermission)
-                .filter(UserProviderPermission.user_id == current_user.id)
-                .all()
-            ]
-
-            # Separate active and temporarily deactivated suppliers
-            temp_deactivated_suppliers = []
-            allowed_providers = []
-
-            for perm in all_permissions:
-                if perm.startswith("TEMP_DEACTIVATED_"):
-                    original_name = perm.replace("TEMP_DEACTIVATED_", "")
-                    temp_deactivated_suppliers.append(original_name)
-                else:
-                    allowed_providers.append(perm)
-
-            # Remove temporarily deactivated suppliers from allowed providers
-            final_allowed_providers = [
-                provider
-                for provider in allowed_providers
-                if provider not in temp_deactivated_suppliers
-            ]
-
-            for hotel in hotels:
-                provider_mappings = (
-                    db.query(models.ProviderMapping)
-                    .filter(
-                        models.ProviderMapping.ittid == hotel.ittid,
-                        models.ProviderMapping.provider_name.in_(
-                            final_allowed_providers
-                        ),
-                    )
-                    .all()
+        for ittid, provider_mappings in hotel_mappings:
+            formatted_provider_mappings = []
+            if provider_mappings:
+                details_list = await asyncio.gather(
+                    *[
+                        _get_hotel_details_internal_fast(
+                            mapping.provider_name, mapping.provider_id
+                        )
+                        for mapping in provider_mappings
+                    ]
                 )
 
-                formatted_provider_mappings = []
-                if provider_mappings:
-                    details_list = await asyncio.gather(
-                        *[
-                            _get_hotel_details_internal_fast(
-                                mapping.provider_name, mapping.provider_id
-                            )
-                            for mapping in provider_mappings
-                        ]
-                    )
-
-                    for mapping, hotel_details in zip(provider_mappings, details_list):
-                        # FILTER: Only include mappings with non-null full_details
-                        if hotel_details is not None:
-                            mapping_data = {
-                                "id": mapping.id,
-                                "ittid": mapping.ittid,
-                                "provider_name": mapping.provider_name,
-                                "provider_id": mapping.provider_id,
-                                "updated_at": mapping.updated_at,
-                                "full_details": hotel_details,
-                            }
-                            formatted_provider_mappings.append(mapping_data)
-
-                # Only include hotel in result if it has valid provider mappings
-                if formatted_provider_mappings:
-                    result.append(
-                        {
-                            "ittid": hotel.ittid,
-                            "provider_mappings": formatted_provider_mappings,
+                for mapping, hotel_details in zip(provider_mappings, details_list):
+                    # FILTER: Only include mappings with non-null full_details
+                    if hotel_details is not None:
+                        mapping_data = {
+                            "id": mapping.id,
+                            "ittid": mapping.ittid,
+                            "provider_name": mapping.provider_name,
+                            "provider_id": mapping.provider_id,
+                            "updated_at": mapping.updated_at,
+                            "full_details": hotel_details,
                         }
-                    )
-        else:
-            # For SUPER/ADMIN users – return all mappings with full details (excluding temp deactivated)
-            # Get temporarily deactivated suppliers for super/admin users
-            all_permissions = [
-                permission.provider_name
-                for permission in db.query(UserProviderPermission)
-                .filter(UserProviderPermission.user_id == current_user.id)
-                .all()
-            ]
+                        formatted_provider_mappings.append(mapping_data)
 
-            temp_deactivated_suppliers = []
-            for perm in all_permissions:
-                if perm.startswith("TEMP_DEACTIVATED_"):
-                    original_name = perm.replace("TEMP_DEACTIVATED_", "")
-                    temp_deactivated_suppliers.append(original_name)
-
-            for hotel in hotels:
-                all_provider_mappings = (
-                    db.query(models.ProviderMapping)
-                    .filter(models.ProviderMapping.ittid == hotel.ittid)
-                    .all()
+            # Only include hotel in result if it has valid provider mappings
+            if formatted_provider_mappings:
+                result.append(
+                    {
+                        "ittid": ittid,
+                        "provider_mappings": formatted_provider_mappings,
+                    }
                 )
-
-                # Filter out temporarily deactivated suppliers
-                if temp_deactivated_suppliers:
-                    provider_mappings = [
-                        pm
-                        for pm in all_provider_mappings
-                        if pm.provider_name not in temp_deactivated_suppliers
-                    ]
-                else:
-                    provider_mappings = all_provider_mappings
-
-                formatted_provider_mappings = []
-                if provider_mappings:
-                    details_list = await asyncio.gather(
-                        *[
-                            _get_hotel_details_internal_fast(
-                                mapping.provider_name, mapping.provider_id
-                            )
-                            for mapping in provider_mappings
-                        ]
-                    )
-
-                    for mapping, hotel_details in zip(provider_mappings, details_list):
-                        # FILTER: Only include mappings with non-null full_details
-                        if hotel_details is not None:
-                            mapping_data = {
-                                "id": mapping.id,
-                                "ittid": mapping.ittid,
-                                "provider_name": mapping.provider_name,
-                                "provider_id": mapping.provider_id,
-                                "updated_at": mapping.updated_at,
-                                "full_details": hotel_details,
-                            }
-                            formatted_provider_mappings.append(mapping_data)
-
-                # Only include hotel in result if it has valid provider mappings
-                if formatted_provider_mappings:
-                    result.append(
-                        {
-                            "ittid": hotel.ittid,
-                            "provider_mappings": formatted_provider_mappings,
-                        }
-                    )
         return result
     except HTTPException:
         raise
@@ -1321,6 +1052,55 @@ async def get_hotels_using_ittid_list(
         )
 
 
+def _load_ittid_provider_mappings(
+    current_user: models.User, ittids: List[str], db: Session
+) -> List[tuple]:
+    """
+    Deduct points and load the visible provider mappings for each requested hotel.
+
+    Runs on the DB threadpool. General users only see their active suppliers;
+    super/admin users see every supplier that is not temporarily deactivated.
+
+    Returns:
+        ``(ittid, [ProviderMapping, ...])`` pairs in hotel order
+    """
+    # 🚫 NO POINT DEDUCTION for super_user and admin_user
+    if current_user.role == models.UserRole.GENERAL_USER:
+        deduct_points_for_general_user(current_user, db)
+    elif current_user.role in [
+        models.UserRole.SUPER_USER,
+        models.UserRole.ADMIN_USER,
+    ]:
+        print(f"🔓 Point deduction skipped for {current_user.role}: {current_user.email}")
+
+    # Fetch hotels
+    hotels = db.query(models.Hotel).filter(models.Hotel.ittid.in_(ittids)).all()
+    if not hotels:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No hotels found for the provided ittid values.",
+        )
+
+    access = get_user_access(current_user.id, db)
+    query = db.query(models.ProviderMapping).filter(
+        models.ProviderMapping.ittid.in_([hotel.ittid for hotel in hotels])
+    )
+    if current_user.role == models.UserRole.GENERAL_USER:
+        # For General Users: only allowed providers (excluding temp deactivated)
+        query = query.filter(
+            models.ProviderMapping.provider_name.in_(list(access.active_suppliers))
+        )
+
+    mappings_by_ittid: Dict[str, list] = {}
+    for mapping in query.order_by(models.ProviderMapping.id).all():
+        # For SUPER/ADMIN users – all mappings except temp deactivated suppliers
+        if mapping.provider_name in access.deactivated_set:
+            continue
+        mappings_by_ittid.setdefault(mapping.ittid, []).append(mapping)
+
+    return [(hotel.ittid, mappings_by_ittid.get(hotel.ittid, [])) for hotel in hotels]
+
+
 @router.get("/get-hotel-with-ittid/{ittid}", status_code=status.HTTP_200_OK)
 async def get_hotel_using_ittid(
     http_request: Request,
@@ -1417,12 +1197,7 @@ async def get_hotel_using_ittid(
         # Check user-specific permissions for general users
         if current_user.role == models.UserRole.GENERAL_USER:
             # Get all user permissions (including temp deactivated ones)
-            all_permissions = [
-                permission.provider_name
-                for permission in db.query(UserProviderPermission)
-                .filter(UserProviderPermission.user_id == current_user.id)
-                .all()
-            ]
+            all_permissions = list(get_user_access(current_user.id, db).permissions)
 
             # Separate active and temporarily deactivated suppliers
             temp_deactivated_suppliers = []
@@ -1468,12 +1243,7 @@ async def get_hotel_using_ittid(
                 )
         else:
             # For super/admin users, pre-load temporarily deactivated suppliers once
-            all_permissions = [
-                permission.provider_name
-                for permission in db.query(UserProviderPermission)
-                .filter(UserProviderPermission.user_id == current_user.id)
-                .all()
-            ]
+            all_permissions = list(get_user_access(current_user.id, db).permissions)
 
             for perm in all_permissions:
                 if perm.startswith("TEMP_DEACTIVATED_"):
@@ -1690,12 +1460,7 @@ async def get_full_hotel_with_primary_photo(
         # Check user permissions
         if current_user.role == models.UserRole.GENERAL_USER:
             try:
-                all_permissions = [
-                    str(permission.provider_name) if permission.provider_name else ""
-                    for permission in db.query(UserProviderPermission)
-                    .filter(UserProviderPermission.user_id == current_user.id)
-                    .all()
-                ]
+                all_permissions = list(get_user_access(current_user.id, db).permissions)
 
                 temp_deactivated_suppliers = []
                 allowed_providers = []
@@ -1752,12 +1517,7 @@ async def get_full_hotel_with_primary_photo(
         # Get provider mappings based on user role
         if current_user.role == models.UserRole.GENERAL_USER:
             try:
-                all_permissions = [
-                    str(permission.provider_name) if permission.provider_name else ""
-                    for permission in db.query(UserProviderPermission)
-                    .filter(UserProviderPermission.user_id == current_user.id)
-                    .all()
-                ]
+                all_permissions = list(get_user_access(current_user.id, db).permissions)
 
                 temp_deactivated_suppliers = []
                 allowed_providers = []
@@ -1793,12 +1553,7 @@ async def get_full_hotel_with_primary_photo(
                 )
         else:
             try:
-                all_permissions = [
-                    str(permission.provider_name) if permission.provider_name else ""
-                    for permission in db.query(UserProviderPermission)
-                    .filter(UserProviderPermission.user_id == current_user.id)
-                    .all()
-                ]
+                all_permissions = list(get_user_access(current_user.id, db).permissions)
 
                 temp_deactivated_suppliers = []
                 for perm in all_permissions:
@@ -2019,12 +1774,7 @@ def get_all_hotels(
         # Only deduct points for general_user
         if current_user.role == UserRole.GENERAL_USER:
             deduct_points_for_general_user(current_user, db)
-            allowed_providers = [
-                p.provider_name
-                for p in db.query(UserProviderPermission)
-                .filter(UserProviderPermission.user_id == current_user.id)
-                .all()
-            ]
+            allowed_providers = list(get_user_access(current_user.id, db).permissions)
             if not allowed_providers:
                 raise HTTPException(
                     status_code=status.HTTP_403_FORBIDDEN,
@@ -2285,12 +2035,7 @@ async def get_all_ittid(
         if current_user.role == UserRole.GENERAL_USER:
             deduct_points_for_general_user(current_user, db)
 
-            allowed_providers = [
-                p.provider_name
-                for p in db.query(UserProviderPermission)
-                .filter(UserProviderPermission.user_id == current_user.id)
-                .all()
-            ]
+            allowed_providers = list(get_user_access(current_user.id, db).permissions)
             if not allowed_providers:
                 raise HTTPException(
                     status_code=403,
@@ -2531,12 +2276,7 @@ async def get_all_hotel_only_supplier(
         # --- Authorization & points deduction ---
         if current_user.role == models.UserRole.GENERAL_USER:
             deduct_points_for_general_user(current_user, db)
-            allowed = [
-                p.provider_name
-                for p in db.query(models.UserProviderPermission).filter_by(
-                    user_id=current_user.id
-                )
-            ]
+            allowed = get_user_access(current_user.id, db).granted
             if request.provider_name not in allowed:
                 raise HTTPException(
                     status_code=status.HTTP_403_FORBIDDEN,
@@ -2827,20 +2567,11 @@ def get_update_provider_info(
                 detail="Invalid date format. Use YYYY-MM-DD format (e.g., '2023-01-01').",
             )
 
-        # Clear expired cache entries
-        _clear_permissions_cache()
-
-        # Optimized permission handling with caching
+        # Optimized permission handling with the access-control cache
+        access = get_user_access(current_user.id, db)
         if current_user.role in [UserRole.SUPER_USER, UserRole.ADMIN_USER]:
-            # For super users, get temp deactivated suppliers using cached permissions
-            all_permissions = _get_cached_user_permissions(current_user.id, db)
-
-            # Get temporarily deactivated suppliers
-            temp_deactivated_suppliers = []
-            for perm in all_permissions:
-                if perm.startswith("TEMP_DEACTIVATED_"):
-                    original_name = perm.replace("TEMP_DEACTIVATED_", "")
-                    temp_deactivated_suppliers.append(original_name)
+            # For super users, only temporarily deactivated suppliers matter
+            temp_deactivated_suppliers = list(access.deactivated_suppliers)
 
             if temp_deactivated_suppliers:
                 # Use subquery to get all provider names except temp deactivated
@@ -2857,26 +2588,8 @@ def get_update_provider_info(
             else:
                 allowed_providers = None
         else:
-            # For regular users, use cached permissions
-            all_permissions = _get_cached_user_permissions(current_user.id, db)
-
-            # Separate active and temporarily deactivated suppliers
-            temp_deactivated_suppliers = []
-            active_providers = []
-
-            for perm in all_permissions:
-                if perm.startswith("TEMP_DEACTIVATED_"):
-                    original_name = perm.replace("TEMP_DEACTIVATED_", "")
-                    temp_deactivated_suppliers.append(original_name)
-                else:
-                    active_providers.append(perm)
-
-            # Remove temporarily deactivated suppliers from allowed providers
-            allowed_providers = [
-                provider
-                for provider in active_providers
-                if provider not in temp_deactivated_suppliers
-            ]
+            # For regular users, temporarily deactivated suppliers are already removed
+            allowed_providers = list(access.active_suppliers)
 
             if not allowed_providers:
                 raise HTTPException(
@@ -3160,6 +2873,17 @@ def _load_hotel_names_cache():
 _hotel_details_cache = None
 
 
+def _reset_hotel_csv_caches(key: Optional[str] = None):
+    """Drop the hotel CSV caches (called for every worker via the cache bus)"""
+    global _hotel_data_cache, _hotel_names_cache, _hotel_details_cache
+    _hotel_data_cache = None
+    _hotel_names_cache = None
+    _hotel_details_cache = None
+
+
+register_local_cache("hotel_csv", _reset_hotel_csv_caches)
+
+
 def _load_hotel_details_cache():
     """Load detailed hotel data into memory cache for autocomplete-all"""
     global _hotel_details_cache
@@ -3270,7 +2994,6 @@ import sys
 import os
 
 sys.path.append(os.path.join(os.path.dirname(__file__), "..", "typesense"))
-from client import get_typesense_client
 
 
 @router.get("/autocomplete-typesense", status_code=status.HTTP_200_OK)
@@ -3331,7 +3054,9 @@ def autocomplete_hotel_typesense(
         if not query:
             return {"results": [], "count": 0, "search_time_ms": 0}
 
-        # Get Typesense client
+        # Get Typesense client (the typesense package is imported on first use)
+        from client import get_typesense_client
+
         client = get_typesense_client()
 
         # Search parameters
@@ -3472,7 +3197,9 @@ def autocomplete_hotel_all(
                 hotel_search_strings.append((search_str, hotel))
 
             # Use rapidfuzz's optimized process.extract (much faster than manual loop)
-            # It uses C++ implementation under the hood
+            # It uses C++ implementation under the hood; imported on first use
+            from rapidfuzz import fuzz, process
+
             matches = process.extract(
                 search_query,
                 [item[0] for item in hotel_search_strings],
@@ -3612,32 +3339,17 @@ def get_all_hotel_with_supplier(
 
         # ULTRA-FAST PERMISSION CHECK - Single query with set operations
         if current_user.role not in [UserRole.SUPER_USER, UserRole.ADMIN_USER]:
-            # Single query to get all permissions as a set for O(1) lookups
-            permission_names = {
-                perm[0]
-                for perm in db.query(UserProviderPermission.provider_name)
-                .filter(UserProviderPermission.user_id == current_user.id)
-                .all()
-            }
+            # Precomputed permission sets from the access-control cache
+            access = get_user_access(current_user.id, db)
 
-            if not permission_names:
+            if not access.granted:
                 raise HTTPException(
                     status_code=status.HTTP_403_FORBIDDEN,
                     detail="You do not have permission to access any suppliers.",
                 )
 
-            # Fast set operations for temp deactivated suppliers
-            temp_deactivated = {
-                name.replace("TEMP_DEACTIVATED_", "")
-                for name in permission_names
-                if name.startswith("TEMP_DEACTIVATED_")
-            }
-            active_suppliers = {
-                name
-                for name in permission_names
-                if not name.startswith("TEMP_DEACTIVATED_")
-            }
-            final_active = active_suppliers - temp_deactivated
+            temp_deactivated = access.deactivated_set
+            final_active = access.active_set
 
             # Fast set intersection checks
             requested_set = set(request.supplier_name)
@@ -3659,15 +3371,7 @@ def get_all_hotel_with_supplier(
             allowed_suppliers = list(final_active & requested_set)
         else:
             # Super/admin users - only check temp deactivations
-            temp_deactivated = {
-                perm[0].replace("TEMP_DEACTIVATED_", "")
-                for perm in db.query(UserProviderPermission.provider_name)
-                .filter(
-                    UserProviderPermission.user_id == current_user.id,
-                    UserProviderPermission.provider_name.like("TEMP_DEACTIVATED_%"),
-                )
-                .all()
-            }
+            temp_deactivated = get_user_access(current_user.id, db).deactivated_set
 
             temp_deactivated_requested = set(request.supplier_name) & temp_deactivated
             if temp_deactivated_requested:
@@ -3929,36 +3633,23 @@ def get_all_hotel_id_by_supplier(
 
         # Check user permissions for the requested supplier
         if current_user.role not in [UserRole.SUPER_USER, UserRole.ADMIN_USER]:
-            # Get user permissions efficiently (single query)
-            user_permissions = (
-                db.query(UserProviderPermission.provider_name)
-                .filter(UserProviderPermission.user_id == current_user.id)
-                .all()
-            )
+            # Get user permissions from the access-control cache
+            access = get_user_access(current_user.id, db)
 
-            if not user_permissions:
+            if not access.permissions:
                 raise HTTPException(
                     status_code=status.HTTP_403_FORBIDDEN,
                     detail="You do not have permission to access any suppliers. Please contact your administrator.",
                 )
 
-            # Extract permission names and check for temporary deactivations
-            permission_names = [perm.provider_name for perm in user_permissions]
-            temp_deactivated_suppliers = []
-            active_suppliers = []
-
-            for perm_name in permission_names:
-                if perm_name.startswith("TEMP_DEACTIVATED_"):
-                    original_name = perm_name.replace("TEMP_DEACTIVATED_", "")
-                    temp_deactivated_suppliers.append(original_name.lower())
-                else:
-                    active_suppliers.append(perm_name.lower())
-
-            # Remove temporarily deactivated suppliers from active list
+            # Compare case-insensitively, without temporarily deactivated suppliers
+            temp_deactivated_suppliers = {
+                name.lower() for name in access.deactivated_suppliers
+            }
             final_active_suppliers = [
-                supplier
-                for supplier in active_suppliers
-                if supplier not in temp_deactivated_suppliers
+                name.lower()
+                for name in access.active_suppliers
+                if name.lower() not in temp_deactivated_suppliers
             ]
 
             # Check if user has permission for the requested supplier
@@ -3975,18 +3666,9 @@ def get_all_hotel_id_by_supplier(
                     )
         else:
             # For super/admin users, check for temporary deactivations
-            user_permissions = (
-                db.query(UserProviderPermission.provider_name)
-                .filter(
-                    UserProviderPermission.user_id == current_user.id,
-                    UserProviderPermission.provider_name.like("TEMP_DEACTIVATED_%"),
-                )
-                .all()
-            )
-
             temp_deactivated_suppliers = [
-                perm.provider_name.replace("TEMP_DEACTIVATED_", "").lower()
-                for perm in user_permissions
+                name.lower()
+                for name in get_user_access(current_user.id, db).deactivated_suppliers
             ]
 
             if supplier_name_lower in temp_deactivated_suppliers:
@@ -8,14 +8,16 @@ from sqlalchemy import func, and_, or_
 from sqlalchemy.exc import OperationalError
 from typing import Dict, Any
 from datetime import datetime, timedelta
-from fastapi_cache.decorator import cache
+from tiered_cache import two_tier_cache
 import asyncio
 
-from database import get_db
+from database import get_read_db
+from db_async import db_offload
 from routes.auth import get_current_active_user
 import models
 from models import UserRole
 from schemas import NewUserDashboardResponse
+from services.hotel_analytics_service import HotelAnalyticsService
 
 router = APIRouter(
     prefix="/v1.0/dashboard",
@@ -129,9 +131,10 @@ def require_admin_or_superuser(current_user: models.User) -> models.User:
 
 
 @router.get("/stats")
-async def get_dashboard_stats(
+@db_offload
+def get_dashboard_stats(
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ) -> Dict[str, Any]:
     """
     Get Comprehensive Dashboard Statistics (Admin and Super User Only)
@@ -410,9 +413,10 @@ async def get_dashboard_stats(
 
 
 @router.get("/user-activity")
-async def get_user_activity_stats(
+@db_offload
+def get_user_activity_stats(
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     days: int = 30,
 ) -> Dict[str, Any]:
     """
@@ -664,9 +668,10 @@ async def get_user_activity_stats(
 
 
 @router.get("/points-summary")
-async def get_points_summary(
+@db_offload
+def get_points_summary(
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ) -> Dict[str, Any]:
     """
     Get Detailed Points and Transaction Statistics (Admin and Super User Only)
@@ -987,9 +992,10 @@ async def get_points_summary(
 
 
 @router.get("/system-health")
-async def get_system_health(
+@db_offload
+def get_system_health(
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ) -> Dict[str, Any]:
     """
     Get System Health and Performance Metrics (Admin and Super User Only)
@@ -1282,9 +1288,10 @@ async def get_system_health(
 
 
 @router.get("/hotel-analytics")
-async def get_hotel_analytics(
+@db_offload
+def get_hotel_analytics(
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ) -> Dict[str, Any]:
     """
     Get Hotel and Location Analytics (Admin and Super User Only)
@@ -1294,6 +1301,8 @@ async def get_hotel_analytics(
     hotel inventory, geographic coverage, and data quality.
 
     Features:
+    - Served from the hotel_analytics_rollup table (bounded memory, no
+      per-request table scans); refreshed when older than 15 minutes
     - Hotel inventory and distribution analysis
     - Geographic coverage and location analytics
     - Provider mapping and integration statistics
@@ -1320,7 +1329,10 @@ async def get_hotel_analytics(
             - provider_analytics: Provider mapping statistics and coverage
             - content_quality: Data completeness and validation metrics
             - chain_analysis: Hotel chain and brand distribution
+            - distributions: Hotel counts by rating bucket, property type,
+              country, map_status and content_update_status
             - data_insights: Performance metrics and recommendations
+            - rollup: When the underlying rollup was refreshed
             - timestamp: When analytics were generated
 
     Access Control:
@@ -1378,225 +1390,111 @@ async def get_hotel_analytics(
             "top_chains": [],
         }
 
-        try:
-            # Hotel overview analytics
-            hotel_overview["total_hotels"] = (
-                db.query(func.count(models.Hotel.id)).scalar() or 0
-            )
-
-            # Hotels with coordinates
-            hotel_overview["hotels_with_coordinates"] = (
-                db.query(func.count(models.Hotel.id))
-                .filter(
-                    and_(
-                        models.Hotel.latitude.isnot(None),
-                        models.Hotel.longitude.isnot(None),
-                    )
-                )
-                .scalar()
-                or 0
-            )
-
-            # Hotels with ratings
-            hotels_with_ratings = (
-                db.query(models.Hotel).filter(models.Hotel.rating.isnot(None)).all()
-            )
-            hotel_overview["hotels_with_ratings"] = len(hotels_with_ratings)
-
-            if hotels_with_ratings:
-                total_rating = sum(
-                    hotel.rating for hotel in hotels_with_ratings if hotel.rating
-                )
-                hotel_overview["avg_rating"] = round(
-                    total_rating / len(hotels_with_ratings), 2
-                )
+        # Everything below is answered from the pre-aggregated rollup (a few
+        # hundred rows) and the incrementally maintained supplier_summary.
+        rollup = HotelAnalyticsService(db).get_rollup()
+        dims = rollup["dimensions"]
+        totals = {k: v["count"] for k, v in dims.get("totals", {}).items()}
 
-        except Exception as e:
-            dashboard_logger.warning(f"Error collecting hotel overview: {e}")
-
-        try:
-            # Geographic distribution analytics
-            geographic_distribution["total_locations"] = (
-                db.query(func.count(models.Location.id)).scalar() or 0
-            )
-
-            # Unique countries and cities
-            geographic_distribution["unique_countries"] = (
-                db.query(func.count(func.distinct(models.Location.country))).scalar()
-                or 0
-            )
-
-            geographic_distribution["unique_cities"] = (
-                db.query(func.count(func.distinct(models.Location.city))).scalar() or 0
-            )
-
-            # Top countries by hotel count
-            top_countries_raw = (
-                db.query(
-                    models.Location.country,
-                    func.count(models.Hotel.id).label("hotel_count"),
-                )
-                .join(models.Hotel, models.Location.id == models.Hotel.location_id)
-                .group_by(models.Location.country)
-                .order_by(func.count(models.Hotel.id).desc())
-                .limit(5)
-                .all()
-            )
-
-            geographic_distribution["top_countries"] = [
-                {"country": country.country, "hotel_count": country.hotel_count}
-                for country in top_countries_raw
+        def _top(dimension: str, limit: int = 5):
+            buckets = dims.get(dimension, {})
+            return sorted(buckets.items(), key=lambda kv: kv[1]["count"], reverse=True)[
+                :limit
             ]
 
-            # Top cities by hotel count
-            top_cities_raw = (
-                db.query(
-                    models.Location.city,
-                    models.Location.country,
-                    func.count(models.Hotel.id).label("hotel_count"),
-                )
-                .join(models.Hotel, models.Location.id == models.Hotel.location_id)
-                .group_by(models.Location.city, models.Location.country)
-                .order_by(func.count(models.Hotel.id).desc())
-                .limit(5)
-                .all()
-            )
-
-            geographic_distribution["top_cities"] = [
-                {
-                    "city": city.city,
-                    "country": city.country,
-                    "hotel_count": city.hotel_count,
-                }
-                for city in top_cities_raw
-            ]
+        def _distribution(dimension: str, limit: int = 20) -> Dict[str, int]:
+            return {k: v["count"] for k, v in _top(dimension, limit=limit)}
 
-        except Exception as e:
-            dashboard_logger.warning(f"Error collecting geographic distribution: {e}")
+        total_hotels = totals.get("total_hotels", 0)
 
-        try:
-            # Provider analytics
-            provider_analytics["total_mappings"] = (
-                db.query(func.count(models.ProviderMapping.id)).scalar() or 0
+        # Hotel overview analytics
+        hotel_overview["total_hotels"] = total_hotels
+        hotel_overview["active_hotels"] = total_hotels
+        hotel_overview["hotels_with_coordinates"] = totals.get(
+            "hotels_with_coordinates", 0
+        )
+        hotel_overview["hotels_with_ratings"] = totals.get("hotels_with_ratings", 0)
+        rating_sum = dims.get("totals", {}).get("rating_sum", {}).get("sum") or 0
+        if hotel_overview["hotels_with_ratings"]:
+            hotel_overview["avg_rating"] = round(
+                rating_sum / hotel_overview["hotels_with_ratings"], 2
             )
 
-            # Unique providers
-            provider_analytics["unique_providers"] = (
-                db.query(
-                    func.count(func.distinct(models.ProviderMapping.provider_name))
-                ).scalar()
-                or 0
-            )
+        # Geographic distribution analytics
+        geographic_distribution["total_locations"] = totals.get("total_locations", 0)
+        geographic_distribution["unique_countries"] = totals.get("unique_countries", 0)
+        geographic_distribution["unique_cities"] = totals.get("unique_cities", 0)
+        geographic_distribution["top_countries"] = [
+            {"country": country, "hotel_count": value["count"]}
+            for country, value in _top("country")
+        ]
+        geographic_distribution["top_cities"] = [
+            {
+                "city": bucket.split("|", 1)[0],
+                "country": bucket.split("|", 1)[1] if "|" in bucket else None,
+                "hotel_count": value["count"],
+            }
+            for bucket, value in _top("city")
+        ]
 
-            # Hotels with provider mappings
-            provider_analytics["hotels_with_mappings"] = (
-                db.query(
-                    func.count(func.distinct(models.ProviderMapping.hotel_id))
-                ).scalar()
-                or 0
+        # Provider analytics
+        provider_analytics["total_mappings"] = totals.get("total_mappings", 0)
+        provider_analytics["hotels_with_mappings"] = totals.get(
+            "hotels_with_mappings", 0
+        )
+        if total_hotels > 0:
+            provider_analytics["mapping_coverage"] = round(
+                (provider_analytics["hotels_with_mappings"] / total_hotels) * 100, 2
             )
-
-            # Calculate mapping coverage
-            if hotel_overview["total_hotels"] > 0:
-                provider_analytics["mapping_coverage"] = round(
-                    (
-                        provider_analytics["hotels_with_mappings"]
-                        / hotel_overview["total_hotels"]
-                    )
-                    * 100,
-                    2,
-                )
-
-            # Top providers by mapping count
-            top_providers_raw = (
+        try:
+            provider_rows = (
                 db.query(
-                    models.ProviderMapping.provider_name,
-                    func.count(models.ProviderMapping.id).label("mapping_count"),
+                    models.SupplierSummary.provider_name,
+                    models.SupplierSummary.total_mappings,
                 )
-                .group_by(models.ProviderMapping.provider_name)
-                .order_by(func.count(models.ProviderMapping.id).desc())
-                .limit(5)
+                .filter(models.SupplierSummary.total_mappings > 0)
+                .order_by(models.SupplierSummary.total_mappings.desc())
                 .all()
             )
-
+            provider_analytics["unique_providers"] = len(provider_rows)
             provider_analytics["top_providers"] = [
-                {
-                    "provider": provider.provider_name,
-                    "mapping_count": provider.mapping_count,
-                }
-                for provider in top_providers_raw
+                {"provider": row.provider_name, "mapping_count": row.total_mappings}
+                for row in provider_rows[:5]
             ]
-
         except Exception as e:
             dashboard_logger.warning(f"Error collecting provider analytics: {e}")
 
-        try:
-            # Content quality analytics
-            hotels_with_contacts = (
-                db.query(func.count(func.distinct(models.Contact.hotel_id))).scalar()
-                or 0
-            )
-
-            content_quality["missing_contacts"] = max(
-                0, hotel_overview["total_hotels"] - hotels_with_contacts
-            )
-
-            # Calculate data completeness score
-            completeness_factors = [
-                hotel_overview["hotels_with_coordinates"]
-                / max(1, hotel_overview["total_hotels"]),
-                hotel_overview["hotels_with_ratings"]
-                / max(1, hotel_overview["total_hotels"]),
-                hotels_with_contacts / max(1, hotel_overview["total_hotels"]),
-                provider_analytics["hotels_with_mappings"]
-                / max(1, hotel_overview["total_hotels"]),
-            ]
-
-            content_quality["data_completeness_score"] = round(
-                (sum(completeness_factors) / len(completeness_factors)) * 100, 2
-            )
-
-        except Exception as e:
-            dashboard_logger.warning(f"Error collecting content quality: {e}")
-
-        try:
-            # Chain analysis
-            chain_analysis["total_chains"] = (
-                db.query(func.count(models.Chain.id)).scalar() or 0
-            )
-
-            # Hotels in chains vs independent
-            hotels_in_chains = (
-                db.query(func.count(func.distinct(models.Hotel.id)))
-                .join(models.Chain, models.Hotel.id == models.Chain.hotel_id)
-                .scalar()
-                or 0
-            )
-
-            chain_analysis["hotels_in_chains"] = hotels_in_chains
-            chain_analysis["independent_hotels"] = (
-                hotel_overview["total_hotels"] - hotels_in_chains
-            )
-
-            # Top chains by hotel count
-            top_chains_raw = (
-                db.query(
-                    models.Chain.chain_name,
-                    func.count(models.Chain.hotel_id).label("hotel_count"),
-                )
-                .group_by(models.Chain.chain_name)
-                .order_by(func.count(models.Chain.hotel_id).desc())
-                .limit(5)
-                .all()
-            )
+        # Content quality analytics
+        hotels_with_contacts = totals.get("hotels_with_contacts", 0)
+        content_quality["missing_contacts"] = max(0, total_hotels - hotels_with_contacts)
+        completeness_factors = [
+            hotel_overview["hotels_with_coordinates"] / max(1, total_hotels),
+            hotel_overview["hotels_with_ratings"] / max(1, total_hotels),
+            hotels_with_contacts / max(1, total_hotels),
+            provider_analytics["hotels_with_mappings"] / max(1, total_hotels),
+        ]
+        content_quality["data_completeness_score"] = round(
+            (sum(completeness_factors) / len(completeness_factors)) * 100, 2
+        )
 
-            chain_analysis["top_chains"] = [
-                {"chain_name": chain.chain_name, "hotel_count": chain.hotel_count}
-                for chain in top_chains_raw
-            ]
+        # Chain analysis
+        chain_analysis["total_chains"] = totals.get("total_chains", 0)
+        chain_analysis["hotels_in_chains"] = totals.get("hotels_in_chains", 0)
+        chain_analysis["independent_hotels"] = max(
+            0, total_hotels - chain_analysis["hotels_in_chains"]
+        )
+        chain_analysis["top_chains"] = [
+            {"chain_name": chain_name, "hotel_count": value["count"]}
+            for chain_name, value in _top("chain")
+        ]
 
-        except Exception as e:
-            dashboard_logger.warning(f"Error collecting chain analysis: {e}")
+        distributions = {
+            "rating": _distribution("rating"),
+            "property_type": _distribution("property_type"),
+            "country": _distribution("country"),
+            "map_status": _distribution("map_status"),
+            "content_update_status": _distribution("content_update_status"),
+        }
 
         # Generate insights and recommendations
         insights = []
@@ -1627,6 +1525,7 @@ async def get_hotel_analytics(
             "provider_analytics": provider_analytics,
             "content_quality": content_quality,
             "chain_analysis": chain_analysis,
+            "distributions": distributions,
             "data_insights": {
                 "recommendations": insights,
                 "quality_score": content_quality["data_completeness_score"],
@@ -1650,6 +1549,14 @@ async def get_hotel_analytics(
                     2,
                 ),
             },
+            "rollup": {
+                "refreshed_at": (
+                    rollup["refreshed_at"].isoformat()
+                    if rollup["refreshed_at"]
+                    else None
+                ),
+                "age_seconds": rollup["age_seconds"],
+            },
             "timestamp": datetime.utcnow().isoformat(),
             "analyzed_by": {
                 "user_id": current_user.id,
@@ -1673,9 +1580,10 @@ async def get_hotel_analytics(
 
 
 @router.get("/user-management")
-async def get_user_management_stats(
+@db_offload
+def get_user_management_stats(
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ) -> Dict[str, Any]:
     """
     Get User Management and Administration Statistics (Admin and Super User Only)
@@ -2052,7 +1960,7 @@ async def get_user_management_stats(
 
 async def get_performance_metrics(
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     days: int = 7,
 ) -> Dict[str, Any]:
     """
@@ -2379,9 +2287,10 @@ async def get_performance_metrics(
 
 
 @router.get("/export-data")
-async def export_dashboard_data(
+@db_offload
+def export_dashboard_data(
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     format: str = "json",
 ) -> Dict[str, Any]:
     """
@@ -2708,9 +2617,10 @@ async def export_dashboard_data(
 
 
 @router.get("/current-active-user-check")
-async def get_current_active_user_info(
+@db_offload
+def get_current_active_user_info(
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ) -> Dict[str, Any]:
     """
     Get Current Active User Complete Information and Activity Analysis
@@ -2998,8 +2908,8 @@ async def get_current_active_user_info(
 # ============================================================================
 
 
-@cache(expire=60)  # 1-minute cache
-async def get_user_account_info(db: Session, user: models.User) -> Dict[str, Any]:
+@two_tier_cache(expire=60)  # 1-minute cache
+def get_user_account_info(db: Session, user: models.User) -> Dict[str, Any]:
     """
     Retrieve user account details and calculate account status.
 
@@ -3134,8 +3044,8 @@ def calculate_onboarding_progress(user: models.User, db: Session) -> Dict[str, A
     }
 
 
-@cache(expire=300)  # 5-minute cache
-async def get_available_suppliers(db: Session) -> list:
+@two_tier_cache(expire=300)  # 5-minute cache
+def get_available_suppliers(db: Session) -> list:
     """
     Query SupplierSummary table for all available suppliers.
 
@@ -3248,8 +3158,8 @@ def fill_time_series_gaps(data: list, days: int = 30) -> list:
     return complete_series
 
 
-@cache(expire=60)  # 1-minute cache
-async def get_user_login_time_series(
+@two_tier_cache(expire=60)  # 1-minute cache
+def get_user_login_time_series(
     db: Session, user_id: str, days: int = 30
 ) -> Dict[str, Any]:
     """
@@ -3301,8 +3211,8 @@ async def get_user_login_time_series(
         return {"time_series": fill_time_series_gaps([], days), "data_available": False}
 
 
-@cache(expire=300)  # 5-minute cache
-async def get_platform_registration_trends(
+@two_tier_cache(expire=300)  # 5-minute cache
+def get_platform_registration_trends(
     db: Session, days: int = 30
 ) -> Dict[str, Any]:
     """
@@ -3350,8 +3260,8 @@ async def get_platform_registration_trends(
         return {"time_series": fill_time_series_gaps([], days), "data_available": False}
 
 
-@cache(expire=300)  # 5-minute cache
-async def get_hotel_update_trends(db: Session, days: int = 30) -> Dict[str, Any]:
+@two_tier_cache(expire=300)  # 5-minute cache
+def get_hotel_update_trends(db: Session, days: int = 30) -> Dict[str, Any]:
     """
     Query Hotel table for update timestamps and generate time-series data.
 
@@ -4249,7 +4159,7 @@ async def _get_new_user_dashboard_data(
 async def get_new_user_dashboard(
     request: Request,
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ) -> Dict[str, Any]:
     """
     Get Comprehensive Dashboard for New Users (All Authenticated Users)
@@ -4355,9 +4265,10 @@ async def get_new_user_dashboard(
 
 
 @router.get("/supplier-freshness")
-async def get_supplier_freshness(
+@db_offload
+def get_supplier_freshness(
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ) -> Dict[str, Any]:
     """
     Get Supplier Data Freshness Statistics (Admin and Super User Only)
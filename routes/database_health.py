@@ -1,7 +1,9 @@
-from fastapi import APIRouter, Depends
-from database import get_pool_status, engine
+from fastapi import APIRouter, Depends, HTTPException, Query
+from database import get_pool_status, get_replica_status, engine
+from db_async import offload_stats
+from db_instrumentation import offenders, sql_offenders
 from routes.auth import get_current_user
-from models import User
+from models import User, UserRole
 
 router = APIRouter(prefix="/v1.0/database", tags=["Database Health"])
 
@@ -16,6 +18,8 @@ async def get_database_pool_status(current_user: User = Depends(get_current_user
         return {
             "status": "healthy" if pool_status["checked_out"] < 8 else "warning",
             "pool_metrics": pool_status,
+            "db_threadpool": offload_stats(),
+            "read_replicas": get_replica_status(),
             "recommendations": {
                 "current_usage": f"{pool_status['checked_out']}/15 connections",
                 "health_status": "good" if pool_status["checked_out"] < 8 else "needs_attention"
@@ -34,4 +38,23 @@ async def reset_database_pool(current_user: User = Depends(get_current_user)):
         engine.dispose()
         return {"message": "Database connection pool has been reset"}
     except Exception as e:
-        return {"error": f"Failed to reset pool: {str(e)}"}
\ No newline at end of file
+        return {"error": f"Failed to reset pool: {str(e)}"}
+
+
+@router.get("/sql-offenders")
+def get_sql_offenders(
+    limit: int = Query(20, ge=1, le=200),
+    reset: bool = Query(False, description="Clear the log after reading"),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Repeated statement shapes (likely N+1 loops), slowest statements and the
+    most query-heavy routes seen by this worker since start (or the last reset).
+    """
+    if current_user.role not in [UserRole.SUPER_USER, UserRole.ADMIN_USER]:
+        raise HTTPException(status_code=403, detail="Only super_user or admin_user can view SQL offenders")
+
+    result = sql_offenders(limit)
+    if reset:
+        offenders.reset()
+    return result
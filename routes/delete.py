@@ -6,6 +6,7 @@ from database import get_db
 from utils import deduct_points_for_general_user, require_role
 from models import UserRole, Hotel, ProviderMapping, Location, Contact
 from routes.auth import get_current_user
+from services.supplier_summary_service import SupplierSummaryService
 
 router = APIRouter(
     prefix="/v1.0/delete",
@@ -325,7 +326,14 @@ def delete_hotel_by_ittid(
         )
 
     # Delete related data
+    removed_mappings = [
+        (row.provider_name, ittid)
+        for row in db.query(ProviderMapping.provider_name).filter(
+            ProviderMapping.ittid == ittid
+        )
+    ]
     db.query(ProviderMapping).filter(ProviderMapping.ittid == ittid).delete()
+    SupplierSummaryService(db).record_mappings_removed(removed_mappings)
     db.query(Location).filter(Location.ittid == ittid).delete()
     db.query(Contact).filter(Contact.ittid == ittid).delete()
     db.query(models.Chain).filter(models.Chain.ittid == ittid).delete()
@@ -398,6 +406,10 @@ def delete_a_hotel_mapping(
         )
 
     db.delete(mapping)
+    db.flush()
+    SupplierSummaryService(db).record_mappings_removed(
+        [(mapping.provider_name, mapping.ittid)]
+    )
     db.commit()
 
     return {
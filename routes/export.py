@@ -11,6 +11,8 @@ Features:
 - Point deduction for general users
 - Audit logging for all export operations
 - Progress tracking and status checking for async exports
+- Identical requests reuse a recent export file (services/export_result_cache.py)
+- Resumable downloads (Range/If-Range, ETag) with pre-compressed variants
 """
 
 import os
@@ -19,7 +21,7 @@ import logging
 from typing import Annotated, Optional
 from datetime import datetime, timedelta
 from fastapi import APIRouter, Depends, HTTPException, status, Request, BackgroundTasks
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
 from sqlalchemy.orm import Session
 
 from database import get_db
@@ -39,8 +41,10 @@ from services.export_permission_service import ExportPermissionService
 from services.export_filter_service import ExportFilterService
 from services.export_engine import ExportEngine
 from services.export_worker import get_export_worker
+from services.export_result_cache import ExportResultCache
 from security.audit_logging import AuditLogger, ActivityType, SecurityLevel
 from utils import deduct_points_for_general_user
+from utils.export_file_storage import ExportFileStorage, COMPRESSED_SUFFIXES
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -58,6 +62,76 @@ EXPORT_STORAGE_PATH = os.getenv(
 )
 
 
+def _reuse_identical_export(
+    result_cache: ExportResultCache,
+    fingerprint: str,
+    export_type: str,
+    export_format: str,
+    filters_applied: dict,
+    current_user: User,
+    request: Request,
+    audit_logger: AuditLogger,
+) -> Optional[ExportJobResponse]:
+    """
+    Answer an export request from an identical earlier one, if possible.
+
+    Returns the user's identical job that is still queued or running, or a
+    new completed job sharing the file of an identical recent export.
+    Returns None when the export has to be generated.
+    """
+    in_flight = result_cache.find_in_flight(fingerprint, current_user.id)
+    if in_flight is not None:
+        logger.info(
+            f"Identical {export_type} export {in_flight.id} already {in_flight.status} for user {current_user.id}"
+        )
+        return ExportJobResponse(
+            job_id=in_flight.id,
+            status=in_flight.status,
+            estimated_records=in_flight.total_records or 0,
+            estimated_completion_time="already in progress",
+            created_at=in_flight.created_at,
+            message="An identical export is already queued or running. Use this job_id to check status and download when complete.",
+        )
+
+    source = result_cache.find_reusable(fingerprint)
+    if source is None:
+        return None
+
+    export_job = result_cache.reuse(
+        source,
+        job_id=f"exp_{uuid.uuid4().hex[:16]}",
+        user_id=current_user.id,
+        filters_applied=filters_applied,
+    )
+
+    audit_logger.log_activity(
+        activity_type=ActivityType.EXPORT_DATA,
+        user_id=current_user.id,
+        details={
+            "export_type": export_type,
+            "format": export_format,
+            "job_id": export_job.id,
+            "estimated_records": export_job.processed_records,
+            "sync": False,
+            "status": "completed",
+            "reused_from": source.id,
+            "filters": filters_applied,
+        },
+        request=request,
+        security_level=SecurityLevel.HIGH,
+        success=True,
+    )
+
+    return ExportJobResponse(
+        job_id=export_job.id,
+        status=export_job.status,
+        estimated_records=export_job.processed_records,
+        estimated_completion_time="0 seconds",
+        created_at=export_job.created_at,
+        message="An identical export completed recently. The file is ready to download with this job_id.",
+    )
+
+
 @router.get("/my-validation")
 async def validate_api_key(
     request: Request,
@@ -278,6 +352,48 @@ async def export_hotels(
         # Asynchronous export using dedicated worker
         logger.info(f"Processing asynchronous export for {estimated_count} records")
 
+        # Reuse an identical recent export instead of generating it again
+        query_params = {
+            "filters": {
+                "suppliers": export_request.filters.suppliers,
+                "country_codes": export_request.filters.country_codes,
+                "min_rating": export_request.filters.min_rating,
+                "max_rating": export_request.filters.max_rating,
+                "date_from": (
+                    export_request.filters.date_from.isoformat()
+                    if export_request.filters.date_from
+                    else None
+                ),
+                "date_to": (
+                    export_request.filters.date_to.isoformat()
+                    if export_request.filters.date_to
+                    else None
+                ),
+                "ittids": export_request.filters.ittids,
+                "property_types": export_request.filters.property_types,
+            },
+            "allowed_suppliers": permission_result.allowed_suppliers,
+            "include_locations": export_request.include_locations,
+            "include_contacts": export_request.include_contacts,
+            "include_mappings": export_request.include_mappings,
+        }
+        result_cache = ExportResultCache(db, export_engine.file_storage)
+        fingerprint = result_cache.fingerprint(
+            "hotels", export_request.format.value, query_params, current_user.id
+        )
+        reused = _reuse_identical_export(
+            result_cache,
+            fingerprint,
+            export_type="hotels",
+            export_format=export_request.format.value,
+            filters_applied=filters_applied,
+            current_user=current_user,
+            request=request,
+            audit_logger=audit_logger,
+        )
+        if reused is not None:
+            return reused
+
         # Create export job record
         # Note: total_records in DB must be int, so use 0 for "All" (unknown count)
         job_id = f"exp_{uuid.uuid4().hex[:16]}"
@@ -298,6 +414,7 @@ async def export_hotels(
             started_at=None,
             completed_at=None,
             expires_at=None,
+            fingerprint=fingerprint,
         )
 
         db.add(export_job)
@@ -306,31 +423,6 @@ async def export_hotels(
 
         # Submit to dedicated export worker
         worker = get_export_worker()
-        query_params = {
-            "filters": {
-                "suppliers": export_request.filters.suppliers,
-                "country_codes": export_request.filters.country_codes,
-                "min_rating": export_request.filters.min_rating,
-                "max_rating": export_request.filters.max_rating,
-                "date_from": (
-                    export_request.filters.date_from.isoformat()
-                    if export_request.filters.date_from
-                    else None
-                ),
-                "date_to": (
-                    export_request.filters.date_to.isoformat()
-                    if export_request.filters.date_to
-                    else None
-                ),
-                "ittids": export_request.filters.ittids,
-                "property_types": export_request.filters.property_types,
-            },
-            "allowed_suppliers": permission_result.allowed_suppliers,
-            "include_locations": export_request.include_locations,
-            "include_contacts": export_request.include_contacts,
-            "include_mappings": export_request.include_mappings,
-        }
-
         worker.submit_export_job(
             job_id=job_id,
             export_type="hotels",
@@ -598,6 +690,42 @@ async def export_mappings(
             f"Processing asynchronous mapping export for {estimated_count} records"
         )
 
+        # Reuse an identical recent export instead of generating it again
+        query_params = {
+            "filters": {
+                "suppliers": export_request.filters.suppliers,
+                "ittids": export_request.filters.ittids,
+                "date_from": (
+                    export_request.filters.date_from.isoformat()
+                    if export_request.filters.date_from
+                    else None
+                ),
+                "date_to": (
+                    export_request.filters.date_to.isoformat()
+                    if export_request.filters.date_to
+                    else None
+                ),
+                "max_records": export_request.filters.max_records,
+            },
+            "allowed_suppliers": permission_result.allowed_suppliers,
+        }
+        result_cache = ExportResultCache(db, export_engine.file_storage)
+        fingerprint = result_cache.fingerprint(
+            "mappings", export_request.format.value, query_params, current_user.id
+        )
+        reused = _reuse_identical_export(
+            result_cache,
+            fingerprint,
+            export_type="mappings",
+            export_format=export_request.format.value,
+            filters_applied=filters_applied,
+            current_user=current_user,
+            request=request,
+            audit_logger=audit_logger,
+        )
+        if reused is not None:
+            return reused
+
         # Create export job record
         # Note: total_records in DB must be int, so use 0 for "All" (unknown count)
         job_id = f"exp_{uuid.uuid4().hex[:16]}"
@@ -618,6 +746,7 @@ async def export_mappings(
             started_at=None,
             completed_at=None,
             expires_at=None,
+            fingerprint=fingerprint,
         )
 
         db.add(export_job)
@@ -626,25 +755,6 @@ async def export_mappings(
 
         # Submit to dedicated export worker
         worker = get_export_worker()
-        query_params = {
-            "filters": {
-                "suppliers": export_request.filters.suppliers,
-                "ittids": export_request.filters.ittids,
-                "date_from": (
-                    export_request.filters.date_from.isoformat()
-                    if export_request.filters.date_from
-                    else None
-                ),
-                "date_to": (
-                    export_request.filters.date_to.isoformat()
-                    if export_request.filters.date_to
-                    else None
-                ),
-                "max_records": export_request.filters.max_records,
-            },
-            "allowed_suppliers": permission_result.allowed_suppliers,
-        }
-
         worker.submit_export_job(
             job_id=job_id,
             export_type="mappings",
@@ -862,6 +972,31 @@ async def export_supplier_summary(
             f"Processing asynchronous supplier summary export for {estimated_count} records"
         )
 
+        # Reuse an identical recent export instead of generating it again
+        query_params = {
+            "filters": {
+                "suppliers": export_request.filters.suppliers,
+                "include_country_breakdown": export_request.filters.include_country_breakdown,
+            },
+            "allowed_suppliers": allowed_suppliers,
+        }
+        result_cache = ExportResultCache(db, export_engine.file_storage)
+        fingerprint = result_cache.fingerprint(
+            "supplier_summary", export_request.format.value, query_params, current_user.id
+        )
+        reused = _reuse_identical_export(
+            result_cache,
+            fingerprint,
+            export_type="supplier_summary",
+            export_format=export_request.format.value,
+            filters_applied=filters_applied,
+            current_user=current_user,
+            request=request,
+            audit_logger=audit_logger,
+        )
+        if reused is not None:
+            return reused
+
         # Create export job record
         job_id = f"exp_{uuid.uuid4().hex[:16]}"
         export_job = ExportJob(
@@ -881,6 +1016,7 @@ async def export_supplier_summary(
             started_at=None,
             completed_at=None,
             expires_at=None,
+            fingerprint=fingerprint,
         )
 
         db.add(export_job)
@@ -889,14 +1025,6 @@ async def export_supplier_summary(
 
         # Submit to dedicated export worker
         worker = get_export_worker()
-        query_params = {
-            "filters": {
-                "suppliers": export_request.filters.suppliers,
-                "include_country_breakdown": export_request.filters.include_country_breakdown,
-            },
-            "allowed_suppliers": allowed_suppliers,
-        }
-
         worker.submit_export_job(
             job_id=job_id,
             export_type="supplier_summary",
@@ -1091,9 +1219,46 @@ async def get_export_status(
         )
 
 
+def _negotiate_encoding(accept_encoding: str, available: dict) -> Optional[str]:
+    """Preferred pre-compressed variant the client accepts (None: send the file as is)"""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    # Server preference: zstd, then gzip
+    for encoding in COMPRESSED_SUFFIXES:
+        if encoding in available and accepted.get(encoding, 0) > 0:
+            return encoding
+    return None
+
+
+def _export_etag(export_job: ExportJob, encoding: Optional[str]) -> str:
+    """Strong ETag of one representation of a completed export"""
+    completed = int(export_job.completed_at.timestamp()) if export_job.completed_at else 0
+    return '"%s-%d-%s"' % (export_job.id, completed, encoding or "identity")
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check (weak comparison, as RFC 9110 requires for it)"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
 @router.get("/download/{job_id}")
+@router.head("/download/{job_id}", include_in_schema=False)
 async def download_export(
     job_id: str,
+    request: Request,
     current_user: Annotated[User, Depends(authenticate_for_export)],
     db: Session = Depends(get_db),
 ):
@@ -1108,6 +1273,12 @@ async def download_export(
     - File must not be expired (>24 hours old)
     - User must own the export job
 
+    Interrupted downloads can resume: send ``Range`` (with ``If-Range``
+    set to the ``ETag`` of the first response) to get the rest as 206
+    Partial Content. Clients that send ``Accept-Encoding: zstd`` or
+    ``gzip`` get the pre-compressed file with ``Content-Encoding``; each
+    encoding has its own ETag, so ranges never mix representations.
+
     Requires authentication. Users can only download their own export files.
     """
     logger.info(f"Export download requested for job {job_id} by user {current_user.id}")
@@ -1224,10 +1395,10 @@ async def download_export(
                 f"Export job {job_id} has expired (expired at: {export_job.expires_at})"
             )
 
-            # Clean up expired file
+            # Clean up expired file (and its compressed variants)
             try:
                 if os.path.exists(export_job.file_path):
-                    os.remove(export_job.file_path)
+                    ExportFileStorage(EXPORT_STORAGE_PATH).delete_file(export_job.file_path)
                     logger.info(f"Deleted expired export file: {export_job.file_path}")
             except Exception as cleanup_error:
                 logger.error(f"Error deleting expired file: {str(cleanup_error)}")
@@ -1251,14 +1422,28 @@ async def download_export(
         format_handler = ExportFormatHandler()
         content_type = format_handler.get_content_type(export_job.format)
 
-        logger.info(f"Serving export file {filename} for job {job_id}")
+        # Serve a pre-compressed variant when the client accepts one
+        variants = ExportFileStorage(EXPORT_STORAGE_PATH).get_compressed_variants(file_path)
+        encoding = _negotiate_encoding(request.headers.get("accept-encoding", ""), variants)
+        etag = _export_etag(export_job, encoding)
+        cache_headers = {"ETag": etag, "Vary": "Accept-Encoding"}
+
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+
+        logger.info(
+            f"Serving export file {filename} for job {job_id} ({encoding or 'identity'})"
+        )
 
-        # Return file response
+        # Return file response (FileResponse answers Range / If-Range against our ETag)
+        if encoding:
+            cache_headers["Content-Encoding"] = encoding
         return FileResponse(
-            path=file_path,
+            path=variants[encoding] if encoding else file_path,
             media_type=content_type,
             filename=filename,
             headers={
+                **cache_headers,
                 "Content-Disposition": f'attachment; filename="{filename}"',
                 "X-Export-ID": export_job.id,
                 "X-Export-Type": export_job.export_type,
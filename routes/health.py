@@ -5,18 +5,21 @@ This module provides comprehensive health checks, service monitoring,
 and system status endpoints for the user management system.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, status
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from database import get_db
 from typing import Dict, Any, List
 from datetime import datetime, timedelta
 import time
-import psutil
+import secrets
 import redis.asyncio as aioredis
 from fastapi_cache import FastAPICache
 import models
 from routes.auth import get_current_user
+from metrics import METRICS_ALLOWED_IPS, METRICS_TOKEN, render_prometheus, route_latency_summary
+from security.ip_prefix_tree import IPPrefixTree
 
 router = APIRouter(
     prefix="/v1.0/health",
@@ -24,6 +27,31 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+# Scrape endpoint at the conventional path, outside the versioned API
+prometheus_router = APIRouter(tags=["Health & Monitoring"])
+
+metrics_allowed_ips = IPPrefixTree(METRICS_ALLOWED_IPS.split(","))
+
+
+@prometheus_router.get("/metrics", include_in_schema=False)
+def prometheus_metrics(request: Request, authorization: str = Header(default="")):
+    """
+    Prometheus metrics of all workers in the text exposition format.
+
+    Access: ``Authorization: Bearer <METRICS_TOKEN>``, or a client address in
+    ``METRICS_ALLOWED_IPS``. With neither configured every scrape is denied.
+    """
+    client_ip = request.client.host if request.client else None
+    if client_ip not in metrics_allowed_ips:
+        if not METRICS_TOKEN:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Metrics are disabled: set METRICS_TOKEN or METRICS_ALLOWED_IPS",
+            )
+        if not secrets.compare_digest(authorization, f"Bearer {METRICS_TOKEN}"):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 
 @router.get("/", summary="Basic Health Check")
 async def health_check():
@@ -132,6 +160,8 @@ async def detailed_health_check(db: Session = Depends(get_db)):
     
     # System resources check
     try:
+        import psutil
+
         cpu_percent = psutil.cpu_percent(interval=1)
         memory = psutil.virtual_memory()
         disk = psutil.disk_usage('/')
@@ -391,9 +421,8 @@ async def service_metrics(
             count = db.query(models.User).filter(models.User.role == role).count()
             role_distribution[role.value] = count
         
-        # System performance indicators
-        avg_response_time = 50  # This would be calculated from actual metrics in production
-        error_rate = 0.1  # This would be calculated from error logs
+        # Request latency and errors, aggregated over all workers
+        performance = route_latency_summary(limit=20)
         
         return {
             "timestamp": now.isoformat(),
@@ -418,8 +447,10 @@ async def service_metrics(
                 )
             },
             "performance_metrics": {
-                "avg_response_time_ms": avg_response_time,
-                "error_rate_percent": error_rate,
+                "total_requests": performance["total_requests"],
+                "error_rate_percent": performance["error_rate_percent"],
+                "latency_ms": performance["latency_ms"],
+                "routes": performance["routes"],
                 "uptime_status": "healthy"
             },
             "system_health": {
@@ -18,9 +18,9 @@ import csv
 from database import get_db
 from routes.auth import get_current_user
 import models
-from models import UserIPWhitelist
 from security.audit_logging import AuditLogger, ActivityType, SecurityLevel
 from middleware.ip_middleware import get_client_ip
+from services.access_control_service import check_ip_whitelist, get_user_access
 
 router = APIRouter()
 
@@ -31,43 +31,6 @@ router = APIRouter(
 )
 
 
-def check_ip_whitelist(user_id: str, request: Request, db: Session) -> bool:
-    """
-    Check if the user's IP address is in the whitelist.
-
-    Args:
-        user_id (str): The user ID to check
-        request (Request): The FastAPI request object
-        db (Session): Database session
-
-    Returns:
-        bool: True if IP is whitelisted, False otherwise
-    """
-    try:
-        # Get client IP using the middleware function
-        client_ip = get_client_ip(request)
-
-        if not client_ip:
-            return False
-
-        # Check if the user has any active IP whitelist entries for this IP
-        whitelist_entry = (
-            db.query(UserIPWhitelist)
-            .filter(
-                UserIPWhitelist.user_id == user_id,
-                UserIPWhitelist.ip_address == client_ip,
-                UserIPWhitelist.is_active == True,
-            )
-            .first()
-        )
-
-        return whitelist_entry is not None
-
-    except Exception as e:
-        print(f"Error checking IP whitelist: {str(e)}")
-        return False
-
-
 class ConvertRequest(BaseModel):
     supplier_code: str
     hotel_id: str
@@ -6204,16 +6167,7 @@ async def convert_row_to_our_formate(
         models.UserRole.ADMIN_USER,
     ]:
         # Check if general user has permission for this supplier
-        user_supplier_permission = (
-            db.query(models.UserProviderPermission)
-            .filter(
-                models.UserProviderPermission.user_id == current_user.id,
-                models.UserProviderPermission.provider_name == supplier_code,
-            )
-            .first()
-        )
-
-        if not user_supplier_permission:
+        if supplier_code not in get_user_access(current_user.id, db).granted:
             # 📝 AUDIT LOG: Record unauthorized supplier access attempt
             audit_logger = AuditLogger(db)
             audit_logger.log_security_event(
@@ -3,7 +3,12 @@ from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from sqlalchemy import func
 from database import get_db
-from schemas import HotelCreate, HotelRead
+from schemas import (
+    HotelCreate,
+    HotelRead,
+    HotelBulkIngestRequest,
+    ProviderMappingBulkRequest,
+)
 import models
 from utils import require_role
 from pydantic import BaseModel
@@ -24,6 +29,10 @@ from datetime import datetime
 
 # Import audit logging for user activity tracking
 from security.audit_logging import AuditLogger, ActivityType, SecurityLevel
+from services.hotel_ingest_service import HotelIngestService
+from services.supplier_summary_service import SupplierSummaryService
+from services.access_control_service import get_user_access
+from cache_bus import publish_invalidation
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -197,6 +206,7 @@ def create_hotel_with_details(
                         )
 
             # Add provider mappings
+            added_mappings = []
             if hotel.provider_mappings:
                 for provider_data in hotel.provider_mappings:
                     try:
@@ -222,6 +232,9 @@ def create_hotel_with_details(
                             **provider_data.dict(), ittid=db_hotel.ittid
                         )
                         db.add(db_provider_mapping)
+                        added_mappings.append(
+                            (provider_data.provider_name, db_hotel.ittid)
+                        )
                     except Exception as provider_error:
                         logger.error(f"Error adding provider mapping: {provider_error}")
                         raise HTTPException(
@@ -259,9 +272,18 @@ def create_hotel_with_details(
                             detail=f"Invalid chain data: {str(chain_error)}",
                         )
 
+            # Keep supplier_summary counters in step with the new mappings
+            if added_mappings:
+                db.flush()
+                SupplierSummaryService(db).record_mappings_added(added_mappings)
+
             # Commit all changes
             db.commit()
 
+            # New locations change the cities-by-country lists in every worker
+            if hotel.locations:
+                publish_invalidation("cities_by_country")
+
             # Log successful creation
             logger.info(
                 f"Successfully created hotel '{db_hotel.name}' with ITTID: {db_hotel.ittid}"
@@ -485,6 +507,10 @@ def add_provider(
         try:
             provider_mapping = models.ProviderMapping(**provider_data)
             db.add(provider_mapping)
+            db.flush()
+            SupplierSummaryService(db).record_mappings_added(
+                [(provider_name, ittid)]
+            )
             db.commit()
             db.refresh(provider_mapping)
 
@@ -550,6 +576,89 @@ def add_provider(
         )
 
 
+# Bulk hotel ingest
+@router.post("/bulk_ingest", status_code=status.HTTP_200_OK)
+def bulk_ingest_hotels(
+    payload: HotelBulkIngestRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+) -> Dict[str, Any]:
+    """
+    Bulk Ingest Hotels with Complete Details (Super User and Admin Only)
+
+    Creates or updates thousands of hotels per call, including locations,
+    contacts, chains and provider mappings. Rows are deduplicated with
+    set-based lookups and written with multi-row inserts, one transaction per
+    chunk.
+
+    Behaviour:
+        - New ITTIDs: hotel and all nested data are inserted
+        - Existing ITTIDs: scalar columns updated (if update_existing), new
+          provider mappings appended, nested locations/contacts/chains untouched
+        - Duplicate provider_name + provider_id pairs are skipped, including
+          duplicates within the same request
+        - A failing chunk is rolled back and retried row by row; only the
+          rows that still fail are reported as "error"
+
+    Returns:
+        Dict[str, Any]: Counters (created, updated, skipped, errors) and a
+        per-row ``results`` list in request order
+    """
+    if not current_user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User authentication required",
+        )
+
+    require_role(["super_user", "admin_user"], current_user)
+
+    logger.info(
+        f"Bulk ingest of {len(payload.hotels)} hotels by user {current_user.id}"
+    )
+
+    service = HotelIngestService(db, chunk_size=payload.chunk_size)
+    summary = service.ingest_hotels(
+        payload.hotels, update_existing=payload.update_existing
+    )
+    summary["timestamp"] = datetime.utcnow().isoformat()
+    return summary
+
+
+# Bulk provider mapping ingest
+@router.post("/bulk_add_provider_mappings", status_code=status.HTTP_200_OK)
+def bulk_add_provider_mappings(
+    payload: ProviderMappingBulkRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+) -> Dict[str, Any]:
+    """
+    Bulk Add Provider Mappings for Existing Hotels (Super User and Admin Only)
+
+    Set-based equivalent of ``/add_provider_all_details_with_ittid`` for
+    mapping loads: every row is reported as "created", "skipped" (mapping
+    already exists), "not_found" (unknown ITTID) or "error".
+
+    Returns:
+        Dict[str, Any]: Counters and a per-row ``results`` list in request order
+    """
+    if not current_user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User authentication required",
+        )
+
+    require_role(["super_user", "admin_user"], current_user)
+
+    logger.info(
+        f"Bulk provider mapping ingest of {len(payload.mappings)} rows by user {current_user.id}"
+    )
+
+    service = HotelIngestService(db, chunk_size=payload.chunk_size)
+    summary = service.ingest_provider_mappings(payload.mappings)
+    summary["timestamp"] = datetime.utcnow().isoformat()
+    return summary
+
+
 # Get supplier information
 @router.get("/get-supplier-info")
 @cache(expire=300)  # Cache for 5 minutes
@@ -674,16 +783,7 @@ def get_supplier_info(
 
             elif current_user.role == "general_user":
                 # General users can only access suppliers they have permissions for
-                user_permission = (
-                    db.query(models.UserProviderPermission)
-                    .filter(
-                        models.UserProviderPermission.user_id == current_user.id,
-                        models.UserProviderPermission.provider_name == supplier,
-                    )
-                    .first()
-                )
-
-                if not user_permission:
+                if supplier not in get_user_access(current_user.id, db).granted:
                     logger.warning(
                         f"Access denied for user {current_user.id} to supplier '{supplier}' - no permission found"
                     )
@@ -1061,14 +1161,10 @@ def get_user_accessible_suppliers(
 
                 permission_based = True
 
-                # OPTIMIZED: Get permitted suppliers using indexed query
-                # Uses index: idx_user_provider_permission_user_provider
-                permitted_suppliers = [
-                    perm.provider_name
-                    for perm in db.query(models.UserProviderPermission.provider_name)
-                    .filter(models.UserProviderPermission.user_id == current_user.id)
-                    .all()
-                ]
+                # OPTIMIZED: Get permitted suppliers from the access-control cache
+                permitted_suppliers = list(
+                    get_user_access(current_user.id, db).permissions
+                )
 
                 # Get total suppliers count efficiently from summary table
                 total_suppliers_in_system = db.query(
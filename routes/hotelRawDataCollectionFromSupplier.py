@@ -7,7 +7,6 @@ import json
 from typing import List, Union, Dict, Any
 from dotenv import load_dotenv
 from io import StringIO
-import pandas as pd
 
 import requests
 import xmltodict
@@ -463,6 +462,8 @@ def authentication_paximum():
 
     if response.status_code == 200:
         try:
+            import pandas as pd
+
             df = pd.read_json(StringIO(response.text))
             token = df.get("body").get("token")
             return token
@@ -782,8 +783,10 @@ def fetch_kiwi_hotel_raw(hotel_id: str) -> Union[Dict[str, Any], str, None]:
         return None
 
 
+# Plain ``def``: supplier fetches, file writes and the audit insert all block,
+# so FastAPI runs this in its threadpool rather than on the event loop
 @router.post("/pushhotel", status_code=status.HTTP_200_OK)
-async def raw_data_push_our_system(
+def raw_data_push_our_system(
     request_body: ConvertRequest,
     request: Request,
     current_user: Annotated[models.User, Depends(get_current_user)],
@@ -2,15 +2,18 @@ from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.orm import Session
 from sqlalchemy import distinct, text
 from typing import List, Optional, Annotated
-from database import get_db
-from models import Location, UserIPWhitelist
+from database import get_read_db
+from db_async import run_db, db_offload
+from models import Location
 from pydantic import BaseModel
-from fastapi_cache.decorator import cache
+from tiered_cache import two_tier_cache
 import asyncio
 from datetime import datetime
 from collections import defaultdict
 from routes.auth import get_current_user
 from middleware.ip_middleware import get_client_ip
+from services.access_control_service import check_ip_whitelist, get_user_access
+from cache_bus import register_local_cache
 import models
 import json
 import os
@@ -24,39 +27,6 @@ router = APIRouter(
 )
 
 
-def check_ip_whitelist(user_id: str, request: Request, db: Session) -> bool:
-    """
-    Check if the user's IP address is in the whitelist.
-    
-    Args:
-        user_id (str): The user ID to check
-        request (Request): The FastAPI request object
-        db (Session): Database session
-    
-    Returns:
-        bool: True if IP is whitelisted, False otherwise
-    """
-    try:
-        # Get client IP using the middleware function
-        client_ip = get_client_ip(request)
-        
-        if not client_ip:
-            return False
-        
-        # Check if the user has any active IP whitelist entries for this IP
-        whitelist_entry = db.query(UserIPWhitelist).filter(
-            UserIPWhitelist.user_id == user_id,
-            UserIPWhitelist.ip_address == client_ip,
-            UserIPWhitelist.is_active == True
-        ).first()
-        
-        return whitelist_entry is not None
-        
-    except Exception as e:
-        print(f"Error checking IP whitelist: {str(e)}")
-        return False
-    
-
 class CitiesListResponse(BaseModel):
     total_city: int
     city_name: List[str]
@@ -207,8 +177,8 @@ class CountryISOFilterRequest(BaseModel):
 
 
 @router.get("/cities", response_model=CitiesListResponse)
-@cache(expire=3600)  # Cache for 1 hour
-async def get_all_cities(db: Session = Depends(get_db)):
+@two_tier_cache(expire=3600)  # Cache for 1 hour
+async def get_all_cities(db: Session = Depends(get_read_db)):
     """
     Get all unique cities from locations in a consolidated format.
     
@@ -241,9 +211,8 @@ async def get_all_cities(db: Session = Depends(get_db)):
             ).all()
             return [city[0] for city in cities if city[0]]
         
-        # Execute in thread pool for better async performance
-        loop = asyncio.get_event_loop()
-        city_names = await loop.run_in_executor(None, get_cities_sync)
+        # Execute on the DB threadpool
+        city_names = await run_db(get_cities_sync)
         
         return {
             "total_city": len(city_names),
@@ -254,7 +223,7 @@ async def get_all_cities(db: Session = Depends(get_db)):
 
 
 @router.get("/countries", response_model=CountriesListResponse)
-async def get_all_countries_fast(db: Session = Depends(get_db)):
+async def get_all_countries_fast(db: Session = Depends(get_read_db)):
     try:
         # Use raw SQL for maximum performance
         raw_sql = text("""
@@ -269,9 +238,8 @@ async def get_all_countries_fast(db: Session = Depends(get_db)):
             result = db.execute(raw_sql)
             return [row[0] for row in result.fetchall()]
         
-        # Execute in thread pool
-        loop = asyncio.get_event_loop()
-        country_names = await loop.run_in_executor(None, execute_raw_query)
+        # Execute on the DB threadpool
+        country_names = await run_db(execute_raw_query)
         
         return {
             "total_country": len(country_names),
@@ -282,7 +250,8 @@ async def get_all_countries_fast(db: Session = Depends(get_db)):
 
 
 @router.get("/country-iso", response_model=CountryCodesListResponse)
-async def get_all_country_codes(db: Session = Depends(get_db)):
+@db_offload
+def get_all_country_codes(db: Session = Depends(get_read_db)):
     """
     Get all unique country codes from locations in a consolidated format.
     
@@ -318,8 +287,8 @@ async def get_all_country_codes(db: Session = Depends(get_db)):
 
 
 @router.get("/cities-with-countries", response_model=CitiesWithCountriesGroupedResponse)
-@cache(expire=3600)  # Cache for 1 hour
-async def get_cities_with_countries(db: Session = Depends(get_db)):
+@two_tier_cache(expire=3600)  # Cache for 1 hour
+async def get_cities_with_countries(db: Session = Depends(get_read_db)):
     """
     ULTRA-OPTIMIZED cities with countries endpoint.
     
@@ -414,9 +383,8 @@ async def get_cities_with_countries(db: Session = Depends(get_db)):
                 
                 return countries_list
         
-        # Execute in thread pool for better async performance
-        loop = asyncio.get_event_loop()
-        countries_data = await loop.run_in_executor(None, execute_ultra_fast_query)
+        # Execute on the DB threadpool
+        countries_data = await run_db(execute_ultra_fast_query)
         
         return {
             "total_country": len(countries_data),
@@ -429,7 +397,8 @@ async def get_cities_with_countries(db: Session = Depends(get_db)):
 
 
 @router.get("/search")
-async def search_locations(
+@db_offload
+def search_locations(
     http_request: Request,
     current_user: Annotated[models.User, Depends(get_current_user)],
     city: Optional[str] = Query(None, description="Filter by city name"),
@@ -438,7 +407,7 @@ async def search_locations(
     state: Optional[str] = Query(None, description="Filter by state name"),
     limit: int = Query(100, ge=1, le=1000, description="Limit number of results"),
     offset: int = Query(0, ge=0, description="Offset for pagination"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Search and filter locations with multiple criteria.
@@ -566,9 +535,10 @@ def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
 
 
 @router.post("/search-hotel-with-location", response_model=HotelSearchResponse)
-async def search_hotel_with_location(
+@db_offload
+def search_hotel_with_location(
     request: HotelSearchRequest,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Search hotels within a specified radius from a given location.
@@ -728,11 +698,12 @@ async def search_hotel_with_location(
 
 
 @router.post("/search-hotel-with-location-with-rate", response_model=HotelSearchResponseRate)
-async def search_hotel_with_location(
+@db_offload
+def search_hotel_with_location(
     http_request: Request,
     request: HotelSearchRequest,
     current_user: Annotated[models.User, Depends(get_current_user)],
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Search hotels within a specified radius from a given location with rate information.
@@ -914,10 +885,7 @@ async def search_hotel_with_location(
             print(f"✅ Admin/Super user requested ALL suppliers: {len(allowed_suppliers)} suppliers")
         else:
             # General users: get all suppliers they have permission for
-            user_permissions = db.query(models.UserProviderPermission.provider_name).filter(
-                models.UserProviderPermission.user_id == current_user.id
-            ).all()
-            allowed_suppliers = [perm[0] for perm in user_permissions]
+            allowed_suppliers = list(get_user_access(current_user.id, db).permissions)
             print(f"✅ General user requested ALL suppliers: {len(allowed_suppliers)} permitted suppliers")
     else:
         # User requested specific suppliers
@@ -926,13 +894,9 @@ async def search_hotel_with_location(
             allowed_suppliers = request.supplier
         else:
             # General users: filter suppliers based on permissions
+            granted = get_user_access(current_user.id, db).granted
             for supplier in request.supplier:
-                user_supplier_permission = db.query(models.UserProviderPermission).filter(
-                    models.UserProviderPermission.user_id == current_user.id,
-                    models.UserProviderPermission.provider_name == supplier
-                ).first()
-                
-                if user_supplier_permission:
+                if supplier in granted:
                     allowed_suppliers.append(supplier)
                 else:
                     print(f"⚠️ User {current_user.id} does not have permission for supplier '{supplier}' - skipping")
@@ -1041,7 +1005,8 @@ async def search_hotel_with_location(
             
 
 @router.get("/{location_id}", response_model=LocationDetailResponse)
-async def get_location_by_id(location_id: int, db: Session = Depends(get_db)):
+@db_offload
+def get_location_by_id(location_id: int, db: Session = Depends(get_read_db)):
     """
     Get detailed information for a specific location.
     
@@ -1097,6 +1062,16 @@ _cities_by_country_cache = None
 _cities_cache_timestamp = None
 
 
+def _reset_cities_by_country_cache(key: Optional[str] = None):
+    """Drop the cities-by-country cache (called for every worker via the cache bus)"""
+    global _cities_by_country_cache, _cities_cache_timestamp
+    _cities_by_country_cache = None
+    _cities_cache_timestamp = None
+
+
+register_local_cache("cities_by_country", _reset_cities_by_country_cache)
+
+
 def _load_cities_by_country_cache(db: Session):
     """Load cities grouped by country into memory cache"""
     global _cities_by_country_cache, _cities_cache_timestamp
@@ -1219,7 +1194,7 @@ def _load_cities_by_country_cache(db: Session):
 @router.post("/get-cities-follow-country", response_model=CitiesByCountryResponse)
 async def get_cities_follow_countries(
     request: Optional[CountryFilterRequest] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get all cities grouped by countries with optional filtering and caching.
@@ -1282,9 +1257,8 @@ async def get_cities_follow_countries(
         def get_cities_data():
             return _load_cities_by_country_cache(db)
         
-        # Execute in thread pool for better async performance
-        loop = asyncio.get_event_loop()
-        countries_data = await loop.run_in_executor(None, get_cities_data)
+        # Execute on the DB threadpool
+        countries_data = await run_db(get_cities_data)
         
         # Filter by country name if provided
         if request and request.country_name:
@@ -1313,7 +1287,7 @@ async def get_cities_follow_countries(
 @router.post("/get-cities-follow-countryISO", response_model=CitiesByCountryResponse)
 async def get_cities_follow_country_iso(
     request: Optional[CountryISOFilterRequest] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get all cities grouped by countries with optional ISO code filtering and caching.
@@ -1371,9 +1345,8 @@ async def get_cities_follow_country_iso(
         def get_cities_data():
             return _load_cities_by_country_cache(db)
         
-        # Execute in thread pool for better async performance
-        loop = asyncio.get_event_loop()
-        countries_data = await loop.run_in_executor(None, get_cities_data)
+        # Execute on the DB threadpool
+        countries_data = await run_db(get_cities_data)
         
         # Filter by country ISO code if provided
         if request and request.country_code:
@@ -5,7 +5,7 @@ from models import Hotel, ProviderMapping, Location, RateTypeInfo, User
 from datetime import datetime
 from utils import require_role
 import models
-from fastapi_cache.decorator import cache
+from tiered_cache import two_tier_cache
 from schemas import AddRateTypeRequest, UpdateRateTypeRequest, BasicMappingResponse
 from pydantic import BaseModel
 from typing import List, Optional
@@ -14,6 +14,7 @@ from sqlalchemy import select
 import secrets, string
 from routes.auth import get_current_user
 from middleware.ip_middleware import get_client_ip
+from services.access_control_service import check_ip_whitelist, get_user_access
 
 router = APIRouter(
     prefix="/v1.0/mapping",
@@ -79,43 +80,6 @@ router = APIRouter(
 #         return True
 
 
-def check_ip_whitelist(user_id: str, request: Request, db: Session) -> bool:
-    """
-    Check if the user's IP address is in the whitelist.
-
-    Args:
-        user_id (str): The user ID to check
-        request (Request): The FastAPI request object
-        db (Session): Database session
-
-    Returns:
-        bool: True if IP is whitelisted, False otherwise
-    """
-    try:
-        # Get client IP using the middleware function
-        client_ip = get_client_ip(request)
-
-        if not client_ip:
-            return False
-
-        # Check if the user has any active IP whitelist entries for this IP
-        whitelist_entry = (
-            db.query(models.UserIPWhitelist)
-            .filter(
-                models.UserIPWhitelist.user_id == user_id,
-                models.UserIPWhitelist.ip_address == client_ip,
-                models.UserIPWhitelist.is_active == True,
-            )
-            .first()
-        )
-
-        return whitelist_entry is not None
-
-    except Exception as e:
-        print(f"Error checking IP whitelist: {str(e)}")
-        return False
-
-
 @router.post("/add_rate_type_with_ittid_and_pid", status_code=status.HTTP_201_CREATED)
 def add_rate_type(
     provider_data: AddRateTypeRequest,
@@ -304,7 +268,7 @@ def update_rate_type(
     "/get_basic_mapping_with_info",
     status_code=status.HTTP_200_OK,
 )
-@cache(expire=7200)
+@two_tier_cache(expire=7200)
 def get_basic_mapping_with_info(
     supplier_name: List[str] = Query(
         ..., description="List of provider names to filter by"
@@ -592,32 +556,17 @@ def get_mapping_with_ittid(
             models.UserRole.SUPER_USER,
             models.UserRole.ADMIN_USER,
         ]:
-            # Get user permissions efficiently
-            user_permissions = (
-                db.query(models.UserProviderPermission.provider_name)
-                .filter(models.UserProviderPermission.user_id == current_user.id)
-                .all()
-            )
+            # Precomputed permission sets from the access-control cache
+            access = get_user_access(current_user.id, db)
 
-            if not user_permissions:
+            if not access.granted:
                 raise HTTPException(
                     status_code=status.HTTP_403_FORBIDDEN,
                     detail="You do not have permission to access any suppliers.",
                 )
 
-            # Fast set operations for permission checking
-            permission_names = {perm[0] for perm in user_permissions}
-            temp_deactivated = {
-                name.replace("TEMP_DEACTIVATED_", "")
-                for name in permission_names
-                if name.startswith("TEMP_DEACTIVATED_")
-            }
-            active_suppliers = {
-                name
-                for name in permission_names
-                if not name.startswith("TEMP_DEACTIVATED_")
-            }
-            final_active = active_suppliers - temp_deactivated
+            temp_deactivated = access.deactivated_set
+            final_active = access.active_set
 
             # Filter mappings to only include accessible suppliers
             accessible_mappings = [
@@ -648,20 +597,7 @@ def get_mapping_with_ittid(
                     )
         else:
             # For super/admin users, check for temporary deactivations
-            user_permissions = (
-                db.query(models.UserProviderPermission.provider_name)
-                .filter(
-                    models.UserProviderPermission.user_id == current_user.id,
-                    models.UserProviderPermission.provider_name.like(
-                        "TEMP_DEACTIVATED_%"
-                    ),
-                )
-                .all()
-            )
-
-            temp_deactivated = {
-                perm[0].replace("TEMP_DEACTIVATED_", "") for perm in user_permissions
-            }
+            temp_deactivated = get_user_access(current_user.id, db).deactivated_set
 
             # Filter out temporarily deactivated suppliers
             accessible_mappings = [
@@ -7,6 +7,7 @@ import logging
 import json
 import glob
 import asyncio
+import importlib
 from concurrent.futures import ThreadPoolExecutor
 import time
 from functools import lru_cache
@@ -14,17 +15,17 @@ from functools import lru_cache
 # Add the tests directory to the path to import mapping_3
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'ml'))
 
-try:
-    from mapping_3 import HotelMapper
-except ImportError as e:
-    logging.error(f"Failed to import HotelMapper: {e}")
-    HotelMapper = None
+# mapping_3 / mapping_without_push pull in pandas and requests; import them on
+# first use so they don't add to worker boot time
+@lru_cache(maxsize=None)
+def _load_mapper(module_name: str):
+    """HotelMapper class from an ml/ module, or None if it can't be imported"""
+    try:
+        return importlib.import_module(module_name).HotelMapper
+    except ImportError as e:
+        logging.error(f"Failed to import HotelMapper from {module_name}: {e}")
+        return None
 
-try:
-    from mapping_without_push import HotelMapper as HotelMapperWithoutPush
-except ImportError as e:
-    logging.error(f"Failed to import HotelMapperWithoutPush: {e}")
-    HotelMapperWithoutPush = None
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -106,6 +107,7 @@ async def find_match_data(request: HotelMappingRequest):
     Raises:
         HTTPException: If HotelMapper is not available, hotel not found, or other errors occur
     """
+    HotelMapper = _load_mapper("mapping_3")
     if HotelMapper is None:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -155,6 +157,7 @@ async def batch_find_match_data(request: BatchHotelMappingRequest):
     Raises:
         HTTPException: If HotelMapper is not available or other errors occur
     """
+    HotelMapper = _load_mapper("mapping_3")
     if HotelMapper is None:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -229,6 +232,7 @@ async def find_match_data_without_push(request: HotelMappingRequest):
     Raises:
         HTTPException: If HotelMapperWithoutPush is not available, hotel not found, or other errors occur
     """
+    HotelMapperWithoutPush = _load_mapper("mapping_without_push")
     if HotelMapperWithoutPush is None:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -272,8 +276,8 @@ async def health_check():
     return {
         "status": "healthy",
         "service": "ML Hotel Mapping",
-        "hotel_mapper_available": HotelMapper is not None,
-        "hotel_mapper_without_push_available": HotelMapperWithoutPush is not None,
+        "hotel_mapper_available": _load_mapper("mapping_3") is not None,
+        "hotel_mapper_without_push_available": _load_mapper("mapping_without_push") is not None,
         "endpoints": {
             "find_match_data": "Standard mapping with push step",
             "find_match_data_without_push": "Direct mapping without push step",
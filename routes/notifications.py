@@ -8,6 +8,7 @@ from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
 from sqlalchemy.orm import Session
 
 from database import get_db
+from db_async import run_db, db_offload
 from routes.auth import get_current_active_user
 import models
 from services.notification_service import NotificationService
@@ -37,7 +38,8 @@ router = APIRouter(
 
 
 @router.get("/", response_model=NotificationListResponse)
-async def get_notifications(
+@db_offload
+def get_notifications(
     page: int = Query(1, ge=1, description="Page number (1-indexed)"),
     limit: int = Query(25, ge=1, le=100, description="Items per page (max 100)"),
     status: Optional[NotificationStatus] = Query(
@@ -120,17 +122,18 @@ async def get_unread_count(
         cache_key = f"notification:unread_count:{current_user.id}"
 
         # Try to get from cache first (30-second TTL)
-        cached_response = cache.get(cache_key)
+        cached_response = await cache.aget(cache_key)
         if cached_response is not None:
             return UnreadCountResponse(**cached_response)
 
         # Cache miss - query database
-        service = NotificationService(db)
-        response = service.get_unread_count(current_user.id)
+        response = await run_db(
+            lambda: NotificationService(db).get_unread_count(current_user.id)
+        )
 
         # Cache the response for 30 seconds
         # This means: 5s polling = only 1 DB query per 30s = 83% reduction
-        cache.set(cache_key, response.dict(), ttl=30)
+        await cache.aset(cache_key, response.dict(), ttl=30)
 
         return response
 
@@ -162,7 +165,7 @@ async def mark_notification_read(
 
         # Invalidate unread count cache for this user
         cache_key = f"notification:unread_count:{current_user.id}"
-        cache.delete(cache_key)
+        await cache.adelete(cache_key)
 
         # Convert to response format
         return NotificationResponse.model_validate(notification)
@@ -218,7 +221,7 @@ async def mark_all_notifications_read(
 
         # Invalidate unread count cache for this user
         cache_key = f"notification:unread_count:{current_user.id}"
-        cache.delete(cache_key)
+        await cache.adelete(cache_key)
 
         return response
 
@@ -6,9 +6,10 @@ from typing import List, Annotated
 from routes.auth import get_current_user
 from pydantic import BaseModel
 import models
-from security.input_validation import validate_ip_address
+from security.ip_prefix_tree import normalize_ip_entry
 from datetime import datetime
 from services.notification_service import NotificationService
+from services.access_control_service import bump_access_version
 
 router = APIRouter(
     prefix="/v1.0/permissions",
@@ -27,7 +28,7 @@ class SupplierActivationRequest(BaseModel):
 
 class IPWhitelistRequest(BaseModel):
     id: str  # User ID
-    ip: List[str]  # List of IP addresses
+    ip: List[str]  # List of IP addresses or CIDR ranges
 
 
 @router.post(
@@ -108,6 +109,7 @@ def grant_provider_permissions(
                 # Permission already exists, skip
                 pass
 
+    bump_access_version(db)
     db.commit()
 
     # Create notifications for granted permissions
@@ -205,6 +207,7 @@ def remove_provider_permissions(
                 db.delete(permission)
                 removed.append(provider_name)
 
+    bump_access_version(db)
     db.commit()
 
     # Create notifications for revoked permissions
@@ -347,6 +350,7 @@ def deactivate_suppliers_temporarily(
                 db.add(temp_deactivation)
                 deactivated.append(supplier_name)
 
+        bump_access_version(db)
         db.commit()
 
         return {
@@ -443,6 +447,7 @@ def activate_suppliers(
             db.delete(deactivation_record)
             activated.append(supplier_name)
 
+        bump_access_version(db)
         db.commit()
 
         return {
@@ -475,7 +480,8 @@ def activate_ip_permission(
 
     Request Body:
     - id: Target user ID to whitelist IPs for
-    - ip: List of IP addresses to whitelist (IPv4/IPv6 supported)
+    - ip: List of IP addresses or CIDR ranges to whitelist (IPv4/IPv6 supported),
+      e.g. "203.0.113.7", "203.0.113.0/24", "2001:db8::/32"
 
     Access Control:
     - Super User: Can whitelist IPs for any user
@@ -483,7 +489,8 @@ def activate_ip_permission(
     - General User: Not allowed
 
     Features:
-    - IP address format validation (IPv4/IPv6)
+    - IP address / CIDR range format validation (IPv4/IPv6)
+    - Entries are stored in canonical form ("10.0.0.5/24" -> "10.0.0.0/24")
     - Duplicate IP prevention for same user
     - Audit logging for security tracking
     - Bulk IP address management
@@ -539,15 +546,11 @@ def activate_ip_permission(
         valid_ips = []
 
         for ip_addr in request.ip:
-            if not ip_addr or not ip_addr.strip():
-                invalid_ips.append(ip_addr)
-                continue
-
-            ip_addr = ip_addr.strip()
-            if validate_ip_address(ip_addr):
-                valid_ips.append(ip_addr)
-            else:
+            normalized = normalize_ip_entry(ip_addr)
+            if normalized is None:
                 invalid_ips.append(ip_addr)
+            elif normalized not in valid_ips:
+                valid_ips.append(normalized)
 
         if invalid_ips:
             raise HTTPException(
@@ -555,19 +558,22 @@ def activate_ip_permission(
                 detail=f"Invalid IP addresses: {', '.join(invalid_ips)}",
             )
 
-        # Check for existing IP addresses for this user
-        existing_ips = (
+        # Check for existing IP addresses for this user (compared in canonical form)
+        active_entries = (
             db.query(UserIPWhitelist)
             .filter(
                 UserIPWhitelist.user_id == request.id,
-                UserIPWhitelist.ip_address.in_(valid_ips),
                 UserIPWhitelist.is_active == True,
             )
             .all()
         )
 
-        existing_ip_addresses = {ip.ip_address for ip in existing_ips}
-        new_ips = [ip for ip in valid_ips if ip not in existing_ip_addresses]
+        active_ip_addresses = {
+            normalize_ip_entry(entry.ip_address) or entry.ip_address
+            for entry in active_entries
+        }
+        existing_ip_addresses = [ip for ip in valid_ips if ip in active_ip_addresses]
+        new_ips = [ip for ip in valid_ips if ip not in active_ip_addresses]
 
         # Add new IP addresses
         added_ips = []
@@ -582,6 +588,7 @@ def activate_ip_permission(
             db.add(whitelist_entry)
             added_ips.append(ip_addr)
 
+        bump_access_version(db)
         db.commit()
 
         # Prepare response
@@ -600,7 +607,7 @@ def activate_ip_permission(
             },
             "ip_details": {
                 "newly_added": added_ips,
-                "already_existing": list(existing_ip_addresses),
+                "already_existing": existing_ip_addresses,
                 "all_active_ips": valid_ips,
             },
             "created_by": {
@@ -680,6 +687,7 @@ def get_user_ip_whitelist(
                 {
                     "id": entry.id,
                     "ip_address": entry.ip_address,
+                    "is_range": entry.is_range,
                     "created_at": (
                         entry.created_at.isoformat() if entry.created_at else None
                     ),
@@ -723,12 +731,14 @@ def remove_ip_whitelist(
     """
     Remove IP Addresses from Whitelist
 
-    Removes specific IP addresses from a user's whitelist.
+    Removes specific IP addresses or CIDR ranges from a user's whitelist.
+    Entries are matched exactly (in canonical form): removing "10.0.0.0/24"
+    removes that range entry, not single addresses inside it.
     Only super users and admin users can manage IP whitelists.
 
     Request Body:
         - user_id: Target user ID to remove IPs from
-        - ip_addresses: List of IP addresses to remove
+        - ip_addresses: List of IP addresses or CIDR ranges to remove
 
     Args:
         request: IPRemovalRequest containing user_id and ip_addresses
@@ -759,18 +769,16 @@ def remove_ip_whitelist(
                 detail=f"User with ID '{request.user_id}' not found",
             )
 
-        # Validate IP addresses
-        import ipaddress
-
+        # Validate IP addresses / CIDR ranges
         valid_ips = []
         invalid_ips = []
 
         for ip in request.ip_addresses:
-            try:
-                ipaddress.ip_address(ip.strip())
-                valid_ips.append(ip.strip())
-            except ValueError:
+            normalized = normalize_ip_entry(ip)
+            if normalized is None:
                 invalid_ips.append(ip)
+            else:
+                valid_ips.append(normalized)
 
         if invalid_ips:
             raise HTTPException(
@@ -778,16 +786,17 @@ def remove_ip_whitelist(
                 detail=f"Invalid IP addresses: {', '.join(invalid_ips)}",
             )
 
-        # Find existing entries to remove
-        entries_to_remove = (
-            db.query(UserIPWhitelist)
+        # Find existing entries to remove (compared in canonical form)
+        entries_to_remove = [
+            entry
+            for entry in db.query(UserIPWhitelist)
             .filter(
                 UserIPWhitelist.user_id == request.user_id,
-                UserIPWhitelist.ip_address.in_(valid_ips),
                 UserIPWhitelist.is_active == True,
             )
             .all()
-        )
+            if (normalize_ip_entry(entry.ip_address) or entry.ip_address) in valid_ips
+        ]
 
         if not entries_to_remove:
             raise HTTPException(
@@ -802,6 +811,7 @@ def remove_ip_whitelist(
             entry.updated_at = datetime.utcnow()
             removed_ips.append(entry.ip_address)
 
+        bump_access_version(db)
         db.commit()
 
         return {
@@ -887,6 +897,7 @@ def clear_user_ip_whitelist(
             entry.updated_at = datetime.utcnow()
             cleared_ips.append(entry.ip_address)
 
+        bump_access_version(db)
         db.commit()
 
         return {
@@ -0,0 +1,128 @@
+"""
+Sampling Profiler Routes
+
+Admin endpoints that start, stop and read on-demand profiling sessions
+(see ``sampling_profiler``). Results are flame graph ready: fetch a session
+with ``format=collapsed`` and feed it to flamegraph.pl or speedscope.
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+from typing import Optional
+from pydantic import BaseModel, Field
+
+from routes.auth import get_current_user
+from sampling_profiler import (
+    DEFAULT_INTERVAL_MS,
+    MAX_SECONDS,
+    ProfilerBusy,
+    collapsed_stacks,
+    profiler,
+    top_functions,
+)
+import models
+
+
+router = APIRouter(
+    prefix="/v1.0/admin/profiler",
+    tags=["Profiling"],
+    responses={404: {"description": "Not found"}},
+)
+
+
+class StartProfilingRequest(BaseModel):
+    duration_seconds: float = Field(30, gt=0, le=MAX_SECONDS, description="Sampling window")
+    interval_ms: float = Field(DEFAULT_INTERVAL_MS, ge=1, le=1000, description="Time between samples")
+    max_requests: Optional[int] = Field(None, ge=1, description="Stop after this many matching requests")
+    path_prefix: Optional[str] = Field(None, description="Only profile requests under this path")
+    user_id: Optional[str] = Field(None, description="Only profile requests of this user")
+    include_idle: bool = Field(False, description="Keep samples of waiting threads")
+
+
+def _require_admin(current_user: models.User) -> None:
+    if current_user.role not in [
+        models.UserRole.SUPER_USER,
+        models.UserRole.ADMIN_USER,
+    ]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied. Only super users and admin users can use the profiler.",
+        )
+
+
+@router.post("/start")
+async def start_profiling(
+    request: StartProfilingRequest,
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    **Start a Profiling Session**
+
+    Samples the worker handling this call. Without filters every busy
+    thread is sampled for ``duration_seconds`` (window mode); with
+    ``path_prefix``, ``user_id`` or ``max_requests`` only work done for
+    matching requests is sampled (requests mode).
+
+    **Access Control:** SUPER_USER, ADMIN_USER
+    """
+    _require_admin(current_user)
+    try:
+        # Async handler: the session records this event loop for task attribution
+        session = profiler.start(**request.model_dump())
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return session.as_dict()
+
+
+@router.post("/{session_id}/stop")
+async def stop_profiling(
+    session_id: str,
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    **Stop a Profiling Session**
+
+    Sessions owned by another worker stop within a few seconds.
+    """
+    _require_admin(current_user)
+    if not profiler.stop(session_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profiling session not found")
+    result = profiler.result(session_id)
+    result.pop("stacks", None)
+    return result
+
+
+@router.get("/sessions")
+async def list_profiling_sessions(current_user: models.User = Depends(get_current_user)):
+    """
+    **List Profiling Sessions**
+
+    Running and finished sessions of all workers (kept for a day).
+    """
+    _require_admin(current_user)
+    return {"sessions": profiler.list_results()}
+
+
+@router.get("/{session_id}")
+async def get_profiling_result(
+    session_id: str,
+    format: str = Query("json", pattern="^(json|collapsed)$"),
+    limit: int = Query(30, ge=1, le=500),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    **Get a Profiling Result**
+
+    - ``format=json``: session summary plus the top functions by self and
+      total samples
+    - ``format=collapsed``: ``frame;frame;frame count`` lines for flame graphs
+    """
+    _require_admin(current_user)
+    result = profiler.result(session_id)
+    if result is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profiling session not found")
+    if format == "collapsed":
+        return PlainTextResponse(collapsed_stacks(result))
+    functions = top_functions(result, limit)
+    result.pop("stacks", None)
+    return {**result, "top_functions": functions}
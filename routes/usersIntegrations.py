@@ -24,6 +24,7 @@ from user_schemas import (
     ValidationError,
 )
 from services.user_service import UserService
+from services.point_service import ensure_spendable_points
 from typing import Annotated, Optional
 import models
 from passlib.context import CryptContext
@@ -791,7 +792,7 @@ def give_points(
                 .filter(models.UserPoint.user_id == current_user.id)
                 .first()
             )
-            if not giver_points or giver_points.current_points < points:
+            if not giver_points or not ensure_spendable_points(db, giver_points, points):
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="Insufficient points to give.",
@@ -883,10 +884,17 @@ def reset_user_point(
                 detail="User points not found.",
             )
 
+        # Settle metered usage and release leased quota first, so neither a
+        # later write-back nor a quota refund lands on the reset balance
+        from services.point_meter_service import release_user_leases
+
+        release_user_leases(user_id, db)
+
         # Reset all point values to zero
         user_points.total_points = 0
         user_points.current_points = 0
         user_points.total_used_points = 0
+        user_points.reserved_points = 0
         db.commit()
 
         return {"message": f"Points for user {user_id} have been reset to 0."}
@@ -0,0 +1,447 @@
+"""
+On-demand sampling profiler
+
+A statistical stack sampler that admins switch on at runtime to see where
+CPU goes in a live worker (formatter, serializer, matcher...) without
+redeploying. A background thread reads every thread's Python stack
+(``sys._current_frames()``) every ``interval_ms`` and counts collapsed
+stacks (``root;caller;leaf count``), the input format of flamegraph.pl,
+speedscope and most flame graph viewers.
+
+Two modes:
+
+- window: sample every busy thread of the worker for ``duration_seconds``
+- requests: sample only work done for matching requests (path prefix and/or
+  user id) until ``max_requests`` of them have finished or the window ends.
+  The request pipeline tags matching requests with a context variable; a
+  sample counts if the thread is running inside a tagged context: event
+  loop threads via their current task's context, AnyIO worker threads
+  (sync handlers, dependencies, ``run_db``) via the context they run.
+
+Safety limits: sessions end after at most ``PROFILER_MAX_SECONDS``; if
+sampling takes more than ``PROFILER_MAX_OVERHEAD`` of wall time the interval
+is doubled, and the session stops once the interval would exceed
+``PROFILER_MAX_INTERVAL_MS``. Only one session runs per worker.
+
+A session runs in the worker that received the start call. Its state and
+result are written to ``PROFILER_DIR/<session_id>.json`` so status, result
+and stop calls work from any worker (stop leaves a flag file the owning
+worker picks up).
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+from collections import Counter
+from contextvars import Context, ContextVar, Token
+from datetime import datetime
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+PROFILER_DIR = os.getenv("PROFILER_DIR", os.path.join(tempfile.gettempdir(), "hita_profiles"))
+DEFAULT_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "10"))
+MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "120"))
+MAX_OVERHEAD = float(os.getenv("PROFILER_MAX_OVERHEAD", "0.05"))
+MAX_INTERVAL_MS = float(os.getenv("PROFILER_MAX_INTERVAL_MS", "200"))
+RESULT_TTL_SECONDS = float(os.getenv("PROFILER_RESULT_TTL_SECONDS", "86400"))
+
+MAX_STACK_DEPTH = 128
+MAX_DISTINCT_STACKS = 20000
+PERSIST_SECONDS = 2.0
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Leaf functions of threads that are waiting, not working (skipped unless include_idle)
+_IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("socket.py", "accept"),
+    ("ssl.py", "read"),
+}
+
+_marker: ContextVar[Optional[str]] = ContextVar("profile_session", default=None)
+
+
+class ProfilerBusy(RuntimeError):
+    """A session is already running in this worker"""
+
+
+class ProfileSession:
+    """
+    One profiling run and its aggregated samples.
+    """
+
+    def __init__(
+        self,
+        duration_seconds: float,
+        interval_ms: float = DEFAULT_INTERVAL_MS,
+        max_requests: Optional[int] = None,
+        path_prefix: Optional[str] = None,
+        user_id: Optional[str] = None,
+        include_idle: bool = False,
+    ):
+        self.id = uuid.uuid4().hex[:12]
+        self.duration_seconds = min(duration_seconds, MAX_SECONDS)
+        self.interval = max(interval_ms, 1.0) / 1000
+        self.max_requests = max_requests
+        self.path_prefix = path_prefix
+        self.user_id = str(user_id) if user_id is not None else None
+        self.include_idle = include_idle
+        self.mode = "requests" if (max_requests or path_prefix or user_id is not None) else "window"
+
+        self.started = time.monotonic()
+        self.started_at = datetime.utcnow().isoformat()
+        self.ended_at: Optional[str] = None
+        self.status = "running"
+        self.stop_reason: Optional[str] = None
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.sampler_seconds = 0.0
+        self.matched_requests = 0
+        self.completed_requests = 0
+        self.in_flight = 0
+
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.loop_thread: Optional[int] = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def matches(self, path: str, user_id: Optional[str]) -> bool:
+        if self.mode != "requests":
+            return False
+        if self.max_requests and self.matched_requests >= self.max_requests:
+            return False
+        if self.path_prefix and not path.startswith(self.path_prefix):
+            return False
+        if self.user_id is not None and str(user_id) != self.user_id:
+            return False
+        return True
+
+    def as_dict(self, include_stacks: bool = False) -> Dict[str, Any]:
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        with self._lock:
+            result = {
+                "session_id": self.id,
+                "pid": os.getpid(),
+                "status": self.status,
+                "stop_reason": self.stop_reason,
+                "mode": self.mode,
+                "filters": {
+                    "path_prefix": self.path_prefix,
+                    "user_id": self.user_id,
+                    "max_requests": self.max_requests,
+                },
+                "started_at": self.started_at,
+                "ended_at": self.ended_at,
+                "duration_seconds": self.duration_seconds,
+                "interval_ms": round(self.interval * 1000, 2),
+                "samples": self.samples,
+                "distinct_stacks": len(self.stacks),
+                "matched_requests": self.matched_requests,
+                "completed_requests": self.completed_requests,
+                "overhead_percent": round(self.sampler_seconds / elapsed * 100, 3),
+            }
+            if include_stacks:
+                result["stacks"] = dict(self.stacks)
+        return result
+
+
+class SamplingProfiler:
+    """
+    Owns this worker's active session and its sampler thread.
+    """
+
+    def __init__(self, directory: str = PROFILER_DIR):
+        self.directory = directory
+        self.session: Optional[ProfileSession] = None
+        self._lock = threading.Lock()
+        self._labels: Dict[Any, str] = {}
+
+    # ------------------------------------------------------------- sessions
+
+    def start(self, **options: Any) -> ProfileSession:
+        with self._lock:
+            if self.session is not None and self.session.status == "running":
+                raise ProfilerBusy(f"Profiling session {self.session.id} is already running")
+            session = ProfileSession(**options)
+            try:
+                session.loop = asyncio.get_running_loop()
+                session.loop_thread = threading.get_ident()
+            except RuntimeError:
+                pass
+            self.session = session
+
+        self._cleanup_old_results()
+        self._persist(session)
+        thread = threading.Thread(target=self._run, args=(session,), name="sampling_profiler", daemon=True)
+        thread.start()
+        logger.info(f"Profiling session {session.id} started ({session.mode}, {session.duration_seconds:g}s)")
+        return session
+
+    def stop(self, session_id: str, reason: str = "stopped") -> bool:
+        """Stop a session (here, or via a flag file for another worker's session)"""
+        session = self.session
+        if session is not None and session.id == session_id:
+            self._finish(session, reason)
+            return True
+        if os.path.exists(self._result_path(session_id)):
+            with open(self._result_path(session_id) + ".stop", "w") as f:
+                f.write(reason)
+            return True
+        return False
+
+    def result(self, session_id: str) -> Optional[Dict[str, Any]]:
+        session = self.session
+        if session is not None and session.id == session_id:
+            return session.as_dict(include_stacks=True)
+        try:
+            with open(self._result_path(session_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def list_results(self) -> List[Dict[str, Any]]:
+        results = []
+        try:
+            names = sorted(os.listdir(self.directory))
+        except OSError:
+            return results
+        for name in names:
+            if name.endswith(".json"):
+                result = self.result(name[: -len(".json")])
+                if result:
+                    result.pop("stacks", None)
+                    results.append(result)
+        results.sort(key=lambda item: item["started_at"], reverse=True)
+        return results
+
+    # ------------------------------------------------------ request tagging
+
+    def enter_request(self, path: str, authorization: Optional[str] = None) -> Optional[Tuple[ProfileSession, Token]]:
+        """Tag the current request if it matches the running session (pipeline hook)"""
+        session = self.session
+        if session is None or session.mode != "requests" or session.status != "running":
+            return None
+        user_id = None
+        if session.user_id is not None:
+            from middleware.auth_middleware import token_user_id
+
+            user_id = token_user_id(authorization, path)
+        with session._lock:
+            if not session.matches(path, user_id):
+                return None
+            session.matched_requests += 1
+            session.in_flight += 1
+        return session, _marker.set(session.id)
+
+    def exit_request(self, tagged: Tuple[ProfileSession, Token]) -> None:
+        session, token = tagged
+        _marker.reset(token)
+        with session._lock:
+            session.in_flight -= 1
+            session.completed_requests += 1
+            done = session.max_requests and session.completed_requests >= session.max_requests
+        if done:
+            self._finish(session, "max_requests")
+
+    # -------------------------------------------------------------- sampling
+
+    def _run(self, session: ProfileSession) -> None:
+        last_persist = time.monotonic()
+        while not session._stop_event.wait(session.interval):
+            begin = time.perf_counter()
+            if session.mode == "window" or session.in_flight:
+                self._sample(session)
+            session.sampler_seconds += time.perf_counter() - begin
+
+            now = time.monotonic()
+            elapsed = now - session.started
+            if elapsed >= session.duration_seconds:
+                self._finish(session, "duration")
+                break
+            if elapsed > 1 and session.sampler_seconds / elapsed > MAX_OVERHEAD:
+                session.interval *= 2
+                if session.interval * 1000 > MAX_INTERVAL_MS:
+                    self._finish(session, "overhead")
+                    break
+                logger.info(f"Profiling session {session.id}: interval raised to {session.interval * 1000:g}ms")
+            if now - last_persist >= PERSIST_SECONDS:
+                last_persist = now
+                if os.path.exists(self._result_path(session.id) + ".stop"):
+                    self._finish(session, "stopped")
+                    break
+                self._persist(session)
+
+        self._persist(session)
+        try:
+            os.remove(self._result_path(session.id) + ".stop")
+        except OSError:
+            pass
+        logger.info(f"Profiling session {session.id} finished ({session.stop_reason}, {session.samples} samples)")
+
+    def _sample(self, session: ProfileSession) -> None:
+        own_thread = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        loop_tasks = self._loop_tasks(session) if session.mode == "requests" else {}
+
+        stacks = []
+        for ident, frame in sys._current_frames().items():
+            if ident == own_thread:
+                continue
+            if session.mode == "requests" and not self._tagged(session, frame, loop_tasks.get(ident)):
+                continue
+            stack = self._collapse(frame)
+            if stack is None or (not session.include_idle and self._is_idle(frame)):
+                continue
+            stacks.append(f"{names.get(ident, 'thread')};{stack}")
+
+        with session._lock:
+            session.samples += 1
+            for stack in stacks:
+                if stack in session.stacks or len(session.stacks) < MAX_DISTINCT_STACKS:
+                    session.stacks[stack] += 1
+                else:
+                    session.stacks["[truncated]"] += 1
+
+    @staticmethod
+    def _loop_tasks(session: ProfileSession) -> Dict[int, asyncio.Task]:
+        """Task currently running on each event loop thread"""
+        loop_tasks = {}
+        for loop, task in list(asyncio.tasks._current_tasks.items()):
+            thread_id = getattr(loop, "_thread_id", None)
+            if thread_id is None and loop is session.loop:
+                thread_id = session.loop_thread
+            if thread_id is not None:
+                loop_tasks[thread_id] = task
+        return loop_tasks
+
+    def _tagged(self, session: ProfileSession, frame, loop_task: Optional[asyncio.Task]) -> bool:
+        if loop_task is not None:
+            return loop_task.get_context().get(_marker) == session.id
+        # AnyIO worker threads run each call inside the caller's copied context
+        callee = None
+        while frame is not None:
+            code = frame.f_code
+            if code.co_name == "run" and "context" in code.co_varnames:
+                context = frame.f_locals.get("context")
+                if isinstance(context, Context):
+                    # An idle worker still holds the context of its last call
+                    if callee is not None and callee.co_name == "get":
+                        return False
+                    return context.get(_marker) == session.id
+            callee = code
+            frame = frame.f_back
+        return False
+
+    def _collapse(self, frame) -> Optional[str]:
+        labels = []
+        while frame is not None and len(labels) < MAX_STACK_DEPTH:
+            labels.append(self._label(frame.f_code))
+            frame = frame.f_back
+        if not labels:
+            return None
+        labels.reverse()
+        return ";".join(labels)
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            filename = code.co_filename
+            if filename.startswith(BASE_DIR + os.sep):
+                filename = os.path.relpath(filename, BASE_DIR)
+            elif "site-packages" + os.sep in filename:
+                filename = filename.split("site-packages" + os.sep, 1)[1]
+            else:
+                filename = os.path.basename(filename)
+            label = f"{code.co_name} ({filename})"
+            self._labels[code] = label
+        return label
+
+    @staticmethod
+    def _is_idle(frame) -> bool:
+        code = frame.f_code
+        return (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES
+
+    # ----------------------------------------------------------- persistence
+
+    def _finish(self, session: ProfileSession, reason: str) -> None:
+        with session._lock:
+            if session.status != "running":
+                return
+            session.status = "finished"
+            session.stop_reason = reason
+            session.ended_at = datetime.utcnow().isoformat()
+        # The sampler thread writes the final result
+        session._stop_event.set()
+
+    def _persist(self, session: ProfileSession) -> None:
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._result_path(session.id)
+            with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+                json.dump(session.as_dict(include_stacks=True), f)
+            os.replace(f"{path}.tmp", path)
+        except OSError as e:
+            logger.warning(f"Could not write profiling session {session.id}: {e}")
+
+    def _result_path(self, session_id: str) -> str:
+        # Session ids are hex; never let a caller-supplied id escape the directory
+        return os.path.join(self.directory, f"{os.path.basename(session_id)}.json")
+
+    def _cleanup_old_results(self) -> None:
+        cutoff = time.time() - RESULT_TTL_SECONDS
+        try:
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+        except OSError:
+            pass
+
+
+profiler = SamplingProfiler()
+
+
+def collapsed_stacks(result: Dict[str, Any]) -> str:
+    """Flame graph input: one ``frame;frame;frame count`` line per stack"""
+    stacks = result.get("stacks", {})
+    return "".join(
+        f"{stack} {count}\n" for stack, count in sorted(stacks.items(), key=lambda item: item[1], reverse=True)
+    )
+
+
+def top_functions(result: Dict[str, Any], limit: int = 30) -> List[Dict[str, Any]]:
+    """Functions by self samples (leaf) and total samples (anywhere on the stack)"""
+    self_counts: Counter = Counter()
+    total_counts: Counter = Counter()
+    samples = 0
+    for stack, count in result.get("stacks", {}).items():
+        frames = stack.split(";")[1:]  # drop the thread name
+        if not frames:
+            continue
+        samples += count
+        self_counts[frames[-1]] += count
+        for frame in set(frames):
+            total_counts[frame] += count
+    return [
+        {
+            "function": function,
+            "self_samples": self_counts[function],
+            "total_samples": total,
+            "self_percent": round(self_counts[function] / samples * 100, 2) if samples else 0.0,
+            "total_percent": round(total / samples * 100, 2) if samples else 0.0,
+        }
+        for function, total in sorted(
+            total_counts.items(), key=lambda item: (self_counts[item[0]], item[1]), reverse=True
+        )[:limit]
+    ]
@@ -181,6 +181,26 @@ class HotelUpdate(BaseModel):
     chains: Optional[List[ChainCreate]] = []
 
 
+# --- Bulk Ingest Schemas ---
+class HotelBulkIngestRequest(BaseModel):
+    hotels: List[HotelCreate] = Field(..., min_length=1, max_length=20000)
+    update_existing: bool = True
+    chunk_size: int = Field(1000, ge=1, le=5000)
+
+
+class ProviderMappingBulkItem(ProviderMappingCreate):
+    ittid: str = Field(..., max_length=100)
+    provider_id: str = Field(..., max_length=255)
+    system_type: str = Field("a", max_length=20)
+
+
+class ProviderMappingBulkRequest(BaseModel):
+    mappings: List[ProviderMappingBulkItem] = Field(
+        ..., min_length=1, max_length=50000
+    )
+    chunk_size: int = Field(1000, ge=1, le=5000)
+
+
 # Rebuild forward references
 UserCreate.model_rebuild()
 HotelCreate.model_rebuild()
@@ -35,9 +35,14 @@ from .audit_logging import (
     create_audit_middleware
 )
 
+from .ip_prefix_tree import (
+    IPPrefixTree,
+    parse_ip_entry,
+    normalize_ip_entry
+)
+
 from .middleware import (
-    SecurityMiddleware,
-    AuthenticationMiddleware,
+    SecurityPolicy,
     create_security_middleware_stack,
     validate_user_permissions,
     log_user_action,
@@ -69,9 +74,13 @@ __all__ = [
     'SessionManager',
     'create_audit_middleware',
     
+    # IP whitelist matching
+    'IPPrefixTree',
+    'parse_ip_entry',
+    'normalize_ip_entry',
+    
     # Middleware
-    'SecurityMiddleware',
-    'AuthenticationMiddleware',
+    'SecurityPolicy',
     'create_security_middleware_stack',
     'validate_user_permissions',
     'log_user_action',
@@ -0,0 +1,161 @@
+"""
+IP Prefix Tree
+
+Path-compressed binary radix (Patricia) tree for IP whitelist matching.
+Entries are single addresses or CIDR ranges, IPv4 and IPv6 kept in
+separate trees. A membership check walks at most one node per distinct
+branching prefix, so it costs O(prefix length) regardless of how many
+entries are whitelisted.
+"""
+
+from typing import Iterable, Optional, Union
+import ipaddress
+
+IPNetwork = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+def parse_ip_entry(value: Optional[str]) -> Optional[IPNetwork]:
+    """
+    Parse a whitelist entry ("203.0.113.7", "203.0.113.0/24", "2001:db8::/32").
+
+    Host bits below the prefix are ignored ("10.0.0.5/24" -> 10.0.0.0/24).
+
+    Returns:
+        The network, or None if the value is not a valid address or range
+    """
+    if not value or not value.strip():
+        return None
+    try:
+        network = ipaddress.ip_network(value.strip(), strict=False)
+    except ValueError:
+        return None
+    # Treat IPv4-mapped IPv6 entries as the IPv4 range they describe
+    if network.version == 6 and network.network_address.ipv4_mapped and network.prefixlen >= 96:
+        return ipaddress.ip_network(
+            f"{network.network_address.ipv4_mapped}/{network.prefixlen - 96}"
+        )
+    return network
+
+
+def format_ip_entry(network: IPNetwork) -> str:
+    """Canonical text of an entry: bare address for /32 and /128, CIDR otherwise"""
+    if network.prefixlen == network.max_prefixlen:
+        return str(network.network_address)
+    return network.with_prefixlen
+
+
+def normalize_ip_entry(value: Optional[str]) -> Optional[str]:
+    """Canonical text of a whitelist entry, or None if invalid"""
+    network = parse_ip_entry(value)
+    return format_ip_entry(network) if network is not None else None
+
+
+class _Node:
+    __slots__ = ("prefix", "length", "terminal", "children")
+
+    def __init__(self, prefix: int, length: int, terminal: bool = False):
+        self.prefix = prefix  # network address as an integer
+        self.length = length  # number of significant leading bits
+        self.terminal = terminal  # a whitelisted prefix ends here
+        self.children = [None, None]
+
+
+class IPPrefixTree:
+    """
+    Set of IPv4/IPv6 prefixes with longest-path membership lookup.
+
+    Example:
+        tree = IPPrefixTree(["10.0.0.0/8", "2001:db8::/32", "203.0.113.7"])
+        "10.20.30.40" in tree   # True
+        "203.0.113.8" in tree   # False
+    """
+
+    __slots__ = ("_roots", "_size")
+
+    def __init__(self, entries: Iterable[str] = ()):
+        self._roots = {4: _Node(0, 0), 6: _Node(0, 0)}
+        self._size = 0
+        for entry in entries:
+            self.add(entry)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __bool__(self) -> bool:
+        return self._size > 0
+
+    def add(self, entry: Union[str, IPNetwork]) -> bool:
+        """Insert an address or CIDR range. Returns False for invalid input."""
+        network = parse_ip_entry(entry) if isinstance(entry, str) else entry
+        if network is None:
+            return False
+        self._insert(
+            self._roots[network.version],
+            int(network.network_address),
+            network.prefixlen,
+            network.max_prefixlen,
+        )
+        self._size += 1
+        return True
+
+    def __contains__(self, ip: Optional[str]) -> bool:
+        if not ip:
+            return False
+        try:
+            address = ipaddress.ip_address(ip.strip())
+        except ValueError:
+            return False
+        if address.version == 6 and address.ipv4_mapped is not None:
+            address = address.ipv4_mapped
+        return self._lookup(self._roots[address.version], int(address), address.max_prefixlen)
+
+    @staticmethod
+    def _insert(node: _Node, prefix: int, length: int, width: int) -> None:
+        while True:
+            if length == node.length:
+                node.terminal = True
+                return
+
+            bit = (prefix >> (width - 1 - node.length)) & 1
+            child = node.children[bit]
+            if child is None:
+                node.children[bit] = _Node(prefix, length, True)
+                return
+
+            common = min(child.length, length, _common_prefix_length(child.prefix, prefix, width))
+            if common == child.length:
+                node = child
+                continue
+
+            # Split the compressed edge where the new prefix diverges
+            branch = _Node(_mask(prefix, common, width), common)
+            branch.children[(child.prefix >> (width - 1 - common)) & 1] = child
+            if common == length:
+                branch.terminal = True
+            else:
+                branch.children[(prefix >> (width - 1 - common)) & 1] = _Node(prefix, length, True)
+            node.children[bit] = branch
+            return
+
+    @staticmethod
+    def _lookup(node: Optional[_Node], address: int, width: int) -> bool:
+        while node is not None:
+            if node.length and (address ^ node.prefix) >> (width - node.length):
+                return False
+            if node.terminal:
+                return True
+            if node.length == width:
+                return False
+            node = node.children[(address >> (width - 1 - node.length)) & 1]
+        return False
+
+
+def _common_prefix_length(a: int, b: int, width: int) -> int:
+    diff = a ^ b
+    return width if diff == 0 else width - diff.bit_length()
+
+
+def _mask(value: int, length: int, width: int) -> int:
+    if length == 0:
+        return 0
+    return value & (((1 << length) - 1) << (width - length))
@@ -1,33 +1,79 @@
 """
 Security Middleware for User Management
 
-This module provides comprehensive security middleware that integrates
-input validation, rate limiting, and audit logging.
+This module provides the security checks (input validation, rate limiting
+and audit logging of security events) that the request pipeline in
+``middleware/pipeline.py`` runs for every request.
 """
 
-import time
 import json
+import re
 from typing import Optional, Dict, Any
 from fastapi import Request, HTTPException, status
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
 from sqlalchemy.orm import Session
-from database import get_db
+from database import SessionLocal
+from db_async import run_db
 from security.input_validation import SecurityValidator, InputSanitizer
-from security.rate_limiting import RateLimitManager, rate_limit_manager
+from security.rate_limiting import (
+    RateLimitManager,
+    rate_limit_manager,
+    rate_limit_headers,
+)
 from security.audit_logging import AuditLogger, ActivityType, SecurityLevel
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-class SecurityMiddleware(BaseHTTPMiddleware):
-    """Comprehensive security middleware"""
+SECURITY_HEADERS = {
+    "X-Content-Type-Options": "nosniff",
+    "X-Frame-Options": "DENY",
+    "X-XSS-Protection": "1; mode=block",
+    "Strict-Transport-Security": "max-age=31536000; includeSubDomains",
+    "Referrer-Policy": "strict-origin-when-cross-origin",
+    "Content-Security-Policy": "default-src 'self'; script-src 'self' https://cdn.jsdelivr.net; style-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net https://fonts.googleapis.com; font-src 'self' https://fonts.gstatic.com;",
+}
 
-    def __init__(
-        self, app, enable_rate_limiting: bool = True, enable_audit_logging: bool = True
-    ):
-        super().__init__(app)
+# Documentation endpoints skip the checks and only get a minimal header
+DOCS_PATHS = frozenset(["/docs", "/redoc", "/openapi.json"])
+
+_SUSPICIOUS_AGENTS = re.compile(r"bot|crawler|scanner|hack|exploit")
+_MALICIOUS_PATTERNS = re.compile(
+    "|".join(
+        re.escape(pattern)
+        for pattern in [
+            "union select",
+            "drop table",
+            "insert into",
+            "delete from",
+            "<script",
+            "javascript:",
+            "onload=",
+            "onerror=",
+            "../",
+            "..\\",
+            "/etc/passwd",
+            "/proc/self",
+            "cmd.exe",
+            "powershell",
+            "/bin/bash",
+        ]
+    )
+)
+
+
+class SecurityPolicy:
+    """
+    Per-request security checks run by the request pipeline
+    (``middleware.pipeline.RequestPipelineMiddleware``).
+
+    Checks are pure CPU work plus the Redis rate-limit call; a DB session is
+    only opened (on the DB threadpool) when a security event has to be
+    written to the audit log.
+    """
+
+    def __init__(self, enable_rate_limiting: bool = True, enable_audit_logging: bool = True):
         self.enable_rate_limiting = enable_rate_limiting
         self.enable_audit_logging = enable_audit_logging
         self.security_validator = SecurityValidator()
@@ -43,144 +89,34 @@ class SecurityMiddleware(BaseHTTPMiddleware):
             "/v1.0/user/bulk": "bulk_operations",
         }
 
-        # Endpoints that should be logged (fallback - now using centralized API logging config)
-        self.logged_endpoints = ["/v1.0/user/", "/v1.0/auth/", "/v1.0/admin/"]
-
-    async def dispatch(self, request: Request, call_next):
-        """Main middleware dispatch method"""
-        start_time = time.time()
-
-        # Skip security middleware for documentation endpoints
-        if request.url.path in ["/docs", "/redoc", "/openapi.json"]:
-            response = await call_next(request)
-            # Add minimal security headers for docs
-            response.headers["X-Content-Type-Options"] = "nosniff"
-            return response
-
-        # Get database session
-        db = next(get_db())
-
-        try:
-            # Initialize audit logger
-            audit_logger = AuditLogger(db) if self.enable_audit_logging else None
-
-            # Check for blocked IPs or suspicious activity
-            if await self._check_security_blocks(request, audit_logger):
-                return JSONResponse(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    content={
-                        "error": True,
-                        "message": "Access denied due to security policy",
-                        "error_code": "ACCESS_DENIED",
-                    },
-                )
-
-            # Apply rate limiting for sensitive endpoints
-            if self.enable_rate_limiting:
-                rate_limit_response = await self._apply_rate_limiting(
-                    request, audit_logger
-                )
-                if rate_limit_response:
-                    return rate_limit_response
-
-            # Validate and sanitize request data
-            await self._validate_request_data(request)
-
-            # Process the request
-            response = await call_next(request)
-
-            # Note: API access logging is now handled by dedicated API logging middleware
-            # to avoid duplicate logging. Security middleware focuses on security events only.
-
-            # Add security headers
-            self._add_security_headers(response)
-
-            return response
-
-        except HTTPException as e:
-            # Log security-related HTTP exceptions
-            if audit_logger and e.status_code in [401, 403, 422, 429]:
-                await self._log_security_event(request, e, audit_logger)
-
-            # Convert HTTPException to JSONResponse
-            return JSONResponse(
-                status_code=e.status_code,
-                content=(
-                    e.detail
-                    if isinstance(e.detail, dict)
-                    else {"error": True, "message": str(e.detail)}
-                ),
-            )
-
-        except Exception as e:
-            # Log unexpected errors
-            if audit_logger:
-                audit_logger.log_activity(
-                    activity_type=ActivityType.API_ERROR,
-                    details={
-                        "error": str(e),
-                        "endpoint": request.url.path,
-                        "method": request.method,
-                    },
-                    request=request,
-                    security_level=SecurityLevel.HIGH,
-                    success=False,
-                )
-
-            logger.error(f"Security middleware error: {e}")
-            raise e
-
-        finally:
-            db.close()
-
-    async def _check_security_blocks(
-        self, request: Request, audit_logger: Optional[AuditLogger]
-    ) -> bool:
-        """Check for security blocks and suspicious activity"""
-        client_ip = self._get_client_ip(request)
-
-        # Check for blocked IPs (this would typically be stored in database or cache)
-        # For now, we'll implement basic checks
-
-        # Check for suspicious user agents
+    async def check_security_blocks(self, request: Request) -> bool:
+        """Check for suspicious user agents and malicious request patterns"""
         user_agent = request.headers.get("user-agent", "").lower()
-        suspicious_agents = ["bot", "crawler", "scanner", "hack", "exploit"]
-
-        if any(agent in user_agent for agent in suspicious_agents):
-            if audit_logger:
-                audit_logger.log_security_event(
-                    activity_type=ActivityType.SUSPICIOUS_ACTIVITY,
-                    user_id=None,
-                    request=request,
-                    details={
-                        "reason": "suspicious_user_agent",
-                        "user_agent": user_agent,
-                    },
-                    security_level=SecurityLevel.MEDIUM,
-                )
+        if _SUSPICIOUS_AGENTS.search(user_agent):
+            await self.log_security_event(
+                request,
+                ActivityType.SUSPICIOUS_ACTIVITY,
+                {"reason": "suspicious_user_agent", "user_agent": user_agent},
+                SecurityLevel.MEDIUM,
+            )
             return True
 
-        # Check for malicious request patterns
         if self._detect_malicious_patterns(request):
-            if audit_logger:
-                audit_logger.log_security_event(
-                    activity_type=ActivityType.SUSPICIOUS_ACTIVITY,
-                    user_id=None,
-                    request=request,
-                    details={"reason": "malicious_patterns"},
-                    security_level=SecurityLevel.HIGH,
-                )
+            await self.log_security_event(
+                request,
+                ActivityType.SUSPICIOUS_ACTIVITY,
+                {"reason": "malicious_patterns"},
+                SecurityLevel.HIGH,
+            )
             return True
 
         return False
 
-    async def _apply_rate_limiting(
-        self, request: Request, audit_logger: Optional[AuditLogger]
-    ) -> Optional[JSONResponse]:
+    async def apply_rate_limiting(self, request: Request) -> Optional[JSONResponse]:
         """Apply rate limiting to sensitive endpoints"""
-        endpoint = request.url.path
-        operation = self.sensitive_endpoints.get(endpoint)
-
+        if not self.enable_rate_limiting:
+            return None
+        operation = self.sensitive_endpoints.get(request.url.path)
         if not operation:
             return None
 
@@ -188,21 +124,17 @@ class SecurityMiddleware(BaseHTTPMiddleware):
         identifier = rate_limit_manager.get_client_identifier(request)
 
         # Check rate limit
-        is_allowed, rate_info = rate_limit_manager.check_rate_limit(
+        is_allowed, rate_info = await rate_limit_manager.check_rate_limit(
             operation, identifier
         )
 
         if not is_allowed:
-            # Log rate limit violation
-            if audit_logger:
-                audit_logger.log_security_event(
-                    activity_type=ActivityType.RATE_LIMIT_EXCEEDED,
-                    user_id=None,
-                    request=request,
-                    details={"operation": operation, "rate_limit_info": rate_info},
-                    security_level=SecurityLevel.MEDIUM,
-                )
-
+            await self.log_security_event(
+                request,
+                ActivityType.RATE_LIMIT_EXCEEDED,
+                {"operation": operation, "rate_limit_info": rate_info},
+                SecurityLevel.MEDIUM,
+            )
             return JSONResponse(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                 content={
@@ -211,202 +143,139 @@ class SecurityMiddleware(BaseHTTPMiddleware):
                     "error_code": "RATE_LIMIT_EXCEEDED",
                     "rate_limit_info": rate_info,
                 },
-                headers={
-                    "X-RateLimit-Limit": str(rate_info.get("limit", 0)),
-                    "X-RateLimit-Remaining": str(rate_info.get("remaining", 0)),
-                    "X-RateLimit-Reset": str(rate_info.get("reset_time", 0)),
-                    "Retry-After": str(rate_info.get("retry_after", 300)),
-                },
+                headers=rate_limit_headers(rate_info),
             )
 
+        request.state.rate_limit_info = rate_info
         return None
 
-    async def _validate_request_data(self, request: Request):
-        """Validate and sanitize request data"""
-        # Only validate POST/PUT/PATCH requests with JSON data
-        if request.method not in ["POST", "PUT", "PATCH"]:
-            return
+    def needs_body_validation(self, request: Request) -> bool:
+        """Only user create/update JSON bodies are validated"""
+        return (
+            request.method in ("POST", "PUT", "PATCH")
+            and "application/json" in request.headers.get("content-type", "")
+            and request.url.path.startswith(("/v1.0/user/create", "/v1.0/user/update"))
+        )
 
-        content_type = request.headers.get("content-type", "")
-        if "application/json" not in content_type:
+    def validate_request_data(self, body: bytes) -> None:
+        """Validate a user create/update JSON body (raises HTTPException)"""
+        if not body:
             return
+        try:
+            data = json.loads(body)
+        except json.JSONDecodeError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={
+                    "error": True,
+                    "message": "Invalid JSON format",
+                    "error_code": "INVALID_JSON",
+                },
+            )
 
         try:
-            # Get request body
-            body = await request.body()
-            if not body:
-                return
-
-            # Parse JSON
-            try:
-                data = json.loads(body)
-            except json.JSONDecodeError:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail={
-                        "error": True,
-                        "message": "Invalid JSON format",
-                        "error_code": "INVALID_JSON",
-                    },
-                )
-
-            # Validate based on endpoint
-            endpoint = request.url.path
-            if any(
-                endpoint.startswith(prefix)
-                for prefix in ["/v1.0/user/create", "/v1.0/user/update"]
-            ):
-                validation_result = self.security_validator.validate_user_creation_data(
-                    data
-                )
-
-                if not validation_result["is_valid"]:
-                    raise HTTPException(
-                        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                        detail={
-                            "error": True,
-                            "message": "Validation failed",
-                            "error_code": "VALIDATION_ERROR",
-                            "field_errors": validation_result["errors"],
-                            "warnings": validation_result.get("warnings", []),
-                        },
-                    )
-
-                # Replace request data with sanitized version
-                # Note: This is a simplified approach. In practice, you might want to
-                # store sanitized data in request state for the endpoint to use
-
-        except HTTPException:
-            raise
+            validation_result = self.security_validator.validate_user_creation_data(data)
         except Exception as e:
             logger.error(f"Request validation error: {e}")
             # Don't block the request for validation errors, just log them
+            return
 
-    # DISABLED: API access logging now handled by dedicated API logging middleware
-    # to avoid duplicate logging. Security middleware focuses on security events only.
-    async def _log_api_access(
-        self, request: Request, response, audit_logger: AuditLogger, duration: float
-    ):
-        """Log API access - DISABLED to prevent duplicate logging"""
-        # This method is no longer used - API logging handled by middleware/api_logging.py
-        pass
-
-    async def _log_security_event(
-        self, request: Request, exception: HTTPException, audit_logger: AuditLogger
-    ):
-        """Log security-related events"""
-        activity_type = ActivityType.UNAUTHORIZED_ACCESS_ATTEMPT
+        if not validation_result["is_valid"]:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail={
+                    "error": True,
+                    "message": "Validation failed",
+                    "error_code": "VALIDATION_ERROR",
+                    "field_errors": validation_result["errors"],
+                    "warnings": validation_result.get("warnings", []),
+                },
+            )
 
+    async def log_http_exception(self, request: Request, exception: HTTPException) -> None:
+        """Log security-related HTTP exceptions (401, 403, 422, 429)"""
+        if exception.status_code not in (401, 403, 422, 429):
+            return
+        activity_type = ActivityType.UNAUTHORIZED_ACCESS_ATTEMPT
         if exception.status_code == 429:
             activity_type = ActivityType.RATE_LIMIT_EXCEEDED
-        elif exception.status_code == 401:
-            activity_type = ActivityType.UNAUTHORIZED_ACCESS_ATTEMPT
-        elif exception.status_code == 403:
-            activity_type = ActivityType.UNAUTHORIZED_ACCESS_ATTEMPT
 
-        audit_logger.log_security_event(
-            activity_type=activity_type,
-            user_id=getattr(request.state, "user_id", None),
-            request=request,
-            details={
+        await self.log_security_event(
+            request,
+            activity_type,
+            {
                 "status_code": exception.status_code,
                 "detail": str(exception.detail),
                 "endpoint": request.url.path,
                 "method": request.method,
             },
-            security_level=SecurityLevel.HIGH,
+            SecurityLevel.HIGH,
+            user_id=getattr(request.state, "user_id", None),
         )
 
-    def _should_log_endpoint(self, path: str) -> bool:
-        """DISABLED: Check if endpoint should be logged - now handled by API logging middleware"""
-        # This method is no longer used - endpoint filtering handled by api_logging_config
-        return False
+    async def log_api_error(self, request: Request, error: Exception) -> None:
+        """Audit an unhandled exception raised by the application"""
+        if not self.enable_audit_logging:
+            return
+        await run_db(
+            _write_audit,
+            lambda audit_logger: audit_logger.log_activity(
+                activity_type=ActivityType.API_ERROR,
+                details={
+                    "error": str(error),
+                    "endpoint": request.url.path,
+                    "method": request.method,
+                },
+                request=request,
+                security_level=SecurityLevel.HIGH,
+                success=False,
+            ),
+        )
+
+    async def log_security_event(
+        self,
+        request: Request,
+        activity_type: ActivityType,
+        details: Dict[str, Any],
+        security_level: SecurityLevel,
+        user_id: Optional[str] = None,
+    ) -> None:
+        if not self.enable_audit_logging:
+            return
+        await run_db(
+            _write_audit,
+            lambda audit_logger: audit_logger.log_security_event(
+                activity_type=activity_type,
+                user_id=user_id,
+                request=request,
+                details=details,
+                security_level=security_level,
+            ),
+        )
 
     def _detect_malicious_patterns(self, request: Request) -> bool:
         """Detect malicious request patterns"""
         # Check URL for SQL injection patterns
-        url_path = request.url.path.lower()
-        query_string = str(request.query_params).lower()
-
-        malicious_patterns = [
-            "union select",
-            "drop table",
-            "insert into",
-            "delete from",
-            "<script",
-            "javascript:",
-            "onload=",
-            "onerror=",
-            "../",
-            "..\\",
-            "/etc/passwd",
-            "/proc/self",
-            "cmd.exe",
-            "powershell",
-            "/bin/bash",
-        ]
-
-        full_url = f"{url_path}?{query_string}"
-        return any(pattern in full_url for pattern in malicious_patterns)
-
-    def _get_client_ip(self, request: Request) -> str:
-        """Extract client IP address"""
-        # Check for forwarded headers
-        forwarded_for = request.headers.get("X-Forwarded-For")
-        if forwarded_for:
-            return forwarded_for.split(",")[0].strip()
-
-        real_ip = request.headers.get("X-Real-IP")
-        if real_ip:
-            return real_ip
-
-        return request.client.host if request.client else "unknown"
-
-    def _add_security_headers(self, response):
-        """Add security headers to response"""
-        security_headers = {
-            "X-Content-Type-Options": "nosniff",
-            "X-Frame-Options": "DENY",
-            "X-XSS-Protection": "1; mode=block",
-            "Strict-Transport-Security": "max-age=31536000; includeSubDomains",
-            "Referrer-Policy": "strict-origin-when-cross-origin",
-            "Content-Security-Policy": "default-src 'self'; script-src 'self' https://cdn.jsdelivr.net; style-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net https://fonts.googleapis.com; font-src 'self' https://fonts.gstatic.com;",
-        }
-
-        for header, value in security_headers.items():
-            response.headers[header] = value
+        full_url = f"{request.url.path}?{request.query_params}".lower()
+        return _MALICIOUS_PATTERNS.search(full_url) is not None
 
 
-class AuthenticationMiddleware(BaseHTTPMiddleware):
-    """Authentication middleware for extracting user information"""
-
-    def __init__(self, app):
-        super().__init__(app)
-
-    async def dispatch(self, request: Request, call_next):
-        """Extract user information from JWT token"""
-        # This is a simplified implementation
-        # In practice, you would decode JWT tokens and extract user information
-
-        authorization = request.headers.get("Authorization")
-        if authorization and authorization.startswith("Bearer "):
-            token = authorization.split(" ")[1]
-            # Decode token and extract user_id
-            # For now, we'll just set a placeholder
-            request.state.user_id = None  # Would be extracted from token
-
-        response = await call_next(request)
-        return response
+def _write_audit(write) -> None:
+    """Run ``write(audit_logger)`` with a short-lived session (DB threadpool)"""
+    db = SessionLocal()
+    try:
+        write(AuditLogger(db))
+    except Exception as e:
+        logger.error(f"Failed to write security audit log: {e}")
+    finally:
+        db.close()
 
 
 def create_security_middleware_stack(app):
-    """Create the complete security middleware stack"""
-    # Add middlewares in reverse order (they wrap around each other)
-    app.add_middleware(
-        SecurityMiddleware, enable_rate_limiting=True, enable_audit_logging=True
-    )
-    app.add_middleware(AuthenticationMiddleware)
+    """Install the request pipeline (IP, security checks, rate limits, logging)"""
+    from middleware.pipeline import install_request_pipeline
 
+    install_request_pipeline(app)
     return app
 
 
@@ -462,12 +331,12 @@ def log_user_action(
     )
 
 
-def check_rate_limit_manual(
+async def check_rate_limit_manual(
     request: Request, operation: str, user_id: Optional[str] = None
 ):
     """Manually check rate limits"""
     identifier = rate_limit_manager.get_client_identifier(request, user_id)
-    is_allowed, rate_info = rate_limit_manager.check_rate_limit(operation, identifier)
+    is_allowed, rate_info = await rate_limit_manager.check_rate_limit(operation, identifier)
 
     if not is_allowed:
         raise HTTPException(
@@ -478,6 +347,8 @@ def check_rate_limit_manual(
                 "error_code": "RATE_LIMIT_EXCEEDED",
                 "rate_limit_info": rate_info,
             },
+            headers=rate_limit_headers(rate_info),
         )
 
+    request.state.rate_limit_info = rate_info
     return rate_info
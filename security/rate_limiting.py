@@ -7,25 +7,109 @@ operations like user creation, password resets, and login attempts.
 
 import time
 import json
+import math
+import os
 from typing import Dict, Optional, Tuple
 from datetime import datetime, timedelta
-from collections import defaultdict
+from collections import OrderedDict
 from fastapi import HTTPException, Request, status
 from functools import wraps
-import redis
 import logging
 
+from redis_pool import AsyncRedis, get_async_redis
+
 logger = logging.getLogger(__name__)
 
 
+# Generic cell rate algorithm (GCRA): a token bucket stored as one number,
+# the "theoretical arrival time" (TAT) at which the bucket is full again.
+# Each request pushes TAT forward by one emission interval (window / limit);
+# a request is allowed while TAT stays within one window of now. That gives
+# ``limit`` requests per window with bursts up to ``limit``, in O(1) state
+# per key. Remaining requests and reset time fall out of the same TAT, so
+# the X-RateLimit-* headers always agree with the decision.
+#
+# KEYS[1] bucket key, KEYS[2] block key
+# ARGV[1] emission interval (ms), ARGV[2] window (ms), ARGV[3] cost,
+# ARGV[4] debt (requests already admitted by a worker's local lease)
+# Returns {allowed, remaining, retry_after_ms, reset_after_ms}
+GCRA_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local interval = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local debt = tonumber(ARGV[4])
+
+local blocked = redis.call('PTTL', KEYS[2])
+if blocked > 0 then
+    return {0, 0, blocked, blocked}
+end
+
+local tat = tonumber(redis.call('GET', KEYS[1])) or now
+if tat < now then
+    tat = now
+end
+tat = tat + debt * interval
+
+local new_tat = tat + cost * interval
+local allow_at = new_tat - period
+if now < allow_at then
+    if debt > 0 then
+        redis.call('SET', KEYS[1], tat, 'PX', math.ceil(tat - now))
+    end
+    return {0, 0, math.ceil(allow_at - now), math.ceil(tat - now)}
+end
+
+redis.call('SET', KEYS[1], new_tat, 'PX', math.ceil(new_tat - now))
+return {1, math.floor((now - allow_at) / interval), 0, math.ceil(new_tat - now)}
+"""
+
+# Local pre-admission: a worker that just saw plenty of remaining capacity
+# may admit a few more requests for the same key without asking Redis,
+# then charges them to the shared bucket on its next call. Keys Redis has
+# rejected are rejected locally until their retry time.
+LOCAL_PREADMIT = os.getenv("RATE_LIMIT_LOCAL_PREADMIT", "true").lower() == "true"
+LEASE_FRACTION = float(os.getenv("RATE_LIMIT_LEASE_FRACTION", "0.1"))
+LEASE_MAX = int(os.getenv("RATE_LIMIT_LEASE_MAX", "10"))
+LEASE_SECONDS = float(os.getenv("RATE_LIMIT_LEASE_SECONDS", "1"))
+LOCAL_MAX_KEYS = int(os.getenv("RATE_LIMIT_LOCAL_MAX_KEYS", "10000"))
+
+
+def _rate_info(allowed: bool, limit: int, remaining: int, retry_after: float, reset_after: float, now: float) -> Dict[str, any]:
+    """Rate limit info (and response headers) from one bucket state"""
+    info = {
+        'allowed': allowed,
+        'limit': limit,
+        'remaining': max(0, int(remaining)),
+        'reset_time': int(math.ceil(now + reset_after)),
+    }
+    if not allowed:
+        info['retry_after'] = max(1, int(math.ceil(retry_after)))
+    return info
+
+
+def rate_limit_headers(rate_info: Dict[str, any]) -> Dict[str, str]:
+    """X-RateLimit-* (and Retry-After when limited) headers for a rate limit result"""
+    headers = {
+        "X-RateLimit-Limit": str(rate_info.get('limit', 0)),
+        "X-RateLimit-Remaining": str(rate_info.get('remaining', 0)),
+        "X-RateLimit-Reset": str(rate_info.get('reset_time', 0)),
+    }
+    if not rate_info.get('allowed', True):
+        headers["Retry-After"] = str(rate_info.get('retry_after', 1))
+    return headers
+
+
 class InMemoryRateLimiter:
-    """In-memory rate limiter for development/testing"""
+    """In-memory GCRA rate limiter for development/testing and Redis outages"""
     
-    def __init__(self):
-        self.requests: Dict[str, list] = defaultdict(list)
+    def __init__(self, max_keys: int = LOCAL_MAX_KEYS):
+        self.max_keys = max_keys
+        self.buckets: "OrderedDict[str, float]" = OrderedDict()
         self.blocked_ips: Dict[str, datetime] = {}
     
-    def is_allowed(self, key: str, limit: int, window_seconds: int) -> Tuple[bool, Dict[str, any]]:
+    def is_allowed(self, key: str, limit: int, window_seconds: int, block_id: Optional[str] = None) -> Tuple[bool, Dict[str, any]]:
         """
         Check if request is allowed based on rate limit
         
@@ -33,51 +117,44 @@ class InMemoryRateLimiter:
             key: Unique identifier for the client (IP, user ID, etc.)
             limit: Maximum number of requests allowed
             window_seconds: Time window in seconds
+            block_id: Identifier checked against blocks (defaults to ``key``)
             
         Returns:
             Tuple of (is_allowed, rate_limit_info)
         """
         now = time.time()
-        window_start = now - window_seconds
-        
-        # Clean old requests
-        self.requests[key] = [req_time for req_time in self.requests[key] if req_time > window_start]
         
         # Check if blocked
-        if key in self.blocked_ips and self.blocked_ips[key] > datetime.utcnow():
-            return False, {
-                'allowed': False,
-                'limit': limit,
-                'remaining': 0,
-                'reset_time': int(self.blocked_ips[key].timestamp()),
-                'blocked_until': self.blocked_ips[key].isoformat()
-            }
+        block_id = block_id or key
+        if block_id in self.blocked_ips:
+            if self.blocked_ips[block_id] > datetime.utcnow():
+                blocked_for = (self.blocked_ips[block_id] - datetime.utcnow()).total_seconds()
+                info = _rate_info(False, limit, 0, blocked_for, blocked_for, now)
+                info['blocked_until'] = self.blocked_ips[block_id].isoformat()
+                return False, info
+            del self.blocked_ips[block_id]
         
-        # Check rate limit
-        current_requests = len(self.requests[key])
+        interval = window_seconds / limit
+        tat = max(self.buckets.get(key, now), now)
+        new_tat = tat + interval
+        allow_at = new_tat - window_seconds
         
-        if current_requests >= limit:
-            # Block for extended period if repeatedly hitting limit
-            if current_requests >= limit * 2:
-                self.blocked_ips[key] = datetime.utcnow() + timedelta(hours=1)
-            
-            return False, {
-                'allowed': False,
-                'limit': limit,
-                'remaining': 0,
-                'reset_time': int(window_start + window_seconds),
-                'retry_after': window_seconds
-            }
+        if now < allow_at:
+            return False, _rate_info(False, limit, 0, allow_at - now, tat - now, now)
         
-        # Allow request
-        self.requests[key].append(now)
+        self.buckets[key] = new_tat
+        self.buckets.move_to_end(key)
+        if len(self.buckets) > self.max_keys:
+            self._evict(now)
         
-        return True, {
-            'allowed': True,
-            'limit': limit,
-            'remaining': limit - current_requests - 1,
-            'reset_time': int(window_start + window_seconds)
-        }
+        return True, _rate_info(True, limit, (now - allow_at) // interval, 0, new_tat - now, now)
+    
+    def _evict(self, now: float) -> None:
+        # A bucket whose TAT has passed is full again, same as no entry
+        for key in [k for k, tat in self.buckets.items() if tat <= now]:
+            del self.buckets[key]
+        while len(self.buckets) > self.max_keys:
+            self.buckets.popitem(last=False)
     
     def block_key(self, key: str, duration_minutes: int = 60):
         """Block a key for specified duration"""
@@ -89,92 +166,167 @@ class InMemoryRateLimiter:
             del self.blocked_ips[key]
 
 
+class _Lease:
+    __slots__ = ("credit", "debt", "remaining", "expires_at", "reset_time", "denied_until", "denied_info")
+
+    def __init__(self):
+        self.credit = 0
+        self.debt = 0
+        self.remaining = 0
+        self.expires_at = 0.0
+        self.reset_time = 0
+        self.denied_until = 0.0
+        self.denied_info: Optional[Dict[str, any]] = None
+
+
+class LocalPreAdmission:
+    """
+    Per-process pre-filter in front of the shared Redis bucket.
+    
+    After Redis admits a request with ``remaining`` capacity left, this
+    worker may admit up to ``min(remaining * lease_fraction, lease_max)``
+    further requests for the key during ``lease_seconds`` on its own; they
+    are charged to Redis as debt with the next call. After Redis rejects a
+    key, further requests are rejected locally until the retry time.
+    Low limits (remaining below ``1 / lease_fraction``) always go to Redis.
+    """
+    
+    def __init__(
+        self,
+        lease_fraction: float = LEASE_FRACTION,
+        lease_max: int = LEASE_MAX,
+        lease_seconds: float = LEASE_SECONDS,
+        max_keys: int = LOCAL_MAX_KEYS,
+    ):
+        self.lease_fraction = lease_fraction
+        self.lease_max = lease_max
+        self.lease_seconds = lease_seconds
+        self.max_keys = max_keys
+        self.leases: "OrderedDict[str, _Lease]" = OrderedDict()
+    
+    def admit(self, key: str, limit: int) -> Optional[Tuple[bool, Dict[str, any]]]:
+        """Decide locally, or None if Redis must be asked"""
+        lease = self.leases.get(key)
+        if lease is None:
+            return None
+        now = time.time()
+        if now < lease.denied_until:
+            return False, dict(lease.denied_info, retry_after=max(1, int(math.ceil(lease.denied_until - now))))
+        if lease.credit > 0 and now < lease.expires_at:
+            lease.credit -= 1
+            lease.debt += 1
+            return True, {
+                'allowed': True,
+                'limit': limit,
+                'remaining': max(0, lease.remaining - lease.debt),
+                'reset_time': lease.reset_time,
+                'local': True,
+            }
+        return None
+    
+    def take_debt(self, key: str) -> int:
+        """Locally admitted requests not yet charged to Redis"""
+        lease = self.leases.get(key)
+        if lease is None:
+            return 0
+        debt, lease.debt, lease.credit = lease.debt, 0, 0
+        return debt
+    
+    def restore_debt(self, key: str, debt: int) -> None:
+        if debt:
+            self._lease(key).debt += debt
+    
+    def record(self, key: str, allowed: bool, rate_info: Dict[str, any]) -> None:
+        """Update the key's lease from a Redis decision"""
+        now = time.time()
+        lease = self._lease(key)
+        if allowed:
+            lease.denied_until = 0.0
+            lease.remaining = rate_info['remaining']
+            lease.reset_time = rate_info['reset_time']
+            lease.credit = min(self.lease_max, int(lease.remaining * self.lease_fraction))
+            lease.expires_at = now + self.lease_seconds
+        else:
+            lease.credit = 0
+            lease.denied_until = now + rate_info.get('retry_after', 1)
+            lease.denied_info = rate_info
+    
+    def _lease(self, key: str) -> _Lease:
+        lease = self.leases.get(key)
+        if lease is None:
+            lease = self.leases[key] = _Lease()
+            if len(self.leases) > self.max_keys:
+                self.leases.popitem(last=False)
+        else:
+            self.leases.move_to_end(key)
+        return lease
+
+
 class RedisRateLimiter:
-    """Redis-based rate limiter for production"""
+    """Redis-based GCRA rate limiter for production (one atomic script call)"""
     
-    def __init__(self, redis_client: redis.Redis):
+    def __init__(self, redis_client: AsyncRedis, pre_admission: Optional[LocalPreAdmission] = None):
         self.redis = redis_client
+        self.pre_admission = pre_admission
     
-    def is_allowed(self, key: str, limit: int, window_seconds: int) -> Tuple[bool, Dict[str, any]]:
+    async def is_allowed(self, key: str, limit: int, window_seconds: int, block_id: Optional[str] = None) -> Optional[Tuple[bool, Dict[str, any]]]:
         """
-        Check if request is allowed using Redis sliding window
+        Check if request is allowed using the shared Redis bucket
         
         Args:
             key: Unique identifier for the client
             limit: Maximum number of requests allowed
             window_seconds: Time window in seconds
+            block_id: Identifier checked against blocks (defaults to ``key``)
             
         Returns:
-            Tuple of (is_allowed, rate_limit_info)
+            Tuple of (is_allowed, rate_limit_info), or None if Redis is unavailable
         """
-        try:
-            now = time.time()
-            pipeline = self.redis.pipeline()
-            
-            # Remove old entries
-            pipeline.zremrangebyscore(key, 0, now - window_seconds)
-            
-            # Count current requests
-            pipeline.zcard(key)
-            
-            # Add current request
-            pipeline.zadd(key, {str(now): now})
-            
-            # Set expiration
-            pipeline.expire(key, window_seconds)
-            
-            results = pipeline.execute()
-            current_requests = results[1]
-            
-            if current_requests >= limit:
-                # Remove the request we just added since it's not allowed
-                self.redis.zrem(key, str(now))
-                
-                return False, {
-                    'allowed': False,
-                    'limit': limit,
-                    'remaining': 0,
-                    'reset_time': int(now + window_seconds),
-                    'retry_after': window_seconds
-                }
-            
-            return True, {
-                'allowed': True,
-                'limit': limit,
-                'remaining': limit - current_requests - 1,
-                'reset_time': int(now + window_seconds)
-            }
-            
-        except Exception as e:
-            logger.error(f"Redis rate limiter error: {e}")
-            # Fall back to allowing the request if Redis is unavailable
-            return True, {
-                'allowed': True,
-                'limit': limit,
-                'remaining': limit - 1,
-                'reset_time': int(time.time() + window_seconds),
-                'fallback': True
-            }
+        if self.pre_admission is not None:
+            local = self.pre_admission.admit(key, limit)
+            if local is not None:
+                return local
+            debt = self.pre_admission.take_debt(key)
+        else:
+            debt = 0
+        
+        period_ms = window_seconds * 1000
+        result = await self.redis.eval_script(
+            GCRA_SCRIPT,
+            keys=(key, f"blocked:{block_id or key}"),
+            args=(period_ms / limit, period_ms, 1, debt),
+        )
+        if result is None:
+            if self.pre_admission is not None:
+                self.pre_admission.restore_debt(key, debt)
+            return None
+        
+        allowed, remaining, retry_after_ms, reset_after_ms = (int(v) for v in result)
+        info = _rate_info(bool(allowed), limit, remaining, retry_after_ms / 1000, reset_after_ms / 1000, time.time())
+        if self.pre_admission is not None:
+            self.pre_admission.record(key, bool(allowed), info)
+        return bool(allowed), info
     
-    def block_key(self, key: str, duration_minutes: int = 60):
+    async def block_key(self, key: str, duration_minutes: int = 60) -> bool:
         """Block a key for specified duration"""
-        block_key = f"blocked:{key}"
-        self.redis.setex(block_key, duration_minutes * 60, "blocked")
+        return await self.redis.setex(f"blocked:{key}", duration_minutes * 60, "blocked")
     
-    def is_blocked(self, key: str) -> bool:
+    async def is_blocked(self, key: str) -> bool:
         """Check if a key is blocked"""
-        block_key = f"blocked:{key}"
-        return self.redis.exists(block_key)
+        return bool(await self.redis.exists(f"blocked:{key}"))
 
 
 class RateLimitManager:
     """Main rate limit manager"""
     
-    def __init__(self, redis_client: Optional[redis.Redis] = None):
-        if redis_client:
-            self.limiter = RedisRateLimiter(redis_client)
-        else:
-            self.limiter = InMemoryRateLimiter()
+    def __init__(self, redis_client: Optional[AsyncRedis] = None):
+        # Per-process limiter, used on its own or while Redis is unavailable
+        self.local_limiter = InMemoryRateLimiter()
+        self.redis_limiter = (
+            RedisRateLimiter(redis_client, LocalPreAdmission() if LOCAL_PREADMIT else None)
+            if redis_client
+            else None
+        )
         
         # Rate limit configurations
         self.limits = {
@@ -187,7 +339,7 @@ class RateLimitManager:
             'bulk_operations': {'limit': 2, 'window': 300},    # 2 per 5 minutes
         }
     
-    def check_rate_limit(self, operation: str, identifier: str) -> Tuple[bool, Dict[str, any]]:
+    async def check_rate_limit(self, operation: str, identifier: str) -> Tuple[bool, Dict[str, any]]:
         """
         Check rate limit for an operation
         
@@ -205,11 +357,22 @@ class RateLimitManager:
         config = self.limits[operation]
         key = f"rate_limit:{operation}:{identifier}"
         
-        return self.limiter.is_allowed(key, config['limit'], config['window'])
+        if self.redis_limiter is not None:
+            result = await self.redis_limiter.is_allowed(key, config['limit'], config['window'], identifier)
+            if result is not None:
+                return result
+        
+        # Redis disabled or unavailable: enforce per process instead of failing open
+        allowed, info = self.local_limiter.is_allowed(key, config['limit'], config['window'], identifier)
+        if self.redis_limiter is not None:
+            info['fallback'] = True
+        return allowed, info
     
-    def block_identifier(self, identifier: str, duration_minutes: int = 60):
+    async def block_identifier(self, identifier: str, duration_minutes: int = 60):
         """Block an identifier across all operations"""
-        self.limiter.block_key(f"blocked:{identifier}", duration_minutes)
+        self.local_limiter.block_key(identifier, duration_minutes)
+        if self.redis_limiter is not None:
+            await self.redis_limiter.block_key(identifier, duration_minutes)
     
     def get_client_identifier(self, request: Request, user_id: Optional[str] = None) -> str:
         """
@@ -246,8 +409,8 @@ class RateLimitManager:
         return request.client.host if request.client else 'unknown'
 
 
-# Global rate limit manager instance
-rate_limit_manager = RateLimitManager()
+# Global rate limit manager instance (Redis-backed, per-process fallback)
+rate_limit_manager = RateLimitManager(get_async_redis())
 
 
 def rate_limit(operation: str, use_user_id: bool = False):
@@ -293,7 +456,7 @@ def rate_limit(operation: str, use_user_id: bool = False):
             identifier = rate_limit_manager.get_client_identifier(request, user_id)
             
             # Check rate limit
-            is_allowed, rate_info = rate_limit_manager.check_rate_limit(operation, identifier)
+            is_allowed, rate_info = await rate_limit_manager.check_rate_limit(operation, identifier)
             
             if not is_allowed:
                 # Log rate limit violation
@@ -311,20 +474,13 @@ def rate_limit(operation: str, use_user_id: bool = False):
                         "error_code": "RATE_LIMIT_EXCEEDED",
                         "rate_limit_info": rate_info
                     },
-                    headers={
-                        "X-RateLimit-Limit": str(rate_info.get('limit', 0)),
-                        "X-RateLimit-Remaining": str(rate_info.get('remaining', 0)),
-                        "X-RateLimit-Reset": str(rate_info.get('reset_time', 0)),
-                        "Retry-After": str(rate_info.get('retry_after', 300))
-                    }
+                    headers=rate_limit_headers(rate_info)
                 )
             
-            # Add rate limit headers to successful responses
+            # Middleware adds the headers to the successful response
+            request.state.rate_limit_info = rate_info
             response = await func(*args, **kwargs)
             
-            # If response is a dict, we can't add headers directly
-            # Headers should be added by middleware or in the endpoint
-            
             return response
         
         return wrapper
@@ -342,22 +498,20 @@ class RateLimitMiddleware:
             await self.app(scope, receive, send)
             return
         
-        # Store rate limit info in scope for later use
-        scope["rate_limit_info"] = {}
+        # Rate limit checks store their result in request.state
+        state = scope.setdefault("state", {})
         
         async def send_wrapper(message):
             if message["type"] == "http.response.start":
                 headers = list(message.get("headers", []))
                 
                 # Add rate limit headers if available
-                rate_info = scope.get("rate_limit_info", {})
+                rate_info = state.get("rate_limit_info")
                 if rate_info:
-                    if "limit" in rate_info:
-                        headers.append((b"x-ratelimit-limit", str(rate_info["limit"]).encode()))
-                    if "remaining" in rate_info:
-                        headers.append((b"x-ratelimit-remaining", str(rate_info["remaining"]).encode()))
-                    if "reset_time" in rate_info:
-                        headers.append((b"x-ratelimit-reset", str(rate_info["reset_time"]).encode()))
+                    existing = {name.lower() for name, _ in headers}
+                    for name, value in rate_limit_headers(rate_info).items():
+                        if name.lower().encode() not in existing:
+                            headers.append((name.lower().encode(), value.encode()))
                 
                 message["headers"] = headers
             
@@ -0,0 +1,302 @@
+"""
+Access Control Service
+
+Process-wide cache of each user's effective supplier permissions and IP
+whitelist, shared by every content route instead of per-endpoint queries
+against ``user_provider_permissions`` and ``user_ip_whitelist``.
+
+For every user the cache holds one immutable ``UserAccess`` entry with the
+``TEMP_DEACTIVATED_`` parsing already applied (active suppliers in grant
+order plus frozensets for O(1) membership) and the whitelist compiled into
+an ``IPPrefixTree`` (single addresses and CIDR ranges, IPv4 and IPv6), so
+permission and IP checks cost no DB queries on a hit. Entries are rebuilt
+from the DB whenever the access-control version changes.
+
+Invalidation: every mutation of permissions or whitelist entries calls
+``bump_access_version(db)`` before committing. That increments the
+``access_control_versions`` row in the same transaction and, once the
+session commits, drops this process's entries immediately and broadcasts
+the change on the cache invalidation bus. Other workers drop their entries
+when the message arrives; as a fallback (Redis down, lost message) they
+also poll the row at most every ``ACCESS_CONTROL_VERSION_POLL_SECONDS``. ``ACCESS_CONTROL_TTL_SECONDS`` is a safety net for
+writes made outside the application (manual SQL, old scripts).
+"""
+
+from typing import Dict, Iterable, Optional, Tuple
+from collections import OrderedDict
+from sqlalchemy.orm import Session
+from sqlalchemy import event, select, update
+from fastapi import Request
+from datetime import datetime
+import threading
+import logging
+import time
+import os
+
+from database import SessionLocal
+from models import UserProviderPermission, UserIPWhitelist, AccessControlVersion
+from middleware.ip_middleware import get_client_ip
+from security.ip_prefix_tree import IPPrefixTree, normalize_ip_entry
+from cache_bus import register_local_cache, publish_invalidation
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+VERSION_POLL_SECONDS = float(os.getenv("ACCESS_CONTROL_VERSION_POLL_SECONDS", "1"))
+CACHE_TTL_SECONDS = float(os.getenv("ACCESS_CONTROL_TTL_SECONDS", "300"))
+CACHE_MAX_USERS = int(os.getenv("ACCESS_CONTROL_CACHE_SIZE", "10000"))
+
+DEACTIVATED_PREFIX = "TEMP_DEACTIVATED_"
+GLOBAL_VERSION_NAME = "global"
+
+_DIRTY_KEY = "access_control_dirty"
+
+
+class UserAccess:
+    """
+    Precomputed access-control view of one user.
+
+    Attributes:
+        permissions: Raw ``provider_name`` values, including
+            ``TEMP_DEACTIVATED_`` markers, in grant order
+        granted: Frozenset of the raw values
+        active_suppliers: Granted suppliers minus deactivated ones, in grant order
+        active_set: Frozenset of ``active_suppliers``
+        deactivated_suppliers: Original names of deactivated suppliers
+        deactivated_set: Frozenset of ``deactivated_suppliers``
+        ip_addresses: Normalized active whitelist entries (addresses and ranges)
+        ip_tree: Prefix tree over ``ip_addresses`` used for matching
+    """
+
+    __slots__ = (
+        "user_id",
+        "permissions",
+        "granted",
+        "active_suppliers",
+        "active_set",
+        "deactivated_suppliers",
+        "deactivated_set",
+        "ip_addresses",
+        "ip_tree",
+        "loaded_at",
+    )
+
+    def __init__(self, user_id: str, permissions: Iterable[str], ip_addresses: Iterable[str]):
+        self.user_id = user_id
+        self.permissions: Tuple[str, ...] = tuple(p for p in permissions if p)
+        self.granted = frozenset(self.permissions)
+
+        deactivated = []
+        granted_active = []
+        for name in self.permissions:
+            if name.startswith(DEACTIVATED_PREFIX):
+                deactivated.append(name[len(DEACTIVATED_PREFIX):])
+            else:
+                granted_active.append(name)
+
+        self.deactivated_suppliers: Tuple[str, ...] = tuple(dict.fromkeys(deactivated))
+        self.deactivated_set = frozenset(self.deactivated_suppliers)
+        self.active_suppliers: Tuple[str, ...] = tuple(
+            name
+            for name in dict.fromkeys(granted_active)
+            if name not in self.deactivated_set
+        )
+        self.active_set = frozenset(self.active_suppliers)
+
+        self.ip_addresses = frozenset(
+            entry for entry in (normalize_ip_entry(value) for value in ip_addresses) if entry
+        )
+        self.ip_tree = IPPrefixTree(self.ip_addresses)
+        self.loaded_at = time.monotonic()
+
+    def has_supplier(self, supplier: str) -> bool:
+        """Granted and not temporarily deactivated"""
+        return supplier in self.active_set
+
+    def is_deactivated(self, supplier: str) -> bool:
+        return supplier in self.deactivated_set
+
+    def allows_ip(self, client_ip: Optional[str]) -> bool:
+        """True if ``client_ip`` matches one of the user's active whitelist entries"""
+        return client_ip in self.ip_tree
+
+
+class AccessControlCache:
+    """
+    Versioned per-process cache of ``UserAccess`` entries.
+    """
+
+    def __init__(
+        self,
+        poll_seconds: float = VERSION_POLL_SECONDS,
+        ttl_seconds: float = CACHE_TTL_SECONDS,
+        max_users: int = CACHE_MAX_USERS,
+    ):
+        self.poll_seconds = poll_seconds
+        self.ttl_seconds = ttl_seconds
+        self.max_users = max_users
+
+        self._entries: "OrderedDict[str, UserAccess]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version: Optional[int] = None
+        self._generation = 0
+        self._checked_at = 0.0
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, user_id: str, db: Session) -> UserAccess:
+        """Return the user's access entry, loading it on a miss"""
+        if db.info.get("read_only"):
+            # A lagging replica could cache revoked permissions until the TTL
+            with SessionLocal() as primary:
+                return self.get(user_id, primary)
+        user_id = str(user_id)
+        self._sync_version(db)
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and now - entry.loaded_at < self.ttl_seconds:
+                self._entries.move_to_end(user_id)
+                self._stats["hits"] += 1
+                return entry
+            self._stats["misses"] += 1
+            generation = self._generation
+
+        entry = self._load(user_id, db)
+
+        with self._lock:
+            # Don't keep data read before an invalidation that raced the load
+            if generation == self._generation:
+                self._entries[user_id] = entry
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_users:
+                    self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, user_id: Optional[str] = None) -> None:
+        """Drop one user's entry, or all entries"""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+                self._generation += 1
+                self._stats["invalidations"] += 1
+                # Pick up the committed version on the next check
+                self._checked_at = 0.0
+            else:
+                self._entries.pop(str(user_id), None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "version": self._version or 0,
+            }
+
+    def _load(self, user_id: str, db: Session) -> UserAccess:
+        permissions = db.execute(
+            select(UserProviderPermission.provider_name)
+            .where(UserProviderPermission.user_id == user_id)
+            .order_by(UserProviderPermission.id)
+        ).scalars().all()
+        ip_addresses = db.execute(
+            select(UserIPWhitelist.ip_address).where(
+                UserIPWhitelist.user_id == user_id,
+                UserIPWhitelist.is_active == True,
+            )
+        ).scalars().all()
+        return UserAccess(user_id, permissions, ip_addresses)
+
+    def _sync_version(self, db: Session) -> None:
+        now = time.monotonic()
+        if now - self._checked_at < self.poll_seconds:
+            return
+        self._checked_at = now
+
+        try:
+            # Own connection: the request transaction's snapshot may predate the bump
+            with db.get_bind().connect() as conn:
+                version = conn.execute(
+                    select(AccessControlVersion.version).where(
+                        AccessControlVersion.name == GLOBAL_VERSION_NAME
+                    )
+                ).scalar()
+        except Exception as e:
+            logger.warning(f"Could not read access control version: {str(e)}")
+            return
+
+        version = version or 0
+        if version != self._version:
+            if self._version is not None:
+                logger.debug(
+                    f"Access control version {self._version} -> {version}, dropping cache"
+                )
+                self.invalidate()
+                self._checked_at = now
+            self._version = version
+
+
+access_cache = AccessControlCache()
+register_local_cache("access_control", access_cache.invalidate)
+
+
+def get_user_access(user_id: str, db: Session) -> UserAccess:
+    """Cached supplier permissions and IP whitelist for a user"""
+    return access_cache.get(user_id, db)
+
+
+def check_ip_whitelist(user_id: str, request: Request, db: Session) -> bool:
+    """
+    Check if the user's IP address is in the whitelist.
+
+    Args:
+        user_id (str): The user ID to check
+        request (Request): The FastAPI request object
+        db (Session): Database session
+
+    Returns:
+        bool: True if IP is whitelisted, False otherwise
+    """
+    try:
+        client_ip = get_client_ip(request)
+
+        if not client_ip:
+            return False
+
+        return get_user_access(user_id, db).allows_ip(client_ip)
+
+    except Exception as e:
+        logger.error(f"Error checking IP whitelist: {str(e)}")
+        return False
+
+
+def bump_access_version(db: Session) -> None:
+    """
+    Record a permission / whitelist change in the caller's transaction.
+
+    Call before ``db.commit()``. Other workers see the new version on their
+    next poll; this process drops its cache as soon as the session commits.
+    """
+    result = db.execute(
+        update(AccessControlVersion)
+        .where(AccessControlVersion.name == GLOBAL_VERSION_NAME)
+        .values(
+            version=AccessControlVersion.version + 1,
+            updated_at=datetime.utcnow(),
+        )
+    )
+    if result.rowcount == 0:
+        db.add(AccessControlVersion(name=GLOBAL_VERSION_NAME, version=1))
+        db.flush()
+    db.info[_DIRTY_KEY] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session) -> None:
+    if session.info.pop(_DIRTY_KEY, False):
+        publish_invalidation("access_control")
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(_DIRTY_KEY, None)
@@ -0,0 +1,537 @@
+"""
+Activity Log Retention Service
+
+Keeps ``user_activity_logs`` bounded to a hot window of recent months.
+Months that fall entirely outside the window are streamed to compressed
+archive files (gzip NDJSON, or Parquet when pyarrow is installed) with a
+manifest next to each file, and then removed from the table:
+
+- MySQL: the table is range-partitioned by month (see migration
+  d41f6a7b2c85), so an expired month is one ``DROP PARTITION`` and inserts
+  and recent-range queries only touch the current partitions.
+  ``ensure_partitions`` keeps future monthly partitions created ahead of time.
+- Other databases (SQLite in development): the month's rows are deleted by
+  id in batches.
+
+A month is only removed after its rows have been folded into the activity
+rollups (services.activity_rollup_service), so dashboard aggregates keep
+covering archived history. Raw archived rows can be read back with
+``read_archive``.
+
+The rollups have their own, longer retention: ``prune_rollups`` deletes
+hourly rows older than ``ACTIVITY_ROLLUP_HOURLY_DAYS`` (hour-of-day patterns
+and windows of up to a week) and daily rows older than
+``ACTIVITY_ROLLUP_DAILY_DAYS`` (timelines, totals, endpoint usage). "All
+time" figures therefore cover the daily retention.
+"""
+
+from typing import Dict, Any, List, Optional, Iterator
+from sqlalchemy.orm import Session
+from sqlalchemy import select, delete, func, text
+from datetime import datetime, timedelta
+import hashlib
+import gzip
+import json
+import logging
+import os
+
+from models import (
+    UserActivityLog,
+    UserActivityRollupHourly,
+    UserActivityRollupDaily,
+    UserEndpointRollupDaily,
+)
+from services.activity_rollup_service import ActivityRollupService
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+TABLE_NAME = UserActivityLog.__tablename__
+HOT_DAYS = int(os.getenv("ACTIVITY_LOG_HOT_DAYS", "90"))
+ARCHIVE_DIR = os.getenv(
+    "ACTIVITY_LOG_ARCHIVE_DIR", os.path.join(os.getcwd(), "archives", "activity_logs")
+)
+ARCHIVE_FORMAT = os.getenv("ACTIVITY_LOG_ARCHIVE_FORMAT", "ndjson")  # or "parquet"
+ROLLUP_HOURLY_DAYS = int(os.getenv("ACTIVITY_ROLLUP_HOURLY_DAYS", "90"))
+ROLLUP_DAILY_DAYS = int(os.getenv("ACTIVITY_ROLLUP_DAILY_DAYS", "730"))
+PARTITION_MONTHS_AHEAD = 3
+EXPORT_BATCH_SIZE = 5000
+
+ARCHIVE_COLUMNS = ("id", "user_id", "action", "details", "ip_address", "user_agent", "created_at")
+
+
+def _month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def _add_months(month: datetime, count: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def _partition_name(month: datetime) -> str:
+    return f"p{month:%Y%m}"
+
+
+class ActivityLogRetentionService:
+    """
+    Service for partition maintenance, archival and archive reads of
+    ``user_activity_logs``.
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        hot_days: int = HOT_DAYS,
+        archive_dir: str = ARCHIVE_DIR,
+        archive_format: str = ARCHIVE_FORMAT,
+    ):
+        """
+        Initialize ActivityLogRetentionService with database session.
+
+        Args:
+            db: SQLAlchemy database session
+            hot_days: Days of history kept in the live table
+            archive_dir: Directory for archive files and manifests
+            archive_format: "ndjson" (gzip) or "parquet"
+        """
+        self.db = db
+        self.hot_days = hot_days
+        self.archive_dir = archive_dir
+        self.archive_format = archive_format
+
+    # ------------------------------------------------------------------
+    # Partitions
+    # ------------------------------------------------------------------
+
+    def is_partitioned(self) -> bool:
+        """Whether the live table uses MySQL monthly partitions"""
+        if self.db.get_bind().dialect.name != "mysql":
+            return False
+        return bool(self._mysql_partitions())
+
+    def _mysql_partitions(self) -> Dict[str, int]:
+        """Partition name -> estimated row count"""
+        rows = self.db.execute(
+            text(
+                "SELECT PARTITION_NAME, TABLE_ROWS FROM information_schema.PARTITIONS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table "
+                "AND PARTITION_NAME IS NOT NULL"
+            ),
+            {"table": TABLE_NAME},
+        )
+        return {name: rows_estimate or 0 for name, rows_estimate in rows}
+
+    def list_partitions(self) -> List[Dict[str, Any]]:
+        """
+        Months currently held in the live table.
+
+        Returns:
+            List of {"name", "month", "rows", "expired"}; ``rows`` is the
+            MySQL estimate or None when the table is not partitioned
+        """
+        cutoff = self.expiry_cutoff()
+        if self.is_partitioned():
+            result = []
+            for name, rows in sorted(self._mysql_partitions().items()):
+                month = None if name == "pmax" else datetime.strptime(name[1:], "%Y%m")
+                result.append(
+                    {
+                        "name": name,
+                        "month": month.strftime("%Y-%m") if month else None,
+                        "rows": rows,
+                        "expired": bool(month and _add_months(month, 1) <= cutoff),
+                    }
+                )
+            return result
+
+        oldest = self.db.scalar(select(func.min(UserActivityLog.created_at)))
+        if oldest is None:
+            return []
+        result = []
+        month = _month_start(oldest)
+        current = _month_start(datetime.utcnow())
+        while month <= current:
+            result.append(
+                {
+                    "name": _partition_name(month),
+                    "month": month.strftime("%Y-%m"),
+                    "rows": None,
+                    "expired": _add_months(month, 1) <= cutoff,
+                }
+            )
+            month = _add_months(month, 1)
+        return result
+
+    def ensure_partitions(self, months_ahead: int = PARTITION_MONTHS_AHEAD) -> List[str]:
+        """
+        Split the catch-all ``pmax`` partition so the next ``months_ahead``
+        months have their own partitions. No-op when not partitioned.
+
+        Returns:
+            Names of the partitions created
+        """
+        if not self.is_partitioned():
+            return []
+
+        existing = self._mysql_partitions()
+        month_names = [name for name in existing if name != "pmax"]
+        current = _month_start(datetime.utcnow())
+        start = (
+            _add_months(datetime.strptime(max(month_names)[1:], "%Y%m"), 1)
+            if month_names
+            else current
+        )
+
+        new_partitions = []
+        month = start
+        while month <= _add_months(current, months_ahead):
+            new_partitions.append(month)
+            month = _add_months(month, 1)
+        if not new_partitions:
+            return []
+
+        definitions = ", ".join(
+            f"PARTITION {_partition_name(m)} VALUES LESS THAN "
+            f"('{_add_months(m, 1):%Y-%m-%d}')"
+            for m in new_partitions
+        )
+        # pmax only holds rows newer than the last monthly partition, which
+        # is kept months ahead, so the reorganise is a metadata-only change
+        self.db.execute(
+            text(
+                f"ALTER TABLE {TABLE_NAME} REORGANIZE PARTITION pmax INTO "
+                f"({definitions}, PARTITION pmax VALUES LESS THAN (MAXVALUE))"
+            )
+        )
+        names = [_partition_name(m) for m in new_partitions]
+        logger.info(f"Created activity log partitions: {', '.join(names)}")
+        return names
+
+    # ------------------------------------------------------------------
+    # Archival
+    # ------------------------------------------------------------------
+
+    def expiry_cutoff(self) -> datetime:
+        """Start of the oldest month that is (partly) inside the hot window"""
+        return _month_start(datetime.utcnow() - timedelta(days=self.hot_days))
+
+    def archive_expired(self, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        Archive and remove every month that ended before the hot window.
+
+        Args:
+            dry_run: Only report what would be archived
+
+        Returns:
+            Report with the months archived and skipped
+        """
+        cutoff = self.expiry_cutoff()
+        watermark = ActivityRollupService(self.db).get_watermark()
+        archived: List[Dict[str, Any]] = []
+        skipped: List[Dict[str, Any]] = []
+
+        for partition in self.list_partitions():
+            if not partition["expired"]:
+                continue
+            month = datetime.strptime(partition["month"], "%Y-%m")
+            month_end = _add_months(month, 1)
+
+            stats = self.db.execute(
+                select(func.count(UserActivityLog.id), func.max(UserActivityLog.id)).where(
+                    UserActivityLog.created_at >= month,
+                    UserActivityLog.created_at < month_end,
+                )
+            ).one()
+            row_count, max_id = stats[0] or 0, stats[1]
+
+            if row_count and max_id > watermark:
+                # Dropping now would lose these rows from the rollups
+                skipped.append(
+                    {"month": partition["month"], "reason": "not yet aggregated into rollups"}
+                )
+                continue
+
+            if dry_run:
+                archived.append({"month": partition["month"], "rows": row_count})
+                continue
+
+            manifest = None
+            if row_count:
+                manifest = self._export_month(month)
+                if manifest["rows"] != row_count:
+                    skipped.append(
+                        {
+                            "month": partition["month"],
+                            "reason": f"exported {manifest['rows']} of {row_count} rows",
+                        }
+                    )
+                    continue
+
+            self._drop_month(month, partition["name"])
+            archived.append(
+                {
+                    "month": partition["month"],
+                    "rows": row_count,
+                    "file": manifest["file"] if manifest else None,
+                }
+            )
+            logger.info(
+                f"Archived activity logs for {partition['month']}: {row_count} rows"
+            )
+
+        return {
+            "cutoff": cutoff.isoformat(),
+            "hot_days": self.hot_days,
+            "dry_run": dry_run,
+            "archived": archived,
+            "skipped": skipped,
+        }
+
+    def prune_rollups(
+        self,
+        hourly_days: int = ROLLUP_HOURLY_DAYS,
+        daily_days: int = ROLLUP_DAILY_DAYS,
+        dry_run: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Delete rollup rows whose bucket ended before the rollup retention.
+
+        Args:
+            hourly_days: Days of hourly rollups kept (0 = keep all)
+            daily_days: Days of daily activity and endpoint rollups kept (0 = keep all)
+            dry_run: Only count what would be deleted
+
+        Returns:
+            Report with the cutoff and rows deleted per table
+        """
+        now = datetime.utcnow()
+        report: Dict[str, Any] = {"dry_run": dry_run, "tables": {}}
+        for model, days in (
+            (UserActivityRollupHourly, hourly_days),
+            (UserActivityRollupDaily, daily_days),
+            (UserEndpointRollupDaily, daily_days),
+        ):
+            if days <= 0:
+                continue
+            cutoff = (now - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+            if dry_run:
+                rows = self.db.scalar(
+                    select(func.count(model.id)).where(model.bucket_start < cutoff)
+                )
+            else:
+                rows = self._delete_before(model, cutoff)
+            report["tables"][model.__tablename__] = {
+                "cutoff": cutoff.isoformat(),
+                "rows": rows or 0,
+            }
+            if rows and not dry_run:
+                logger.info(f"Pruned {rows} rows older than {cutoff:%Y-%m-%d} from {model.__tablename__}")
+        return report
+
+    def _delete_before(self, model, cutoff: datetime) -> int:
+        """Delete ``model`` rows with ``bucket_start < cutoff`` in batches"""
+        deleted = 0
+        while True:
+            ids = self.db.scalars(
+                select(model.id).where(model.bucket_start < cutoff).limit(EXPORT_BATCH_SIZE)
+            ).all()
+            if not ids:
+                return deleted
+            self.db.execute(delete(model).where(model.id.in_(ids)))
+            self.db.commit()
+            deleted += len(ids)
+
+    def _iter_month_rows(self, month: datetime) -> Iterator[Dict[str, Any]]:
+        """Stream a month's rows in id order with keyset pagination"""
+        month_end = _add_months(month, 1)
+        columns = [getattr(UserActivityLog, name) for name in ARCHIVE_COLUMNS]
+        last_id = 0
+        while True:
+            rows = self.db.execute(
+                select(*columns)
+                .where(
+                    UserActivityLog.created_at >= month,
+                    UserActivityLog.created_at < month_end,
+                    UserActivityLog.id > last_id,
+                )
+                .order_by(UserActivityLog.id)
+                .limit(EXPORT_BATCH_SIZE)
+            ).all()
+            if not rows:
+                return
+            for row in rows:
+                record = dict(zip(ARCHIVE_COLUMNS, row))
+                record["created_at"] = record["created_at"].isoformat()
+                yield record
+            last_id = rows[-1].id
+
+    def _export_month(self, month: datetime) -> Dict[str, Any]:
+        """Write one month to an archive file plus manifest; returns the manifest"""
+        os.makedirs(self.archive_dir, exist_ok=True)
+        archive_format = self.archive_format
+        if archive_format == "parquet":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                logger.warning("pyarrow not installed, archiving as NDJSON instead")
+                archive_format = "ndjson"
+
+        base_name = f"{TABLE_NAME}-{month:%Y-%m}"
+        file_name = base_name + (".parquet" if archive_format == "parquet" else ".ndjson.gz")
+        path = os.path.join(self.archive_dir, file_name)
+        tmp_path = path + ".tmp"
+
+        rows = self._iter_month_rows(month)
+        if archive_format == "parquet":
+            summary = self._write_parquet(tmp_path, rows)
+        else:
+            summary = self._write_ndjson(tmp_path, rows)
+
+        digest = hashlib.sha256()
+        with open(tmp_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        os.replace(tmp_path, path)
+
+        manifest = {
+            "table": TABLE_NAME,
+            "month": f"{month:%Y-%m}",
+            "file": file_name,
+            "format": archive_format,
+            "sha256": digest.hexdigest(),
+            "archived_at": datetime.utcnow().isoformat(),
+            **summary,
+        }
+        with open(os.path.join(self.archive_dir, base_name + ".manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
+
+    @staticmethod
+    def _write_ndjson(path: str, rows: Iterator[Dict[str, Any]]) -> Dict[str, Any]:
+        count, min_id, max_id = 0, None, None
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, default=str) + "\n")
+                count += 1
+                min_id = row["id"] if min_id is None else min_id
+                max_id = row["id"]
+        return {"rows": count, "min_id": min_id, "max_id": max_id}
+
+    @staticmethod
+    def _write_parquet(path: str, rows: Iterator[Dict[str, Any]]) -> Dict[str, Any]:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.schema(
+            [
+                ("id", pa.int64()),
+                ("user_id", pa.string()),
+                ("action", pa.string()),
+                ("details", pa.string()),  # JSON text
+                ("ip_address", pa.string()),
+                ("user_agent", pa.string()),
+                ("created_at", pa.string()),
+            ]
+        )
+        count, min_id, max_id = 0, None, None
+        batch: List[Dict[str, Any]] = []
+        with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+            for row in rows:
+                row["details"] = json.dumps(row["details"], default=str)
+                batch.append(row)
+                count += 1
+                min_id = row["id"] if min_id is None else min_id
+                max_id = row["id"]
+                if len(batch) >= EXPORT_BATCH_SIZE:
+                    writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                    batch = []
+            if batch:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+        return {"rows": count, "min_id": min_id, "max_id": max_id}
+
+    def _drop_month(self, month: datetime, partition_name: str) -> None:
+        """Remove an archived month from the live table"""
+        if self.is_partitioned():
+            self.db.execute(text(f"ALTER TABLE {TABLE_NAME} DROP PARTITION {partition_name}"))
+            return
+
+        month_end = _add_months(month, 1)
+        while True:
+            ids = self.db.scalars(
+                select(UserActivityLog.id)
+                .where(
+                    UserActivityLog.created_at >= month,
+                    UserActivityLog.created_at < month_end,
+                )
+                .limit(EXPORT_BATCH_SIZE)
+            ).all()
+            if not ids:
+                break
+            self.db.execute(delete(UserActivityLog).where(UserActivityLog.id.in_(ids)))
+            self.db.commit()
+
+    # ------------------------------------------------------------------
+    # Archive reads
+    # ------------------------------------------------------------------
+
+    def list_archives(self) -> List[Dict[str, Any]]:
+        """Manifests of all archived months, oldest first"""
+        if not os.path.isdir(self.archive_dir):
+            return []
+        manifests = []
+        for name in sorted(os.listdir(self.archive_dir)):
+            if name.startswith(TABLE_NAME) and name.endswith(".manifest.json"):
+                with open(os.path.join(self.archive_dir, name)) as f:
+                    manifests.append(json.load(f))
+        return manifests
+
+    def read_archive(
+        self,
+        start: datetime,
+        end: datetime,
+        user_id: Optional[str] = None,
+        action: Optional[str] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream archived rows with ``start <= created_at < end``.
+
+        Args:
+            start: Range start (inclusive)
+            end: Range end (exclusive)
+            user_id: Only rows of this user
+            action: Only rows with this action
+
+        Yields:
+            Row dicts with ``created_at`` as datetime
+        """
+        for manifest in self.list_archives():
+            month = datetime.strptime(manifest["month"], "%Y-%m")
+            if _add_months(month, 1) <= start or month >= end:
+                continue
+            path = os.path.join(self.archive_dir, manifest["file"])
+            for row in self._read_file(path, manifest.get("format", "ndjson")):
+                if user_id is not None and row["user_id"] != user_id:
+                    continue
+                if action is not None and row["action"] != action:
+                    continue
+                created_at = datetime.fromisoformat(row["created_at"])
+                if start <= created_at < end:
+                    row["created_at"] = created_at
+                    yield row
+
+    @staticmethod
+    def _read_file(path: str, archive_format: str) -> Iterator[Dict[str, Any]]:
+        if archive_format == "parquet":
+            import pyarrow.parquet as pq
+
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=EXPORT_BATCH_SIZE):
+                for row in batch.to_pylist():
+                    row["details"] = json.loads(row["details"]) if row["details"] else None
+                    yield row
+            return
+
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
@@ -0,0 +1,619 @@
+"""
+Activity Rollup Service
+
+Folds ``user_activity_logs`` rows into hourly and daily rollup tables keyed by
+(bucket_start, user_id, action, success), plus a daily per-endpoint rollup, so
+audit and analytics dashboards aggregate a few hundred pre-counted rows
+instead of grouping the raw log table by DATE()/HOUR()/DAYOFWEEK().
+
+Rows are consumed in id order behind a watermark stored in
+``activity_rollup_state``. Readers combine the rollups (ids <= watermark) with
+the raw rows after the watermark, which is only the last aggregation interval,
+so results stay exact without waiting for the aggregator.
+
+Windows are bucket-aligned. Windows of up to ``HOURLY_WINDOW_DAYS`` read the
+hourly table and start at the first hour; longer ones read the daily table
+and start at midnight UTC of the first day. A service instance resolves each
+``since`` once and every reader uses that start, so the daily timeline,
+per-action, per-user and hour-of-day figures of one response cover the same
+window and add up to the same total.
+
+The rollups are pruned by ``ActivityLogRetentionService.prune_rollups``
+(hourly rows after ``ACTIVITY_ROLLUP_HOURLY_DAYS``, daily rows after
+``ACTIVITY_ROLLUP_DAILY_DAYS``).
+"""
+
+from typing import Dict, Any, List, Optional, Iterable, Tuple, Callable
+from collections import Counter
+from sqlalchemy.orm import Session
+from sqlalchemy import select, update, insert, func, bindparam
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, date, timedelta
+import threading
+import logging
+import os
+
+from models import (
+    UserActivityLog,
+    UserActivityRollupHourly,
+    UserActivityRollupDaily,
+    UserEndpointRollupDaily,
+    ActivityRollupState,
+)
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+ROLLUP_STATE_NAME = "user_activity_logs"
+ROLLUP_BATCH_SIZE = int(os.getenv("ACTIVITY_ROLLUP_BATCH_SIZE", "5000"))
+ROLLUP_INTERVAL_SECONDS = int(os.getenv("ACTIVITY_ROLLUP_INTERVAL_SECONDS", "60"))
+# Rows younger than this are left for the next run so that inserts which were
+# assigned a lower id but committed late are not skipped by the watermark.
+ROLLUP_SETTLE_SECONDS = int(os.getenv("ACTIVITY_ROLLUP_SETTLE_SECONDS", "5"))
+HOURLY_WINDOW_DAYS = 7
+
+ANONYMOUS_USER = ""
+
+
+def _hour_start(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def _day_start(value: datetime) -> datetime:
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _details(row) -> Dict[str, Any]:
+    return row.details if isinstance(row.details, dict) else {}
+
+
+def _is_success(details: Dict[str, Any]) -> bool:
+    """Outcome recorded by AuditLogger, falling back to the HTTP status code"""
+    success = details.get("success")
+    if isinstance(success, bool):
+        return success
+    status_code = details.get("status_code")
+    if isinstance(status_code, int):
+        return status_code < 400
+    return True
+
+
+def _endpoint_key(details: Dict[str, Any]) -> Optional[Tuple[str, str, int]]:
+    """(method, endpoint, status_code) for rows that describe an HTTP request"""
+    endpoint = details.get("endpoint") or details.get("path") or ""
+    method = details.get("method") or ""
+    status_code = details.get("status_code") or 0
+    if not (endpoint or method or status_code):
+        return None
+    try:
+        status_code = int(status_code)
+    except (TypeError, ValueError):
+        status_code = 0
+    return str(method)[:10], str(endpoint)[:255], status_code
+
+
+class ActivityRollupService:
+    """
+    Service for maintaining and querying the user activity rollups.
+    """
+
+    def __init__(self, db: Session):
+        """
+        Initialize ActivityRollupService with database session.
+
+        Args:
+            db: SQLAlchemy database session
+        """
+        self.db = db
+        self._windows: Dict[datetime, Tuple[Any, datetime]] = {}
+
+    # ------------------------------------------------------------------
+    # Aggregation
+    # ------------------------------------------------------------------
+
+    def aggregate_new_logs(
+        self, batch_size: int = ROLLUP_BATCH_SIZE, max_batches: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Fold log rows after the watermark into the rollups, one transaction
+        per batch.
+
+        Args:
+            batch_size: Log rows read per batch
+            max_batches: Stop after this many batches (None = until caught up)
+
+        Returns:
+            Dict with rows processed, batches committed and the new watermark
+        """
+        processed = 0
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            count = self._aggregate_batch(batch_size)
+            if count == 0:
+                break
+            processed += count
+            batches += 1
+            if count < batch_size:
+                break
+
+        if processed:
+            logger.info(
+                f"Activity rollups: aggregated {processed} log rows in {batches} batches"
+            )
+        return {
+            "processed": processed,
+            "batches": batches,
+            "watermark": self.get_watermark(),
+        }
+
+    def get_watermark(self) -> int:
+        """Id of the last log row included in the rollups"""
+        value = self.db.scalar(
+            select(ActivityRollupState.last_log_id).where(
+                ActivityRollupState.name == ROLLUP_STATE_NAME
+            )
+        )
+        return value or 0
+
+    def _ensure_state(self) -> int:
+        watermark = self.db.scalar(
+            select(ActivityRollupState.last_log_id).where(
+                ActivityRollupState.name == ROLLUP_STATE_NAME
+            )
+        )
+        if watermark is not None:
+            return watermark
+        try:
+            self.db.execute(
+                insert(ActivityRollupState).values(
+                    name=ROLLUP_STATE_NAME, last_log_id=0, updated_at=datetime.utcnow()
+                )
+            )
+            self.db.commit()
+        except IntegrityError:
+            # Another worker created it first
+            self.db.rollback()
+        return 0
+
+    def _aggregate_batch(self, batch_size: int) -> int:
+        watermark = self._ensure_state()
+        cutoff = datetime.utcnow() - timedelta(seconds=ROLLUP_SETTLE_SECONDS)
+
+        rows = self.db.execute(
+            select(
+                UserActivityLog.id,
+                UserActivityLog.user_id,
+                UserActivityLog.action,
+                UserActivityLog.details,
+                UserActivityLog.created_at,
+            )
+            .where(UserActivityLog.id > watermark)
+            .order_by(UserActivityLog.id)
+            .limit(batch_size)
+        ).all()
+
+        batch = []
+        for row in rows:
+            if row.created_at >= cutoff:
+                break
+            batch.append(row)
+        if not batch:
+            self.db.rollback()
+            return 0
+
+        # Claim the batch first: the conditional update serialises concurrent
+        # aggregators (other processes) on the state row, and a loser sees
+        # rowcount 0 and backs out instead of counting the rows twice.
+        claimed = self.db.execute(
+            update(ActivityRollupState)
+            .where(
+                ActivityRollupState.name == ROLLUP_STATE_NAME,
+                ActivityRollupState.last_log_id == watermark,
+            )
+            .values(last_log_id=batch[-1].id, updated_at=datetime.utcnow())
+        )
+        if claimed.rowcount != 1:
+            self.db.rollback()
+            return 0
+
+        hourly: Counter = Counter()
+        daily: Counter = Counter()
+        endpoints: Counter = Counter()
+        for row in batch:
+            details = _details(row)
+            user_id = row.user_id or ANONYMOUS_USER
+            success = _is_success(details)
+            hourly[(_hour_start(row.created_at), user_id, row.action, success)] += 1
+            daily[(_day_start(row.created_at), user_id, row.action, success)] += 1
+            endpoint = _endpoint_key(details)
+            if endpoint:
+                endpoints[(_day_start(row.created_at), user_id) + endpoint] += 1
+
+        try:
+            key_columns = ("bucket_start", "user_id", "action", "success")
+            self._merge_counts(UserActivityRollupHourly, key_columns, hourly)
+            self._merge_counts(UserActivityRollupDaily, key_columns, daily)
+            self._merge_counts(
+                UserEndpointRollupDaily,
+                ("bucket_start", "user_id", "method", "endpoint", "status_code"),
+                endpoints,
+            )
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        return len(batch)
+
+    def _merge_counts(
+        self, model, key_columns: Tuple[str, ...], counts: Counter
+    ) -> None:
+        """Add counts to existing rollup rows and insert the missing keys"""
+        if not counts:
+            return
+
+        table = model.__table__
+        buckets = {key[0] for key in counts}
+        existing = {
+            tuple(row[1:]): row[0]
+            for row in self.db.execute(
+                select(table.c.id, *[table.c[name] for name in key_columns]).where(
+                    table.c.bucket_start.in_(list(buckets))
+                )
+            )
+        }
+
+        updates = []
+        inserts = []
+        for key, count in counts.items():
+            row_id = existing.get(key)
+            if row_id is None:
+                inserts.append(dict(zip(key_columns, key), count=count))
+            else:
+                updates.append({"row_id": row_id, "delta": count})
+
+        if updates:
+            self.db.execute(
+                table.update()
+                .where(table.c.id == bindparam("row_id"))
+                .values(count=table.c["count"] + bindparam("delta")),
+                updates,
+            )
+        if inserts:
+            self.db.execute(table.insert(), inserts)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def counts_by_day(
+        self,
+        since: datetime,
+        user_id: Optional[str] = None,
+        user_ids: Optional[Iterable[str]] = None,
+    ) -> List[Tuple[date, int]]:
+        """
+        Activity count per calendar day (UTC), oldest first.
+
+        Short windows are summed from the hourly table, so the first day
+        only counts from the window start, like the other readers.
+        """
+        model, window_start = self.resolve_window(since)
+        counts = self._grouped(
+            model,
+            "bucket_start",
+            lambda row: _day_start(row.created_at),
+            window_start,
+            user_id=user_id,
+            user_ids=user_ids,
+        )
+        days: Counter = Counter()
+        for bucket, count in counts.items():
+            days[_day_start(bucket).date()] += count
+        return sorted(days.items())
+
+    def counts_by_action(
+        self,
+        since: Optional[datetime] = None,
+        user_id: Optional[str] = None,
+        actions: Optional[Iterable[str]] = None,
+        user_ids: Optional[Iterable[str]] = None,
+    ) -> Dict[str, int]:
+        """Activity count per action"""
+        model, window_start = self.resolve_window(since)
+        return self._grouped(
+            model,
+            "action",
+            lambda row: row.action,
+            window_start,
+            user_id=user_id,
+            actions=actions,
+            user_ids=user_ids,
+        )
+
+    def counts_by_user(self, since: Optional[datetime] = None) -> Dict[str, int]:
+        """Activity count per authenticated user"""
+        model, window_start = self.resolve_window(since)
+        counts = self._grouped(
+            model,
+            "user_id",
+            lambda row: row.user_id or ANONYMOUS_USER,
+            window_start,
+        )
+        counts.pop(ANONYMOUS_USER, None)
+        return counts
+
+    def counts_by_hour_of_day(
+        self, since: datetime, user_id: Optional[str] = None
+    ) -> Dict[int, int]:
+        """Activity count per hour of day (0-23, UTC)"""
+        _, window_start = self.resolve_window(since)
+        by_hour = self._grouped(
+            UserActivityRollupHourly,
+            "bucket_start",
+            lambda row: _hour_start(row.created_at),
+            window_start,
+            user_id=user_id,
+        )
+        result: Counter = Counter()
+        for bucket, count in by_hour.items():
+            result[bucket.hour] += count
+        return dict(result)
+
+    def counts_by_day_of_week(
+        self, since: datetime, user_id: Optional[str] = None
+    ) -> Dict[int, int]:
+        """Activity count per weekday, 0 = Sunday (same numbering as DAYOFWEEK() - 1)"""
+        result: Counter = Counter()
+        for day, count in self.counts_by_day(since, user_id=user_id):
+            result[(day.weekday() + 1) % 7] += count
+        return dict(result)
+
+    def total(
+        self,
+        since: Optional[datetime] = None,
+        user_id: Optional[str] = None,
+        actions: Optional[Iterable[str]] = None,
+        user_ids: Optional[Iterable[str]] = None,
+    ) -> int:
+        """Total activity count"""
+        return sum(
+            self.counts_by_action(
+                since, user_id=user_id, actions=actions, user_ids=user_ids
+            ).values()
+        )
+
+    def unique_users(self, since: Optional[datetime] = None) -> int:
+        """Number of distinct authenticated users with activity"""
+        return len(self.counts_by_user(since))
+
+    def endpoint_usage(
+        self, since: datetime, user_id: Optional[str] = None
+    ) -> Tuple[Dict[str, int], Dict[str, int], Dict[str, int]]:
+        """
+        Request counts from the daily endpoint rollup.
+
+        Returns:
+            (calls per "METHOD endpoint", calls per method, calls per status code)
+        """
+        endpoint_usage: Counter = Counter()
+        method_usage: Counter = Counter()
+        status_codes: Counter = Counter()
+        for (method, endpoint, status_code), count in self._endpoint_counts(
+            since, user_id=user_id
+        ).items():
+            if endpoint:
+                endpoint_usage[f"{method} {endpoint}" if method else endpoint] += count
+            if method:
+                method_usage[method] += count
+            if status_code:
+                status_codes[str(status_code)] += count
+        return dict(endpoint_usage), dict(method_usage), dict(status_codes)
+
+    def top_endpoints(
+        self,
+        since: datetime,
+        user_id: str,
+        until: Optional[datetime] = None,
+        limit: int = 3,
+    ) -> List[str]:
+        """Most called endpoint paths for a user, most used first"""
+        calls: Counter = Counter()
+        for (_, endpoint, _), count in self._endpoint_counts(
+            since, until=until, user_id=user_id
+        ).items():
+            if endpoint:
+                calls[endpoint] += count
+        return [endpoint for endpoint, _ in calls.most_common(limit)]
+
+    def _endpoint_counts(
+        self,
+        since: datetime,
+        until: Optional[datetime] = None,
+        user_id: Optional[str] = None,
+    ) -> Counter:
+        """Counts per (method, endpoint, status_code), rollup plus raw tail"""
+        watermark = self.get_watermark()
+        window_start = _day_start(since)
+        window_end = _day_start(until) if until is not None else None
+        counts: Counter = Counter()
+
+        model = UserEndpointRollupDaily
+        query = (
+            select(model.method, model.endpoint, model.status_code, func.sum(model.count))
+            .where(model.bucket_start >= window_start)
+            .group_by(model.method, model.endpoint, model.status_code)
+        )
+        if window_end is not None:
+            query = query.where(model.bucket_start < window_end)
+        if user_id is not None:
+            query = query.where(model.user_id == user_id)
+        for method, endpoint, status_code, count in self.db.execute(query):
+            counts[(method, endpoint, status_code)] += int(count or 0)
+
+        for row in self._tail_rows(
+            watermark, window_start, window_end, user_id=user_id, with_details=True
+        ):
+            key = _endpoint_key(_details(row))
+            if key:
+                counts[key] += 1
+        return counts
+
+    def resolve_window(self, since: Optional[datetime]) -> Tuple[Any, Optional[datetime]]:
+        """
+        Rollup table and aligned start for a window beginning at ``since``.
+
+        Resolved once per ``since`` and instance, so readers called one
+        after another in a request agree even if the window crosses
+        ``HOURLY_WINDOW_DAYS`` in between.
+        """
+        if since is None:
+            return UserActivityRollupDaily, None
+        window = self._windows.get(since)
+        if window is None:
+            if datetime.utcnow() - since <= timedelta(days=HOURLY_WINDOW_DAYS):
+                window = (UserActivityRollupHourly, _hour_start(since))
+            else:
+                window = (UserActivityRollupDaily, _day_start(since))
+            self._windows[since] = window
+        return window
+
+    def _grouped(
+        self,
+        model,
+        column: str,
+        tail_key: Callable,
+        window_start: Optional[datetime],
+        user_id: Optional[str] = None,
+        actions: Optional[Iterable[str]] = None,
+        user_ids: Optional[Iterable[str]] = None,
+    ) -> Dict[Any, int]:
+        """Sum rollup counts grouped by ``column`` from ``window_start`` and add the raw tail rows"""
+        watermark = self.get_watermark()
+        actions = list(actions) if actions is not None else None
+        user_ids = list(user_ids) if user_ids is not None else None
+
+        group_column = getattr(model, column)
+        query = select(group_column, func.sum(model.count)).group_by(group_column)
+        if window_start is not None:
+            query = query.where(model.bucket_start >= window_start)
+        if user_id is not None:
+            query = query.where(model.user_id == user_id)
+        if user_ids is not None:
+            query = query.where(model.user_id.in_(user_ids))
+        if actions is not None:
+            query = query.where(model.action.in_(actions))
+
+        counts: Counter = Counter()
+        for key, count in self.db.execute(query):
+            counts[key] += int(count or 0)
+
+        for row in self._tail_rows(
+            watermark, window_start, user_id=user_id, user_ids=user_ids, actions=actions
+        ):
+            counts[tail_key(row)] += 1
+        return dict(counts)
+
+    def _tail_rows(
+        self,
+        watermark: int,
+        window_start: Optional[datetime],
+        window_end: Optional[datetime] = None,
+        user_id: Optional[str] = None,
+        user_ids: Optional[List[str]] = None,
+        actions: Optional[List[str]] = None,
+        with_details: bool = False,
+    ):
+        """Raw log rows not yet folded into the rollups"""
+        columns = [
+            UserActivityLog.user_id,
+            UserActivityLog.action,
+            UserActivityLog.created_at,
+        ]
+        if with_details:
+            columns.append(UserActivityLog.details)
+        query = select(*columns).where(UserActivityLog.id > watermark)
+        if window_start is not None:
+            query = query.where(UserActivityLog.created_at >= window_start)
+        if window_end is not None:
+            query = query.where(UserActivityLog.created_at < window_end)
+        if user_id is not None:
+            query = query.where(UserActivityLog.user_id == user_id)
+        if user_ids is not None:
+            query = query.where(UserActivityLog.user_id.in_(user_ids))
+        if actions is not None:
+            query = query.where(UserActivityLog.action.in_(actions))
+        return self.db.execute(query).all()
+
+
+class ActivityRollupWorker:
+    """
+    Background thread that runs the aggregator every
+    ``ROLLUP_INTERVAL_SECONDS`` with its own database sessions.
+    """
+
+    def __init__(self, interval_seconds: int = ROLLUP_INTERVAL_SECONDS):
+        self.interval_seconds = interval_seconds
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="activity_rollup_worker", daemon=True
+        )
+        self._thread.start()
+        logger.info(
+            f"Activity rollup worker started (interval={self.interval_seconds}s)"
+        )
+
+    def stop(self, timeout: float = 10.0):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        logger.info("Activity rollup worker stopped")
+
+    def run_once(self) -> Dict[str, Any]:
+        from database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            return ActivityRollupService(db).aggregate_new_logs()
+        finally:
+            db.close()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Activity rollup aggregation failed: {e}")
+            self._stop_event.wait(self.interval_seconds)
+
+
+# Global worker instance
+_rollup_worker: Optional[ActivityRollupWorker] = None
+
+
+def start_activity_rollup_worker() -> Optional[ActivityRollupWorker]:
+    """Start the background aggregator unless ACTIVITY_ROLLUP_ENABLED=false"""
+    global _rollup_worker
+
+    if os.getenv("ACTIVITY_ROLLUP_ENABLED", "true").lower() in ("0", "false", "no"):
+        logger.info("Activity rollup worker disabled")
+        return None
+    if _rollup_worker is None:
+        _rollup_worker = ActivityRollupWorker()
+    _rollup_worker.start()
+    return _rollup_worker
+
+
+def stop_activity_rollup_worker():
+    """Stop the background aggregator"""
+    global _rollup_worker
+
+    if _rollup_worker is not None:
+        _rollup_worker.stop()
+        _rollup_worker = None
@@ -426,8 +426,8 @@ class CachedUserService:
             # Get sample cache keys to check status
             sample_keys = [
                 CacheKeys.superadmin_user_list_key(1, 25, {}),
-                f"{CacheKeys.USER_STATS}:get_user_statistics:",
-                f"{CacheKeys.DASHBOARD_STATS}:get_dashboard_statistics:"
+                cache.tagged_key(CacheKeys.USER_STATS, "get_user_statistics:"),
+                cache.tagged_key(CacheKeys.DASHBOARD_STATS, "get_dashboard_statistics:")
             ]
             
             cache_status = {}
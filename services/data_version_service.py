@@ -0,0 +1,184 @@
+"""
+Data Version Service
+
+Change counters for the tables exports read (hotels, provider_mappings,
+locations, contacts, supplier_summary), one ``data_versions`` row per
+table. ``ExportResultCache`` builds export fingerprints from them instead
+of scanning the tables on every request.
+
+Writes are detected by Session events, so write paths need no changes:
+
+- ORM flushes of new, changed or deleted rows of a tracked model,
+- ORM-enabled ``insert()``/``update()``/``delete()`` statements (the bulk
+  writes of ``HotelIngestService`` and ``SupplierSummaryService``),
+- textual ``INSERT``/``UPDATE``/``DELETE``/``REPLACE``/``TRUNCATE`` run
+  through a Session (the supplier summary helper scripts).
+
+Each session collects the tables it touched. Once it commits, their rows
+are incremented in a short transaction of their own, so concurrent ingests
+never wait on the counter row while their own transaction is open. The
+change is then broadcast on the cache invalidation bus.
+
+Readers cache the counters per process. Other workers pick up a change
+from the bus message or, as a fallback, by re-reading the rows (one
+indexed lookup) at most every ``EXPORT_DATA_VERSION_POLL_SECONDS``.
+
+Writes that bypass the Session (``engine.connect()``, manual SQL) are not
+detected; call ``bump_data_version`` after them. Otherwise the export reuse
+window (``EXPORT_REUSE_SECONDS``) bounds how long a stale result is served.
+"""
+
+from typing import Dict, Iterable, Optional
+from itertools import chain
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import TextClause
+from sqlalchemy import event, insert, select, update
+from datetime import datetime
+import threading
+import logging
+import time
+import re
+import os
+
+from models import DataVersion, Hotel, ProviderMapping, Location, Contact, SupplierSummary
+from cache_bus import register_local_cache, publish_invalidation
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+VERSION_POLL_SECONDS = float(os.getenv("EXPORT_DATA_VERSION_POLL_SECONDS", "1"))
+
+TRACKED_TABLES = frozenset(
+    model.__tablename__ for model in (Hotel, ProviderMapping, Location, Contact, SupplierSummary)
+)
+
+_TOUCHED_KEY = "data_version_touched"
+
+# Target table of textual write statements
+_WRITE_TARGET = re.compile(
+    r"\b(?:INSERT\s+(?:IGNORE\s+)?INTO|REPLACE\s+INTO|UPDATE|DELETE\s+FROM|TRUNCATE\s+TABLE)"
+    r"\s+[`\"]?(\w+)",
+    re.IGNORECASE,
+)
+
+
+class DataVersionCache:
+    """
+    Process-wide copy of the ``data_versions`` counters.
+    """
+
+    def __init__(self, poll_seconds: float = VERSION_POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self._versions: Dict[str, int] = {}
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def get(self, db: Session) -> Dict[str, int]:
+        """Counter of every tracked table (0 for tables without a row)"""
+        if time.monotonic() - self._checked_at >= self.poll_seconds:
+            self._load(db)
+        return {name: self._versions.get(name, 0) for name in TRACKED_TABLES}
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        """Re-read the counters on the next ``get``"""
+        self._checked_at = float("-inf")
+
+    def _load(self, db: Session) -> None:
+        try:
+            # Own connection: the request transaction's snapshot may predate a bump
+            with db.get_bind().connect() as conn:
+                rows = conn.execute(
+                    select(DataVersion.name, DataVersion.version).where(
+                        DataVersion.name.in_(TRACKED_TABLES)
+                    )
+                ).all()
+        except Exception as e:
+            logger.warning(f"Could not read data versions: {str(e)}")
+            return
+
+        with self._lock:
+            self._versions = {name: version for name, version in rows}
+            self._checked_at = time.monotonic()
+
+
+data_versions = DataVersionCache()
+register_local_cache("data_versions", data_versions.invalidate)
+
+
+def get_data_versions(db: Session) -> Dict[str, int]:
+    """Cached change counters of the tracked tables"""
+    return data_versions.get(db)
+
+
+def bump_data_version(tables: Iterable[str], bind=None) -> None:
+    """
+    Increment the counters of ``tables`` (untracked names are ignored).
+
+    Runs in its own transaction; call it after the change has committed.
+
+    Args:
+        tables: Table names that changed
+        bind: Engine to write to (default: the primary engine)
+    """
+    names = sorted(set(tables) & TRACKED_TABLES)
+    if not names:
+        return
+    if bind is None:
+        from database import engine as bind
+
+    now = datetime.utcnow()
+    try:
+        with bind.begin() as conn:
+            for name in names:
+                result = conn.execute(
+                    update(DataVersion)
+                    .where(DataVersion.name == name)
+                    .values(version=DataVersion.version + 1, updated_at=now)
+                )
+                if result.rowcount == 0:
+                    conn.execute(insert(DataVersion).values(name=name, version=1, updated_at=now))
+    except Exception as e:
+        logger.warning(f"Could not bump data version of {', '.join(names)}: {str(e)}")
+    publish_invalidation("data_versions")
+
+
+def _touch(session: Session, tables: Iterable[Optional[str]]) -> None:
+    touched = TRACKED_TABLES.intersection(tables)
+    if touched:
+        session.info.setdefault(_TOUCHED_KEY, set()).update(touched)
+
+
+@event.listens_for(Session, "before_flush")
+def _record_flushed_tables(session, flush_context, instances):
+    _touch(
+        session,
+        {
+            getattr(type(obj), "__tablename__", None)
+            for obj in chain(session.new, session.dirty, session.deleted)
+        },
+    )
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _record_statement_tables(orm_execute_state):
+    statement = orm_execute_state.statement
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(statement, "table", None)
+        _touch(orm_execute_state.session, [getattr(table, "name", None)])
+    elif isinstance(statement, TextClause):
+        _touch(
+            orm_execute_state.session,
+            (match.group(1).lower() for match in _WRITE_TARGET.finditer(statement.text)),
+        )
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_after_commit(session: Session) -> None:
+    touched = session.info.pop(_TOUCHED_KEY, None)
+    if touched:
+        bump_data_version(touched, session.get_bind())
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(_TOUCHED_KEY, None)
@@ -15,15 +15,17 @@ Features:
 import os
 import uuid
 import logging
-from typing import Generator, List, Any, Union, Optional
+from typing import Callable, Dict, Generator, List, Any, Union, Optional
 from datetime import datetime, timedelta
 from pathlib import Path
+from sqlalchemy import text
 from sqlalchemy.orm import Session, Query
 from fastapi import BackgroundTasks
 from fastapi.responses import FileResponse
 
-from models import ExportJob, User
+from models import ExportJob, Hotel, User
 from export_schemas import ExportFormat, ExportMetadata
+from services.export_queue import ExportInterrupted, fail_job
 from services.export_format_handler import ExportFormatHandler
 from security.audit_logging import AuditLogger, ActivityType, SecurityLevel
 from services.notification_service import NotificationService
@@ -80,8 +82,10 @@ class ExportEngine:
         """
         try:
             db.execute(
-                "UPDATE export_jobs SET progress_percentage = :progress, "
-                "processed_records = :processed WHERE id = :job_id",
+                text(
+                    "UPDATE export_jobs SET progress_percentage = :progress, "
+                    "processed_records = :processed WHERE id = :job_id"
+                ),
                 {
                     "progress": progress,
                     "processed": processed_records,
@@ -140,22 +144,7 @@ class ExportEngine:
             while True:
                 # Check for cancellation if job_id and db_session provided
                 if job_id and db_session:
-                    from models import ExportJob
-
-                    export_job = (
-                        db_session.query(ExportJob)
-                        .filter(ExportJob.id == job_id)
-                        .first()
-                    )
-                    if (
-                        export_job
-                        and export_job.status == "failed"
-                        and export_job.error_message == "Cancelled by user"
-                    ):
-                        logger.warning(
-                            f"[STREAM] Job {job_id} was cancelled, stopping stream"
-                        )
-                        raise Exception("Export cancelled by user")
+                    self._check_cancelled(db_session, job_id)
 
                 # Fetch a batch using offset and limit
                 batch_query = query.offset(offset).limit(batch_size)
@@ -189,6 +178,64 @@ class ExportEngine:
             logger.error(f"Error streaming query results: {str(e)}")
             raise
 
+    def _check_cancelled(self, db_session: Session, job_id: str) -> None:
+        """Raise if the job was cancelled by the user while streaming"""
+        export_job = (
+            db_session.query(ExportJob).filter(ExportJob.id == job_id).first()
+        )
+        if (
+            export_job
+            and export_job.status == "failed"
+            and export_job.error_message == "Cancelled by user"
+        ):
+            logger.warning(f"[STREAM] Job {job_id} was cancelled, stopping stream")
+            raise Exception("Export cancelled by user")
+
+    def stream_query_keyset(
+        self,
+        query: Query,
+        key_column,
+        after_key: Any = None,
+        batch_size: int = None,
+        job_id: str = None,
+        db_session: Session = None,
+    ) -> Generator[List[Any], None, None]:
+        """
+        Stream query results in ``key_column`` order, resuming after ``after_key``.
+
+        Each batch is ``WHERE key > last key ORDER BY key LIMIT n``: unlike
+        offset pagination the order is stable, later batches cost the same
+        as the first, and the last key of a written batch is a checkpoint
+        the export can resume from.
+
+        Args:
+            query: SQLAlchemy Query object (its ordering is replaced)
+            key_column: Unique, indexed column to page on (e.g. ``Hotel.id``)
+            after_key: Resume after this key (None: from the start)
+            batch_size: Number of records per batch (default: self.batch_size)
+
+        Yields:
+            Lists of records in batches
+        """
+        if batch_size is None:
+            batch_size = self.batch_size
+
+        query = query.order_by(None).order_by(key_column)
+        while True:
+            if job_id and db_session:
+                self._check_cancelled(db_session, job_id)
+
+            batch_query = query if after_key is None else query.filter(key_column > after_key)
+            batch_records = batch_query.limit(batch_size).all()
+            if not batch_records:
+                break
+
+            yield batch_records
+
+            if len(batch_records) < batch_size:
+                break
+            after_key = getattr(batch_records[-1], key_column.key)
+
     def export_hotels_sync(
         self,
         query: Query,
@@ -707,6 +754,9 @@ class ExportEngine:
         include_locations: bool = True,
         include_contacts: bool = True,
         include_mappings: bool = True,
+        checkpoint: Optional[Dict[str, Any]] = None,
+        on_checkpoint: Optional[Callable[[Dict[str, Any]], None]] = None,
+        worker_id: Optional[str] = None,
     ) -> None:
         """
         Background task to process asynchronous hotel export.
@@ -715,6 +765,12 @@ class ExportEngine:
         Writes output to file storage incrementally.
         Handles errors and updates job status to "failed" on exceptions.
 
+        With ``on_checkpoint``, CSV exports page by ``Hotel.id`` and report
+        ``{"last_key", "processed", "file_path", "offset"}`` after every
+        written batch; passing that dict back as ``checkpoint`` continues
+        the same file after the last complete batch. ``on_checkpoint`` may
+        raise ``ExportInterrupted`` to stop the export without failing it.
+
         Args:
             job_id: Unique export job ID
             query: SQLAlchemy Query object for hotels
@@ -723,6 +779,10 @@ class ExportEngine:
             include_locations: Whether to include location data
             include_contacts: Whether to include contact data
             include_mappings: Whether to include provider mappings
+            checkpoint: Resume point saved by an earlier, interrupted run
+            on_checkpoint: Called with the resume point after each batch
+            worker_id: Queue worker running the job (failures only apply
+                while it still owns the job)
         """
         logger.info(f"Processing async hotel export job {job_id}")
 
@@ -774,14 +834,46 @@ class ExportEngine:
             processed_records = 0
             last_progress_update = 0
 
+            resumable = on_checkpoint is not None and format == ExportFormat.CSV
+            after_key = None
+            if resumable and checkpoint and os.path.exists(checkpoint.get("file_path") or ""):
+                # Drop anything written after the last checkpointed batch
+                output_path = checkpoint["file_path"]
+                with open(output_path, "r+b") as partial:
+                    partial.truncate(checkpoint["offset"])
+                after_key = checkpoint["last_key"]
+                processed_records = checkpoint["processed"]
+                logger.info(
+                    f"Resuming export job {job_id} after hotel id {after_key} ({processed_records} records done)"
+                )
+            else:
+                checkpoint = None
+
+            if resumable:
+                batches = self.stream_query_keyset(
+                    query, Hotel.id, after_key, self.batch_size, job_id=job_id, db_session=db
+                )
+            else:
+                batches = self.stream_query_results(
+                    query, self.batch_size, job_id=job_id, db_session=db
+                )
+
+            def batch_written(batch, offset):
+                on_checkpoint(
+                    {
+                        "last_key": batch[-1].id,
+                        "processed": processed_records,
+                        "file_path": output_path,
+                        "offset": offset,
+                    }
+                )
+
             # Create a generator that tracks progress
             def progress_tracking_generator():
                 nonlocal processed_records, last_progress_update
 
                 batch_count = 0
-                for batch in self.stream_query_results(
-                    query, self.batch_size, job_id=job_id, db_session=db
-                ):
+                for batch in batches:
                     processed_records += len(batch)
                     batch_count += 1
 
@@ -818,6 +910,8 @@ class ExportEngine:
                     output_path=output_path,
                     headers=headers,
                     flatten_func=self.format_handler.flatten_hotel_data,
+                    append=checkpoint is not None,
+                    on_batch=batch_written if resumable else None,
                 )
 
             elif format == ExportFormat.JSON:
@@ -841,6 +935,9 @@ class ExportEngine:
             # Set file permissions for security
             self.file_storage.set_file_permissions(output_path)
 
+            # Pre-compressed variants for Content-Encoding downloads
+            self.file_storage.write_compressed_variants(output_path)
+
             # Get file size
             file_size = self.file_storage.get_file_size(output_path)
 
@@ -891,17 +988,17 @@ class ExportEngine:
                 success=True,
             )
 
+        except ExportInterrupted:
+            # Not a failure: the job goes back to the queue with its checkpoint
+            logger.info(f"Export job {job_id} interrupted at {processed_records} records")
+            raise
+
         except Exception as e:
             logger.error(f"Error processing async hotel export job {job_id}: {str(e)}")
 
-            # Update job as failed
+            # Update job as failed, unless it was cancelled or re-claimed meanwhile
             try:
-                export_job = db.query(ExportJob).filter(ExportJob.id == job_id).first()
-                if export_job:
-                    export_job.status = "failed"
-                    export_job.error_message = str(e)
-                    export_job.completed_at = datetime.utcnow()
-                    db.commit()
+                if fail_job(db, job_id, str(e), worker_id):
                     logger.info(f"Export job {job_id} marked as failed")
 
                     # Log export failure
@@ -1014,7 +1111,12 @@ class ExportEngine:
             raise Exception(f"Failed to create export job: {str(e)}")
 
     def process_async_mapping_export(
-        self, job_id: str, query: Query, format: ExportFormat, user: User
+        self,
+        job_id: str,
+        query: Query,
+        format: ExportFormat,
+        user: User,
+        worker_id: Optional[str] = None,
     ) -> None:
         """
         Background task to process asynchronous mapping export.
@@ -1024,6 +1126,8 @@ class ExportEngine:
             query: SQLAlchemy Query object for provider mappings
             format: Export format (CSV, JSON, EXCEL)
             user: User object who requested the export
+            worker_id: Queue worker running the job (failures only apply
+                while it still owns the job)
         """
         logger.info(f"Processing async mapping export job {job_id}")
 
@@ -1159,6 +1263,9 @@ class ExportEngine:
             # Set file permissions for security
             self.file_storage.set_file_permissions(output_path)
 
+            # Pre-compressed variants for Content-Encoding downloads
+            self.file_storage.write_compressed_variants(output_path)
+
             # Get file size
             file_size = self.file_storage.get_file_size(output_path)
 
@@ -1214,14 +1321,9 @@ class ExportEngine:
                 f"Error processing async mapping export job {job_id}: {str(e)}"
             )
 
-            # Update job as failed
+            # Update job as failed, unless it was cancelled or re-claimed meanwhile
             try:
-                export_job = db.query(ExportJob).filter(ExportJob.id == job_id).first()
-                if export_job:
-                    export_job.status = "failed"
-                    export_job.error_message = str(e)
-                    export_job.completed_at = datetime.utcnow()
-                    db.commit()
+                if fail_job(db, job_id, str(e), worker_id):
                     logger.info(f"Export job {job_id} marked as failed")
 
                     # Log export failure
@@ -1345,6 +1447,7 @@ class ExportEngine:
         format: ExportFormat,
         user: User,
         country_breakdown: dict = None,
+        worker_id: Optional[str] = None,
     ) -> None:
         """
         Background task to process asynchronous supplier summary export.
@@ -1355,6 +1458,8 @@ class ExportEngine:
             format: Export format (CSV, JSON, EXCEL)
             user: User object who requested the export
             country_breakdown: Optional country breakdown data
+            worker_id: Queue worker running the job (failures only apply
+                while it still owns the job)
         """
         logger.info(f"Processing async supplier summary export job {job_id}")
 
@@ -1478,6 +1583,9 @@ class ExportEngine:
             # Set file permissions for security
             self.file_storage.set_file_permissions(output_path)
 
+            # Pre-compressed variants for Content-Encoding downloads
+            self.file_storage.write_compressed_variants(output_path)
+
             # Get file size
             file_size = self.file_storage.get_file_size(output_path)
 
@@ -1533,14 +1641,9 @@ class ExportEngine:
                 f"Error processing async supplier summary export job {job_id}: {str(e)}"
             )
 
-            # Update job as failed
+            # Update job as failed, unless it was cancelled or re-claimed meanwhile
             try:
-                export_job = db.query(ExportJob).filter(ExportJob.id == job_id).first()
-                if export_job:
-                    export_job.status = "failed"
-                    export_job.error_message = str(e)
-                    export_job.completed_at = datetime.utcnow()
-                    db.commit()
+                if fail_job(db, job_id, str(e), worker_id):
                     logger.info(f"Export job {job_id} marked as failed")
 
                     # Log export failure
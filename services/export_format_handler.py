@@ -17,6 +17,7 @@ from pathlib import Path
 
 from models import Hotel, Location, Contact, ProviderMapping, SupplierSummary
 from export_schemas import ExportMetadata
+from services.export_queue import ExportInterrupted
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -41,7 +42,9 @@ class ExportFormatHandler:
         data: Generator[List[Any], None, None],
         output_path: str,
         headers: List[str],
-        flatten_func: callable = None
+        flatten_func: callable = None,
+        append: bool = False,
+        on_batch: callable = None
     ) -> str:
         """
         Generate CSV file from data stream with UTF-8 BOM encoding.
@@ -57,6 +60,8 @@ class ExportFormatHandler:
             output_path: Path where CSV file should be written
             headers: List of column headers
             flatten_func: Optional function to flatten complex objects
+            append: Continue an existing file (no header, no second BOM)
+            on_batch: Called with (batch, file offset) once a batch is on disk
             
         Returns:
             Path to the generated CSV file
@@ -69,7 +74,7 @@ class ExportFormatHandler:
             Path(output_path).parent.mkdir(parents=True, exist_ok=True)
             
             # Open file with UTF-8 BOM encoding
-            with open(output_path, 'w', newline='', encoding='utf-8-sig') as csvfile:
+            with open(output_path, 'a' if append else 'w', newline='', encoding='utf-8-sig') as csvfile:
                 writer = csv.DictWriter(
                     csvfile,
                     fieldnames=headers,
@@ -78,8 +83,9 @@ class ExportFormatHandler:
                 )
                 
                 # Write header row
-                writer.writeheader()
-                logger.debug("CSV header row written")
+                if not append:
+                    writer.writeheader()
+                    logger.debug("CSV header row written")
                 
                 # Process data in batches
                 total_rows = 0
@@ -101,12 +107,18 @@ class ExportFormatHandler:
                         writer.writerow(row)
                         total_rows += 1
                     
+                    if on_batch is not None:
+                        csvfile.flush()
+                        on_batch(batch, csvfile.tell())
+                    
                     if total_rows % 1000 == 0:
                         logger.debug(f"Written {total_rows} rows to CSV")
             
             logger.info(f"CSV export completed: {total_rows} rows written to {output_path}")
             return output_path
             
+        except ExportInterrupted:
+            raise
         except IOError as e:
             logger.error(f"File I/O error generating CSV export: {str(e)}")
             raise IOError(f"Failed to write CSV file: {str(e)}")
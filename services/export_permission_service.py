@@ -14,8 +14,9 @@ from fastapi import Request, HTTPException, status
 from datetime import datetime
 import logging
 
-from models import User, UserProviderPermission, UserIPWhitelist, ProviderMapping, UserRole
+from models import User, ProviderMapping, UserRole
 from middleware.ip_middleware import get_client_ip
+from services.access_control_service import get_user_access
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -213,24 +214,17 @@ class ExportPermissionService:
                 logger.warning("Could not determine client IP, allowing access (fail open)")
                 return True
             
-            # Check if user has any IP whitelist entries
-            whitelist_entries = self.db.query(UserIPWhitelist).filter(
-                UserIPWhitelist.user_id == user_id,
-                UserIPWhitelist.is_active == True
-            ).all()
+            # Whitelist entries come from the shared access-control cache
+            access = get_user_access(user_id, self.db)
             
-            logger.debug(f"Found {len(whitelist_entries)} whitelist entries for user {user_id}")
+            logger.debug(f"Found {len(access.ip_addresses)} whitelist entries for user {user_id}")
             
             # REQUIRE IP WHITELIST: If no whitelist entries exist, DENY access
-            if not whitelist_entries:
+            if not access.ip_addresses:
                 logger.warning(f"No whitelist entries found for user {user_id}, DENYING access")
                 return False
             
-            # Check if current IP is in whitelist
-            whitelisted_ips = [entry.ip_address for entry in whitelist_entries]
-            logger.debug(f"Whitelisted IPs for user {user_id}: {whitelisted_ips}")
-            
-            is_whitelisted = client_ip in whitelisted_ips
+            is_whitelisted = access.allows_ip(client_ip)
             logger.debug(f"IP {client_ip} whitelisted: {is_whitelisted}")
             
             return is_whitelisted
@@ -287,20 +281,8 @@ class ExportPermissionService:
             else:
                 logger.debug(f"User {user_id} is general user, fetching assigned suppliers")
                 
-                # Get user's assigned suppliers (excluding TEMP_DEACTIVATED_ prefix)
-                permissions = self.db.query(UserProviderPermission).filter(
-                    UserProviderPermission.user_id == user_id,
-                    ~UserProviderPermission.provider_name.like("TEMP_DEACTIVATED_%")
-                ).all()
-                
-                suppliers = [perm.provider_name for perm in permissions]
-                unique_suppliers = list(set(suppliers))
-                
-                # Filter out temporarily deactivated suppliers
-                active_suppliers = [
-                    supplier for supplier in unique_suppliers 
-                    if supplier not in deactivated_suppliers
-                ]
+                # Assigned suppliers minus temporarily deactivated ones
+                active_suppliers = list(get_user_access(user_id, self.db).active_suppliers)
                 
                 logger.info(f"General user {user_id} has access to {len(active_suppliers)} suppliers")
                 return active_suppliers
@@ -322,18 +304,7 @@ class ExportPermissionService:
             List of deactivated supplier names (without prefix)
         """
         try:
-            deactivated_perms = self.db.query(UserProviderPermission).filter(
-                UserProviderPermission.user_id == user_id,
-                UserProviderPermission.provider_name.like("TEMP_DEACTIVATED_%")
-            ).all()
-            
-            # Extract original supplier names by removing prefix
-            deactivated_suppliers = [
-                perm.provider_name.replace("TEMP_DEACTIVATED_", "")
-                for perm in deactivated_perms
-            ]
-            
-            return list(set(deactivated_suppliers))
+            return list(get_user_access(user_id, self.db).deactivated_suppliers)
             
         except Exception as e:
             logger.error(f"Error getting deactivated suppliers for user {user_id}: {str(e)}")
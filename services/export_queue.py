@@ -0,0 +1,307 @@
+"""
+Export Job Queue
+
+Durable queue for asynchronous exports, kept in the ``export_jobs`` table so
+it survives API and worker restarts and is shared by every worker process.
+
+- **Enqueue**: the API stores everything needed to rebuild the job
+  (``payload``) on the job row and leaves it ``pending``.
+- **Claim**: a worker picks the oldest pending job of the highest
+  ``priority`` whose owner is below ``EXPORT_MAX_JOBS_PER_USER`` running
+  jobs, and takes it with a conditional ``UPDATE ... WHERE status =
+  'pending'``. Only one worker can win that update, on MySQL and SQLite
+  alike, so no row locks or ``SKIP LOCKED`` are needed. The per-user cap is
+  checked before the claim, so two workers racing for the same user can
+  exceed it by one job for a moment.
+- **Lease**: workers refresh ``heartbeat_at`` of their running jobs every
+  ``EXPORT_HEARTBEAT_SECONDS``. A processing job whose heartbeat is older
+  than ``EXPORT_LEASE_SECONDS`` belongs to a dead worker and is put back to
+  ``pending`` (with its checkpoint), up to ``EXPORT_MAX_ATTEMPTS`` claims.
+- **Checkpoint**: exports that can resume (hotel CSV) store the last
+  exported key and the output file offset after every batch; a re-claimed
+  job continues from there instead of starting over.
+- **Failure**: like checkpoints and releases, marking a job failed is
+  conditional on the worker still owning it (``fail_job``), so a worker
+  that lost its lease cannot fail a job another worker is now running, and
+  a cancelled job stays cancelled.
+
+Jobs without a payload (queued before this table became the queue) are
+never claimed.
+"""
+
+from typing import Any, Dict, List, Optional
+from datetime import datetime, timedelta
+import logging
+import os
+
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+
+from models import ExportJob
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+MAX_JOBS_PER_USER = int(os.getenv("EXPORT_MAX_JOBS_PER_USER", "2"))
+HEARTBEAT_SECONDS = float(os.getenv("EXPORT_HEARTBEAT_SECONDS", "10"))
+LEASE_SECONDS = float(os.getenv("EXPORT_LEASE_SECONDS", "60"))
+MAX_ATTEMPTS = int(os.getenv("EXPORT_MAX_ATTEMPTS", "3"))
+
+# Default priorities: small exports go ahead of bulk ones
+PRIORITY_NORMAL = 0
+PRIORITY_SMALL = 10
+SMALL_JOB_RECORDS = int(os.getenv("EXPORT_SMALL_JOB_RECORDS", "50000"))
+
+CLAIM_CANDIDATES = 20
+
+
+class ExportInterrupted(Exception):
+    """Raised inside a running export to hand the job back to the queue"""
+
+
+def default_priority(total_records: Optional[int]) -> int:
+    """Priority for a job of ``total_records`` (0 or None: unknown size)"""
+    if total_records and total_records <= SMALL_JOB_RECORDS:
+        return PRIORITY_SMALL
+    return PRIORITY_NORMAL
+
+
+def fail_job(db: Session, job_id: str, error_message: str, worker_id: Optional[str] = None) -> bool:
+    """
+    Mark a job failed if the caller still owns it.
+
+    Rolls back ``db`` first, so it can be used in an ``except`` block after
+    a database error.
+
+    Args:
+        db: Session on the primary database (committed here)
+        job_id: Export job ID
+        error_message: Stored on the job
+        worker_id: Queue worker running the job; None for exports run
+            outside the queue (BackgroundTasks), which fail any job that is
+            still pending or processing
+
+    Returns:
+        False when the job was cancelled, finished or re-claimed meanwhile
+    """
+    db.rollback()
+    if worker_id is not None:
+        owned = (ExportJob.worker_id == worker_id, ExportJob.status == "processing")
+    else:
+        owned = (ExportJob.status.in_(["pending", "processing"]),)
+    failed = db.execute(
+        update(ExportJob)
+        .where(ExportJob.id == job_id, *owned)
+        .values(status="failed", error_message=error_message, completed_at=datetime.utcnow())
+    ).rowcount
+    db.commit()
+    if not failed:
+        logger.info(f"Export job {job_id} no longer owned by this worker; not marked as failed")
+    return bool(failed)
+
+
+class ExportQueue:
+    """
+    Queue operations on ``export_jobs`` (one short transaction each).
+    """
+
+    def __init__(self, session_factory):
+        """
+        Args:
+            session_factory: sessionmaker bound to the primary database
+        """
+        self.SessionLocal = session_factory
+
+    def enqueue(
+        self,
+        job_id: str,
+        payload: Dict[str, Any],
+        priority: Optional[int] = None,
+    ) -> None:
+        """Attach ``payload`` to an existing job row and mark it pending"""
+        db = self.SessionLocal()
+        try:
+            job = db.query(ExportJob).filter(ExportJob.id == job_id).first()
+            if job is None:
+                raise ValueError(f"Export job {job_id} not found")
+            job.payload = payload
+            job.priority = default_priority(job.total_records) if priority is None else priority
+            job.status = "pending"
+            job.attempts = 0
+            job.checkpoint = None
+            db.commit()
+            logger.info(f"Export job {job_id} queued (priority {job.priority})")
+        finally:
+            db.close()
+
+    def claim(self, worker_id: str) -> Optional[ExportJob]:
+        """
+        Take the next runnable job for ``worker_id``.
+
+        Returns:
+            The claimed job (detached), or None when nothing is runnable
+        """
+        db = self.SessionLocal()
+        try:
+            running = dict(
+                db.query(ExportJob.user_id, func.count(ExportJob.id))
+                .filter(ExportJob.status == "processing")
+                .group_by(ExportJob.user_id)
+                .all()
+            )
+            candidates = (
+                db.query(ExportJob.id, ExportJob.user_id)
+                .filter(ExportJob.status == "pending", ExportJob.payload.isnot(None))
+                .order_by(ExportJob.priority.desc(), ExportJob.created_at)
+                .limit(CLAIM_CANDIDATES)
+                .all()
+            )
+            now = datetime.utcnow()
+            for job_id, user_id in candidates:
+                if running.get(user_id, 0) >= MAX_JOBS_PER_USER:
+                    continue
+                claimed = db.execute(
+                    update(ExportJob)
+                    .where(ExportJob.id == job_id, ExportJob.status == "pending")
+                    .values(
+                        status="processing",
+                        worker_id=worker_id,
+                        heartbeat_at=now,
+                        attempts=ExportJob.attempts + 1,
+                        started_at=func.coalesce(ExportJob.started_at, now),
+                    )
+                ).rowcount
+                db.commit()
+                if claimed:
+                    job = db.query(ExportJob).filter(ExportJob.id == job_id).one()
+                    db.expunge(job)
+                    return job
+            return None
+        finally:
+            db.close()
+
+    def heartbeat(self, worker_id: str, job_ids: List[str]) -> None:
+        """Extend the lease of ``worker_id``'s running jobs"""
+        if not job_ids:
+            return
+        db = self.SessionLocal()
+        try:
+            db.execute(
+                update(ExportJob)
+                .where(
+                    ExportJob.id.in_(job_ids),
+                    ExportJob.worker_id == worker_id,
+                    ExportJob.status == "processing",
+                )
+                .values(heartbeat_at=datetime.utcnow())
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def save_checkpoint(self, job_id: str, worker_id: str, checkpoint: Dict[str, Any]) -> bool:
+        """
+        Store the resume point of a running job.
+
+        Returns:
+            False when the job is no longer this worker's (cancelled or
+            re-claimed after a lost lease); the caller should stop
+        """
+        db = self.SessionLocal()
+        try:
+            saved = db.execute(
+                update(ExportJob)
+                .where(
+                    ExportJob.id == job_id,
+                    ExportJob.worker_id == worker_id,
+                    ExportJob.status == "processing",
+                )
+                .values(
+                    checkpoint=checkpoint,
+                    processed_records=checkpoint.get("processed", 0),
+                    heartbeat_at=datetime.utcnow(),
+                )
+            ).rowcount
+            db.commit()
+            return bool(saved)
+        finally:
+            db.close()
+
+    def release(self, job_id: str, worker_id: str) -> None:
+        """Hand an interrupted job back to the queue (keeps its checkpoint)"""
+        db = self.SessionLocal()
+        try:
+            db.execute(
+                update(ExportJob)
+                .where(
+                    ExportJob.id == job_id,
+                    ExportJob.worker_id == worker_id,
+                    ExportJob.status == "processing",
+                )
+                .values(status="pending", worker_id=None, heartbeat_at=None)
+            )
+            db.commit()
+            logger.info(f"Export job {job_id} released back to the queue")
+        finally:
+            db.close()
+
+    def fail(self, job_id: str, worker_id: str, error_message: str) -> bool:
+        """Mark ``worker_id``'s running job failed (see ``fail_job``)"""
+        db = self.SessionLocal()
+        try:
+            return fail_job(db, job_id, error_message, worker_id)
+        finally:
+            db.close()
+
+    def requeue_stale(self) -> int:
+        """
+        Recover jobs of workers that stopped heartbeating.
+
+        Returns:
+            Number of jobs put back to pending or failed
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=LEASE_SECONDS)
+        db = self.SessionLocal()
+        try:
+            stale = (
+                ExportJob.status == "processing",
+                ExportJob.payload.isnot(None),
+                ExportJob.heartbeat_at < cutoff,
+            )
+            failed = db.execute(
+                update(ExportJob)
+                .where(*stale, ExportJob.attempts >= MAX_ATTEMPTS)
+                .values(
+                    status="failed",
+                    error_message=f"Export worker lost {MAX_ATTEMPTS} times",
+                    completed_at=datetime.utcnow(),
+                )
+            ).rowcount
+            requeued = db.execute(
+                update(ExportJob)
+                .where(*stale)
+                .values(status="pending", worker_id=None, heartbeat_at=None)
+            ).rowcount
+            db.commit()
+            if failed or requeued:
+                logger.warning(f"Export queue: requeued {requeued} stale job(s), failed {failed}")
+            return failed + requeued
+        finally:
+            db.close()
+
+    def depth(self) -> Dict[str, int]:
+        """Pending and processing job counts"""
+        db = self.SessionLocal()
+        try:
+            counts = dict(
+                db.query(ExportJob.status, func.count(ExportJob.id))
+                .filter(
+                    ExportJob.status.in_(["pending", "processing"]),
+                    ExportJob.payload.isnot(None),
+                )
+                .group_by(ExportJob.status)
+                .all()
+            )
+            return {"pending": counts.get("pending", 0), "processing": counts.get("processing", 0)}
+        finally:
+            db.close()
@@ -0,0 +1,224 @@
+"""
+Export Result Cache
+
+Reuses finished export files for identical requests instead of queueing
+another full export. Every job carries a fingerprint, a SHA-256 over:
+
+- the export type and format,
+- the normalized query parameters: list order, duplicates and supplier name
+  case do not change the exported rows, so they do not change the
+  fingerprint either,
+- the effective supplier permission set (``allowed_suppliers``),
+- the data version of the tables the export reads,
+- the owner, for JSON and Excel only. Those files embed the requesting user
+  in their metadata; CSV files do not and are shared between users with the
+  same permissions.
+
+A request whose fingerprint matches a job completed within
+``EXPORT_REUSE_SECONDS`` gets a new job that is completed immediately, its
+file being a hard link to the earlier one
+(``ExportFileStorage.link_file``). A request matching one of the same user's
+pending or running jobs gets that job back instead of a duplicate.
+
+The data version is the per-table change counters kept by
+``services.data_version_service`` (bumped after every committed write to a
+source table and cached per process), so fingerprinting costs no table
+scans. Writes that bypass the Session are bounded by the freshness window.
+"""
+
+from typing import Any, Dict, Optional
+from datetime import datetime, timedelta
+import hashlib
+import json
+import logging
+import os
+
+from sqlalchemy.orm import Session
+
+from models import ExportJob, Hotel, ProviderMapping, Location, Contact, SupplierSummary
+from services.data_version_service import get_data_versions
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Freshness window for reusing a completed export (0 disables reuse)
+REUSE_SECONDS = int(os.getenv("EXPORT_REUSE_SECONDS", "900"))
+
+# Formats whose files carry the requesting user in their metadata
+USER_SCOPED_FORMATS = {"json", "excel"}
+
+# Filter keys matched case-insensitively by ExportFilterService
+CASE_INSENSITIVE_KEYS = {"suppliers"}
+
+
+def normalize_params(value: Any, key: Optional[str] = None) -> Any:
+    """Canonical form of export query parameters for fingerprinting"""
+    if isinstance(value, dict):
+        return {k: normalize_params(v, k) for k, v in sorted(value.items())}
+    if isinstance(value, str) and value.lower() == "all":
+        return "all"
+    if isinstance(value, (list, tuple, set)):
+        items = {
+            item.lower() if key in CASE_INSENSITIVE_KEYS and isinstance(item, str) else item
+            for item in value
+        }
+        return sorted(items, key=str)
+    return value
+
+
+def source_tables(export_type: str, query_params: Dict[str, Any]) -> list:
+    """Tables whose contents end up in an export of ``export_type``"""
+    if export_type == "hotels":
+        tables = [Hotel, ProviderMapping]
+        if query_params.get("include_locations"):
+            tables.append(Location)
+        if query_params.get("include_contacts"):
+            tables.append(Contact)
+        return tables
+    if export_type == "mappings":
+        return [ProviderMapping, Hotel]
+    return [SupplierSummary]
+
+
+class ExportResultCache:
+    """
+    Fingerprinting and reuse of completed exports.
+    """
+
+    def __init__(self, db: Session, file_storage):
+        """
+        Args:
+            db: SQLAlchemy database session
+            file_storage: ExportFileStorage of the export directory
+        """
+        self.db = db
+        self.file_storage = file_storage
+
+    def data_version(self, export_type: str, query_params: Dict[str, Any]) -> str:
+        """Version stamp of the tables read by an export"""
+        versions = get_data_versions(self.db)
+        return "|".join(
+            f"{model.__tablename__}:{versions[model.__tablename__]}"
+            for model in source_tables(export_type, query_params)
+        )
+
+    def fingerprint(
+        self,
+        export_type: str,
+        format: str,
+        query_params: Dict[str, Any],
+        user_id: str,
+    ) -> str:
+        """
+        Fingerprint of an export request.
+
+        Args:
+            export_type: hotels, mappings or supplier_summary
+            format: Export format value (csv, json, excel)
+            query_params: Parameters the worker rebuilds the query from,
+                including ``allowed_suppliers``
+            user_id: Requesting user (only part of the key for user-scoped formats)
+
+        Returns:
+            64-character hex digest
+        """
+        canonical = {
+            "export_type": export_type,
+            "format": format,
+            "params": normalize_params(query_params),
+            "data_version": self.data_version(export_type, query_params),
+            "owner": user_id if format in USER_SCOPED_FORMATS else None,
+        }
+        encoded = json.dumps(canonical, sort_keys=True, default=str)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def find_in_flight(self, fingerprint: str, user_id: str) -> Optional[ExportJob]:
+        """The user's pending or running job with the same fingerprint, if any"""
+        return (
+            self.db.query(ExportJob)
+            .filter(
+                ExportJob.fingerprint == fingerprint,
+                ExportJob.user_id == user_id,
+                ExportJob.status.in_(["pending", "processing"]),
+            )
+            .order_by(ExportJob.created_at.desc())
+            .first()
+        )
+
+    def find_reusable(self, fingerprint: str) -> Optional[ExportJob]:
+        """Newest job completed within the freshness window whose file still exists"""
+        if REUSE_SECONDS <= 0:
+            return None
+
+        now = datetime.utcnow()
+        candidates = (
+            self.db.query(ExportJob)
+            .filter(
+                ExportJob.fingerprint == fingerprint,
+                ExportJob.status == "completed",
+                ExportJob.completed_at >= now - timedelta(seconds=REUSE_SECONDS),
+                ExportJob.file_path.isnot(None),
+            )
+            .order_by(ExportJob.completed_at.desc())
+            .limit(5)
+            .all()
+        )
+        for job in candidates:
+            if job.expires_at and job.expires_at <= now:
+                continue
+            if os.path.isfile(job.file_path):
+                return job
+        return None
+
+    def reuse(
+        self,
+        source: ExportJob,
+        job_id: str,
+        user_id: str,
+        filters_applied: Optional[Dict[str, Any]] = None,
+    ) -> ExportJob:
+        """
+        Create a completed job for ``user_id`` that shares ``source``'s file.
+
+        Returns:
+            The new job (committed)
+        """
+        now = datetime.utcnow()
+        file_path = self.file_storage.get_file_path(
+            job_id=job_id,
+            export_type=source.export_type,
+            format=source.format,
+            timestamp=now,
+            user_id=user_id,
+        )
+        self.file_storage.link_file(source.file_path, file_path)
+
+        job = ExportJob(
+            id=job_id,
+            user_id=user_id,
+            export_type=source.export_type,
+            format=source.format,
+            filters=filters_applied if filters_applied is not None else source.filters,
+            status="completed",
+            progress_percentage=100,
+            processed_records=source.processed_records,
+            total_records=source.total_records,
+            file_path=file_path,
+            file_size_bytes=source.file_size_bytes,
+            error_message=None,
+            created_at=now,
+            started_at=now,
+            completed_at=now,
+            expires_at=now + timedelta(hours=24),
+            fingerprint=source.fingerprint,
+        )
+        try:
+            self.db.add(job)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            self.file_storage.delete_file(file_path)
+            raise
+
+        logger.info(f"Export job {job_id} reuses the result of {source.id}")
+        return job
@@ -2,11 +2,28 @@
 Export Worker Service
 
 Dedicated worker for processing export jobs in complete isolation from the main API.
-Uses a separate database connection pool and thread pool to ensure no impact on other endpoints.
+Uses a separate database connection pool and consumer threads to ensure no impact on other endpoints.
+
+Jobs live in a durable queue on the ``export_jobs`` table (see
+``services.export_queue``): the API only enqueues, consumers claim jobs by
+priority with per-user concurrency caps, a job whose worker dies is
+re-claimed when its lease expires, and hotel CSV exports resume from their
+last checkpoint instead of starting over.
+
+Two ways to run the consumers (``EXPORT_WORKER_MODE``):
+
+- ``thread`` (default): ``EXPORT_MAX_WORKERS`` consumer threads inside each
+  API process, as before
+- ``external``: the API only enqueues; run the standalone worker, one
+  process per core by default, so CSV/Excel generation never competes with
+  request handling for the GIL:
+
+      python -m services.export_worker --processes 4
 
 Features:
 - Separate database connection pool for exports
-- Thread pool executor for parallel processing
+- Export queries read from a healthy replica (own pools) when configured
+- Durable, prioritized queue shared by all worker processes
 - Resource limits and throttling
 - Automatic cleanup of old export files
 - Health monitoring
@@ -15,16 +32,24 @@ Features:
 import os
 import logging
 import threading
-from concurrent.futures import ThreadPoolExecutor
+import uuid
+import socket
 from typing import Optional
 from datetime import datetime, timedelta
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session
 from dotenv import load_dotenv
 
+from database import DB_REPLICA_URLS, replica_router
 from models import ExportJob
 from export_schemas import ExportFormat
 from services.export_engine import ExportEngine
+from services.export_queue import (
+    HEARTBEAT_SECONDS,
+    LEASE_SECONDS,
+    ExportInterrupted,
+    ExportQueue,
+)
 from services.notification_service import NotificationService
 
 # Load environment variables
@@ -33,6 +58,11 @@ load_dotenv()
 # Configure logging
 logger = logging.getLogger(__name__)
 
+WORKER_MODE = os.getenv("EXPORT_WORKER_MODE", "thread").lower()
+POLL_SECONDS = float(os.getenv("EXPORT_POLL_SECONDS", "2"))
+SHUTDOWN_GRACE_SECONDS = float(os.getenv("EXPORT_SHUTDOWN_GRACE_SECONDS", "10"))
+WORKER_NICE = int(os.getenv("EXPORT_WORKER_NICE", "10"))
+
 
 class ExportWorker:
     """
@@ -40,7 +70,7 @@ class ExportWorker:
 
     Uses separate resources to ensure no impact on main API:
     - Separate database connection pool
-    - Dedicated thread pool executor
+    - Dedicated consumer threads pulling from the durable job queue
     - Resource limits and throttling
     """
 
@@ -98,10 +128,33 @@ class ExportWorker:
             autocommit=False, autoflush=False, bind=self.export_engine
         )
 
-        # Create thread pool executor
-        self.executor = ThreadPoolExecutor(
-            max_workers=max_workers, thread_name_prefix="export_worker"
-        )
+        # Export queries are read-heavy: run them on replicas, with pools of
+        # their own so exports never take connections from API reads
+        self.replica_sessions = {
+            replica.name: sessionmaker(
+                autocommit=False,
+                autoflush=False,
+                bind=create_engine(
+                    url,
+                    pool_size=pool_size,
+                    max_overflow=max_overflow,
+                    pool_timeout=60,
+                    pool_recycle=3600,
+                    pool_pre_ping=True,
+                    echo=False,
+                ),
+            )
+            for replica, url in zip(replica_router.replicas, DB_REPLICA_URLS)
+        }
+
+        # Durable job queue; consumers start with start()
+        self.queue = ExportQueue(self.SessionLocal)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._consumers = []
+        self._heartbeat_thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._queue_depth = {"pending": 0, "processing": 0}
 
         # Track active jobs and cancellation flags
         self.active_jobs = {}
@@ -118,6 +171,33 @@ class ExportWorker:
             f"pool_size={pool_size}, storage_path={self.storage_path}"
         )
 
+    def start(self):
+        """Start the consumer and heartbeat threads (idempotent)."""
+        if self._consumers:
+            return
+
+        self._stop.clear()
+        self._consumers = [
+            threading.Thread(
+                target=self._consume, name=f"export_worker_{i}", daemon=True
+            )
+            for i in range(self.max_workers)
+        ]
+        self._heartbeat_thread = threading.Thread(
+            target=self._heartbeat_loop, name="export_worker_heartbeat", daemon=True
+        )
+        for thread in self._consumers:
+            thread.start()
+        self._heartbeat_thread.start()
+
+        logger.info(
+            f"Export worker {self.worker_id} consuming with {self.max_workers} thread(s)"
+        )
+
+    @property
+    def consuming(self) -> bool:
+        return bool(self._consumers)
+
     def submit_export_job(
         self,
         job_id: str,
@@ -126,62 +206,130 @@ class ExportWorker:
         format: ExportFormat,
         user_data: dict,
         filters_applied: dict = None,
+        priority: Optional[int] = None,
         **kwargs,
     ) -> bool:
         """
-        Submit an export job to the worker queue.
+        Submit an export job to the durable queue.
+
+        Any consumer (in this process or a standalone worker) picks it up;
+        the job survives restarts until it completes or fails.
 
         Args:
-            job_id: Unique export job ID
+            job_id: Unique export job ID (the ExportJob row must exist)
             export_type: Type of export (hotels, mappings, supplier_summary)
             query_params: Parameters to rebuild the query
             format: Export format
             user_data: User information (id, username)
             filters_applied: Filters applied to the query
+            priority: Higher runs first (default: small jobs before bulk jobs)
             **kwargs: Additional export-specific parameters
 
         Returns:
             True if job was submitted successfully, False otherwise
         """
-        with self.lock:
-            # Check if we're at capacity
-            if len(self.active_jobs) >= self.max_workers:
-                logger.warning(
-                    f"Export worker at capacity ({self.max_workers} jobs). "
-                    f"Job {job_id} will be queued."
-                )
+        payload = {
+            "export_type": export_type,
+            "query_params": query_params,
+            "format": format.value,
+            "user_data": user_data,
+            "filters_applied": filters_applied,
+            "options": kwargs,
+        }
 
-            # Submit job to executor
-            future = self.executor.submit(
-                self._process_export_job,
-                job_id=job_id,
-                export_type=export_type,
-                query_params=query_params,
-                format=format,
-                user_data=user_data,
-                filters_applied=filters_applied,
-                **kwargs,
-            )
+        try:
+            self.queue.enqueue(job_id, payload, priority=priority)
+        except Exception as e:
+            logger.error(f"Error queueing export job {job_id}: {str(e)}")
+            return False
+
+        # Let an idle local consumer claim it right away
+        self._wake.set()
+
+        logger.info(
+            f"Export job {job_id} submitted to queue. "
+            f"Active jobs in this worker: {len(self.active_jobs)}"
+        )
+
+        return True
+
+    def _consume(self):
+        """Consumer thread: claim and run jobs until shutdown."""
+        while not self._stop.is_set():
+            try:
+                job = self.queue.claim(self.worker_id)
+            except Exception as e:
+                logger.error(f"Error claiming export job: {str(e)}")
+                job = None
 
-            self.active_jobs[job_id] = {
-                "future": future,
+            if job is None:
+                self._wake.wait(POLL_SECONDS)
+                self._wake.clear()
+                continue
+
+            self._run_claimed(job)
+
+    def _run_claimed(self, job: ExportJob):
+        """Run one claimed job from its stored payload."""
+        payload = job.payload
+        with self.lock:
+            self.active_jobs[job.id] = {
                 "submitted_at": datetime.utcnow(),
-                "export_type": export_type,
+                "export_type": payload["export_type"],
+                "user_id": job.user_id,
+                "attempt": job.attempts,
             }
 
-            # Add callback to remove from active jobs when done
-            future.add_done_callback(lambda f: self._job_completed(job_id))
-
+        if job.checkpoint:
             logger.info(
-                f"Export job {job_id} submitted to worker. "
-                f"Active jobs: {len(self.active_jobs)}"
+                f"Export job {job.id} re-claimed (attempt {job.attempts}), "
+                f"resuming at {job.checkpoint.get('processed')} records"
             )
 
-            return True
+        try:
+            self._process_export_job(
+                job_id=job.id,
+                export_type=payload["export_type"],
+                query_params=payload["query_params"],
+                format=ExportFormat(payload["format"]),
+                user_data=payload["user_data"],
+                filters_applied=payload.get("filters_applied"),
+                checkpoint=job.checkpoint,
+                on_checkpoint=lambda state: self._save_checkpoint(job.id, state),
+                **payload.get("options", {}),
+            )
+        finally:
+            self._job_completed(job.id)
+
+    def _save_checkpoint(self, job_id: str, state: dict):
+        """Persist a resume point; stop the job if it should not continue."""
+        if self._stop.is_set():
+            raise ExportInterrupted("Export worker shutting down")
+        if not self.queue.save_checkpoint(job_id, self.worker_id, state):
+            raise ExportInterrupted("Export job cancelled or claimed by another worker")
+
+    def _heartbeat_loop(self):
+        """Keep leases of running jobs alive and recover jobs of dead workers."""
+        next_recovery = 0.0
+        while not self._stop.wait(HEARTBEAT_SECONDS):
+            with self.lock:
+                job_ids = list(self.active_jobs)
+            try:
+                self.queue.heartbeat(self.worker_id, job_ids)
+
+                now = datetime.utcnow().timestamp()
+                if now >= next_recovery:
+                    next_recovery = now + LEASE_SECONDS / 2
+                    if self.queue.requeue_stale():
+                        self._wake.set()
+                self._queue_depth = self.queue.depth()
+            except Exception as e:
+                logger.error(f"Export worker heartbeat failed: {str(e)}")
 
     def _job_completed(self, job_id: str):
         """Callback when a job completes."""
         with self.lock:
+            self.cancelled_jobs.discard(job_id)
             if job_id in self.active_jobs:
                 job_info = self.active_jobs.pop(job_id)
                 duration = (
@@ -213,6 +361,7 @@ class ExportWorker:
 
         # Create dedicated database session for this job
         db = self.SessionLocal()
+        read_db = None
 
         try:
             # Get export job from database
@@ -224,7 +373,7 @@ class ExportWorker:
 
             # Update status to processing
             export_job.status = "processing"
-            export_job.started_at = datetime.utcnow()
+            export_job.started_at = export_job.started_at or datetime.utcnow()
             db.commit()
 
             logger.info(f"Export job {job_id} status updated to processing")
@@ -233,8 +382,9 @@ class ExportWorker:
             export_engine = ExportEngine(db, self.storage_path)
 
             # Rebuild query based on export type and parameters
+            read_db = self._open_read_session()
             query = self._rebuild_query(
-                db=db, export_type=export_type, query_params=query_params
+                db=read_db or db, export_type=export_type, query_params=query_params
             )
 
             # Create user object from user_data
@@ -286,27 +436,39 @@ class ExportWorker:
 
             logger.info(f"Export job {job_id} completed successfully")
 
+        except ExportInterrupted as e:
+            # Back to the queue; the next claim resumes from the checkpoint
+            logger.info(f"Export job {job_id} interrupted: {str(e)}")
+            try:
+                self.queue.release(job_id, self.worker_id)
+            except Exception as release_error:
+                logger.error(f"Error releasing job {job_id}: {str(release_error)}")
+
         except Exception as e:
             logger.error(f"Error processing export job {job_id}: {str(e)}")
 
-            # Update job as failed
+            # Update job as failed, unless it was cancelled or re-claimed meanwhile
             try:
-                export_job = db.query(ExportJob).filter(ExportJob.id == job_id).first()
-
-                if export_job:
-                    export_job.status = "failed"
-                    export_job.error_message = str(e)
-                    export_job.completed_at = datetime.utcnow()
-                    db.commit()
+                if self.queue.fail(job_id, self.worker_id, str(e)):
                     logger.info(f"Export job {job_id} marked as failed")
 
             except Exception as update_error:
                 logger.error(f"Error updating failed job status: {str(update_error)}")
 
         finally:
-            # Always close the database session
+            # Always close the database sessions
+            if read_db is not None:
+                read_db.close()
             db.close()
 
+    def _open_read_session(self) -> Optional[Session]:
+        """Session on a healthy, fresh replica, or None to read from the primary"""
+        replica = replica_router.pick()
+        if replica is None:
+            return None
+        logger.info(f"Export query routed to read replica {replica.name}")
+        return self.replica_sessions[replica.name]()
+
     def _rebuild_query(self, db: Session, export_type: str, query_params: dict):
         """
         Rebuild the query from stored parameters.
@@ -391,6 +553,9 @@ class ExportWorker:
             include_locations=include_locations,
             include_contacts=include_contacts,
             include_mappings=include_mappings,
+            checkpoint=kwargs.get("checkpoint"),
+            on_checkpoint=kwargs.get("on_checkpoint"),
+            worker_id=self.worker_id,
         )
 
     def _process_mapping_export(
@@ -404,7 +569,11 @@ class ExportWorker:
     ):
         """Process mapping export with progress tracking."""
         export_engine.process_async_mapping_export(
-            job_id=export_job.id, query=query, format=format, user=user
+            job_id=export_job.id,
+            query=query,
+            format=format,
+            user=user,
+            worker_id=self.worker_id,
         )
 
     def _process_supplier_summary_export(
@@ -429,20 +598,27 @@ class ExportWorker:
             format=format,
             user=user,
             country_breakdown=country_breakdown,
+            worker_id=self.worker_id,
         )
 
+
     def get_worker_status(self) -> dict:
         """Get current worker status."""
         with self.lock:
             return {
+                "worker_id": self.worker_id,
+                "mode": WORKER_MODE,
+                "consuming": self.consuming,
                 "max_workers": self.max_workers,
                 "active_jobs": len(self.active_jobs),
                 "available_slots": self.max_workers - len(self.active_jobs),
+                "queue": dict(self._queue_depth),
                 "jobs": [
                     {
                         "job_id": job_id,
                         "export_type": info["export_type"],
                         "submitted_at": info["submitted_at"].isoformat(),
+                        "attempt": info["attempt"],
                     }
                     for job_id, info in self.active_jobs.items()
                 ],
@@ -493,6 +669,9 @@ class ExportWorker:
         """
         Cancel an active export job.
 
+        The job's row is marked cancelled by the caller; a job running in
+        another process notices at its next batch.
+
         Args:
             job_id: The job ID to cancel
 
@@ -505,7 +684,7 @@ class ExportWorker:
                 logger.info(f"Job {job_id} marked for cancellation")
                 return True
             else:
-                logger.warning(f"Job {job_id} not found in active jobs")
+                logger.warning(f"Job {job_id} not active in worker {self.worker_id}")
                 return False
 
     def is_cancelled(self, job_id: str) -> bool:
@@ -514,14 +693,33 @@ class ExportWorker:
             return job_id in self.cancelled_jobs
 
     def shutdown(self):
-        """Gracefully shutdown the worker."""
+        """
+        Gracefully shutdown the worker.
+
+        Resumable jobs stop at their next checkpoint and go back to the
+        queue; other jobs get ``EXPORT_SHUTDOWN_GRACE_SECONDS`` to finish and
+        are otherwise re-claimed by another worker once their lease expires.
+        """
         logger.info("Shutting down export worker...")
 
-        # Wait for active jobs to complete
-        self.executor.shutdown(wait=True)
+        self._stop.set()
+        self._wake.set()
+        for thread in self._consumers:
+            thread.join(timeout=SHUTDOWN_GRACE_SECONDS)
+        if self._heartbeat_thread is not None:
+            self._heartbeat_thread.join(timeout=1)
+        self._consumers = []
 
-        # Dispose database engine
+        with self.lock:
+            if self.active_jobs:
+                logger.warning(
+                    f"Export jobs still running at shutdown (lease will expire): {list(self.active_jobs)}"
+                )
+
+        # Dispose database engines
         self.export_engine.dispose()
+        for session_factory in self.replica_sessions.values():
+            session_factory.kw["bind"].dispose()
 
         logger.info("Export worker shutdown complete")
 
@@ -547,6 +745,16 @@ def get_export_worker() -> ExportWorker:
     return _export_worker
 
 
+def start_export_worker() -> ExportWorker:
+    """Create the global worker; consume in-process unless EXPORT_WORKER_MODE=external."""
+    worker = get_export_worker()
+    if WORKER_MODE == "external":
+        logger.info("EXPORT_WORKER_MODE=external: API only enqueues export jobs")
+    else:
+        worker.start()
+    return worker
+
+
 def shutdown_export_worker():
     """Shutdown the global export worker."""
     global _export_worker
@@ -554,3 +762,112 @@ def shutdown_export_worker():
     if _export_worker is not None:
         _export_worker.shutdown()
         _export_worker = None
+
+
+# ——————— Standalone worker processes ———————
+
+
+def _configure_logging():
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(processName)s %(levelname)s %(name)s: %(message)s",
+    )
+
+
+def run_worker_process(threads: int, nice: int = WORKER_NICE):
+    """Entry point of one standalone worker process (runs until SIGTERM/SIGINT)."""
+    import signal
+
+    _configure_logging()
+    if nice and hasattr(os, "nice"):
+        # Yield the CPU to API processes on the same host
+        os.nice(nice)
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    # Report slots and queue depth to the shared metrics directory
+    from metrics import start_metrics, stop_metrics
+
+    global _export_worker
+    _export_worker = ExportWorker(
+        max_workers=threads,
+        pool_size=max(threads, 1),
+        max_overflow=int(os.getenv("EXPORT_MAX_OVERFLOW", "5")),
+    )
+    _export_worker.start()
+    start_metrics()
+
+    while not stop.wait(1):
+        pass
+
+    shutdown_export_worker()
+    stop_metrics()
+
+
+def main():
+    import argparse
+    import multiprocessing
+    import signal
+    import time
+
+    parser = argparse.ArgumentParser(description="Standalone export worker pool")
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Worker processes (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--threads", type=int, default=1, help="Concurrent jobs per process (default: 1)"
+    )
+    parser.add_argument(
+        "--nice",
+        type=int,
+        default=WORKER_NICE,
+        help=f"Scheduling niceness of worker processes (default: {WORKER_NICE})",
+    )
+    args = parser.parse_args()
+    _configure_logging()
+
+    if args.processes <= 1:
+        run_worker_process(args.threads, args.nice)
+        return
+
+    context = multiprocessing.get_context("spawn")
+    stopping = threading.Event()
+
+    def spawn(index: int):
+        process = context.Process(
+            target=run_worker_process,
+            args=(args.threads, args.nice),
+            name=f"export-worker-{index}",
+        )
+        process.start()
+        return process
+
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    signal.signal(signal.SIGINT, lambda *_: stopping.set())
+
+    processes = [spawn(i) for i in range(args.processes)]
+    logger.info(f"Export worker pool started: {args.processes} process(es) x {args.threads} thread(s)")
+
+    # Supervise: replace crashed workers (their jobs are re-claimed by lease)
+    while not stopping.wait(1):
+        for index, process in enumerate(processes):
+            if not process.is_alive():
+                logger.warning(f"Export worker {process.name} exited ({process.exitcode}), restarting")
+                processes[index] = spawn(index)
+
+    for process in processes:
+        process.terminate()
+    deadline = time.monotonic() + SHUTDOWN_GRACE_SECONDS + 5
+    for process in processes:
+        process.join(timeout=max(deadline - time.monotonic(), 0))
+        if process.is_alive():
+            process.kill()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+Hotel Analytics Service
+
+Maintains the ``hotel_analytics_rollup`` table: hotel counts per
+(dimension, bucket) computed with SQL GROUP BY queries, so the hotel analytics
+dashboard reads a few hundred pre-aggregated rows instead of loading hotels
+into the ORM. The rollup is refreshed on a schedule (refresh_hotel_analytics.py).
+Readers never wait for a refresh unless the rollup has never been built: an
+older-than-``ROLLUP_MAX_AGE_SECONDS`` rollup is returned as is and rebuilt by
+a background thread on its own session.
+"""
+
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from sqlalchemy import select, delete, insert, func, and_
+from datetime import datetime
+import threading
+import logging
+import os
+
+from models import (
+    Hotel,
+    Location,
+    ProviderMapping,
+    Contact,
+    Chain,
+    HotelAnalyticsRollup,
+)
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+ROLLUP_MAX_AGE_SECONDS = int(os.getenv("HOTEL_ANALYTICS_MAX_AGE_SECONDS", "900"))
+TOP_N_BUCKETS = 50
+
+# Only one refresh per process at a time; concurrent readers use the old rollup
+_refresh_lock = threading.Lock()
+
+
+def _refresh_in_background() -> None:
+    """Rebuild the rollup on a fresh session; releases ``_refresh_lock``"""
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        HotelAnalyticsService(db).refresh_rollup()
+    except Exception as e:
+        logger.error(f"Background hotel analytics refresh failed: {e}")
+    finally:
+        db.close()
+        _refresh_lock.release()
+
+
+def _rating_bucket(rating: Optional[str]) -> Tuple[str, Optional[float]]:
+    """Map a raw rating string to a whole-star bucket and its numeric value"""
+    if not str(rating).strip():
+        return "unrated", None
+    try:
+        value = float(str(rating).strip())
+    except (TypeError, ValueError):
+        return "invalid", None
+    if value < 0 or value > 5:
+        return "invalid", None
+    return str(int(value)), value
+
+
+class HotelAnalyticsService:
+    """
+    Service for building and reading the hotel analytics rollup.
+    """
+
+    def __init__(self, db: Session):
+        """
+        Initialize HotelAnalyticsService with database session.
+
+        Args:
+            db: SQLAlchemy database session
+        """
+        self.db = db
+
+    def refresh_rollup(self) -> Dict[str, Any]:
+        """
+        Recompute every rollup dimension with SQL-side aggregation and replace
+        the table contents in one transaction.
+
+        Returns:
+            Dict with number of rows written and refresh duration
+        """
+        started = datetime.utcnow()
+        rows: List[Dict[str, Any]] = []
+
+        def add(dimension: str, bucket: Any, count: int, value_sum: float = None):
+            rows.append(
+                {
+                    "dimension": dimension,
+                    "bucket": str(bucket)[:255] if bucket not in (None, "") else "unknown",
+                    "hotel_count": int(count or 0),
+                    "value_sum": value_sum,
+                    "refreshed_at": started,
+                }
+            )
+
+        db = self.db
+
+        # Totals
+        totals = {
+            "total_hotels": db.scalar(select(func.count(Hotel.id))),
+            "hotels_with_coordinates": db.scalar(
+                select(func.count(Hotel.id)).where(
+                    and_(Hotel.latitude.isnot(None), Hotel.longitude.isnot(None))
+                )
+            ),
+            "total_locations": db.scalar(select(func.count(Location.id))),
+            "unique_countries": db.scalar(
+                select(func.count(func.distinct(Location.country_code)))
+            ),
+            "unique_cities": db.scalar(
+                select(func.count(func.distinct(Location.city_name)))
+            ),
+            "total_mappings": db.scalar(select(func.count(ProviderMapping.id))),
+            "hotels_with_mappings": db.scalar(
+                select(func.count(func.distinct(ProviderMapping.ittid)))
+            ),
+            "hotels_with_contacts": db.scalar(
+                select(func.count(func.distinct(Contact.ittid)))
+            ),
+            "total_chains": db.scalar(select(func.count(Chain.id))),
+            "hotels_in_chains": db.scalar(
+                select(func.count(func.distinct(Chain.ittid)))
+            ),
+        }
+
+        # Ratings are strings; group by the raw value in SQL (few distinct
+        # values) and bucket the groups here.
+        rating_buckets: Dict[str, List[float]] = {}
+        rated_hotels = 0
+        rating_sum = 0.0
+        for rating, count in db.execute(
+            select(Hotel.rating, func.count(Hotel.id))
+            .where(Hotel.rating.isnot(None))
+            .group_by(Hotel.rating)
+        ):
+            bucket, value = _rating_bucket(rating)
+            entry = rating_buckets.setdefault(bucket, [0, 0.0])
+            entry[0] += count
+            if value is not None:
+                entry[1] += value * count
+                rated_hotels += count
+                rating_sum += value * count
+        for bucket, (count, value_sum) in rating_buckets.items():
+            add("rating", bucket, count, value_sum)
+        totals["hotels_with_ratings"] = rated_hotels
+        add("totals", "rating_sum", rated_hotels, rating_sum)
+
+        for name, value in totals.items():
+            add("totals", name, value)
+
+        # Simple GROUP BY dimensions on hotels
+        for dimension, column in (
+            ("property_type", Hotel.property_type),
+            ("map_status", Hotel.map_status),
+            ("content_update_status", Hotel.content_update_status),
+        ):
+            for bucket, count in db.execute(
+                select(column, func.count(Hotel.id)).group_by(column)
+            ):
+                add(dimension, bucket, count)
+
+        # Country coverage (a hotel counts once per country)
+        for country_code, count in db.execute(
+            select(Location.country_code, func.count(func.distinct(Location.ittid)))
+            .group_by(Location.country_code)
+        ):
+            add("country", country_code, count)
+
+        # Top cities and chains only; long tails are not shown on dashboards
+        city_count = func.count(func.distinct(Location.ittid))
+        for city_name, country_code, count in db.execute(
+            select(Location.city_name, Location.country_code, city_count)
+            .where(Location.city_name.isnot(None))
+            .group_by(Location.city_name, Location.country_code)
+            .order_by(city_count.desc())
+            .limit(TOP_N_BUCKETS)
+        ):
+            add("city", f"{city_name}|{country_code or ''}", count)
+
+        chain_count = func.count(func.distinct(Chain.ittid))
+        for chain_name, count in db.execute(
+            select(Chain.chain_name, chain_count)
+            .where(Chain.chain_name.isnot(None))
+            .group_by(Chain.chain_name)
+            .order_by(chain_count.desc())
+            .limit(TOP_N_BUCKETS)
+        ):
+            add("chain", chain_name, count)
+
+        # GROUP BY on NULL-able columns can yield two "unknown" buckets
+        # (NULL and ""); merge them so (dimension, bucket) stays unique.
+        merged: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for row in rows:
+            key = (row["dimension"], row["bucket"])
+            if key in merged:
+                merged[key]["hotel_count"] += row["hotel_count"]
+            else:
+                merged[key] = row
+
+        try:
+            db.execute(delete(HotelAnalyticsRollup))
+            db.execute(insert(HotelAnalyticsRollup), list(merged.values()))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        duration = (datetime.utcnow() - started).total_seconds()
+        logger.info(
+            f"Hotel analytics rollup refreshed: {len(merged)} rows in {duration:.2f}s"
+        )
+        return {
+            "rows_written": len(merged),
+            "refreshed_at": started.isoformat(),
+            "duration_seconds": round(duration, 3),
+        }
+
+    def get_rollup(self, max_age_seconds: int = ROLLUP_MAX_AGE_SECONDS) -> Dict[str, Any]:
+        """
+        Read the rollup. A missing rollup is built before returning; one older
+        than ``max_age_seconds`` is returned immediately while a background
+        thread rebuilds it.
+
+        Returns:
+            Dict with ``dimensions`` ({dimension: {bucket: {"count", "sum"}}}),
+            ``refreshed_at`` and ``age_seconds``
+        """
+        refreshed_at = self.db.scalar(select(func.max(HotelAnalyticsRollup.refreshed_at)))
+        now = datetime.utcnow()
+        stale = (
+            refreshed_at is None
+            or (now - refreshed_at).total_seconds() > max_age_seconds
+        )
+
+        if refreshed_at is None:
+            # Nothing to serve yet: build it now (waits for a refresh in
+            # progress). self.db may be a read-only replica session, so the
+            # build and this first read both use the primary.
+            from database import SessionLocal
+
+            primary = SessionLocal()
+            try:
+                with _refresh_lock:
+                    if primary.scalar(select(func.max(HotelAnalyticsRollup.refreshed_at))) is None:
+                        try:
+                            HotelAnalyticsService(primary).refresh_rollup()
+                        except Exception as e:
+                            logger.error(f"Hotel analytics rollup refresh failed: {e}")
+                rows = primary.query(HotelAnalyticsRollup).all()
+            finally:
+                primary.close()
+        else:
+            if stale and _refresh_lock.acquire(blocking=False):
+                threading.Thread(
+                    target=_refresh_in_background, name="hotel_analytics_refresh", daemon=True
+                ).start()
+            rows = self.db.query(HotelAnalyticsRollup).all()
+
+        dimensions: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        refreshed_at = None
+        for row in rows:
+            dimensions.setdefault(row.dimension, {})[row.bucket] = {
+                "count": row.hotel_count,
+                "sum": row.value_sum,
+            }
+            refreshed_at = max(refreshed_at or row.refreshed_at, row.refreshed_at)
+
+        return {
+            "dimensions": dimensions,
+            "refreshed_at": refreshed_at,
+            "age_seconds": (
+                round((datetime.utcnow() - refreshed_at).total_seconds(), 1)
+                if refreshed_at
+                else None
+            ),
+        }
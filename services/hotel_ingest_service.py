@@ -0,0 +1,491 @@
+"""
+Hotel Bulk Ingest Service
+
+Set-based ingestion of hotels and provider mappings. Each chunk of rows is
+deduplicated with a handful of IN (...) lookups, written with multi-row
+executemany inserts/updates and committed as a single transaction, instead
+of one round trip and one commit per hotel/mapping. When a chunk fails, its
+rows are retried one transaction each so only the offending rows are
+reported as errors.
+"""
+
+from typing import List, Optional, Dict, Any, Iterable, Tuple, Callable
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import insert, update, select
+from datetime import datetime
+import logging
+
+from models import Hotel, Location, ProviderMapping, Contact, Chain
+from services.supplier_summary_service import SupplierSummaryService
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1000
+MAX_CHUNK_SIZE = 5000
+
+# Scalar hotel columns accepted from the payload (everything else is nested data)
+HOTEL_FIELDS = (
+    "ittid",
+    "name",
+    "latitude",
+    "longitude",
+    "address_line1",
+    "address_line2",
+    "postal_code",
+    "rating",
+    "property_type",
+    "primary_photo",
+    "map_status",
+    "content_update_status",
+)
+MAPPING_FIELDS = (
+    "provider_name",
+    "provider_id",
+    "system_type",
+    "vervotech_id",
+    "giata_code",
+)
+
+
+def _chunks(rows: List[Any], size: int) -> Iterable[Tuple[int, List[Any]]]:
+    """Yield (offset, chunk) pairs"""
+    for offset in range(0, len(rows), size):
+        yield offset, rows[offset : offset + size]
+
+
+def _as_dict(row: Any) -> Dict[str, Any]:
+    """Accept both pydantic models and plain dicts"""
+    if hasattr(row, "dict"):
+        return row.dict()
+    return dict(row or {})
+
+
+class HotelIngestService:
+    """
+    Service for bulk hotel and provider mapping ingestion.
+
+    Rows are processed in chunks; every chunk runs in its own transaction. A
+    failing chunk is rolled back and written again row by row, so a bad row
+    only fails itself. Outcomes are reported per input row, in input order.
+    """
+
+    def __init__(self, db: Session, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        """
+        Initialize HotelIngestService with database session.
+
+        Args:
+            db: SQLAlchemy database session
+            chunk_size: Number of input rows written per transaction
+        """
+        self.db = db
+        self.chunk_size = max(1, min(chunk_size or DEFAULT_CHUNK_SIZE, MAX_CHUNK_SIZE))
+        # (provider_name, ittid) for every mapping created by this service
+        # instance, so callers can apply follow-up bookkeeping in bulk.
+        self.created_mappings: List[Tuple[str, str]] = []
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def ingest_hotels(
+        self, hotels: List[Any], update_existing: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Create or update hotels together with locations, contacts, chains
+        and provider mappings.
+
+        New hotels are inserted with all nested data. Existing hotels (same
+        ITTID) get their scalar columns updated when ``update_existing`` is
+        set; their new provider mappings are appended while nested locations,
+        contacts and chains are left untouched.
+
+        Args:
+            hotels: List of HotelCreate models or equivalent dicts
+            update_existing: Update scalar columns of hotels that already exist
+
+        Returns:
+            Summary counters and a per-row ``results`` list
+        """
+        rows = [_as_dict(h) for h in hotels]
+        results: List[Dict[str, Any]] = []
+
+        for offset, chunk in _chunks(rows, self.chunk_size):
+            results.extend(self._ingest_hotel_chunk(offset, chunk, update_existing))
+
+        return self._summarize(results)
+
+    def ingest_provider_mappings(self, mappings: List[Any]) -> Dict[str, Any]:
+        """
+        Add provider mappings for existing hotels.
+
+        Equivalent to calling ``/add_provider_all_details_with_ittid`` once per
+        row: rows whose hotel does not exist are reported as ``not_found`` and
+        rows whose (provider_name, provider_id) is already mapped as ``skipped``.
+
+        Args:
+            mappings: List of dicts with ittid, provider_name, provider_id, ...
+
+        Returns:
+            Summary counters and a per-row ``results`` list
+        """
+        rows = [_as_dict(m) for m in mappings]
+        results: List[Dict[str, Any]] = []
+
+        for offset, chunk in _chunks(rows, self.chunk_size):
+            results.extend(self._ingest_mapping_chunk(offset, chunk))
+
+        return self._summarize(results)
+
+    # ------------------------------------------------------------------
+    # Chunk processing
+    # ------------------------------------------------------------------
+
+    def _ingest_hotel_chunk(
+        self, offset: int, chunk: List[Dict[str, Any]], update_existing: bool
+    ) -> List[Dict[str, Any]]:
+        results: List[Dict[str, Any]] = []
+        valid: List[Tuple[int, Dict[str, Any]]] = []
+        seen_ittids = set()
+
+        for i, row in enumerate(chunk):
+            index = offset + i
+            error = self._validate_hotel(row)
+            if error:
+                results.append(self._result(index, row.get("ittid"), "error", error=error))
+            elif row["ittid"] in seen_ittids:
+                results.append(
+                    self._result(index, row["ittid"], "skipped", error="Duplicate ITTID in request")
+                )
+            else:
+                seen_ittids.add(row["ittid"])
+                valid.append((index, row))
+
+        if valid:
+            results.extend(
+                self._write_chunk(
+                    offset, valid, lambda rows: self._write_hotels(rows, update_existing)
+                )
+            )
+
+        results.sort(key=lambda r: r["index"])
+        return results
+
+    def _ingest_mapping_chunk(
+        self, offset: int, chunk: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        results: List[Dict[str, Any]] = []
+        valid: List[Tuple[int, Dict[str, Any]]] = []
+
+        for i, row in enumerate(chunk):
+            index = offset + i
+            missing = [
+                f for f in ("ittid", "provider_name", "provider_id") if not row.get(f)
+            ]
+            if missing:
+                results.append(
+                    self._result(
+                        index,
+                        row.get("ittid"),
+                        "error",
+                        error=f"Missing required fields: {', '.join(missing)}",
+                    )
+                )
+            else:
+                valid.append((index, row))
+
+        if valid:
+            results.extend(self._write_chunk(offset, valid, self._write_mappings))
+
+        results.sort(key=lambda r: r["index"])
+        return results
+
+    def _write_chunk(
+        self,
+        offset: int,
+        valid: List[Tuple[int, Dict[str, Any]]],
+        write: Callable[[List[Tuple[int, Dict[str, Any]]]], List[Dict[str, Any]]],
+    ) -> List[Dict[str, Any]]:
+        """
+        Write a chunk in one transaction; if it fails, retry row by row.
+
+        The retry gives every row its own transaction, so the rows that caused
+        the failure are reported as "error" with their own database error while
+        the rest of the chunk is still written.
+        """
+        try:
+            return write(valid)
+        except (SQLAlchemyError, ValueError, TypeError) as e:
+            self.db.rollback()
+            if len(valid) == 1:
+                index, row = valid[0]
+                logger.error(f"Bulk ingest row {index} ({row.get('ittid')}) failed: {e}")
+                return [self._result(index, row.get("ittid"), "error", error=str(e))]
+            logger.warning(
+                f"Bulk ingest chunk at offset {offset} failed, retrying {len(valid)} rows "
+                f"one by one: {e}"
+            )
+
+        results: List[Dict[str, Any]] = []
+        for item in valid:
+            results.extend(self._write_chunk(item[0], [item], write))
+        return results
+
+    def _write_hotels(
+        self, valid: List[Tuple[int, Dict[str, Any]]], update_existing: bool
+    ) -> List[Dict[str, Any]]:
+        """Insert/update validated, ITTID-unique hotel rows and commit"""
+        existing_ittids = self._existing_ittids(r["ittid"] for _, r in valid)
+        existing_keys = self._existing_mapping_keys(
+            m for _, r in valid for m in r.get("provider_mappings") or []
+        )
+
+        hotel_inserts: List[Dict[str, Any]] = []
+        hotel_updates: List[Dict[str, Any]] = []
+        locations: List[Dict[str, Any]] = []
+        contacts: List[Dict[str, Any]] = []
+        chains: List[Dict[str, Any]] = []
+        mapping_inserts: List[Dict[str, Any]] = []
+        results: List[Dict[str, Any]] = []
+        now = datetime.utcnow()
+
+        for index, row in valid:
+            ittid = row["ittid"]
+            hotel_values = {
+                k: row[k] for k in HOTEL_FIELDS if row.get(k) is not None
+            }
+            if ittid in existing_ittids:
+                if update_existing:
+                    hotel_values["updated_at"] = now
+                    hotel_updates.append(hotel_values)
+                    status = "updated"
+                else:
+                    status = "skipped"
+            else:
+                hotel_inserts.append(hotel_values)
+                locations.extend(
+                    {**_as_dict(l), "ittid": ittid} for l in row.get("locations") or []
+                )
+                contacts.extend(
+                    {**_as_dict(c), "ittid": ittid} for c in row.get("contacts") or []
+                )
+                chains.extend(
+                    {**_as_dict(c), "ittid": ittid} for c in row.get("chains") or []
+                )
+                status = "created"
+
+            created, skipped = self._collect_mappings(
+                ittid, row.get("provider_mappings") or [], existing_keys, mapping_inserts
+            )
+            results.append(
+                self._result(
+                    index,
+                    ittid,
+                    status,
+                    mappings_created=created,
+                    mappings_skipped=skipped,
+                )
+            )
+
+        # Hotels first: every child table references hotels.ittid
+        if hotel_inserts:
+            self.db.execute(insert(Hotel), hotel_inserts)
+        if hotel_updates:
+            self._update_hotels(hotel_updates)
+        if locations:
+            self.db.execute(insert(Location), locations)
+        if contacts:
+            self.db.execute(insert(Contact), contacts)
+        if chains:
+            self.db.execute(insert(Chain), chains)
+        self._insert_mappings(mapping_inserts)
+
+        logger.info(
+            f"Bulk ingest of {len(valid)} rows from index {valid[0][0]}: "
+            f"{len(hotel_inserts)} hotels created, {len(hotel_updates)} updated, "
+            f"{len(mapping_inserts)} mappings created"
+        )
+        return results
+
+    def _write_mappings(
+        self, valid: List[Tuple[int, Dict[str, Any]]]
+    ) -> List[Dict[str, Any]]:
+        """Insert validated provider mapping rows for existing hotels and commit"""
+        existing_ittids = self._existing_ittids(r["ittid"] for _, r in valid)
+        existing_keys = self._existing_mapping_keys(r for _, r in valid)
+        mapping_inserts: List[Dict[str, Any]] = []
+        results: List[Dict[str, Any]] = []
+
+        for index, row in valid:
+            ittid = row["ittid"]
+            if ittid not in existing_ittids:
+                results.append(
+                    self._result(index, ittid, "not_found", error="Hotel not found")
+                )
+                continue
+
+            created, _ = self._collect_mappings(
+                ittid, [row], existing_keys, mapping_inserts
+            )
+            results.append(
+                self._result(index, ittid, "created" if created else "skipped")
+            )
+
+        self._insert_mappings(mapping_inserts)
+        return results
+
+    def _insert_mappings(self, mapping_inserts: List[Dict[str, Any]]) -> None:
+        """Insert mappings with their supplier_summary deltas and commit"""
+        if mapping_inserts:
+            self.db.execute(insert(ProviderMapping), mapping_inserts)
+            self._record_summary(mapping_inserts)
+        self.db.commit()
+        self.created_mappings.extend(
+            (m["provider_name"], m["ittid"]) for m in mapping_inserts
+        )
+
+    # ------------------------------------------------------------------
+    # Set-based helpers
+    # ------------------------------------------------------------------
+
+    def _existing_ittids(self, ittids: Iterable[str]) -> set:
+        """Return the subset of ittids already present, in one query"""
+        wanted = list(set(ittids))
+        if not wanted:
+            return set()
+        rows = self.db.execute(select(Hotel.ittid).where(Hotel.ittid.in_(wanted)))
+        return {r[0] for r in rows}
+
+    def _existing_mapping_keys(self, mappings: Iterable[Any]) -> set:
+        """
+        Return the (provider_name, provider_id) pairs already mapped.
+
+        Issues one IN (...) query per distinct provider in the chunk rather
+        than one query per mapping.
+        """
+        by_provider: Dict[str, set] = {}
+        for m in mappings:
+            m = _as_dict(m)
+            if m.get("provider_name") and m.get("provider_id"):
+                by_provider.setdefault(m["provider_name"], set()).add(str(m["provider_id"]))
+
+        existing = set()
+        for provider_name, provider_ids in by_provider.items():
+            rows = self.db.execute(
+                select(ProviderMapping.provider_id).where(
+                    ProviderMapping.provider_name == provider_name,
+                    ProviderMapping.provider_id.in_(list(provider_ids)),
+                )
+            )
+            existing.update((provider_name, r[0]) for r in rows)
+        return existing
+
+    def _collect_mappings(
+        self,
+        ittid: str,
+        mappings: List[Any],
+        existing_keys: set,
+        mapping_inserts: List[Dict[str, Any]],
+    ) -> Tuple[int, int]:
+        """Queue non-duplicate mappings for insert; returns (created, skipped)"""
+        created = skipped = 0
+        for m in mappings:
+            m = _as_dict(m)
+            key = (m.get("provider_name"), str(m.get("provider_id")))
+            if not key[0] or not m.get("provider_id") or key in existing_keys:
+                skipped += 1
+                continue
+            # Mark as seen so later rows in the same request are deduplicated too
+            existing_keys.add(key)
+            values = {k: m[k] for k in MAPPING_FIELDS if m.get(k) is not None}
+            values["provider_id"] = key[1]
+            values["ittid"] = ittid
+            mapping_inserts.append(values)
+            created += 1
+        return created, skipped
+
+    def _record_summary(self, mapping_inserts: List[Dict[str, Any]]) -> None:
+        """Apply supplier_summary deltas inside the chunk transaction"""
+        SupplierSummaryService(self.db).record_mappings_added(
+            (m["provider_name"], m["ittid"]) for m in mapping_inserts
+        )
+
+    def _update_hotels(self, hotel_updates: List[Dict[str, Any]]) -> None:
+        """Executemany UPDATE keyed by primary key, one statement per column set"""
+        ids = dict(
+            self.db.execute(
+                select(Hotel.ittid, Hotel.id).where(
+                    Hotel.ittid.in_([h["ittid"] for h in hotel_updates])
+                )
+            ).all()
+        )
+        # Rows only carry the columns present in the payload; an executemany
+        # needs the same parameter set on every row
+        by_columns: Dict[frozenset, List[Dict[str, Any]]] = {}
+        for values in hotel_updates:
+            values["id"] = ids[values["ittid"]]
+            by_columns.setdefault(frozenset(values), []).append(values)
+        for rows in by_columns.values():
+            self.db.execute(update(Hotel), rows)
+
+    # ------------------------------------------------------------------
+    # Result helpers
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _validate_hotel(row: Dict[str, Any]) -> Optional[str]:
+        if not row.get("ittid"):
+            return "ITTID is required"
+        if not row.get("name"):
+            return "Hotel name is required"
+        return None
+
+    @staticmethod
+    def _result(
+        index: int,
+        ittid: Optional[str],
+        status: str,
+        error: Optional[str] = None,
+        **extra: Any,
+    ) -> Dict[str, Any]:
+        result = {"index": index, "ittid": ittid, "status": status, **extra}
+        if error:
+            result["error"] = error
+        return result
+
+    @staticmethod
+    def _summarize(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for r in results:
+            counts[r["status"]] = counts.get(r["status"], 0) + 1
+        return {
+            "total": len(results),
+            "created": counts.get("created", 0),
+            "updated": counts.get("updated", 0),
+            "skipped": counts.get("skipped", 0),
+            "not_found": counts.get("not_found", 0),
+            "errors": counts.get("error", 0),
+            "results": results,
+        }
+
+
+def ingest_hotels(
+    db: Session,
+    hotels: List[Any],
+    update_existing: bool = True,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Dict[str, Any]:
+    """Library entry point for scripts that hold a session (see utils/helper)"""
+    return HotelIngestService(db, chunk_size=chunk_size).ingest_hotels(
+        hotels, update_existing=update_existing
+    )
+
+
+def ingest_provider_mappings(
+    db: Session, mappings: List[Any], chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Dict[str, Any]:
+    """Library entry point for mapping-only loads of existing hotels"""
+    return HotelIngestService(db, chunk_size=chunk_size).ingest_provider_mappings(
+        mappings
+    )
@@ -4,6 +4,7 @@ from datetime import datetime
 import logging
 
 from models import User, UserProviderPermission, ProviderMapping
+from services.access_control_service import bump_access_version
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -83,6 +84,7 @@ class PermissionService:
             )
             
             self.db.add(new_permission)
+            bump_access_version(self.db)
             self.db.commit()
             
             logger.info(f"Added permission for user {user_id} to access provider {provider_name}")
@@ -115,6 +117,7 @@ class PermissionService:
                 return True
             
             self.db.delete(permission)
+            bump_access_version(self.db)
             self.db.commit()
             
             logger.info(f"Removed permission for user {user_id} to access provider {provider_name}")
@@ -159,6 +162,7 @@ class PermissionService:
                 else:
                     logger.warning(f"Skipping non-existent provider: {provider_name}")
             
+            bump_access_version(self.db)
             self.db.commit()
             
             logger.info(f"Successfully set permissions for user {user_id}")
@@ -265,6 +269,7 @@ class PermissionService:
                     self.db.add(new_permission)
                     added_count += 1
             
+            bump_access_version(self.db)
             self.db.commit()
             
             logger.info(f"Bulk added {added_count} permissions")
@@ -298,6 +303,7 @@ class PermissionService:
                     self.db.delete(permission)
                     removed_count += 1
             
+            bump_access_version(self.db)
             self.db.commit()
             
             logger.info(f"Bulk removed {removed_count} permissions")
@@ -368,6 +374,7 @@ class PermissionService:
             for permission in permissions:
                 self.db.delete(permission)
             
+            bump_access_version(self.db)
             self.db.commit()
             
             logger.info(f"Cleaned up {removed_count} permissions for user {user_id}")
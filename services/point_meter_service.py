@@ -0,0 +1,702 @@
+"""
+Point Meter Service
+
+Write-behind metering for per-request point deductions. Instead of reading
+and updating ``user_points`` and the user's "deduction" ``PointTransaction``
+and committing on every metered request, each worker process:
+
+1. leases a quota of points from the database by reserving it with a
+   conditional ``UPDATE user_points SET reserved_points = reserved_points + :n
+   WHERE current_points - reserved_points >= :n`` and records the lease in
+   ``point_meter_leases``,
+2. admits requests against its local quota and appends each deduction to a
+   local journal file, and
+3. settles the accumulated usage in one transaction per flush interval
+   (``POINT_METER_FLUSH_SECONDS``): ``current_points``, ``reserved_points``
+   and the lease go down by exactly what was charged, ``total_used_points``
+   and the deduction transaction go up.
+
+The reservation is the single, atomic source of truth for admission: all
+workers together can never admit more than the unreserved balance, and a
+settlement never takes ``current_points`` below zero. ``current_points``
+itself only drops by charged points, so everything that reads the balance
+(point details, transfers, dashboards) sees the user's real balance, minus
+at most one flush interval of unsettled usage, as it did before leases.
+Code that takes points out of the balance by other means must leave the
+reserved part alone or release it first (``release_user_leases``, used via
+``services.point_service.ensure_spendable_points``).
+
+Once a lease of ``POINT_METER_LEASE_POINTS`` is no longer covered (a user
+near zero), every request is deducted synchronously for exactly its own
+points. Unused quota is released after ``POINT_METER_LEASE_TTL_SECONDS``
+without use and when the worker stops. Workers refresh their lease rows on
+every flush; a lease left unrefreshed for ``POINT_METER_RECLAIM_SECONDS``
+(its worker died) is released by any other worker.
+
+Crash safety: every journal file is a batch with a unique id. Applying a
+batch inserts its id into ``point_meter_batches`` in the same transaction as
+the usage and lease updates, so replaying a journal after a crash
+(``recover``, run at startup and periodically) applies each batch exactly
+once.
+"""
+
+from typing import Dict, Any, Optional, Tuple
+from collections import Counter
+from sqlalchemy.orm import Session
+from sqlalchemy import select, update, insert, delete, func, case
+from sqlalchemy.exc import IntegrityError
+from fastapi import HTTPException
+from datetime import datetime, timedelta
+import threading
+import logging
+import socket
+import json
+import time
+import uuid
+import os
+
+import psutil
+
+from models import User, UserPoint, PointTransaction, PointMeterBatch, PointMeterLease
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+METER_ENABLED = os.getenv("POINT_METER_ENABLED", "true").lower() not in ("0", "false", "no")
+FLUSH_SECONDS = float(os.getenv("POINT_METER_FLUSH_SECONDS", "5"))
+STRICT_MODE = os.getenv("POINT_METER_STRICT", "false").lower() in ("1", "true", "yes")
+LEASE_POINTS = int(os.getenv("POINT_METER_LEASE_POINTS", "100"))
+LEASE_TTL_SECONDS = float(os.getenv("POINT_METER_LEASE_TTL_SECONDS", "60"))
+RECLAIM_SECONDS = float(os.getenv("POINT_METER_RECLAIM_SECONDS", "300"))
+JOURNAL_DIR = os.getenv(
+    "POINT_METER_JOURNAL_DIR", os.path.join(os.getcwd(), "data", "point_meter")
+)
+
+INSUFFICIENT_POINTS_DETAIL = "Insufficient points to access this endpoint."
+
+
+class _Account:
+    """Quota this worker holds for one user"""
+
+    __slots__ = ("quota", "leased_at", "used_at")
+
+    def __init__(self):
+        self.quota = 0  # leased from the DB, not yet admitted
+        self.leased_at = time.monotonic()
+        self.used_at = self.leased_at
+
+
+class PointMeter:
+    """
+    In-process point meter with leased quotas and journaled, batched write-back.
+    """
+
+    def __init__(
+        self,
+        journal_dir: str = JOURNAL_DIR,
+        flush_seconds: float = FLUSH_SECONDS,
+        strict: bool = STRICT_MODE,
+        lease_points: int = LEASE_POINTS,
+        lease_ttl_seconds: float = LEASE_TTL_SECONDS,
+        reclaim_seconds: float = RECLAIM_SECONDS,
+        session_factory=None,
+    ):
+        """
+        Initialize the meter and open a fresh journal.
+
+        Args:
+            journal_dir: Directory for journal files (must survive restarts)
+            flush_seconds: Interval between write-backs
+            strict: Always deduct synchronously
+            lease_points: Quota taken from the DB at a time
+            lease_ttl_seconds: Return quota unused for this long
+            reclaim_seconds: Refund leases of workers silent for this long
+            session_factory: Callable returning a new DB session
+        """
+        self.journal_dir = journal_dir
+        self.flush_seconds = flush_seconds
+        self.strict = strict
+        self.lease_points = lease_points
+        self.lease_ttl_seconds = lease_ttl_seconds
+        self.reclaim_seconds = reclaim_seconds
+        if session_factory is None:
+            from database import SessionLocal
+
+            session_factory = SessionLocal
+        self.session_factory = session_factory
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._accounts: Dict[str, _Account] = {}
+        self._journal_usage: Counter = Counter()
+        # batch_id -> (journal path, usage, refunds) written back unsuccessfully so far
+        self._unapplied: Dict[str, Tuple[Optional[str], Counter, Counter]] = {}
+
+        self._pid = os.getpid()
+        self._token = uuid.uuid4().hex[:12]
+        self._host = socket.gethostname()
+        self.owner = f"{self._host}:{self._pid}:{self._token}"[-100:]
+        os.makedirs(self.journal_dir, exist_ok=True)
+        self._open_journal()
+
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------
+    # Hot path
+    # ------------------------------------------------------------------
+
+    def charge(self, user: User, points: int, db: Session) -> None:
+        """
+        Deduct points for one request.
+
+        Raises:
+            HTTPException: 400 if the user does not have enough points
+        """
+        if points <= 0:
+            return
+
+        for _ in range(2):
+            if self._admit(user.id, points):
+                return
+            if self.strict or not self._lease(user.id, max(points, self.lease_points)):
+                break
+
+        # Near zero (or strict mode): settle exactly this request in the database
+        self._charge_strict(user, points, db)
+
+    def _admit(self, user_id: str, points: int) -> bool:
+        """Take the deduction from local quota and journal it, if covered"""
+        with self._lock:
+            account = self._accounts.get(user_id)
+            if self.strict or account is None or account.quota < points:
+                return False
+            account.quota -= points
+            account.used_at = time.monotonic()
+            if points:
+                self._journal_usage[user_id] += points
+                self._journal.write(json.dumps({"u": user_id, "p": points}) + "\n")
+                self._journal.flush()
+            return True
+
+    def _lease(self, user_id: str, points: int) -> bool:
+        """Reserve ``points`` of the user's balance as this worker's quota"""
+        # Own session: the request's pending work is neither committed nor rolled back
+        db = self.session_factory()
+        try:
+            result = db.execute(
+                update(UserPoint)
+                .where(UserPoint.user_id == user_id, _unreserved() >= points)
+                .values(reserved_points=_reserved() + points)
+            )
+            if result.rowcount != 1:
+                db.rollback()
+                return False
+            now = datetime.utcnow()
+            updated = db.execute(
+                update(PointMeterLease)
+                .where(PointMeterLease.owner == self.owner, PointMeterLease.user_id == user_id)
+                .values(points=PointMeterLease.points + points, updated_at=now)
+            ).rowcount
+            if not updated:
+                db.execute(
+                    insert(PointMeterLease).values(
+                        owner=self.owner, user_id=user_id, points=points, updated_at=now
+                    )
+                )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        with self._lock:
+            account = self._accounts.get(user_id)
+            if account is None:
+                account = self._accounts[user_id] = _Account()
+            account.quota += points
+            account.leased_at = account.used_at = time.monotonic()
+        return True
+
+    def _charge_strict(self, user: User, points: int, db: Session) -> None:
+        result = db.execute(
+            update(UserPoint)
+            .where(UserPoint.user_id == user.id, _unreserved() >= points)
+            .values(
+                current_points=UserPoint.current_points - points,
+                total_used_points=func.coalesce(UserPoint.total_used_points, 0) + points,
+            )
+        )
+        if result.rowcount != 1:
+            db.rollback()
+            raise HTTPException(status_code=400, detail=INSUFFICIENT_POINTS_DETAIL)
+
+        _record_deduction_transactions(db, {user.id: points}, {user.id: user.email})
+        db.commit()
+
+    def forget_user(self, user_id: str) -> None:
+        """
+        Settle this worker's journaled usage and drop its quota for a user
+        whose reservations are being released (the lease rows are removed
+        by ``release_user_leases``).
+        """
+        self.flush()
+        with self._lock:
+            self._accounts.pop(user_id, None)
+
+    # ------------------------------------------------------------------
+    # Write-back
+    # ------------------------------------------------------------------
+
+    def _open_journal(self) -> None:
+        self._journal_id = uuid.uuid4().hex
+        self._journal_path = os.path.join(
+            self.journal_dir, f"journal-{self._pid}-{self._token}-{self._journal_id}.ndjson"
+        )
+        self._journal = open(self._journal_path, "a", encoding="utf-8")
+
+    def flush(self, release_all: bool = False) -> Dict[str, Any]:
+        """
+        Write all journaled usage back to the database and return idle quota.
+
+        Args:
+            release_all: Return every quota (shutdown)
+
+        Returns:
+            Dict with batches applied, points written and points refunded
+        """
+        with self._flush_lock:
+            now = time.monotonic()
+            with self._lock:
+                usage: Counter = Counter()
+                batch_id, path = uuid.uuid4().hex, None
+                if self._journal_usage:
+                    usage = self._journal_usage
+                    self._journal_usage = Counter()
+                    batch_id, path = self._journal_id, self._journal_path
+                    self._journal.close()
+                    self._open_journal()
+
+                refunds: Counter = Counter()
+                for user_id, account in list(self._accounts.items()):
+                    if release_all or now - account.used_at >= self.lease_ttl_seconds:
+                        if account.quota:
+                            refunds[user_id] = account.quota
+                        del self._accounts[user_id]
+
+                if usage or refunds:
+                    self._unapplied[batch_id] = (path, usage, refunds)
+
+            applied_batches = 0
+            applied_points = 0
+            refunded_points = 0
+            for batch_id, (path, usage, refunds) in list(self._unapplied.items()):
+                db = self.session_factory()
+                try:
+                    _apply_batch(db, batch_id, self.owner, usage, refunds)
+                except Exception as e:
+                    logger.error(f"Point meter flush of batch {batch_id} failed: {e}")
+                    continue
+                finally:
+                    db.close()
+
+                if path:
+                    _remove_file(path)
+                del self._unapplied[batch_id]
+                applied_batches += 1
+                applied_points += sum(usage.values())
+                refunded_points += sum(refunds.values())
+
+            self._sync_leases()
+            return {
+                "batches": applied_batches,
+                "points": applied_points,
+                "refunded": refunded_points,
+            }
+
+    def _sync_leases(self) -> None:
+        """Keep this worker's leases alive and drop quota removed by others"""
+        started = time.monotonic()
+        db = self.session_factory()
+        try:
+            db.execute(
+                update(PointMeterLease)
+                .where(PointMeterLease.owner == self.owner)
+                .values(updated_at=datetime.utcnow())
+            )
+            held = set(
+                db.scalars(
+                    select(PointMeterLease.user_id).where(PointMeterLease.owner == self.owner)
+                ).all()
+            )
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Point meter lease refresh failed: {e}")
+            return
+        finally:
+            db.close()
+
+        with self._lock:
+            for user_id, account in list(self._accounts.items()):
+                # Leases taken after the query started are not in ``held`` yet
+                if user_id not in held and account.leased_at < started:
+                    del self._accounts[user_id]
+
+    def recover(self) -> Dict[str, Any]:
+        """
+        Replay journals left behind by processes that are no longer running
+        (or by an earlier run of this one), then refund their leases. Safe to
+        call repeatedly.
+
+        Returns:
+            Dict with journals replayed, points written and points refunded
+        """
+        replayed = 0
+        points_total = 0
+        for name in sorted(os.listdir(self.journal_dir)):
+            if not (name.startswith("journal-") and name.endswith(".ndjson")):
+                continue
+            parts = name[len("journal-") : -len(".ndjson")].split("-")
+            try:
+                pid = int(parts[0])
+            except ValueError:
+                continue
+            if len(parts) == 3:
+                owner = f"{self._host}:{pid}:{parts[1]}"[-100:]
+            elif len(parts) == 2:
+                owner = None  # written before leases: usage not yet taken from the balance
+            else:
+                continue
+            batch_id = parts[-1]
+            if batch_id == self._journal_id or batch_id in self._unapplied:
+                continue
+            if pid != self._pid and psutil.pid_exists(pid):
+                continue  # owned by a live worker
+
+            path = os.path.join(self.journal_dir, name)
+            usage = _read_journal(path)
+            if usage:
+                db = self.session_factory()
+                try:
+                    _apply_batch(db, batch_id, owner, usage, Counter())
+                finally:
+                    db.close()
+            _remove_file(path)
+            replayed += 1
+            points_total += sum(usage.values())
+
+        refunded = self._reclaim_leases()
+        if replayed or refunded:
+            logger.info(
+                f"Point meter recovered {replayed} journals ({points_total} points), "
+                f"refunded {refunded} leased points"
+            )
+        return {"journals": replayed, "points": points_total, "refunded": refunded}
+
+    def _reclaim_leases(self) -> int:
+        """Release leases of dead local workers and of workers silent too long"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.reclaim_seconds)
+        db = self.session_factory()
+        try:
+            leases = db.execute(
+                select(
+                    PointMeterLease.owner,
+                    PointMeterLease.user_id,
+                    PointMeterLease.points,
+                    PointMeterLease.updated_at,
+                ).where(PointMeterLease.owner != self.owner)
+            ).all()
+            refunded = 0
+            for owner, user_id, points, updated_at in leases:
+                if updated_at >= cutoff and not _is_dead_local_owner(owner, self._host):
+                    continue
+                if _release_lease(db, owner, user_id, points):
+                    refunded += points
+                db.commit()
+            return refunded
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="point_meter_flusher", daemon=True
+        )
+        self._thread.start()
+        logger.info(f"Point meter started (flush every {self.flush_seconds}s)")
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+            self._thread = None
+        self.flush(release_all=True)
+        with self._lock:
+            self._journal.close()
+            if not self._journal_usage:
+                _remove_file(self._journal_path)
+        logger.info("Point meter stopped")
+
+    def _run(self) -> None:
+        last_recover = time.monotonic()
+        while not self._stop_event.wait(self.flush_seconds):
+            try:
+                self.flush()
+                if time.monotonic() - last_recover >= self.reclaim_seconds / 2:
+                    last_recover = time.monotonic()
+                    self.recover()
+            except Exception as e:
+                logger.error(f"Point meter flush failed: {e}")
+
+
+def _is_dead_local_owner(owner: str, host: str) -> bool:
+    """True for a lease owner on this host whose process has exited"""
+    try:
+        owner_host, pid, _ = owner.rsplit(":", 2)
+        return owner_host == host and not psutil.pid_exists(int(pid))
+    except ValueError:
+        return False
+
+
+def _read_journal(path: str) -> Counter:
+    usage: Counter = Counter()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+                usage[entry["u"]] += int(entry["p"])
+            except (ValueError, KeyError, TypeError):
+                # Torn last line from a crash mid-write
+                continue
+    return usage
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _reserved():
+    return func.coalesce(UserPoint.reserved_points, 0)
+
+
+def _unreserved():
+    return func.coalesce(UserPoint.current_points, 0) - _reserved()
+
+
+def _take_from_balance(points: int, reserved: bool) -> Dict[str, Any]:
+    """UPDATE values charging ``points`` (out of the reservation if ``reserved``), never below zero"""
+    values = {
+        "current_points": case(
+            (UserPoint.current_points >= points, UserPoint.current_points - points),
+            else_=0,
+        ),
+        "total_used_points": func.coalesce(UserPoint.total_used_points, 0) + points,
+    }
+    if reserved:
+        values["reserved_points"] = case((_reserved() >= points, _reserved() - points), else_=0)
+    return values
+
+
+def _release_lease(db: Session, owner: str, user_id: str, points: int) -> bool:
+    """Delete one lease row (if unchanged) and release its reservation"""
+    taken = db.execute(
+        delete(PointMeterLease).where(
+            PointMeterLease.owner == owner,
+            PointMeterLease.user_id == user_id,
+            PointMeterLease.points == points,
+        )
+    ).rowcount
+    if taken and points > 0:
+        db.execute(
+            update(UserPoint)
+            .where(UserPoint.user_id == user_id)
+            .values(reserved_points=case((_reserved() >= points, _reserved() - points), else_=0))
+        )
+    return bool(taken)
+
+
+def _apply_batch(
+    db: Session,
+    batch_id: str,
+    owner: Optional[str],
+    usage: Counter,
+    refunds: Counter,
+) -> bool:
+    """
+    Apply one batch of usage and quota refunds; returns False if it was
+    applied before.
+
+    Usage covered by the owner's lease is settled out of the reservation.
+    Usage whose lease is gone (released by a reset or transfer, reclaimed
+    from a stalled worker, or ``owner`` None for a journal written before
+    leases existed) is taken from the balance directly, never below zero.
+    """
+    try:
+        db.execute(
+            insert(PointMeterBatch).values(
+                batch_id=batch_id,
+                user_count=len(usage),
+                points=sum(usage.values()),
+                applied_at=datetime.utcnow(),
+            )
+        )
+        for user_id, points in usage.items():
+            covered = False
+            if owner is not None:
+                covered = bool(
+                    db.execute(
+                        update(PointMeterLease)
+                        .where(
+                            PointMeterLease.owner == owner,
+                            PointMeterLease.user_id == user_id,
+                            PointMeterLease.points >= points,
+                        )
+                        .values(points=PointMeterLease.points - points)
+                    ).rowcount
+                )
+            db.execute(
+                update(UserPoint)
+                .where(UserPoint.user_id == user_id)
+                .values(**_take_from_balance(points, reserved=covered))
+            )
+        for user_id, points in refunds.items():
+            # A lease released in the meantime has nothing left to return
+            taken = db.execute(
+                update(PointMeterLease)
+                .where(
+                    PointMeterLease.owner == owner,
+                    PointMeterLease.user_id == user_id,
+                    PointMeterLease.points >= points,
+                )
+                .values(points=PointMeterLease.points - points)
+            ).rowcount
+            if taken:
+                db.execute(
+                    update(UserPoint)
+                    .where(UserPoint.user_id == user_id)
+                    .values(
+                        reserved_points=case((_reserved() >= points, _reserved() - points), else_=0)
+                    )
+                )
+        if owner is not None:
+            db.execute(
+                delete(PointMeterLease).where(
+                    PointMeterLease.owner == owner, PointMeterLease.points <= 0
+                )
+            )
+        if usage:
+            emails = dict(
+                db.execute(select(User.id, User.email).where(User.id.in_(list(usage)))).all()
+            )
+            _record_deduction_transactions(db, usage, emails)
+        db.commit()
+        return True
+    except IntegrityError:
+        db.rollback()
+        logger.info(f"Point meter batch {batch_id} already applied, skipping")
+        return False
+    except Exception:
+        db.rollback()
+        raise
+
+
+def _record_deduction_transactions(
+    db: Session, usage: Dict[str, int], emails: Dict[str, str]
+) -> None:
+    """Add usage to each user's cumulative "deduction" transaction"""
+    existing: Dict[str, PointTransaction] = {}
+    for transaction in (
+        db.query(PointTransaction)
+        .filter(
+            PointTransaction.giver_id.in_(list(usage)),
+            PointTransaction.transaction_type == "deduction",
+        )
+        .order_by(PointTransaction.id)
+        .all()
+    ):
+        existing.setdefault(transaction.giver_id, transaction)
+
+    now = datetime.utcnow()
+    for user_id, points in usage.items():
+        transaction = existing.get(user_id)
+        if transaction:
+            transaction.giver_email = emails.get(user_id, transaction.giver_email)
+            transaction.points += points
+            transaction.created_at = now
+        else:
+            db.add(
+                PointTransaction(
+                    giver_id=user_id,
+                    points=points,
+                    transaction_type="deduction",
+                    created_at=now,
+                )
+            )
+
+
+# Global meter instance
+_point_meter: Optional[PointMeter] = None
+
+
+def get_point_meter() -> Optional[PointMeter]:
+    """The running meter, or None when metering is disabled or not started"""
+    return _point_meter
+
+
+def start_point_meter() -> Optional[PointMeter]:
+    """Create the meter, replay leftover journals and start the flusher"""
+    global _point_meter
+
+    if not METER_ENABLED:
+        logger.info("Point meter disabled, deducting points synchronously")
+        return None
+    if _point_meter is None:
+        _point_meter = PointMeter()
+        _point_meter.recover()
+    _point_meter.start()
+    return _point_meter
+
+
+def release_user_leases(user_id: str, db: Session) -> int:
+    """
+    Release every reservation held for a user, in the caller's transaction.
+
+    Used before the balance is changed by other means (an admin reset, a
+    transfer that needs reserved points). Settles this worker's journaled
+    usage first; other workers drop their local quota at their next flush,
+    and usage they admit until then is taken from the balance directly.
+
+    Returns:
+        Points released
+    """
+    if _point_meter is not None:
+        _point_meter.forget_user(user_id)
+    released = 0
+    leases = db.execute(
+        select(PointMeterLease.owner, PointMeterLease.points).where(
+            PointMeterLease.user_id == user_id
+        )
+    ).all()
+    for owner, points in leases:
+        if _release_lease(db, owner, user_id, points):
+            released += points
+    return released
+
+
+def stop_point_meter() -> None:
+    """Flush outstanding deductions and stop the flusher"""
+    global _point_meter
+
+    if _point_meter is not None:
+        _point_meter.stop()
+        _point_meter = None
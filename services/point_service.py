@@ -35,6 +35,36 @@ class TransactionSummary:
     recent_activity_days: int
 
 
+
+def ensure_spendable_points(db: Session, user_points: UserPoint, points: int) -> bool:
+    """
+    Check that ``points`` can be taken out of a user's balance.
+
+    ``current_points`` is the user's real balance, but the point meter may
+    have reserved part of it (``reserved_points``) for requests it admits
+    in memory. If only the reservation stands in the way, it is released
+    in the caller's transaction so the caller can deduct.
+
+    Args:
+        db: SQLAlchemy database session
+        user_points: The user's UserPoint row
+        points: Points the caller is about to deduct
+
+    Returns:
+        True if the balance covers ``points``
+    """
+    current = int(user_points.current_points or 0)
+    if current < points:
+        return False
+    if current - int(user_points.reserved_points or 0) < points:
+        from services.point_meter_service import release_user_leases
+
+        release_user_leases(user_points.user_id, db)
+        # Settling this worker's usage may have lowered the balance too
+        db.refresh(user_points, ["current_points", "reserved_points"])
+        return int(user_points.current_points or 0) >= points
+    return True
+
 class PointService:
     """
     Service for managing user points and transactions.
@@ -297,7 +327,7 @@ class PointService:
                 self.db.query(UserPoint).filter(UserPoint.user_id == user_id).first()
             )
 
-            if not user_points or user_points.current_points < points:
+            if not user_points or not ensure_spendable_points(self.db, user_points, points):
                 logger.warning(f"Insufficient points for user {user_id}")
                 return False
 
@@ -363,7 +393,7 @@ class PointService:
             giver_points = (
                 self.db.query(UserPoint).filter(UserPoint.user_id == giver_id).first()
             )
-            if not giver_points or giver_points.current_points < points:
+            if not giver_points or not ensure_spendable_points(self.db, giver_points, points):
                 logger.warning(f"Insufficient points for transfer from user {giver_id}")
                 return False
 
@@ -0,0 +1,296 @@
+"""
+Supplier Summary Service
+
+Keeps the ``supplier_summary`` counters current as provider mappings are
+added and removed, instead of rebuilding them with a full
+COUNT(DISTINCT ittid) / COUNT(*) scan over ``provider_mappings``.
+
+Delta updates run inside the caller's transaction, after the mapping rows
+have been flushed and before commit, so counters and mappings commit or roll
+back together.
+
+Whether a (provider, ittid) pair gained its first mapping or lost its last
+one is decided by a subquery inside the relative UPDATE itself, not by a
+separate read beforehand. Under InnoDB's default REPEATABLE READ the
+subquery of an UPDATE is a locking read of the latest rows, so two
+transactions adding the first mapping of the same pair serialize (or one
+fails with a deadlock and rolls back completely) instead of both
+incrementing ``total_hotels``. On databases that evaluate it against the
+statement snapshot (PostgreSQL READ COMMITTED), a concurrent writer that
+commits while the UPDATE waits for the row lock can still be missed: the
+drift is bounded by one hotel per such collision, never affects
+``total_mappings``, and is corrected by ``reconcile``. A provider's first
+summary row is a plain INSERT; a concurrent first insert fails on the
+unique provider_name and rolls back with its mappings.
+
+``reconcile`` also covers rows changed outside the API; schedule it via
+``refresh_supplier_summary.py``.
+"""
+
+from typing import List, Dict, Any, Iterable, Tuple
+from collections import Counter
+from sqlalchemy.orm import Session
+from sqlalchemy import select, update, insert, func, literal
+from datetime import datetime
+import logging
+
+from models import ProviderMapping, SupplierSummary
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class SupplierSummaryService:
+    """
+    Service for incremental maintenance of per-provider mapping counters.
+
+    ``total_mappings`` is adjusted by the number of mapping rows added or
+    removed. ``total_hotels`` (distinct ITTIDs per provider) only changes when
+    a (provider, ittid) pair gains its first mapping or loses its last one,
+    which the UPDATE determines with a grouped subquery per provider.
+    """
+
+    def __init__(self, db: Session):
+        """
+        Initialize SupplierSummaryService with database session.
+
+        Args:
+            db: SQLAlchemy database session
+        """
+        self.db = db
+
+    def record_mappings_added(self, pairs: Iterable[Tuple[str, str]]) -> None:
+        """
+        Apply counter deltas for mappings that were just inserted.
+
+        Must be called after the new rows are flushed, in the same transaction.
+
+        Args:
+            pairs: (provider_name, ittid) for every inserted mapping row
+        """
+        added = Counter(pairs)
+        if not added:
+            return
+
+        mapping_delta: Counter = Counter()
+        # provider -> added count -> ittids that got that many new mappings
+        groups: Dict[str, Dict[int, List[str]]] = {}
+        for (provider_name, ittid), count in added.items():
+            mapping_delta[provider_name] += count
+            groups.setdefault(provider_name, {}).setdefault(count, []).append(ittid)
+
+        # A pair is new for the provider when every mapping it has now was
+        # added by this transaction
+        hotel_delta = {
+            provider_name: sum(
+                (
+                    self._pairs_with_count(provider_name, ittids, count)
+                    for count, ittids in by_count.items()
+                ),
+                literal(0),
+            )
+            for provider_name, by_count in groups.items()
+        }
+
+        self._apply(mapping_delta, hotel_delta)
+
+    def record_mappings_removed(self, pairs: Iterable[Tuple[str, str]]) -> None:
+        """
+        Apply counter deltas for mappings that were just deleted.
+
+        Must be called after the delete is flushed, in the same transaction.
+
+        Args:
+            pairs: (provider_name, ittid) for every deleted mapping row
+        """
+        removed = Counter(pairs)
+        if not removed:
+            return
+
+        mapping_delta: Counter = Counter()
+        ittids_by_provider: Dict[str, List[str]] = {}
+        for (provider_name, ittid), count in removed.items():
+            mapping_delta[provider_name] -= count
+            ittids_by_provider.setdefault(provider_name, []).append(ittid)
+
+        # Pairs with no mapping left are hotels the provider lost
+        hotel_delta = {
+            provider_name: self._pairs_with_mappings(provider_name, ittids) - len(ittids)
+            for provider_name, ittids in ittids_by_provider.items()
+        }
+
+        self._apply(mapping_delta, hotel_delta)
+
+    def reconcile(self, fix: bool = True) -> Dict[str, Any]:
+        """
+        Verify every counter against a full recount of provider_mappings.
+
+        Args:
+            fix: Overwrite drifted counters (and add/remove provider rows)
+
+        Returns:
+            Report with the providers checked and the drift found
+        """
+        recount = {
+            row.provider_name: row
+            for row in self.db.execute(
+                select(
+                    ProviderMapping.provider_name,
+                    func.count(func.distinct(ProviderMapping.ittid)).label("total_hotels"),
+                    func.count(ProviderMapping.id).label("total_mappings"),
+                    func.max(ProviderMapping.updated_at).label("last_updated"),
+                ).group_by(ProviderMapping.provider_name)
+            )
+        }
+        stored = {s.provider_name: s for s in self.db.query(SupplierSummary).all()}
+
+        drift: List[Dict[str, Any]] = []
+        now = datetime.utcnow()
+
+        for provider_name, actual in recount.items():
+            summary = stored.get(provider_name)
+            if (
+                summary is not None
+                and summary.total_hotels == actual.total_hotels
+                and summary.total_mappings == actual.total_mappings
+            ):
+                continue
+
+            drift.append(
+                {
+                    "provider_name": provider_name,
+                    "stored_hotels": summary.total_hotels if summary else None,
+                    "actual_hotels": actual.total_hotels,
+                    "stored_mappings": summary.total_mappings if summary else None,
+                    "actual_mappings": actual.total_mappings,
+                }
+            )
+            if not fix:
+                continue
+            if summary is None:
+                self.db.add(
+                    SupplierSummary(
+                        provider_name=provider_name,
+                        total_hotels=actual.total_hotels,
+                        total_mappings=actual.total_mappings,
+                        last_updated=actual.last_updated,
+                        summary_generated_at=now,
+                    )
+                )
+            else:
+                summary.total_hotels = actual.total_hotels
+                summary.total_mappings = actual.total_mappings
+                summary.last_updated = actual.last_updated or summary.last_updated
+                summary.summary_generated_at = now
+
+        # Providers whose mappings are all gone
+        for provider_name, summary in stored.items():
+            if provider_name in recount:
+                continue
+            if summary.total_hotels or summary.total_mappings:
+                drift.append(
+                    {
+                        "provider_name": provider_name,
+                        "stored_hotels": summary.total_hotels,
+                        "actual_hotels": 0,
+                        "stored_mappings": summary.total_mappings,
+                        "actual_mappings": 0,
+                    }
+                )
+                if fix:
+                    summary.total_hotels = 0
+                    summary.total_mappings = 0
+                    summary.summary_generated_at = now
+
+        if fix:
+            self.db.commit()
+
+        if drift:
+            logger.warning(
+                f"Supplier summary reconciliation found drift for {len(drift)} providers"
+            )
+        else:
+            logger.info(
+                f"Supplier summary reconciliation: {len(recount)} providers verified"
+            )
+
+        return {
+            "providers_checked": len(recount),
+            "drifted_providers": len(drift),
+            "fixed": fix,
+            "drift": drift,
+            "reconciled_at": now.isoformat(),
+        }
+
+    @staticmethod
+    def _pairs_with_count(provider_name: str, ittids: List[str], count: int):
+        """Scalar subquery: how many of ``ittids`` have exactly ``count`` mappings"""
+        matching = (
+            select(ProviderMapping.ittid)
+            .where(
+                ProviderMapping.provider_name == provider_name,
+                ProviderMapping.ittid.in_(ittids),
+            )
+            .group_by(ProviderMapping.ittid)
+            .having(func.count(ProviderMapping.id) == count)
+            .subquery()
+        )
+        return select(func.count()).select_from(matching).scalar_subquery()
+
+    @staticmethod
+    def _pairs_with_mappings(provider_name: str, ittids: List[str]):
+        """Scalar subquery: how many of ``ittids`` still have a mapping"""
+        return (
+            select(func.count(func.distinct(ProviderMapping.ittid)))
+            .where(
+                ProviderMapping.provider_name == provider_name,
+                ProviderMapping.ittid.in_(ittids),
+            )
+            .scalar_subquery()
+        )
+
+    def _apply(self, mapping_delta: Counter, hotel_delta: Dict[str, Any]) -> None:
+        """
+        Apply deltas with relative UPDATEs; create rows for unseen providers.
+
+        ``hotel_delta`` values are SQL expressions evaluated by the statement
+        that applies them.
+        """
+        providers = set(mapping_delta) | set(hotel_delta)
+        if not providers:
+            return
+
+        now = datetime.utcnow()
+        existing = {
+            row[0]
+            for row in self.db.execute(
+                select(SupplierSummary.provider_name).where(
+                    SupplierSummary.provider_name.in_(list(providers))
+                )
+            )
+        }
+
+        for provider_name in providers:
+            d_mappings = mapping_delta.get(provider_name, 0)
+            d_hotels = hotel_delta.get(provider_name, 0)
+            if provider_name in existing:
+                # Relative update so concurrent writers don't overwrite each other
+                self.db.execute(
+                    update(SupplierSummary)
+                    .where(SupplierSummary.provider_name == provider_name)
+                    .values(
+                        total_mappings=SupplierSummary.total_mappings + d_mappings,
+                        total_hotels=SupplierSummary.total_hotels + d_hotels,
+                        last_updated=now,
+                    )
+                )
+            elif d_mappings > 0:
+                self.db.execute(
+                    insert(SupplierSummary).values(
+                        provider_name=provider_name,
+                        total_mappings=d_mappings,
+                        total_hotels=d_hotels,
+                        last_updated=now,
+                        summary_generated_at=now,
+                    )
+                )
@@ -0,0 +1,133 @@
+"""
+Activity rollup tests: every reader of one request covers the same window,
+and the retention job prunes expired rollup rows.
+"""
+
+import pytest
+from collections import Counter
+from datetime import datetime, timedelta
+
+from models import (
+    UserActivityLog,
+    UserActivityRollupHourly,
+    UserActivityRollupDaily,
+    UserEndpointRollupDaily,
+)
+from services.activity_rollup_service import ActivityRollupService
+from services.activity_log_retention_service import ActivityLogRetentionService
+
+
+def _log(db, user_id, action, created_at):
+    db.add(
+        UserActivityLog(
+            user_id=user_id,
+            action=action,
+            details={"endpoint": "/v1.0/hotels", "method": "GET", "status_code": 200},
+            created_at=created_at,
+        )
+    )
+
+
+@pytest.fixture(scope="function")
+def activity(test_db, test_users):
+    """Logs spread over 40 days, folded into the rollups, plus an unaggregated tail"""
+    now = datetime.utcnow()
+    users = [user.id for user in test_users.values()]
+    for hours_ago in range(1, 40 * 24, 7):
+        user_id = users[hours_ago % len(users)]
+        action = ("login", "search")[hours_ago % 2]
+        _log(test_db, user_id, action, now - timedelta(hours=hours_ago))
+    test_db.commit()
+    ActivityRollupService(test_db).aggregate_new_logs()
+
+    # Not yet aggregated
+    _log(test_db, users[0], "search", now - timedelta(minutes=1))
+    test_db.commit()
+    return now
+
+
+@pytest.mark.parametrize("days", [3, 30])
+def test_readers_of_one_request_cover_the_same_window(test_db, activity, days):
+    since = activity - timedelta(days=days, minutes=30)
+    rollups = ActivityRollupService(test_db)
+
+    by_day = rollups.counts_by_day(since)
+    by_action = rollups.counts_by_action(since)
+    by_hour = rollups.counts_by_hour_of_day(since)
+    by_weekday = rollups.counts_by_day_of_week(since)
+    by_user = rollups.counts_by_user(since)
+
+    total = sum(by_action.values())
+    assert sum(count for _, count in by_day) == total
+    assert sum(by_hour.values()) == total
+    assert sum(by_weekday.values()) == total
+    assert sum(by_user.values()) == total
+
+    # And the window is the documented bucket-aligned one
+    _, window_start = rollups.resolve_window(since)
+    logs = test_db.query(UserActivityLog).filter(UserActivityLog.created_at >= window_start)
+    assert total == logs.count()
+
+
+def test_short_window_timeline_starts_at_the_window_hour(test_db, activity):
+    since = activity - timedelta(days=3)
+    rollups = ActivityRollupService(test_db)
+
+    model, window_start = rollups.resolve_window(since)
+
+    assert model is UserActivityRollupHourly
+    assert window_start == since.replace(minute=0, second=0, microsecond=0)
+    expected = Counter(
+        created_at.date()
+        for (created_at,) in test_db.query(UserActivityLog.created_at).filter(
+            UserActivityLog.created_at >= window_start
+        )
+    )
+    assert rollups.counts_by_day(since) == sorted(expected.items())
+
+
+def test_window_is_resolved_once_per_service(test_db, activity, monkeypatch):
+    from services import activity_rollup_service
+
+    since = activity - timedelta(days=7) + timedelta(minutes=1)
+    rollups = ActivityRollupService(test_db)
+    assert rollups.resolve_window(since)[0] is UserActivityRollupHourly
+
+    # The window crosses HOURLY_WINDOW_DAYS between two readers
+    monkeypatch.setattr(activity_rollup_service, "HOURLY_WINDOW_DAYS", 1)
+    assert rollups.resolve_window(since)[0] is UserActivityRollupHourly
+    assert ActivityRollupService(test_db).resolve_window(since)[0] is UserActivityRollupDaily
+
+
+def test_prune_rollups_deletes_only_expired_buckets(test_db, activity):
+    retention = ActivityLogRetentionService(test_db)
+    hourly_before = test_db.query(UserActivityRollupHourly).count()
+    hourly_cutoff = (activity - timedelta(days=10)).replace(hour=0, minute=0, second=0, microsecond=0)
+    old_hourly = (
+        test_db.query(UserActivityRollupHourly)
+        .filter(UserActivityRollupHourly.bucket_start < hourly_cutoff)
+        .count()
+    )
+    assert old_hourly > 0
+
+    dry = retention.prune_rollups(hourly_days=10, daily_days=20, dry_run=True)
+    assert dry["tables"]["user_activity_rollup_hourly"]["rows"] == old_hourly
+    assert test_db.query(UserActivityRollupHourly).count() == hourly_before
+
+    report = retention.prune_rollups(hourly_days=10, daily_days=20)
+
+    assert report["tables"]["user_activity_rollup_hourly"]["rows"] == old_hourly
+    assert test_db.query(UserActivityRollupHourly).count() == hourly_before - old_hourly
+    daily_cutoff = datetime.fromisoformat(report["tables"]["user_activity_rollup_daily"]["cutoff"])
+    for model in (UserActivityRollupDaily, UserEndpointRollupDaily):
+        assert test_db.query(model).filter(model.bucket_start < daily_cutoff).count() == 0
+        assert test_db.query(model).count() > 0
+
+
+def test_prune_rollups_keeps_everything_when_disabled(test_db, activity):
+    before = test_db.query(UserActivityRollupDaily).count()
+
+    report = ActivityLogRetentionService(test_db).prune_rollups(hourly_days=0, daily_days=0)
+
+    assert report["tables"] == {}
+    assert test_db.query(UserActivityRollupDaily).count() == before
@@ -0,0 +1,236 @@
+"""
+Export queue tests: claiming by priority under the per-user cap, lease
+recovery, ownership-checked checkpoints and failures, and a hotel CSV
+export resuming from its checkpoint after an interruption.
+"""
+
+import csv
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import database
+from export_schemas import ExportFormat
+from models import Base, ExportJob, Hotel, User, UserRole
+from services import export_queue
+from services.export_engine import ExportEngine
+from services.export_queue import ExportInterrupted, ExportQueue, fail_job
+
+
+@pytest.fixture(scope="function")
+def sessions(tmp_path):
+    """Session factory on a file database shared by the queue and the test"""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'exports.db'}", connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = factory()
+    for user_id in ("user000001", "user000002"):
+        db.add(
+            User(
+                id=user_id,
+                username=user_id,
+                email=f"{user_id}@test.com",
+                hashed_password="hashed_password",
+                role=UserRole.GENERAL_USER,
+                is_active=True,
+            )
+        )
+    db.commit()
+    db.close()
+    yield factory
+    engine.dispose()
+
+
+@pytest.fixture(scope="function")
+def queue(sessions):
+    return ExportQueue(sessions)
+
+
+@pytest.fixture(scope="function")
+def make_job(sessions, queue):
+    """Create an export job row and enqueue it"""
+    created = []
+
+    def factory(user_id="user000001", priority=None, created_at=None):
+        job_id = f"exp_{len(created):03d}"
+        db = sessions()
+        db.add(
+            ExportJob(
+                id=job_id,
+                user_id=user_id,
+                export_type="hotels",
+                format="csv",
+                status="pending",
+                created_at=created_at or datetime.utcnow() + timedelta(seconds=len(created)),
+            )
+        )
+        db.commit()
+        db.close()
+        queue.enqueue(job_id, {"export_type": "hotels"}, priority=priority)
+        created.append(job_id)
+        return job_id
+
+    return factory
+
+
+def _job(sessions, job_id):
+    db = sessions()
+    try:
+        job = db.get(ExportJob, job_id)
+        db.expunge(job)
+        return job
+    finally:
+        db.close()
+
+
+def test_claim_takes_highest_priority_then_oldest(queue, make_job):
+    bulk = make_job(priority=0)
+    small = make_job(priority=10, user_id="user000002")
+    later_bulk = make_job(priority=0, user_id="user000002")
+
+    claimed = [queue.claim("worker-a").id for _ in range(3)]
+
+    assert claimed == [small, bulk, later_bulk]
+    assert queue.claim("worker-a") is None
+
+
+def test_claimed_job_has_one_owner(sessions, queue, make_job):
+    job_id = make_job()
+
+    job = queue.claim("worker-a")
+
+    assert job.id == job_id
+    assert (job.status, job.worker_id, job.attempts) == ("processing", "worker-a", 1)
+    assert job.started_at is not None
+    assert queue.claim("worker-b") is None
+
+
+def test_per_user_cap_skips_to_other_users(queue, make_job, monkeypatch):
+    monkeypatch.setattr(export_queue, "MAX_JOBS_PER_USER", 2)
+    first, second, third = make_job(), make_job(), make_job()
+    other = make_job(user_id="user000002")
+
+    claimed = [queue.claim("worker-a").id for _ in range(3)]
+
+    assert claimed == [first, second, other]
+    assert queue.claim("worker-b") is None
+    assert queue.depth() == {"pending": 1, "processing": 3}
+
+    queue.fail(first, "worker-a", "boom")
+    assert queue.claim("worker-b").id == third
+
+
+def test_requeue_stale_recovers_jobs_of_dead_workers(sessions, queue, make_job, monkeypatch):
+    monkeypatch.setattr(export_queue, "MAX_ATTEMPTS", 2)
+    alive, dead = make_job(), make_job(user_id="user000002")
+    queue.claim("worker-alive")
+    queue.claim("worker-dead")
+    assert queue.save_checkpoint(dead, "worker-dead", {"processed": 40, "last_key": 40})
+
+    db = sessions()
+    db.query(ExportJob).filter_by(id=dead).update(
+        {"heartbeat_at": datetime.utcnow() - timedelta(seconds=export_queue.LEASE_SECONDS + 1)}
+    )
+    db.commit()
+    db.close()
+
+    assert queue.requeue_stale() == 1
+    job = _job(sessions, dead)
+    assert (job.status, job.worker_id, job.checkpoint["last_key"]) == ("pending", None, 40)
+    assert _job(sessions, alive).status == "processing"
+
+    # The dead worker's late writes no longer apply
+    assert not queue.save_checkpoint(dead, "worker-dead", {"processed": 50, "last_key": 50})
+    assert not queue.fail(dead, "worker-dead", "late error")
+    assert _job(sessions, dead).status == "pending"
+
+    # Second lost lease: attempts exhausted
+    assert queue.claim("worker-b").id == dead
+    db = sessions()
+    db.query(ExportJob).filter_by(id=dead).update({"heartbeat_at": datetime.utcnow() - timedelta(hours=1)})
+    db.commit()
+    db.close()
+    assert queue.requeue_stale() == 1
+    assert _job(sessions, dead).status == "failed"
+
+
+def test_fail_only_applies_to_the_owner(sessions, queue, make_job):
+    job_id = make_job()
+    queue.claim("worker-a")
+
+    assert not queue.fail(job_id, "worker-b", "not mine")
+    assert _job(sessions, job_id).status == "processing"
+
+    # Cancelled while running: the failing export must not resurrect it
+    db = sessions()
+    db.query(ExportJob).filter_by(id=job_id).update({"status": "cancelled"})
+    db.commit()
+    assert not fail_job(db, job_id, "boom", "worker-a")
+    db.close()
+    assert _job(sessions, job_id).status == "cancelled"
+
+
+def test_fail_marks_the_owned_job_failed(sessions, queue, make_job):
+    job_id = make_job()
+    queue.claim("worker-a")
+
+    assert queue.fail(job_id, "worker-a", "boom")
+
+    job = _job(sessions, job_id)
+    assert (job.status, job.error_message) == ("failed", "boom")
+    assert job.completed_at is not None
+
+
+def test_hotel_csv_export_resumes_from_checkpoint(sessions, queue, make_job, tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "SessionLocal", sessions)
+    db = sessions()
+    db.add_all(Hotel(ittid=f"ITT{i:04d}", name=f"Hotel {i}") for i in range(1, 26))
+    db.commit()
+    db.close()
+
+    job_id = make_job()
+    job = queue.claim("worker-a")
+    user = User(id="user000001", username="user000001")
+    written = []
+
+    def crash_on_third_batch(state):
+        written.append(state["last_key"])
+        if len(written) == 3:
+            # Batch 3 reached the file but its checkpoint is lost with the worker
+            raise ExportInterrupted("worker stopped")
+        assert queue.save_checkpoint(job_id, "worker-a", state)
+
+    def run(checkpoint, on_checkpoint, worker_id):
+        db = sessions()
+        try:
+            engine = ExportEngine(db, str(tmp_path / "exports"))
+            engine.batch_size = 10
+            engine.process_async_hotel_export(
+                job_id=job_id,
+                query=db.query(Hotel),
+                format=ExportFormat.CSV,
+                user=user,
+                checkpoint=checkpoint,
+                on_checkpoint=on_checkpoint,
+                worker_id=worker_id,
+            )
+        finally:
+            db.close()
+
+    with pytest.raises(ExportInterrupted):
+        run(job.checkpoint, crash_on_third_batch, "worker-a")
+    queue.release(job_id, "worker-a")
+
+    resumed = queue.claim("worker-b")
+    assert (resumed.attempts, resumed.checkpoint["last_key"]) == (2, 20)
+    run(resumed.checkpoint, lambda state: queue.save_checkpoint(job_id, "worker-b", state), "worker-b")
+
+    finished = _job(sessions, job_id)
+    assert finished.status == "completed"
+    with open(finished.file_path, newline="", encoding="utf-8-sig") as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 25
+    assert len({row["ittid"] for row in rows}) == 25
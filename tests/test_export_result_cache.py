@@ -0,0 +1,215 @@
+"""
+Export result cache tests: parameter normalization, which requests share a
+fingerprint, and committed writes to source tables ending reuse through the
+data version counters.
+"""
+
+import os
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from models import Base, DataVersion, ExportJob, Hotel, SupplierSummary, User, UserRole
+from services import data_version_service
+from services.export_result_cache import ExportResultCache, normalize_params
+from utils.export_file_storage import ExportFileStorage
+
+HOTEL_PARAMS = {
+    "filters": {"suppliers": ["Agoda", "hotelbeds"], "country_codes": ["US", "BD"]},
+    "allowed_suppliers": ["agoda", "hotelbeds"],
+    "include_locations": True,
+    "include_contacts": False,
+}
+
+
+@pytest.fixture(scope="function")
+def sessions(tmp_path, monkeypatch):
+    """Session factory on a file database; data versions only refresh on invalidation"""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'cache.db'}", connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = factory()
+    db.add(
+        User(
+            id="user000001",
+            username="user000001",
+            email="user000001@test.com",
+            hashed_password="hashed_password",
+            role=UserRole.GENERAL_USER,
+            is_active=True,
+        )
+    )
+    db.commit()
+    db.close()
+
+    # Without polling, fingerprints only change through bump_data_version
+    monkeypatch.setattr(data_version_service.data_versions, "poll_seconds", 3600)
+    data_version_service.data_versions.invalidate()
+    yield factory
+    data_version_service.data_versions.invalidate()
+    engine.dispose()
+
+
+@pytest.fixture(scope="function")
+def db(sessions):
+    db = sessions()
+    yield db
+    db.close()
+
+
+@pytest.fixture(scope="function")
+def cache(db, tmp_path):
+    return ExportResultCache(db, ExportFileStorage(str(tmp_path / "exports")))
+
+
+def _versions(sessions):
+    db = sessions()
+    try:
+        return {row.name: row.version for row in db.query(DataVersion)}
+    finally:
+        db.close()
+
+
+def test_normalize_params_ignores_order_duplicates_and_supplier_case():
+    a = {"suppliers": ["Agoda", "hotelbeds", "agoda"], "country_codes": ["US", "BD"], "page": 1}
+    b = {"page": 1, "country_codes": ["BD", "US", "US"], "suppliers": ["HotelBeds", "AGODA"]}
+
+    assert normalize_params(a) == normalize_params(b)
+    assert normalize_params(a)["suppliers"] == ["agoda", "hotelbeds"]
+
+
+def test_normalize_params_keeps_case_outside_supplier_keys():
+    assert normalize_params({"country_codes": ["us"]}) != normalize_params({"country_codes": ["US"]})
+
+
+def test_normalize_params_treats_all_case_insensitively():
+    assert normalize_params({"suppliers": "All"}) == normalize_params({"suppliers": "ALL"})
+    assert normalize_params({"suppliers": "All"}) == {"suppliers": "all"}
+
+
+def test_csv_is_shared_between_users_other_formats_are_owner_scoped(cache):
+    assert cache.fingerprint("hotels", "csv", HOTEL_PARAMS, "user000001") == cache.fingerprint(
+        "hotels", "csv", HOTEL_PARAMS, "user000002"
+    )
+    for format in ("json", "excel"):
+        assert cache.fingerprint("hotels", format, HOTEL_PARAMS, "user000001") != cache.fingerprint(
+            "hotels", format, HOTEL_PARAMS, "user000002"
+        )
+
+
+def test_reordered_request_has_the_same_fingerprint(cache):
+    reordered = {
+        "include_contacts": False,
+        "include_locations": True,
+        "allowed_suppliers": ["hotelbeds", "agoda"],
+        "filters": {"country_codes": ["BD", "US"], "suppliers": ["HOTELBEDS", "agoda"]},
+    }
+
+    assert cache.fingerprint("hotels", "csv", HOTEL_PARAMS, "user000001") == cache.fingerprint(
+        "hotels", "csv", reordered, "user000001"
+    )
+
+
+def test_allowed_suppliers_change_the_fingerprint(cache):
+    narrower = dict(HOTEL_PARAMS, allowed_suppliers=["agoda"])
+
+    assert cache.fingerprint("hotels", "csv", HOTEL_PARAMS, "user000001") != cache.fingerprint(
+        "hotels", "csv", narrower, "user000001"
+    )
+
+
+def test_orm_write_bumps_the_version_and_ends_reuse(sessions, db, cache, tmp_path):
+    before = cache.fingerprint("hotels", "csv", HOTEL_PARAMS, "user000001")
+    summary_before = cache.fingerprint("supplier_summary", "csv", {}, "user000001")
+
+    path = tmp_path / "exports" / "source.csv"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("ittid,name\n")
+    now = datetime.utcnow()
+    db.add(
+        ExportJob(
+            id="exp_source",
+            user_id="user000001",
+            export_type="hotels",
+            format="csv",
+            status="completed",
+            file_path=str(path),
+            completed_at=now,
+            expires_at=now + timedelta(hours=24),
+            fingerprint=before,
+        )
+    )
+    db.commit()
+    assert cache.find_reusable(before).id == "exp_source"
+
+    writer = sessions()
+    writer.add(Hotel(ittid="ITT0001", name="Hotel 1"))
+    writer.commit()
+    writer.close()
+
+    after = cache.fingerprint("hotels", "csv", HOTEL_PARAMS, "user000001")
+    assert after != before
+    assert cache.find_reusable(after) is None
+    assert _versions(sessions)["hotels"] == 1
+    # Exports that do not read hotels keep their fingerprint
+    assert cache.fingerprint("supplier_summary", "csv", {}, "user000001") == summary_before
+
+
+def test_text_write_bumps_the_version(sessions, cache):
+    before = cache.fingerprint("supplier_summary", "csv", {}, "user000001")
+
+    writer = sessions()
+    writer.execute(
+        text(
+            "INSERT INTO supplier_summary (provider_name, total_hotels, total_mappings, summary_generated_at) "
+            "VALUES ('agoda', 1, 1, :now)"
+        ),
+        {"now": datetime.utcnow()},
+    )
+    writer.commit()
+    writer.close()
+
+    assert cache.fingerprint("supplier_summary", "csv", {}, "user000001") != before
+    assert _versions(sessions)["supplier_summary"] == 1
+
+
+def test_rolled_back_write_keeps_the_version(sessions, cache):
+    before = cache.fingerprint("supplier_summary", "csv", {}, "user000001")
+
+    writer = sessions()
+    writer.add(SupplierSummary(provider_name="agoda", total_hotels=1, total_mappings=1))
+    writer.flush()
+    writer.rollback()
+    writer.close()
+
+    assert cache.fingerprint("supplier_summary", "csv", {}, "user000001") == before
+    assert _versions(sessions) == {}
+
+
+def test_reuse_links_the_file_for_the_new_job(db, cache, tmp_path):
+    source_path = tmp_path / "exports" / "source.csv"
+    source_path.parent.mkdir(parents=True, exist_ok=True)
+    source_path.write_text("ittid,name\nITT0001,Hotel 1\n")
+    now = datetime.utcnow()
+    source = ExportJob(
+        id="exp_source",
+        user_id="user000001",
+        export_type="hotels",
+        format="csv",
+        status="completed",
+        processed_records=1,
+        file_path=str(source_path),
+        completed_at=now,
+        fingerprint="f" * 64,
+    )
+    db.add(source)
+    db.commit()
+
+    job = cache.reuse(source, "exp_reused", "user000001")
+
+    assert (job.status, job.fingerprint, job.processed_records) == ("completed", "f" * 64, 1)
+    assert job.file_path != source.file_path
+    assert os.path.samefile(job.file_path, source.file_path)
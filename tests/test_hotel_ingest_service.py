@@ -0,0 +1,178 @@
+"""
+Bulk ingest tests: creates, updates, in-request deduplication, unknown
+hotels, supplier_summary deltas, and a bad row failing only itself.
+"""
+
+import pytest
+
+from models import Contact, Hotel, Location, ProviderMapping, SupplierSummary
+from services.hotel_ingest_service import HotelIngestService
+
+
+def _hotel(ittid, name=None, mappings=(), **extra):
+    return {
+        "ittid": ittid,
+        "name": name or f"Hotel {ittid}",
+        "provider_mappings": [
+            {"provider_name": provider, "provider_id": provider_id}
+            for provider, provider_id in mappings
+        ],
+        **extra,
+    }
+
+
+def _summary(db):
+    db.expire_all()
+    return {
+        s.provider_name: (s.total_hotels, s.total_mappings)
+        for s in db.query(SupplierSummary)
+    }
+
+
+@pytest.fixture(scope="function")
+def service(test_db):
+    """Ingest service writing ten rows per chunk"""
+    return HotelIngestService(test_db, chunk_size=10)
+
+
+def test_creates_hotels_with_nested_data(test_db, service):
+    summary = service.ingest_hotels(
+        [
+            _hotel(
+                "ITT0001",
+                mappings=[("agoda", "A1"), ("hotelbeds", "H1")],
+                locations=[{"city_name": "Dhaka", "country_code": "BD"}],
+                contacts=[{"contact_type": "phone", "value": "+880"}],
+            ),
+            _hotel("ITT0002", mappings=[("agoda", "A2")]),
+        ]
+    )
+
+    assert (summary["total"], summary["created"], summary["errors"]) == (2, 2, 0)
+    assert summary["results"][0]["mappings_created"] == 2
+    assert test_db.query(Hotel).count() == 2
+    assert test_db.query(Location).filter_by(ittid="ITT0001").one().city_name == "Dhaka"
+    assert test_db.query(Contact).filter_by(ittid="ITT0001").count() == 1
+    assert test_db.query(ProviderMapping).count() == 3
+    assert sorted(service.created_mappings) == [
+        ("agoda", "ITT0001"),
+        ("agoda", "ITT0002"),
+        ("hotelbeds", "ITT0001"),
+    ]
+
+
+def test_updates_existing_hotels_and_appends_mappings(test_db, service):
+    service.ingest_hotels(
+        [_hotel("ITT0001", mappings=[("agoda", "A1")], rating="3"), _hotel("ITT0002")]
+    )
+
+    # Updates carrying different column sets in one chunk
+    summary = service.ingest_hotels(
+        [
+            _hotel("ITT0001", name="Renamed", mappings=[("agoda", "A1"), ("agoda", "A9")]),
+            _hotel("ITT0002", rating="4", postal_code="1207"),
+            _hotel("ITT0003"),
+        ]
+    )
+
+    assert [(r["ittid"], r["status"]) for r in summary["results"]] == [
+        ("ITT0001", "updated"),
+        ("ITT0002", "updated"),
+        ("ITT0003", "created"),
+    ]
+    assert summary["results"][0]["mappings_created"] == 1
+    assert summary["results"][0]["mappings_skipped"] == 1
+    test_db.expire_all()
+    first = test_db.query(Hotel).filter_by(ittid="ITT0001").one()
+    second = test_db.query(Hotel).filter_by(ittid="ITT0002").one()
+    # Columns missing from the payload keep their value
+    assert (first.name, first.rating) == ("Renamed", "3")
+    assert (second.name, second.rating, second.postal_code) == ("Hotel ITT0002", "4", "1207")
+
+
+def test_existing_hotels_are_skipped_without_update_existing(test_db, service):
+    service.ingest_hotels([_hotel("ITT0001")])
+
+    summary = service.ingest_hotels(
+        [_hotel("ITT0001", name="Renamed")], update_existing=False
+    )
+
+    assert summary["skipped"] == 1
+    test_db.expire_all()
+    assert test_db.query(Hotel).filter_by(ittid="ITT0001").one().name == "Hotel ITT0001"
+
+
+def test_duplicates_within_a_request_are_skipped(test_db, service):
+    summary = service.ingest_hotels(
+        [
+            _hotel("ITT0001", mappings=[("agoda", "A1")]),
+            _hotel("ITT0001", name="Again"),
+            _hotel("ITT0002", mappings=[("agoda", "A1")]),
+            {"ittid": "ITT0003"},
+        ]
+    )
+
+    assert [r["status"] for r in summary["results"]] == ["created", "skipped", "created", "error"]
+    assert summary["results"][1]["error"] == "Duplicate ITTID in request"
+    assert summary["results"][2]["mappings_skipped"] == 1
+    assert test_db.query(ProviderMapping).count() == 1
+
+
+def test_mapping_ingest_reports_not_found_and_skipped(test_db, service):
+    service.ingest_hotels([_hotel("ITT0001", mappings=[("agoda", "A1")])])
+
+    summary = service.ingest_provider_mappings(
+        [
+            {"ittid": "ITT0001", "provider_name": "agoda", "provider_id": "A1"},
+            {"ittid": "ITT0001", "provider_name": "agoda", "provider_id": "A2"},
+            {"ittid": "ITT0001", "provider_name": "agoda", "provider_id": "A2"},
+            {"ittid": "ITT9999", "provider_name": "agoda", "provider_id": "A3"},
+            {"ittid": "ITT0001", "provider_name": "agoda"},
+        ]
+    )
+
+    assert [r["status"] for r in summary["results"]] == [
+        "skipped",
+        "created",
+        "skipped",
+        "not_found",
+        "error",
+    ]
+    assert (summary["created"], summary["skipped"], summary["not_found"], summary["errors"]) == (1, 2, 1, 1)
+
+
+def test_supplier_summary_follows_the_ingest(test_db, service):
+    service.ingest_hotels(
+        [
+            _hotel("ITT0001", mappings=[("agoda", "A1"), ("agoda", "A2"), ("hotelbeds", "H1")]),
+            _hotel("ITT0002", mappings=[("agoda", "A3")]),
+        ]
+    )
+    assert _summary(test_db) == {"agoda": (2, 3), "hotelbeds": (1, 1)}
+
+    service.ingest_provider_mappings(
+        [
+            {"ittid": "ITT0002", "provider_name": "agoda", "provider_id": "A4"},
+            {"ittid": "ITT0002", "provider_name": "hotelbeds", "provider_id": "H2"},
+            {"ittid": "ITT0002", "provider_name": "hotelbeds", "provider_id": "H1"},
+        ]
+    )
+    assert _summary(test_db) == {"agoda": (2, 4), "hotelbeds": (2, 2)}
+
+
+def test_bad_row_only_fails_itself(test_db, service):
+    # contacts.value is NOT NULL: the chunk insert fails on the database
+    summary = service.ingest_hotels(
+        [
+            _hotel("ITT0001", mappings=[("agoda", "A1")]),
+            _hotel("ITT0002", mappings=[("agoda", "A2")], contacts=[{"contact_type": "phone"}]),
+            _hotel("ITT0003", mappings=[("agoda", "A3")]),
+        ]
+    )
+
+    assert [r["status"] for r in summary["results"]] == ["created", "error", "created"]
+    assert "contacts.value" in summary["results"][1]["error"]
+    assert {h.ittid for h in test_db.query(Hotel)} == {"ITT0001", "ITT0003"}
+    # Counters only include the rows that committed
+    assert _summary(test_db) == {"agoda": (2, 2)}
+    assert sorted(service.created_mappings) == [("agoda", "ITT0001"), ("agoda", "ITT0003")]
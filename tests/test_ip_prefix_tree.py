@@ -0,0 +1,158 @@
+"""
+IP prefix tree tests: membership compared against a brute-force scan of the
+same entries over seeded random whitelists (IPv4 and IPv6, /0, host routes,
+nested and overlapping ranges), plus the whitelist edge cases of
+``UserAccess``.
+"""
+
+import ipaddress
+import random
+import pytest
+
+from security.ip_prefix_tree import IPPrefixTree
+from services.access_control_service import UserAccess
+
+WIDTHS = {4: 32, 6: 128}
+
+
+def _address(version, value):
+    return ipaddress.ip_address(value) if version == 4 else ipaddress.IPv6Address(value)
+
+
+def _near(rng, version, anchor):
+    """An address sharing a random-length prefix with ``anchor``"""
+    width = WIDTHS[version]
+    value = anchor ^ rng.getrandbits(rng.randint(0, width))
+    if version == 6 and _address(6, value).ipv4_mapped is not None:
+        # IPv4-mapped addresses are looked up in the IPv4 tree
+        value ^= 1 << 127
+    return value
+
+
+def _entry(rng, version, anchor):
+    """Whitelist text: host address, host route, CIDR (host bits set) or /0"""
+    width = WIDTHS[version]
+    address = _address(version, _near(rng, version, anchor))
+    kind = rng.random()
+    if kind < 0.3:
+        return str(address)
+    if kind < 0.4:
+        return f"{address}/{width}"
+    if kind < 0.45:
+        return f"{address}/0"
+    return f"{address}/{rng.randint(1, width - 1)}"
+
+
+def _brute_force(networks, ip):
+    address = ipaddress.ip_address(ip)
+    return any(address.version == n.version and address in n for n in networks)
+
+
+def _probes(rng, version, anchors, networks):
+    """Random nearby addresses plus the first/last address of every range and their neighbours"""
+    width = WIDTHS[version]
+    values = [_near(rng, version, rng.choice(anchors)) for _ in range(200)]
+    for network in networks:
+        if network.version != version:
+            continue
+        first, last = int(network.network_address), int(network.broadcast_address)
+        values.extend([first, last, (first - 1) % (1 << width), (last + 1) % (1 << width)])
+    return [
+        str(_address(version, value))
+        for value in values
+        if version == 4 or _address(6, value).ipv4_mapped is None
+    ]
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_membership_matches_brute_force(seed):
+    rng = random.Random(seed)
+    anchors = {version: [rng.getrandbits(width) for _ in range(3)] for version, width in WIDTHS.items()}
+    versions = [rng.choice((4, 6)) for _ in range(rng.randint(1, 40))]
+    entries = [_entry(rng, version, rng.choice(anchors[version])) for version in versions]
+    networks = [ipaddress.ip_network(entry, strict=False) for entry in entries]
+
+    tree = IPPrefixTree(entries)
+
+    assert len(tree) == len(entries)
+    for version in (4, 6):
+        for ip in _probes(rng, version, anchors[version], networks):
+            assert (ip in tree) == _brute_force(networks, ip), (entries, ip)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_insertion_order_does_not_matter(seed):
+    rng = random.Random(seed)
+    anchor = rng.getrandbits(32)
+    entries = [_entry(rng, 4, anchor) for _ in range(30)]
+    networks = [ipaddress.ip_network(entry, strict=False) for entry in entries]
+    shuffled = entries[:]
+    rng.shuffle(shuffled)
+
+    forward, backward = IPPrefixTree(entries), IPPrefixTree(shuffled)
+
+    for ip in _probes(rng, 4, [anchor], networks):
+        assert (ip in forward) == (ip in backward) == _brute_force(networks, ip)
+
+
+def test_default_route_matches_only_its_family():
+    tree = IPPrefixTree(["0.0.0.0/0"])
+
+    assert "0.0.0.0" in tree
+    assert "255.255.255.255" in tree
+    assert "2001:db8::1" not in tree
+
+    tree.add("::/0")
+    assert "2001:db8::1" in tree
+    assert "ffff:ffff:ffff:ffff:ffff:ffff:ffff:ffff" in tree
+
+
+def test_host_routes_match_only_the_address():
+    tree = IPPrefixTree(["203.0.113.7/32", "2001:db8::7/128", "203.0.113.0/31"])
+
+    assert "203.0.113.7" in tree
+    assert "203.0.113.1" in tree
+    assert "203.0.113.6" not in tree
+    assert "203.0.113.8" not in tree
+    assert "2001:db8::7" in tree
+    assert "2001:db8::6" not in tree
+
+
+def test_ipv4_mapped_addresses_match_ipv4_entries():
+    tree = IPPrefixTree(["10.0.0.0/8", "::ffff:192.0.2.0/120"])
+
+    assert "::ffff:10.1.2.3" in tree
+    assert "192.0.2.9" in tree
+    assert "192.0.3.9" not in tree
+
+
+def test_invalid_entries_and_addresses_are_ignored():
+    tree = IPPrefixTree(["not-an-ip", "", "10.0.0.0/33", "10.0.0.1"])
+
+    assert len(tree) == 1
+    assert "10.0.0.1" in tree
+    for ip in (None, "", "garbage", "10.0.0.256"):
+        assert ip not in tree
+
+
+@pytest.mark.parametrize("entries", [[], [""], ["not-an-ip", "300.1.1.1"]])
+def test_empty_whitelist_denies_every_address(entries):
+    access = UserAccess("user000001", [], entries)
+
+    assert not access.ip_tree
+    for ip in ("127.0.0.1", "0.0.0.0", "::1", "::", "::ffff:127.0.0.1", None, ""):
+        assert not access.allows_ip(ip)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_user_access_matches_brute_force(seed):
+    rng = random.Random(seed)
+    anchors = {version: [rng.getrandbits(width)] for version, width in WIDTHS.items()}
+    entries = [_entry(rng, version, anchors[version][0]) for version in (4, 6) for _ in range(10)]
+    networks = [ipaddress.ip_network(entry, strict=False) for entry in entries]
+
+    access = UserAccess("user000001", [], entries + ["not-an-ip"])
+
+    for version in (4, 6):
+        for ip in _probes(rng, version, anchors[version], networks):
+            assert access.allows_ip(ip) == _brute_force(networks, ip), (entries, ip)
@@ -0,0 +1,64 @@
+"""
+/metrics access tests: denied unless a token or an allowed scraper address
+is configured.
+"""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routes import health
+from security.ip_prefix_tree import IPPrefixTree
+
+
+def _client(host="203.0.113.7"):
+    app = FastAPI()
+    app.include_router(health.prometheus_router)
+    return TestClient(app, client=(host, 50000))
+
+
+@pytest.fixture(scope="function")
+def configure(monkeypatch):
+    """Set the token and allowed scraper addresses the endpoint checks"""
+
+    def apply(token="", allowed_ips=()):
+        monkeypatch.setattr(health, "METRICS_TOKEN", token)
+        monkeypatch.setattr(health, "metrics_allowed_ips", IPPrefixTree(allowed_ips))
+
+    return apply
+
+
+def test_metrics_are_denied_without_configuration(configure):
+    configure()
+
+    response = _client().get("/metrics")
+
+    assert response.status_code == 403
+    assert "METRICS_TOKEN" in response.json()["detail"]
+
+
+def test_metrics_require_the_token(configure):
+    configure(token="s3cret")
+    client = _client()
+
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+
+    response = client.get("/metrics", headers={"Authorization": "Bearer s3cret"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+
+
+def test_allowed_scraper_needs_no_token(configure):
+    configure(token="s3cret", allowed_ips=["10.0.0.0/8"])
+
+    assert _client("10.1.2.3").get("/metrics").status_code == 200
+    assert _client("203.0.113.7").get("/metrics").status_code == 401
+
+
+def test_allowed_scraper_without_token(configure):
+    configure(allowed_ips=["127.0.0.1", "::1"])
+
+    assert _client("127.0.0.1").get("/metrics").status_code == 200
+    assert _client("::1").get("/metrics").status_code == 200
+    assert _client("10.1.2.3").get("/metrics").status_code == 403
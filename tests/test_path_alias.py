@@ -0,0 +1,78 @@
+"""
+PathAliasMiddleware tests: /api/... and bare paths resolve to the same
+routes, and only a leading /api segment is stripped.
+"""
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from database import get_db
+from middleware.path_alias import PathAliasMiddleware
+from models import User, UserRole
+from routes import setting
+
+
+@pytest.fixture(scope="function")
+def client():
+    """App with the settings router and a probe route behind the alias middleware"""
+    app = FastAPI()
+    app.include_router(setting.router)
+
+    @app.get("/v1.0/probe/{rest:path}")
+    async def probe(rest: str, request: Request):
+        return {"path": request.scope["path"], "raw_path": request.scope["raw_path"].decode()}
+
+    @app.get("/")
+    async def root():
+        return {"root": True}
+
+    admin = User(id="admin00001", username="admin_user", role=UserRole.ADMIN_USER, is_active=True)
+    app.dependency_overrides[setting.require_admin_or_super] = lambda: admin
+    app.dependency_overrides[get_db] = lambda: None
+    app.add_middleware(PathAliasMiddleware, prefixes=["/api"])
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def test_canonical_path_is_served(client):
+    response = client.get("/v1.0/probe/hotels")
+
+    assert response.status_code == 200
+    assert response.json() == {"path": "/v1.0/probe/hotels", "raw_path": "/v1.0/probe/hotels"}
+
+
+def test_alias_path_is_rewritten_to_canonical(client):
+    response = client.get("/api/v1.0/probe/hotels")
+
+    assert response.status_code == 200
+    assert response.json() == {"path": "/v1.0/probe/hotels", "raw_path": "/v1.0/probe/hotels"}
+
+
+def test_settings_api_route_is_not_rewritten(client):
+    canonical = client.get("/v1.0/settings/api")
+    alias = client.get("/api/v1.0/settings/api")
+
+    assert canonical.status_code == 200
+    assert canonical.json()["success"] is True
+    assert alias.status_code == 200
+    assert alias.json() == canonical.json()
+
+
+def test_trailing_api_segment_is_kept(client):
+    for path in ("/v1.0/probe/api", "/api/v1.0/probe/api"):
+        response = client.get(path)
+
+        assert response.status_code == 200
+        assert response.json()["path"] == "/v1.0/probe/api"
+
+
+def test_only_whole_prefix_segment_is_stripped(client):
+    assert client.get("/apiv1.0/probe/hotels").status_code == 404
+    assert client.get("/v1.0/api/probe/hotels").status_code == 404
+
+
+def test_bare_alias_prefix_maps_to_root(client):
+    assert client.get("/api").json() == {"root": True}
+    assert client.get("/api/").json() == {"root": True}
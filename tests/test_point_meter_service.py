@@ -0,0 +1,236 @@
+"""
+Point meter tests: admission against leased quota, settlement on flush,
+recovery of a crashed worker, releasing reservations and the balance that
+users and admins see meanwhile.
+"""
+
+import pytest
+from datetime import datetime
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from models import Base, User, UserRole, UserPoint, PointTransaction, PointMeterLease
+from services import point_meter_service
+from services.point_meter_service import PointMeter, release_user_leases
+from services.point_service import ensure_spendable_points
+
+
+@pytest.fixture(scope="function")
+def sessions(tmp_path):
+    """Session factory on a file database shared by the meters and the test"""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'points.db'}", connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    yield factory
+    engine.dispose()
+
+
+@pytest.fixture(scope="function")
+def user(sessions):
+    """General user with 1000 points"""
+    db = sessions()
+    user = User(
+        id="general001",
+        username="general_user",
+        email="general@test.com",
+        hashed_password="hashed_password",
+        role=UserRole.GENERAL_USER,
+        is_active=True,
+        created_at=datetime.utcnow(),
+        updated_at=datetime.utcnow(),
+    )
+    db.add(user)
+    db.add(
+        UserPoint(
+            user_id=user.id,
+            user_email=user.email,
+            total_points=1000,
+            current_points=1000,
+            total_used_points=0,
+        )
+    )
+    db.commit()
+    db.refresh(user)
+    db.expunge(user)
+    db.close()
+    return user
+
+
+@pytest.fixture(scope="function")
+def make_meter(sessions, tmp_path):
+    """Build meters sharing one journal directory; stops the ones left running"""
+    meters = []
+
+    def factory(**kwargs):
+        kwargs.setdefault("lease_points", 100)
+        meter = PointMeter(
+            journal_dir=str(tmp_path / "journal"), session_factory=sessions, **kwargs
+        )
+        meters.append(meter)
+        return meter
+
+    yield factory
+    for meter in meters:
+        if not meter._journal.closed:
+            meter.stop()
+
+
+def _balance(sessions, user_id="general001"):
+    db = sessions()
+    try:
+        row = db.get(UserPoint, user_id)
+        return row.current_points, row.reserved_points, row.total_used_points
+    finally:
+        db.close()
+
+
+def _leases(sessions):
+    db = sessions()
+    try:
+        return {(lease.owner, lease.user_id): lease.points for lease in db.query(PointMeterLease)}
+    finally:
+        db.close()
+
+
+def test_charge_reserves_a_lease_without_lowering_the_balance(sessions, user, make_meter):
+    meter = make_meter()
+    db = sessions()
+    meter.charge(user, 1, db)
+    db.close()
+
+    # The balance users and admins read is untouched until settlement
+    assert _balance(sessions) == (1000, 100, 0)
+    assert _leases(sessions) == {(meter.owner, user.id): 100}
+
+
+def test_zero_point_charge_takes_no_lease(sessions, user, make_meter):
+    meter = make_meter()
+    db = sessions()
+    meter.charge(user, 0, db)
+    db.close()
+
+    assert _balance(sessions) == (1000, 0, 0)
+    assert _leases(sessions) == {}
+
+
+def test_flush_settles_exactly_the_charged_points(sessions, user, make_meter):
+    meter = make_meter()
+    db = sessions()
+    for _ in range(3):
+        meter.charge(user, 5, db)
+    db.close()
+
+    result = meter.flush()
+
+    assert result["points"] == 15
+    assert _balance(sessions) == (985, 85, 15)
+    assert _leases(sessions) == {(meter.owner, user.id): 85}
+    db = sessions()
+    deduction = db.query(PointTransaction).filter_by(transaction_type="deduction").one()
+    assert (deduction.giver_id, deduction.points) == (user.id, 15)
+    db.close()
+
+    meter.stop()
+    assert _balance(sessions) == (985, 0, 15)
+    assert _leases(sessions) == {}
+
+
+def test_workers_together_never_admit_more_than_the_balance(sessions, user, make_meter):
+    db = sessions()
+    db.query(UserPoint).filter_by(user_id=user.id).update({"current_points": 250})
+    db.commit()
+    meters = [make_meter(), make_meter(), make_meter()]
+
+    admitted = 0
+    for _ in range(40):
+        for meter in meters:
+            try:
+                meter.charge(user, 7, db)
+                admitted += 7
+            except HTTPException as e:
+                assert e.status_code == 400
+    db.close()
+
+    assert admitted <= 250
+    current, reserved, _ = _balance(sessions)
+    assert current >= reserved >= 0
+
+    for meter in meters:
+        meter.stop()
+    current, reserved, used = _balance(sessions)
+    assert (reserved, used) == (0, admitted)
+    assert current == 250 - admitted >= 0
+
+
+def test_near_zero_balance_is_charged_synchronously(sessions, user, make_meter):
+    db = sessions()
+    db.query(UserPoint).filter_by(user_id=user.id).update({"current_points": 30})
+    db.commit()
+    meter = make_meter()
+
+    meter.charge(user, 10, db)
+    assert _balance(sessions) == (20, 0, 10)
+    meter.charge(user, 20, db)
+    with pytest.raises(HTTPException):
+        meter.charge(user, 1, db)
+    db.close()
+    assert _balance(sessions) == (0, 0, 30)
+
+
+def test_recover_replays_a_crashed_worker_and_releases_its_lease(sessions, user, make_meter):
+    crashed = make_meter()
+    db = sessions()
+    crashed.charge(user, 30, db)
+    db.close()
+    # Crash: journal left on disk, lease never returned
+    crashed._journal.close()
+
+    survivor = make_meter(reclaim_seconds=0)
+    result = survivor.recover()
+
+    assert result == {"journals": 1, "points": 30, "refunded": 70}
+    assert _balance(sessions) == (970, 0, 30)
+    assert _leases(sessions) == {}
+    # Replaying again applies nothing twice
+    assert survivor.recover()["points"] == 0
+    assert _balance(sessions) == (970, 0, 30)
+
+
+def test_release_user_leases_before_a_reset(sessions, user, make_meter, monkeypatch):
+    local = make_meter()
+    other = make_meter()
+    monkeypatch.setattr(point_meter_service, "_point_meter", local)
+    db = sessions()
+    local.charge(user, 10, db)
+    other.charge(user, 5, db)
+
+    assert release_user_leases(user.id, db) == 90 + 100
+    row = db.get(UserPoint, user.id)
+    row.current_points = row.total_points = row.total_used_points = row.reserved_points = 0
+    db.commit()
+    db.close()
+
+    # The other worker's unsettled usage can no longer refund or go negative
+    other.stop()
+    local.stop()
+    current, reserved, _ = _balance(sessions)
+    assert (current, reserved) == (0, 0)
+    assert _leases(sessions) == {}
+
+
+def test_ensure_spendable_points_releases_reservations(sessions, user, make_meter, monkeypatch):
+    meter = make_meter(lease_points=1000)
+    monkeypatch.setattr(point_meter_service, "_point_meter", meter)
+    db = sessions()
+    meter.charge(user, 1, db)
+    assert _balance(sessions) == (1000, 1000, 0)
+
+    user_points = db.get(UserPoint, user.id)
+    assert ensure_spendable_points(db, user_points, 999) is True
+    assert (user_points.current_points, user_points.reserved_points) == (999, 0)
+    assert ensure_spendable_points(db, user_points, 1000) is False
+    db.commit()
+    db.close()
@@ -0,0 +1,181 @@
+"""
+Rate limiter tests: GCRA decisions and headers, local pre-admission debt
+charged to the shared bucket, and the per-process fallback while Redis is
+unavailable.
+
+The Lua script runs against fakeredis (with lupa) when it is installed;
+everything else uses a fake ``AsyncRedis``.
+"""
+
+import asyncio
+import pytest
+
+from redis_pool import AsyncRedis, CircuitBreaker
+from security.rate_limiting import (
+    GCRA_SCRIPT,
+    InMemoryRateLimiter,
+    LocalPreAdmission,
+    RateLimitManager,
+    RedisRateLimiter,
+    rate_limit_headers,
+)
+
+
+class FakeAsyncRedis:
+    """``AsyncRedis`` stand-in: ``eval_script`` returns queued results (None = Redis down)"""
+
+    def __init__(self, results=None):
+        self.results = list(results or [])
+        self.calls = []
+
+    async def eval_script(self, script, keys, args, default=None):
+        self.calls.append({"keys": tuple(keys), "args": tuple(args)})
+        return self.results.pop(0) if self.results else default
+
+    async def setex(self, key, seconds, value):
+        return False
+
+
+@pytest.fixture(scope="function")
+def redis(monkeypatch):
+    """AsyncRedis running the real scripts on fakeredis"""
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(AsyncRedis, "client", property(lambda self: client))
+    return AsyncRedis(breaker=CircuitBreaker())
+
+
+def _run(limiter, key, limit, window, times):
+    async def calls():
+        return [await limiter.is_allowed(key, limit, window) for _ in range(times)]
+
+    return asyncio.run(calls())
+
+
+# ---------------------------------------------------------------------------
+# In-memory GCRA
+# ---------------------------------------------------------------------------
+
+
+def test_in_memory_first_request_leaves_limit_minus_one():
+    allowed, info = InMemoryRateLimiter().is_allowed("k", 5, 60)
+
+    assert allowed is True
+    assert info["remaining"] == 4
+    assert "Retry-After" not in rate_limit_headers(info)
+
+
+def test_in_memory_denies_at_the_limit_with_retry_after():
+    limiter = InMemoryRateLimiter()
+    results = [limiter.is_allowed("k", 3, 60) for _ in range(4)]
+
+    assert [allowed for allowed, _ in results] == [True, True, True, False]
+    assert [info["remaining"] for _, info in results[:3]] == [2, 1, 0]
+    allowed, info = results[-1]
+    # One emission interval (60 s / 3) until the next request fits
+    assert 19 <= info["retry_after"] <= 20
+    assert rate_limit_headers(info)["Retry-After"] == str(info["retry_after"])
+    assert rate_limit_headers(info)["X-RateLimit-Remaining"] == "0"
+
+
+def test_in_memory_block_overrides_the_bucket():
+    limiter = InMemoryRateLimiter()
+    limiter.block_key("1.2.3.4", duration_minutes=1)
+
+    allowed, info = limiter.is_allowed("rate_limit:login_attempt:1.2.3.4", 10, 300, "1.2.3.4")
+
+    assert allowed is False
+    assert info["retry_after"] >= 59
+
+
+# ---------------------------------------------------------------------------
+# GCRA script (fakeredis)
+# ---------------------------------------------------------------------------
+
+
+def test_script_first_request_leaves_limit_minus_one(redis):
+    (allowed, info), = _run(RedisRateLimiter(redis), "rl:a", 5, 60, 1)
+
+    assert allowed is True
+    assert info["remaining"] == 4
+    assert info["limit"] == 5
+
+
+def test_script_denies_at_the_limit_with_retry_after(redis):
+    results = _run(RedisRateLimiter(redis), "rl:b", 3, 60, 4)
+
+    assert [allowed for allowed, _ in results] == [True, True, True, False]
+    assert [info["remaining"] for _, info in results[:3]] == [2, 1, 0]
+    _, info = results[-1]
+    assert 19 <= info["retry_after"] <= 20
+    assert rate_limit_headers(info)["Retry-After"] == str(info["retry_after"])
+
+
+def test_script_honours_blocks(redis):
+    async def scenario():
+        limiter = RedisRateLimiter(redis)
+        await limiter.block_key("1.2.3.4", duration_minutes=1)
+        return await limiter.is_allowed("rl:c", 10, 300, "1.2.3.4")
+
+    allowed, info = asyncio.run(scenario())
+
+    assert allowed is False
+    assert 59 <= info["retry_after"] <= 60
+
+
+def test_local_pre_admission_debt_is_charged_on_the_next_redis_call(redis):
+    limiter = RedisRateLimiter(redis, LocalPreAdmission(lease_fraction=0.1, lease_max=10, lease_seconds=60))
+
+    results = _run(limiter, "rl:d", 100, 60, 11)
+
+    # First call goes to Redis (99 left), which leases min(10, 9) local admissions
+    assert results[0][1]["remaining"] == 99
+    assert all(info.get("local") for _, info in results[1:10])
+    # The 11th asks Redis again and pays for the 9 local ones first
+    assert not results[10][1].get("local")
+    assert results[10][1]["remaining"] == 99 - 9 - 1
+
+
+# ---------------------------------------------------------------------------
+# Debt bookkeeping and fallback (fake AsyncRedis)
+# ---------------------------------------------------------------------------
+
+
+def test_debt_is_sent_as_script_argument():
+    fake = FakeAsyncRedis([[1, 99, 0, 600], [1, 89, 0, 6600]])
+    limiter = RedisRateLimiter(fake, LocalPreAdmission(lease_fraction=0.1, lease_max=10, lease_seconds=60))
+
+    _run(limiter, "rl:e", 100, 60, 11)
+
+    assert len(fake.calls) == 2
+    assert fake.calls[0]["args"] == (600.0, 60000, 1, 0)
+    assert fake.calls[1]["args"] == (600.0, 60000, 1, 9)
+    assert fake.calls[1]["keys"] == ("rl:e", "blocked:rl:e")
+
+
+def test_debt_is_kept_while_redis_is_unavailable():
+    fake = FakeAsyncRedis([[1, 99, 0, 600], None])
+    pre_admission = LocalPreAdmission(lease_fraction=0.1, lease_max=10, lease_seconds=60)
+    limiter = RedisRateLimiter(fake, pre_admission)
+
+    results = _run(limiter, "rl:f", 100, 60, 11)
+
+    assert results[-1] is None
+    assert pre_admission.take_debt("rl:f") == 9
+
+
+def test_manager_falls_back_to_the_in_memory_limiter():
+    fake = FakeAsyncRedis()
+    manager = RateLimitManager(fake)
+
+    async def scenario():
+        return [await manager.check_rate_limit("bulk_operations", "1.2.3.4") for _ in range(3)]
+
+    results = asyncio.run(scenario())
+
+    assert len(fake.calls) == 3
+    assert [allowed for allowed, _ in results] == [True, True, False]
+    assert all(info["fallback"] for _, info in results)
+    assert results[0][1]["remaining"] == 1
+    assert results[-1][1]["retry_after"] >= 1
@@ -0,0 +1,189 @@
+"""
+Read-replica routing tests: replica reads, read-your-writes stickiness,
+fallback to the primary and the read-only guard, using two SQLite files
+as primary and replica.
+"""
+
+import pytest
+from datetime import datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from starlette.requests import Request
+
+import database
+from models import Base, User, UserRole
+
+
+def _add_user(session_factory, user_id, username):
+    db = session_factory()
+    db.add(
+        User(
+            id=user_id,
+            username=username,
+            email=f"{username}@test.com",
+            hashed_password="hashed_password",
+            role=UserRole.GENERAL_USER,
+            is_active=True,
+            created_at=datetime.utcnow(),
+            updated_at=datetime.utcnow(),
+        )
+    )
+    db.commit()
+    db.close()
+
+
+def _request(token):
+    return Request(
+        {
+            "type": "http",
+            "headers": [(b"authorization", f"Bearer {token}".encode())],
+            "client": ("127.0.0.1", 5000),
+        }
+    )
+
+
+def _usernames(db):
+    return {user.username for user in db.query(User).all()}
+
+
+@pytest.fixture(scope="function")
+def routed_db(tmp_path, monkeypatch):
+    """Primary and replica SQLite files wired into ``database``"""
+    primary_url = f"sqlite:///{tmp_path / 'primary.db'}"
+    replica_url = f"sqlite:///{tmp_path / 'replica.db'}"
+
+    primary_engine = create_engine(primary_url)
+    Base.metadata.create_all(bind=primary_engine)
+    primary_sessions = sessionmaker(autocommit=False, autoflush=False, bind=primary_engine)
+
+    router = database.ReplicaRouter([replica_url], max_lag=5, check_seconds=0)
+    Base.metadata.create_all(bind=router.replicas[0].engine)
+
+    # Different rows on each side show which database served a read
+    _add_user(primary_sessions, "primary001", "on_primary")
+    _add_user(router.replicas[0].SessionLocal, "replica001", "on_replica")
+
+    monkeypatch.setattr(database, "SessionLocal", primary_sessions)
+    monkeypatch.setattr(database, "replica_router", router)
+    monkeypatch.setattr(database, "_shared_redis_call", lambda operation: None)
+    monkeypatch.setattr(database, "_sticky_until", {})
+
+    yield router
+
+    primary_engine.dispose()
+    for replica in router.replicas:
+        replica.engine.dispose()
+
+
+def test_reads_go_to_healthy_replica(routed_db):
+    db = next(database.get_read_db(_request("reader")))
+    try:
+        assert db.info["replica"] == "replica1"
+        assert _usernames(db) == {"on_replica"}
+    finally:
+        db.close()
+
+
+def test_client_reads_primary_after_its_own_write(routed_db):
+    writer = database.get_db(_request("writer"))
+    db = next(writer)
+    db.query(User).filter(User.id == "primary001").update({"username": "renamed"})
+    db.commit()
+    writer.close()
+
+    db = next(database.get_read_db(_request("writer")))
+    try:
+        assert db.info["replica"] == "primary"
+        assert _usernames(db) == {"renamed"}
+    finally:
+        db.close()
+
+    # Other clients keep reading from the replica
+    db = next(database.get_read_db(_request("someone_else")))
+    try:
+        assert db.info["replica"] == "replica1"
+    finally:
+        db.close()
+
+
+def test_rolled_back_write_does_not_stick(routed_db):
+    writer = database.get_db(_request("writer"))
+    db = next(writer)
+    db.query(User).filter(User.id == "primary001").update({"username": "renamed"})
+    db.rollback()
+    writer.close()
+
+    db = next(database.get_read_db(_request("writer")))
+    try:
+        assert db.info["replica"] == "replica1"
+    finally:
+        db.close()
+
+
+def test_unavailable_replica_falls_back_to_primary(routed_db, tmp_path):
+    routed_db.replicas[0].engine.dispose()
+    unreachable = database.ReplicaRouter(
+        [f"sqlite:///{tmp_path / 'missing' / 'replica.db'}"], max_lag=5, check_seconds=0
+    )
+    database.replica_router = unreachable
+
+    db = database.get_read_session("reader")
+    try:
+        assert db.info["replica"] == "primary"
+        assert _usernames(db) == {"on_primary"}
+    finally:
+        db.close()
+    assert unreachable.status()[0]["healthy"] is False
+
+
+def test_lagging_replica_falls_back_to_primary(routed_db, monkeypatch):
+    monkeypatch.setattr(database, "_replica_lag_seconds", lambda connection: 60.0)
+
+    db = database.get_read_session("reader")
+    try:
+        assert db.info["replica"] == "primary"
+    finally:
+        db.close()
+
+
+def test_without_replicas_reads_use_primary(routed_db, monkeypatch):
+    monkeypatch.setattr(
+        database, "replica_router", database.ReplicaRouter([], max_lag=5, check_seconds=0)
+    )
+
+    db = database.get_read_session("reader")
+    try:
+        assert db.info["replica"] == "primary"
+        assert _usernames(db) == {"on_primary"}
+    finally:
+        db.close()
+
+
+def test_read_session_rejects_writes(routed_db):
+    db = database.get_read_session("reader")
+    try:
+        with pytest.raises(RuntimeError):
+            db.query(User).filter(User.id == "replica001").update({"username": "changed"})
+        db.rollback()
+
+        db.get(User, "replica001").username = "changed"
+        with pytest.raises(RuntimeError):
+            db.flush()
+    finally:
+        db.close()
+
+
+def test_analytics_rollup_builds_on_primary_from_read_session(routed_db, monkeypatch):
+    from services.hotel_analytics_service import HotelAnalyticsService
+
+    monkeypatch.setattr(
+        database, "replica_router", database.ReplicaRouter([], max_lag=5, check_seconds=0)
+    )
+
+    db = database.get_read_session("reader")
+    try:
+        rollup = HotelAnalyticsService(db).get_rollup()
+    finally:
+        db.close()
+
+    assert rollup["refreshed_at"] is not None
@@ -0,0 +1,114 @@
+"""
+Redis circuit breaker tests: the half-open trial slot is released however
+the trial call ends, and command errors do not count as outages.
+"""
+
+import asyncio
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError, ResponseError
+
+from redis_pool import AsyncRedis, CircuitBreaker
+
+
+class FakeClient:
+    """Stand-in for ``redis.asyncio.Redis``; ``get`` runs the queued behaviour"""
+
+    def __init__(self):
+        self.behaviour = []
+        self.calls = 0
+
+    async def get(self, key):
+        self.calls += 1
+        action = self.behaviour.pop(0) if self.behaviour else "ok"
+        if action == "hang":
+            await asyncio.sleep(3600)
+        if isinstance(action, BaseException):
+            raise action
+        return f"value:{key}"
+
+    async def evalsha(self, sha, numkeys, *keys_and_args):
+        self.calls += 1
+        raise ResponseError("ERR Error running script: attempt to compare nil with number")
+
+
+@pytest.fixture(scope="function")
+def fake():
+    return FakeClient()
+
+
+@pytest.fixture(scope="function")
+def redis(fake, monkeypatch):
+    """AsyncRedis over the fake client with a breaker that opens after 2 failures"""
+    monkeypatch.setattr(AsyncRedis, "client", property(lambda self: fake))
+    return AsyncRedis(breaker=CircuitBreaker(failure_threshold=2, reset_seconds=60))
+
+
+def _half_open(breaker: CircuitBreaker) -> None:
+    breaker._failures = breaker.failure_threshold
+    breaker._opened_at = -breaker.reset_seconds
+
+
+def test_connection_errors_open_the_breaker(redis, fake):
+    fake.behaviour = [RedisConnectionError("down"), RedisConnectionError("down")]
+
+    async def scenario():
+        assert await redis.get("a", default="d") == "d"
+        assert await redis.get("a", default="d") == "d"
+        # Open: Redis is skipped without a call
+        assert await redis.get("a", default="d") == "d"
+
+    asyncio.run(scenario())
+    assert redis.breaker.state == "open"
+    assert fake.calls == 2
+
+
+def test_response_errors_do_not_open_the_breaker(redis, fake):
+    fake.behaviour = [ResponseError("WRONGTYPE"), ResponseError("WRONGTYPE"), ResponseError("WRONGTYPE")]
+
+    async def scenario():
+        for _ in range(3):
+            assert await redis.get("a", default="d") == "d"
+        assert await redis.eval_script("return 1", ["k"], [], default="d") == "d"
+        return await redis.get("a")
+
+    assert asyncio.run(scenario()) == "value:a"
+    assert redis.breaker.stats() == {"state": "closed", "consecutive_failures": 0}
+
+
+def test_response_error_closes_a_half_open_breaker(redis, fake):
+    _half_open(redis.breaker)
+    fake.behaviour = [ResponseError("WRONGTYPE")]
+
+    assert asyncio.run(redis.get("a", default="d")) == "d"
+    assert redis.breaker.state == "closed"
+
+
+def test_cancelled_trial_releases_the_slot(redis, fake):
+    _half_open(redis.breaker)
+    fake.behaviour = ["hang"]
+
+    async def scenario():
+        trial = asyncio.create_task(redis.get("a", default="d"))
+        await asyncio.sleep(0)
+        # Only one trial at a time while it is in flight
+        assert await redis.get("b", default="skipped") == "skipped"
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        # The next call becomes the new trial and closes the breaker
+        return await redis.get("c", default="d")
+
+    assert asyncio.run(scenario()) == "value:c"
+    assert redis.breaker.state == "closed"
+    assert fake.calls == 2
+
+
+def test_unexpected_error_releases_the_slot(redis, fake):
+    _half_open(redis.breaker)
+    fake.behaviour = [TypeError("bad argument")]
+
+    with pytest.raises(TypeError):
+        asyncio.run(redis.get("a"))
+
+    assert redis.breaker.state == "half_open"
+    assert redis.breaker.allow() is True
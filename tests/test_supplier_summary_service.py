@@ -0,0 +1,115 @@
+"""
+Supplier summary tests: the counter deltas applied by hotel creation,
+add_provider and the delete routes, and the first/last mapping checks the
+delta UPDATE makes itself.
+"""
+
+import pytest
+
+from models import Hotel, ProviderMapping, SupplierSummary
+from routes.delete import delete_a_hotel_mapping, delete_hotel_by_ittid
+from routes.hotelIntegration import add_provider, create_hotel_with_details
+from schemas import HotelCreate
+from services.supplier_summary_service import SupplierSummaryService
+
+
+def _summary(db):
+    db.expire_all()
+    return {
+        s.provider_name: (s.total_hotels, s.total_mappings)
+        for s in db.query(SupplierSummary)
+    }
+
+
+def _mapping(provider_name, provider_id):
+    return {"provider_name": provider_name, "provider_id": provider_id, "system_type": "a"}
+
+
+@pytest.fixture(scope="function")
+def hotels(test_db, test_users):
+    """Two hotels created through the API route; returns the super user"""
+    super_user = test_users["super"]
+    create_hotel_with_details(
+        HotelCreate(
+            ittid="ITT0001",
+            name="Hotel 1",
+            provider_mappings=[_mapping("agoda", "A1"), _mapping("agoda", "A2"), _mapping("hotelbeds", "H1")],
+        ),
+        db=test_db,
+        current_user=super_user,
+    )
+    create_hotel_with_details(
+        HotelCreate(ittid="ITT0002", name="Hotel 2", provider_mappings=[_mapping("agoda", "A3")]),
+        db=test_db,
+        current_user=super_user,
+    )
+    return super_user
+
+
+def _add_provider(db, user, ittid, provider_name, provider_id):
+    return add_provider(
+        {"ittid": ittid, **_mapping(provider_name, provider_id)}, db=db, current_user=user
+    )
+
+
+def test_create_counts_hotels_once_per_provider(test_db, hotels):
+    assert _summary(test_db) == {"agoda": (2, 3), "hotelbeds": (1, 1)}
+
+
+def test_add_provider_counts_only_first_mappings_as_hotels(test_db, hotels):
+    assert _add_provider(test_db, hotels, "ITT0002", "hotelbeds", "H2")["operation_type"] == "created"
+    assert _add_provider(test_db, hotels, "ITT0002", "agoda", "A4")["operation_type"] == "created"
+    # Existing provider_name + provider_id: no delta
+    assert _add_provider(test_db, hotels, "ITT0001", "agoda", "A1")["operation_type"] == "skipped"
+
+    assert _summary(test_db) == {"agoda": (2, 4), "hotelbeds": (2, 2)}
+
+
+def test_add_provider_for_a_new_provider_creates_its_row(test_db, hotels):
+    _add_provider(test_db, hotels, "ITT0001", "expedia", "E1")
+
+    assert _summary(test_db)["expedia"] == (1, 1)
+
+
+def test_deleting_a_mapping_keeps_the_hotel_until_its_last_mapping(test_db, hotels):
+    delete_a_hotel_mapping(hotels, provider_name="agoda", provider_id="A1", db=test_db)
+    assert _summary(test_db)["agoda"] == (2, 2)
+
+    delete_a_hotel_mapping(hotels, provider_name="agoda", provider_id="A2", db=test_db)
+    assert _summary(test_db)["agoda"] == (1, 1)
+
+
+def test_deleting_a_hotel_removes_its_mappings_from_every_provider(test_db, hotels):
+    delete_hotel_by_ittid("ITT0001", hotels, db=test_db)
+
+    assert _summary(test_db) == {"agoda": (1, 1), "hotelbeds": (0, 0)}
+    assert SupplierSummaryService(test_db).reconcile(fix=False)["drifted_providers"] == 0
+
+
+def test_mapping_added_elsewhere_is_not_a_new_hotel(test_db, hotels):
+    # Another writer's mapping for the same pair is already in the table when
+    # this transaction applies its delta: the pair is not new to the provider
+    test_db.add_all(
+        [
+            ProviderMapping(ittid="ITT0002", provider_name="hotelbeds", provider_id="H2"),
+            ProviderMapping(ittid="ITT0002", provider_name="hotelbeds", provider_id="H3"),
+        ]
+    )
+    test_db.flush()
+    SupplierSummaryService(test_db).record_mappings_added([("hotelbeds", "ITT0002")])
+    test_db.commit()
+
+    assert _summary(test_db)["hotelbeds"] == (1, 2)
+
+
+def test_deltas_match_a_full_recount(test_db, hotels):
+    _add_provider(test_db, hotels, "ITT0002", "hotelbeds", "H2")
+    delete_a_hotel_mapping(hotels, provider_name="agoda", provider_id="A3", db=test_db)
+    test_db.add(Hotel(ittid="ITT0003", name="Hotel 3"))
+    test_db.commit()
+    _add_provider(test_db, hotels, "ITT0003", "agoda", "A5")
+
+    report = SupplierSummaryService(test_db).reconcile(fix=False)
+
+    assert report["providers_checked"] == 2
+    assert report["drifted_providers"] == 0
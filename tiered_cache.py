@@ -0,0 +1,511 @@
+"""
+Two-tier cache: per-process LRU (L1) in front of Redis (L2)
+
+Read path for a key:
+
+1. L1 hit that is still fresh -> returned without any I/O.
+2. L1 miss -> L2 (Redis) is read and, on a hit, copied into L1.
+3. Miss in both -> the value is computed. Concurrent misses for the same
+   key in one process share a single computation (single-flight); the
+   others wait for its result instead of running the same query.
+
+Stampede protection at TTL boundaries:
+
+- Probabilistic early refresh ("XFetch"): while an entry is fresh, each
+  read recomputes it early with a probability that grows as expiry
+  approaches and with how long the value took to compute, so one request
+  refreshes it shortly before it expires instead of many at once after.
+- Serve-stale: entries are kept ``TIERED_CACHE_STALE_SECONDS`` past their
+  TTL. If recomputing an expired entry fails because the database or
+  Redis is unreachable (``BACKEND_ERRORS``), the stale value is returned
+  instead of the error. Any other error (bugs, 4xx/5xx ``HTTPException``)
+  is raised as usual.
+
+Values are stored as JSON (``jsonable_encoder``); callers always receive a
+freshly decoded copy, so mutating a result never corrupts the cache.
+Starlette ``Response`` results (e.g. ``JSONResponse``) are cached as body,
+status and headers and rebuilt on every hit.
+
+Usage:
+    from tiered_cache import two_tier_cache
+
+    @router.get("/cities")
+    @two_tier_cache(expire=3600)
+    async def get_all_cities(db: Session = Depends(get_db)): ...
+"""
+
+from typing import Any, Awaitable, Callable, Dict, Optional
+from collections import OrderedDict
+from functools import wraps
+import asyncio
+import base64
+import inspect
+import json
+import logging
+import math
+import random
+import threading
+import time
+import os
+
+from fastapi import Request, Response, BackgroundTasks
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.exc import DBAPIError, OperationalError
+from sqlalchemy.orm import Session
+from redis.exceptions import ConnectionError as RedisConnectionError
+from redis.exceptions import TimeoutError as RedisTimeoutError
+
+from redis_pool import get_async_redis
+from db_async import run_db
+from cache_bus import register_local_cache
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+L1_MAX_ENTRIES = int(os.getenv("TIERED_CACHE_L1_MAX_ENTRIES", "10000"))
+L1_MAX_BYTES = int(os.getenv("TIERED_CACHE_L1_MAX_BYTES", str(64 * 1024 * 1024)))
+STALE_SECONDS = int(os.getenv("TIERED_CACHE_STALE_SECONDS", "300"))
+EARLY_REFRESH_BETA = float(os.getenv("TIERED_CACHE_EARLY_REFRESH_BETA", "1.0"))
+
+_RESPONSE_MARKER = "__response__"
+_ENTRY_OVERHEAD = 200  # rough per-entry bookkeeping bytes
+
+
+class CacheEntry:
+    """Encoded value with its freshness window and recompute cost"""
+
+    __slots__ = ("payload", "fresh_until", "stale_until", "delta", "size")
+
+    def __init__(self, payload: str, fresh_until: float, stale_until: float, delta: float):
+        self.payload = payload
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+        self.delta = delta  # seconds the value took to compute
+        self.size = len(payload) + _ENTRY_OVERHEAD
+
+
+class LocalLRU:
+    """
+    Thread-safe LRU bounded by entry count and by total payload bytes.
+    """
+
+    def __init__(self, max_entries: int = L1_MAX_ENTRIES, max_bytes: int = L1_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str, now: float) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if now >= entry.stale_until:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, entry: CacheEntry) -> None:
+        if entry.size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+
+    def pop(self, key: str) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+
+class _Flight:
+    """In-progress computation shared by concurrent sync callers"""
+
+    __slots__ = ("done", "payload", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.payload: Optional[str] = None
+        self.error: Optional[BaseException] = None
+
+
+class TieredCache:
+    """
+    L1 (``LocalLRU``) + L2 (Redis) cache with single-flight computation,
+    probabilistic early refresh and serve-stale on failure.
+    """
+
+    def __init__(
+        self,
+        l1: Optional[LocalLRU] = None,
+        stale_seconds: int = STALE_SECONDS,
+        beta: float = EARLY_REFRESH_BETA,
+    ):
+        self.l1 = l1 or LocalLRU()
+        self.stale_seconds = stale_seconds
+        self.beta = beta
+        self._async_flights: Dict[str, asyncio.Future] = {}
+        self._sync_flights: Dict[str, _Flight] = {}
+        self._flight_lock = threading.Lock()
+        self._stats = {
+            "l1_hits": 0,
+            "l2_hits": 0,
+            "misses": 0,
+            "early_refreshes": 0,
+            "shared_computations": 0,
+            "stale_served": 0,
+        }
+
+    # ----------------------------------------------------------------- async
+
+    async def aget_or_compute(
+        self, key: str, compute: Callable[[], Awaitable[Any]], ttl: int
+    ) -> Any:
+        """Cached value for ``key``, computing it with ``compute()`` if needed"""
+        now = time.time()
+        entry = self.l1.get(key, now)
+        if entry is not None:
+            self._stats["l1_hits"] += 1
+        else:
+            entry = await self._aload_l2(key, now)
+
+        if entry is None:
+            self._stats["misses"] += 1
+            return await self._acompute(key, compute, ttl)
+
+        if now < entry.fresh_until:
+            if key not in self._async_flights and self._refresh_early(entry, now):
+                self._stats["early_refreshes"] += 1
+                try:
+                    return await self._acompute(key, compute, ttl)
+                except Exception as e:
+                    logger.warning(f"Early refresh of {key} failed, using cached value: {e}")
+            return _decode(entry.payload)
+
+        try:
+            return await self._acompute(key, compute, ttl)
+        except Exception as e:
+            if not _is_backend_failure(e):
+                raise
+            self._stats["stale_served"] += 1
+            logger.warning(f"Serving stale value for {key}: {e}")
+            return _decode(entry.payload)
+
+    async def _acompute(self, key: str, compute: Callable[[], Awaitable[Any]], ttl: int) -> Any:
+        flight = self._async_flights.get(key)
+        if flight is not None:
+            self._stats["shared_computations"] += 1
+            try:
+                return _decode(await asyncio.shield(flight))
+            except asyncio.CancelledError:
+                if not flight.cancelled():
+                    raise
+                # The leader's request went away; compute it ourselves
+                return await self._acompute(key, compute, ttl)
+
+        flight = asyncio.get_running_loop().create_future()
+        self._async_flights[key] = flight
+        try:
+            started = time.perf_counter()
+            value = await compute()
+            entry = self._make_entry(value, ttl, time.perf_counter() - started)
+            self.l1.put(key, entry)
+            await self._astore_l2(key, entry)
+            flight.set_result(entry.payload)
+            return value
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except BaseException as e:
+            flight.set_exception(e)
+            flight.exception()  # mark retrieved when nobody else is waiting
+            raise
+        finally:
+            self._async_flights.pop(key, None)
+
+    async def _aload_l2(self, key: str, now: float) -> Optional[CacheEntry]:
+        raw = await get_async_redis().get(key)
+        entry = self._parse_l2(raw, now)
+        if entry is not None:
+            self._stats["l2_hits"] += 1
+            self.l1.put(key, entry)
+        return entry
+
+    async def _astore_l2(self, key: str, entry: CacheEntry) -> None:
+        await get_async_redis().setex(key, self._l2_ttl(entry), self._format_l2(entry))
+
+    # ------------------------------------------------------------------ sync
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any], ttl: int) -> Any:
+        """Sync ``aget_or_compute`` for threadpool code (uses the sync Redis client)"""
+        now = time.time()
+        entry = self.l1.get(key, now)
+        if entry is not None:
+            self._stats["l1_hits"] += 1
+        else:
+            entry = self._load_l2(key, now)
+
+        if entry is None:
+            self._stats["misses"] += 1
+            return self._compute(key, compute, ttl)
+
+        if now < entry.fresh_until:
+            if key not in self._sync_flights and self._refresh_early(entry, now):
+                self._stats["early_refreshes"] += 1
+                try:
+                    return self._compute(key, compute, ttl)
+                except Exception as e:
+                    logger.warning(f"Early refresh of {key} failed, using cached value: {e}")
+            return _decode(entry.payload)
+
+        try:
+            return self._compute(key, compute, ttl)
+        except Exception as e:
+            if not _is_backend_failure(e):
+                raise
+            self._stats["stale_served"] += 1
+            logger.warning(f"Serving stale value for {key}: {e}")
+            return _decode(entry.payload)
+
+    def _compute(self, key: str, compute: Callable[[], Any], ttl: int) -> Any:
+        with self._flight_lock:
+            flight = self._sync_flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._sync_flights[key] = _Flight()
+
+        if not leader:
+            self._stats["shared_computations"] += 1
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return _decode(flight.payload)
+
+        try:
+            started = time.perf_counter()
+            value = compute()
+            entry = self._make_entry(value, ttl, time.perf_counter() - started)
+            self.l1.put(key, entry)
+            self._store_l2(key, entry)
+            flight.payload = entry.payload
+            return value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._flight_lock:
+                self._sync_flights.pop(key, None)
+            flight.done.set()
+
+    def _load_l2(self, key: str, now: float) -> Optional[CacheEntry]:
+        from cache_config import cache
+
+        if not cache.is_available:
+            return None
+        try:
+            raw = cache.redis_client.get(key)
+        except Exception as e:
+            logger.warning(f"L2 cache get failed for {key}: {e}")
+            return None
+        entry = self._parse_l2(raw, now)
+        if entry is not None:
+            self._stats["l2_hits"] += 1
+            self.l1.put(key, entry)
+        return entry
+
+    def _store_l2(self, key: str, entry: CacheEntry) -> None:
+        from cache_config import cache
+
+        if not cache.is_available:
+            return
+        try:
+            cache.redis_client.setex(key, self._l2_ttl(entry), self._format_l2(entry))
+        except Exception as e:
+            logger.warning(f"L2 cache set failed for {key}: {e}")
+
+    # --------------------------------------------------------------- helpers
+
+    def invalidate(self, key: str) -> None:
+        """Drop a key from this process's L1 (L2 keys are versioned or expire)"""
+        self.l1.pop(key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "l1": self.l1.stats()}
+
+    def _make_entry(self, value: Any, ttl: int, delta: float) -> CacheEntry:
+        now = time.time()
+        return CacheEntry(_encode(value), now + ttl, now + ttl + self.stale_seconds, delta)
+
+    def _refresh_early(self, entry: CacheEntry, now: float) -> bool:
+        # XFetch: -log(U) is exponentially distributed, so the chance of an
+        # early recompute rises sharply over the last few ``delta``s
+        if entry.delta <= 0 or self.beta <= 0:
+            return False
+        gap = -entry.delta * self.beta * math.log(1.0 - random.random())
+        return now + gap >= entry.fresh_until
+
+    def _l2_ttl(self, entry: CacheEntry) -> int:
+        return max(1, int(math.ceil(entry.stale_until - time.time())))
+
+    @staticmethod
+    def _format_l2(entry: CacheEntry) -> str:
+        return f'{{"x":{entry.fresh_until:.3f},"d":{entry.delta:.4f},"v":{entry.payload}}}'
+
+    def _parse_l2(self, raw: Optional[str], now: float) -> Optional[CacheEntry]:
+        if not raw:
+            return None
+        try:
+            envelope = json.loads(raw)
+            fresh_until = float(envelope["x"])
+            payload = json.dumps(envelope["v"])
+            delta = float(envelope.get("d", 0))
+        except (ValueError, KeyError, TypeError):
+            return None
+        entry = CacheEntry(payload, fresh_until, fresh_until + self.stale_seconds, delta)
+        return entry if now < entry.stale_until else None
+
+
+def _encode(value: Any) -> str:
+    if isinstance(value, Response):
+        body = bytes(value.body)
+        try:
+            content, encoding = body.decode("utf-8"), "utf-8"
+        except UnicodeDecodeError:
+            content, encoding = base64.b64encode(body).decode("ascii"), "base64"
+        headers = {
+            name: header_value
+            for name, header_value in value.headers.items()
+            if name.lower() != "content-length"
+        }
+        value = {
+            _RESPONSE_MARKER: {
+                "body": content,
+                "encoding": encoding,
+                "status_code": value.status_code,
+                "headers": headers,
+                "media_type": value.media_type,
+            }
+        }
+    return json.dumps(jsonable_encoder(value))
+
+
+def _decode(payload: str) -> Any:
+    value = json.loads(payload)
+    if isinstance(value, dict) and _RESPONSE_MARKER in value:
+        stored = value[_RESPONSE_MARKER]
+        body = stored["body"]
+        content = base64.b64decode(body) if stored["encoding"] == "base64" else body.encode("utf-8")
+        return Response(
+            content=content,
+            status_code=stored["status_code"],
+            headers=stored["headers"],
+            media_type=stored["media_type"],
+        )
+    return value
+
+
+# Connectivity failures that justify serving stale data
+BACKEND_ERRORS = (
+    OperationalError,
+    DBAPIError,
+    RedisConnectionError,
+    RedisTimeoutError,
+    OSError,
+)
+
+
+def _is_backend_failure(error: Exception) -> bool:
+    """Whether ``error`` is a database/Redis/connection failure (everything else is re-raised)"""
+    return isinstance(error, BACKEND_ERRORS)
+
+
+def _key_part(value: Any) -> Any:
+    # ORM objects (current user etc.) are identified by their primary key
+    if hasattr(value, "__table__") and hasattr(value, "id"):
+        return f"{type(value).__name__}:{value.id}"
+    return value
+
+
+_IGNORED_TYPES = (Session, Request, Response, BackgroundTasks)
+
+
+def two_tier_cache(expire: int, namespace: Optional[str] = None):
+    """
+    Cache a route or helper (sync or async) in the two-tier cache.
+
+    The key is built from the bound arguments, ignoring the DB session,
+    request/response objects and background tasks; ORM objects such as the
+    current user contribute their id, so results stay per user.
+
+    Args:
+        expire: Seconds a value is fresh (it may be served stale on failure
+            for ``TIERED_CACHE_STALE_SECONDS`` longer)
+        namespace: Key prefix, defaults to ``module.function``
+    """
+
+    def decorator(func):
+        from cache_config import cache_key_builder
+
+        signature = inspect.signature(func)
+        prefix = f"tiered:{namespace or f'{func.__module__}.{func.__qualname__}'}"
+        is_async = asyncio.iscoroutinefunction(func)
+
+        def build_key(args, kwargs) -> str:
+            bound = signature.bind_partial(*args, **kwargs)
+            parts = {
+                name: _key_part(value)
+                for name, value in bound.arguments.items()
+                if not isinstance(value, _IGNORED_TYPES)
+            }
+            return f"{prefix}:{cache_key_builder(**parts)}"
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            if is_async:
+                compute = lambda: func(*args, **kwargs)
+            else:
+                compute = lambda: run_db(func, *args, **kwargs)
+            return await tiered_cache.aget_or_compute(build_key(args, kwargs), compute, expire)
+
+        return wrapper
+
+    return decorator
+
+
+# Global two-tier cache instance
+tiered_cache = TieredCache()
+
+
+def _invalidate_l1(key: Optional[str]) -> None:
+    if key is None:
+        tiered_cache.l1.clear()
+    else:
+        tiered_cache.l1.pop(key)
+
+
+register_local_cache("tiered_l1", _invalidate_l1)
@@ -0,0 +1,147 @@
+"""
+Archive Activity Logs Script
+
+This script should be run periodically (e.g., daily via cron job) to keep
+user_activity_logs bounded. It creates upcoming monthly partitions (MySQL),
+archives months older than the hot window to compressed files and then
+removes them from the live table. Activity rollups older than their own
+retention (ACTIVITY_ROLLUP_HOURLY_DAYS, ACTIVITY_ROLLUP_DAILY_DAYS) are
+pruned in the same run.
+
+Usage:
+    python utils/archive_activity_logs.py [--hot-days DAYS] [--archive-dir DIR]
+                                          [--format ndjson|parquet] [--dry-run]
+
+Examples:
+    # Keep the last 90 days live (default, or ACTIVITY_LOG_HOT_DAYS)
+    python utils/archive_activity_logs.py
+
+    # Keep 180 days and write Parquet archives (requires pyarrow)
+    python utils/archive_activity_logs.py --hot-days 180 --format parquet
+
+    # Show partitions and what would be archived
+    python utils/archive_activity_logs.py --dry-run
+
+Cron Job Setup:
+    # Run daily at 2:30 AM
+    30 2 * * * cd /path/to/hita && /path/to/python utils/archive_activity_logs.py >> /var/log/activity_log_archive.log 2>&1
+"""
+
+import os
+import sys
+import argparse
+import logging
+from datetime import datetime
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import SessionLocal
+from services.activity_rollup_service import ActivityRollupService
+from services.activity_log_retention_service import (
+    ActivityLogRetentionService,
+    HOT_DAYS,
+    ARCHIVE_DIR,
+    ARCHIVE_FORMAT,
+)
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    """Main archival function"""
+    parser = argparse.ArgumentParser(description="Archive expired activity logs")
+    parser.add_argument(
+        "--hot-days",
+        type=int,
+        default=HOT_DAYS,
+        help=f"Days of history kept in the live table (default: {HOT_DAYS})",
+    )
+    parser.add_argument(
+        "--archive-dir",
+        default=ARCHIVE_DIR,
+        help=f"Directory for archive files (default: {ARCHIVE_DIR})",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["ndjson", "parquet"],
+        default=ARCHIVE_FORMAT,
+        help=f"Archive file format (default: {ARCHIVE_FORMAT})",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Show what would be archived without changing anything",
+    )
+
+    args = parser.parse_args()
+
+    logger.info("=" * 60)
+    logger.info("Activity Log Archive Script")
+    logger.info("=" * 60)
+    logger.info(f"Hot window: {args.hot_days} days")
+    logger.info(f"Archive directory: {args.archive_dir} ({args.format})")
+    logger.info(f"Dry run: {args.dry_run}")
+    logger.info(f"Started at: {datetime.utcnow().isoformat()}")
+    logger.info("=" * 60)
+
+    db = SessionLocal()
+
+    try:
+        service = ActivityLogRetentionService(
+            db,
+            hot_days=args.hot_days,
+            archive_dir=args.archive_dir,
+            archive_format=args.format,
+        )
+
+        logger.info(
+            f"Partitioned table: {'yes (MySQL monthly)' if service.is_partitioned() else 'no'}"
+        )
+        for partition in service.list_partitions():
+            logger.info(
+                f"  {partition['name']:<8} month={partition['month']} "
+                f"rows={partition['rows']} expired={partition['expired']}"
+            )
+
+        if not args.dry_run:
+            created = service.ensure_partitions()
+            if created:
+                logger.info(f"Created partitions: {', '.join(created)}")
+
+            # Make sure expired months are in the rollups before they go
+            ActivityRollupService(db).aggregate_new_logs()
+
+        report = service.archive_expired(dry_run=args.dry_run)
+
+        for item in report["archived"]:
+            verb = "Would archive" if args.dry_run else "Archived"
+            logger.info(f"{verb} {item['month']}: {item['rows']} rows")
+        for item in report["skipped"]:
+            logger.warning(f"Skipped {item['month']}: {item['reason']}")
+        if not report["archived"] and not report["skipped"]:
+            logger.info("Nothing to archive")
+
+        pruned = service.prune_rollups(dry_run=args.dry_run)
+        for table, item in pruned["tables"].items():
+            verb = "Would prune" if args.dry_run else "Pruned"
+            logger.info(f"{verb} {item['rows']} rows of {table} before {item['cutoff']}")
+
+        logger.info("=" * 60)
+        logger.info("Archive run completed")
+        logger.info(f"Finished at: {datetime.utcnow().isoformat()}")
+        logger.info("=" * 60)
+
+    except Exception as e:
+        logger.error(f"Error during archival: {str(e)}", exc_info=True)
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
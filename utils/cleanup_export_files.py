@@ -79,6 +79,7 @@ def main():
     stats_before = storage.get_storage_stats()
     logger.info(f"  Total files: {stats_before['total_files']}")
     logger.info(f"  Total size: {stats_before['total_size_mb']} MB")
+    logger.info(f"  On disk: {stats_before['physical_size_mb']} MB ({stats_before['shared_files']} hard-linked files)")
     if stats_before['oldest_file']:
         logger.info(f"  Oldest file: {stats_before['oldest_file'].isoformat()}")
     if stats_before['newest_file']:
@@ -111,9 +112,10 @@ def main():
         stats_after = storage.get_storage_stats()
         logger.info(f"  Total files: {stats_after['total_files']}")
         logger.info(f"  Total size: {stats_after['total_size_mb']} MB")
+        logger.info(f"  On disk: {stats_after['physical_size_mb']} MB ({stats_after['shared_files']} hard-linked files)")
         
-        # Calculate space freed
-        space_freed_mb = stats_before['total_size_mb'] - stats_after['total_size_mb']
+        # Calculate space freed (deleting one name of a reused result frees nothing)
+        space_freed_mb = stats_before['physical_size_mb'] - stats_after['physical_size_mb']
         logger.info(f"\nSpace freed: {space_freed_mb:.2f} MB")
         
         logger.info("\n" + "=" * 60)
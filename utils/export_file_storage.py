@@ -7,14 +7,19 @@ Manages file storage for export operations including:
 - File permissions
 - Cleanup of expired files
 - Storage error handling
+- Hard-linking reused export results (see services/export_result_cache.py)
+- Pre-compressed variants (``<file>.zst``, ``<file>.gz``) that the download
+  endpoint serves with ``Content-Encoding``
 """
 
 import os
+import gzip
 import logging
+import shutil
 import stat
 from pathlib import Path
 from datetime import datetime, timedelta
-from typing import Optional, Tuple
+from typing import Dict, Optional, Tuple
 from sqlalchemy.orm import Session
 
 from models import ExportJob
@@ -22,6 +27,22 @@ from models import ExportJob
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Content-Encoding -> file suffix of the pre-compressed variant
+COMPRESSED_SUFFIXES = {"zstd": ".zst", "gzip": ".gz"}
+
+# Variants written for each finished export (zstd needs the zstandard package)
+PRECOMPRESS_ENCODINGS = [
+    encoding.strip()
+    for encoding in os.getenv("EXPORT_PRECOMPRESS", "zstd,gzip").split(",")
+    if encoding.strip() in COMPRESSED_SUFFIXES
+]
+PRECOMPRESS_MIN_BYTES = int(os.getenv("EXPORT_PRECOMPRESS_MIN_BYTES", "65536"))
+
+# Already-compressed containers gain nothing from another pass
+UNCOMPRESSIBLE_EXTENSIONS = {".xlsx"}
+
+COPY_CHUNK_BYTES = 1024 * 1024
+
 
 class ExportFileStorage:
     """
@@ -195,9 +216,108 @@ class ExportFileStorage:
             logger.error(f"Error getting file size: {str(e)}")
             return None
     
+    def write_compressed_variants(self, file_path: str) -> Dict[str, str]:
+        """
+        Write pre-compressed copies of a finished export next to it.
+        
+        Variants that do not come out smaller than the original are
+        dropped. Failures are logged and never fail the export.
+        
+        Args:
+            file_path: Path to the finished export file
+            
+        Returns:
+            Mapping of content encoding to variant path
+        """
+        variants = {}
+        if os.path.splitext(file_path)[1].lower() in UNCOMPRESSIBLE_EXTENSIONS:
+            return variants
+        original_size = self.get_file_size(file_path)
+        if original_size is None or original_size < PRECOMPRESS_MIN_BYTES:
+            return variants
+        
+        for encoding in PRECOMPRESS_ENCODINGS:
+            variant_path = file_path + COMPRESSED_SUFFIXES[encoding]
+            tmp_path = variant_path + ".tmp"
+            try:
+                if encoding == "zstd":
+                    try:
+                        import zstandard
+                    except ImportError:
+                        logger.debug("zstandard not installed, skipping zstd variant")
+                        continue
+                    with open(file_path, "rb") as src, open(tmp_path, "wb") as dst:
+                        zstandard.ZstdCompressor(level=3).copy_stream(src, dst, read_size=COPY_CHUNK_BYTES)
+                else:
+                    with open(file_path, "rb") as src, open(tmp_path, "wb") as raw:
+                        # mtime=0 keeps the bytes (and so Range offsets) reproducible
+                        with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6, mtime=0) as dst:
+                            shutil.copyfileobj(src, dst, COPY_CHUNK_BYTES)
+                
+                if os.path.getsize(tmp_path) >= original_size:
+                    os.remove(tmp_path)
+                    continue
+                os.replace(tmp_path, variant_path)
+                self.set_file_permissions(variant_path)
+                variants[encoding] = variant_path
+            except Exception as e:
+                logger.error(f"Error writing {encoding} variant of {file_path}: {str(e)}")
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        
+        if variants:
+            logger.info(f"Pre-compressed {file_path}: {', '.join(variants)}")
+        return variants
+    
+    def get_compressed_variants(self, file_path: str) -> Dict[str, str]:
+        """
+        Existing pre-compressed variants of an export file.
+        
+        Args:
+            file_path: Path to the export file
+            
+        Returns:
+            Mapping of content encoding to variant path
+        """
+        return {
+            encoding: file_path + suffix
+            for encoding, suffix in COMPRESSED_SUFFIXES.items()
+            if os.path.isfile(file_path + suffix)
+        }
+    
+    def link_file(self, source_path: str, target_path: str) -> str:
+        """
+        Give an existing export file (and its compressed variants) a second
+        name for another job.
+
+        Uses a hard link so reusing a result costs no extra storage and
+        each job can later delete its own name independently. Falls back to
+        a copy when the filesystem does not support hard links.
+
+        Args:
+            source_path: Path of the existing export file
+            target_path: Path for the new job's file
+
+        Returns:
+            target_path
+        """
+        sources = [(source_path, target_path)] + [
+            (variant_path, target_path + COMPRESSED_SUFFIXES[encoding])
+            for encoding, variant_path in self.get_compressed_variants(source_path).items()
+        ]
+        for source, target in sources:
+            try:
+                os.link(source, target)
+                logger.debug(f"Hard-linked export file {source} -> {target}")
+            except OSError as e:
+                logger.warning(f"Hard link not possible ({str(e)}), copying {source}")
+                shutil.copyfile(source, target)
+                self.set_file_permissions(target)
+        return target_path
+
     def delete_file(self, file_path: str) -> bool:
         """
-        Delete an export file.
+        Delete an export file and its compressed variants.
         
         Args:
             file_path: Path to the export file
@@ -206,6 +326,8 @@ class ExportFileStorage:
             True if file was deleted successfully, False otherwise
         """
         try:
+            for variant_path in self.get_compressed_variants(file_path).values():
+                os.remove(variant_path)
             if os.path.exists(file_path):
                 os.remove(file_path)
                 logger.info(f"Deleted export file: {file_path}")
@@ -338,35 +460,54 @@ class ExportFileStorage:
         """
         Get statistics about the export storage directory.
         
+        Scans the per-user subdirectories as well. Hard-linked files (reused
+        export results) count once towards the physical size.
+        
         Returns:
             Dictionary with storage statistics:
             - total_files: Number of files in storage
             - total_size_bytes: Total size of all files
+            - physical_size_bytes: Disk space actually used (links counted once)
+            - shared_files: Files that share their data with another file
             - oldest_file: Timestamp of oldest file
             - newest_file: Timestamp of newest file
         """
         try:
             files = []
             total_size = 0
+            physical_size = 0
+            inodes = set()
+            shared_files = 0
             
             # Scan storage directory
-            for filename in os.listdir(self.base_storage_path):
-                file_path = os.path.join(self.base_storage_path, filename)
-                
-                if os.path.isfile(file_path):
-                    file_stat = os.stat(file_path)
-                    files.append({
-                        "path": file_path,
-                        "size": file_stat.st_size,
-                        "modified": datetime.fromtimestamp(file_stat.st_mtime)
-                    })
-                    total_size += file_stat.st_size
+            for root, _dirs, filenames in os.walk(self.base_storage_path):
+                for filename in filenames:
+                    file_path = os.path.join(root, filename)
+                    
+                    if os.path.isfile(file_path):
+                        file_stat = os.stat(file_path)
+                        files.append({
+                            "path": file_path,
+                            "size": file_stat.st_size,
+                            "modified": datetime.fromtimestamp(file_stat.st_mtime)
+                        })
+                        total_size += file_stat.st_size
+                        
+                        if file_stat.st_nlink > 1:
+                            shared_files += 1
+                        inode = (file_stat.st_dev, file_stat.st_ino)
+                        if inode not in inodes:
+                            inodes.add(inode)
+                            physical_size += file_stat.st_size
             
             # Calculate statistics
             stats = {
                 "total_files": len(files),
                 "total_size_bytes": total_size,
                 "total_size_mb": round(total_size / (1024 * 1024), 2),
+                "physical_size_bytes": physical_size,
+                "physical_size_mb": round(physical_size / (1024 * 1024), 2),
+                "shared_files": shared_files,
                 "oldest_file": min([f["modified"] for f in files]) if files else None,
                 "newest_file": max([f["modified"] for f in files]) if files else None
             }
@@ -381,6 +522,9 @@ class ExportFileStorage:
                 "total_files": 0,
                 "total_size_bytes": 0,
                 "total_size_mb": 0,
+                "physical_size_bytes": 0,
+                "physical_size_mb": 0,
+                "shared_files": 0,
                 "oldest_file": None,
                 "newest_file": None,
                 "error": str(e)
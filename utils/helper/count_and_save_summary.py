@@ -12,6 +12,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspa
 
 from sqlalchemy import text
 from database import SessionLocal
+import services.data_version_service  # noqa: F401  (bumps export data versions on commit)
 import logging
 import time
 
@@ -182,6 +182,14 @@ def deduct_points_for_general_user(
     if current_user.role != models.UserRole.GENERAL_USER:
         return  # No deduction for other roles
 
+    # Metered path: admitted in memory, written back to the DB in batches
+    from services.point_meter_service import get_point_meter
+
+    meter = get_point_meter()
+    if meter is not None:
+        meter.charge(current_user, int(points) if points else 0, db)
+        return
+
     # Get the user's points
     user_points = (
         db.query(models.UserPoint)
@@ -0,0 +1,133 @@
+"""
+Startup Profiler
+
+Imports the application in a fresh interpreter with ``python -X importtime``
+and reports where worker boot time goes: the slowest modules by cumulative
+import time, the same grouped by top-level package, and the wall time until
+``main.app`` is importable.
+
+Usage:
+    python utils/profile_startup.py [--module main] [--top 25] [--json]
+
+Examples:
+    # Slowest 25 modules and packages
+    python utils/profile_startup.py
+
+    # Machine-readable output (e.g. to compare two branches)
+    python utils/profile_startup.py --json > startup.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from collections import defaultdict
+from typing import Any, Dict, List
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_importtime(module: str) -> Dict[str, Any]:
+    """Import ``module`` in a subprocess and collect ``-X importtime`` records"""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BASE_DIR,
+        capture_output=True,
+        text=True,
+    )
+    wall_seconds = time.perf_counter() - started
+
+    records: List[Dict[str, Any]] = []
+    for line in result.stderr.splitlines():
+        # "import time:   self [us] | cumulative | imported package"
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue
+        name = parts[2].rstrip()
+        records.append(
+            {
+                "module": name.strip(),
+                "depth": (len(name) - len(name.lstrip())) // 2,
+                "self_us": int(parts[0]),
+                "cumulative_us": int(parts[1]),
+            }
+        )
+
+    errors = [
+        line for line in result.stderr.splitlines() if line and not line.startswith("import time:")
+    ]
+    return {
+        "module": module,
+        "ok": result.returncode == 0,
+        "errors": errors[-20:],
+        "wall_seconds": round(wall_seconds, 3),
+        "records": records,
+    }
+
+
+def summarize(profile: Dict[str, Any], top: int) -> Dict[str, Any]:
+    records = profile["records"]
+    by_package: Dict[str, int] = defaultdict(int)
+    for record in records:
+        by_package[record["module"].split(".")[0]] += record["self_us"]
+
+    slowest = sorted(records, key=lambda r: r["cumulative_us"], reverse=True)[:top]
+    packages = sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "module": profile["module"],
+        "ok": profile["ok"],
+        "errors": profile["errors"],
+        "wall_seconds": profile["wall_seconds"],
+        "import_seconds": round(sum(r["self_us"] for r in records) / 1e6, 3),
+        "modules_imported": len(records),
+        "slowest_modules": [
+            {
+                "module": r["module"],
+                "cumulative_ms": round(r["cumulative_us"] / 1000, 1),
+                "self_ms": round(r["self_us"] / 1000, 1),
+            }
+            for r in slowest
+        ],
+        "slowest_packages": [
+            {"package": name, "self_ms": round(us / 1000, 1)} for name, us in packages
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report per-module import cost of app startup")
+    parser.add_argument("--module", default="main", help="Module to import (default: main)")
+    parser.add_argument("--top", type=int, default=25, help="Rows per table (default: 25)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    report = summarize(run_importtime(args.module), args.top)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(
+            f"import {report['module']}: {report['wall_seconds']:.2f}s wall, "
+            f"{report['import_seconds']:.2f}s in imports, {report['modules_imported']} modules"
+        )
+        print(f"\n{'cumulative ms':>14} {'self ms':>9}  module")
+        for row in report["slowest_modules"]:
+            print(f"{row['cumulative_ms']:>14.1f} {row['self_ms']:>9.1f}  {row['module']}")
+        print(f"\n{'self ms':>14}  top-level package")
+        for row in report["slowest_packages"]:
+            print(f"{row['self_ms']:>14.1f}  {row['package']}")
+
+    if not report["ok"]:
+        print("\nImport failed:", file=sys.stderr)
+        for line in report["errors"]:
+            print(f"  {line}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()